@@ -4,16 +4,19 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Mapping, Optional, Literal, Union, Sequence
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Literal, Union, Sequence
 import logging
 from decimal import Decimal
-from collections import deque
+from collections import OrderedDict, deque
 import os
 import sys
+import threading
+import time
+import weakref
 
 from fastapi import FastAPI, HTTPException, Query, WebSocket, Request
 
-from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from fastapi.middleware.cors import CORSMiddleware
@@ -25,6 +28,7 @@ if str(ROOT) not in sys.path:
 CORTEX_FRONTEND_PUBLIC = ROOT / "cortex_frontend" / "public"
 PUBLIC_LOGOS_DIR = CORTEX_FRONTEND_PUBLIC / "logos"
 
+import base64
 import json
 from datetime import datetime, timedelta, timezone
 import re
@@ -622,13 +626,13 @@ def _fetch_self_membership(conn: psycopg.Connection, membership_id: str) -> Opti
     return dict(row) if row else None
 
 
-def _increment_self_membership_usage(membership_id: str, session_token: Optional[str] = None) -> None:
+def _increment_self_membership_usage(membership_id: str, session_token: Optional[str] = None, count: int = 1) -> None:
     try:
         with _open_supabase_conn() as conn:
             with conn.cursor() as cur:
                 cur.execute(
-                    "update cortex.self_memberships set search_count = coalesce(search_count, 0) + 1 where id = %s",
-                    (membership_id,),
+                    "update cortex.self_memberships set search_count = coalesce(search_count, 0) + %s where id = %s",
+                    (int(count), membership_id),
                 )
                 if session_token:
                     cur.execute(
@@ -995,6 +999,7 @@ def _extract_membership_session(request: Optional[Request], payload: Optional[Ma
 def _membership_usage_precheck(
     request: Optional[Request],
     payload: Optional[Mapping[str, Any]] = None,
+    units: int = 1,
 ) -> Optional[Dict[str, Any]]:
     if request is None:
         return None
@@ -1014,7 +1019,7 @@ def _membership_usage_precheck(
     paid = bool(session_data.get("paid"))
     if not paid and isinstance(limit, int) and limit >= 0:
         used = int(session_data.get("search_count", 0))
-        if used >= limit:
+        if used + max(1, units) > limit:
             detail = {
                 "error": "membership_payment_required",
                 "message": f"Alcanzaste el límite gratuito de {limit} búsquedas.",
@@ -1031,23 +1036,21 @@ def _membership_usage_precheck(
     return {"token": session_token, "data": session_data}
 
 
-def _membership_usage_commit(ctx: Optional[Dict[str, Any]], usage_key: str) -> None:
-    if not ctx:
+def _membership_usage_commit(ctx: Optional[Dict[str, Any]], usage_key: str, count: int = 1) -> None:
+    if not ctx or count <= 0:
         return
     data = ctx.get("data")
     if not isinstance(data, dict):
         return
     try:
-        data["search_count"] = int(data.get("search_count", 0)) + 1
+        data["search_count"] = int(data.get("search_count", 0)) + count
     except Exception:
-        data["search_count"] = 1
+        data["search_count"] = count
     history = data.setdefault("usage_history", [])
     if isinstance(history, list):
         try:
-            history.append({
-                "usage": usage_key,
-                "at": datetime.now(timezone.utc).isoformat(),
-            })
+            at = datetime.now(timezone.utc).isoformat()
+            history.extend({"usage": usage_key, "at": at} for _ in range(count))
             if len(history) > 100:
                 del history[:-100]
         except Exception:
@@ -1055,7 +1058,7 @@ def _membership_usage_commit(ctx: Optional[Dict[str, Any]], usage_key: str) -> N
     membership_id = data.get("membership_id")
     token = ctx.get("token") if isinstance(ctx, dict) else None
     if membership_id:
-        _increment_self_membership_usage(str(membership_id), token if isinstance(token, str) else None)
+        _increment_self_membership_usage(str(membership_id), token if isinstance(token, str) else None, count)
 
 
 def _build_dealer_state(session_data: Mapping[str, Any]) -> Dict[str, Any]:
@@ -1969,10 +1972,61 @@ try:
 except Exception:  # pragma: no cover
     pd = None  # type: ignore
 
+
+def _pandas_copy_on_write() -> bool:
+    """Copy-on-Write is always on in pandas 3; older pandas opts in here so
+    the whole app runs under the same semantics as the pinned pandas>=3."""
+    if pd is None:
+        return False
+    try:
+        if int(str(pd.__version__).split(".")[0]) >= 3:
+            return True
+    except Exception:
+        pass
+    try:
+        pd.options.mode.copy_on_write = True
+        return bool(pd.options.mode.copy_on_write)
+    except Exception:
+        return False
+
+
+_PANDAS_COW = _pandas_copy_on_write()
+
+
 # --------------------------- Shared Row Utilities -------------------------
 # These helpers are used in /compare and /price_explain. Keep them at module level
 # to avoid NameError and code duplication across endpoints.
 from typing import Optional as _Optional, Any as _Any
+from core.catalog_kernels import (
+    apply_alias_table,
+    column_or_none,
+    flag_any,
+    key_present,
+    map_values,
+    num_column,
+    python_or,
+    round1,
+    truthy_mask,
+)
+from core.build_report import BuildReport
+from core.catalog_dtypes import compact_frame, memory_report
+from core.catalog_index import CatalogIndex
+from core.catalog_search import EXACT as SEARCH_EXACT, CatalogSearch
+from core.enriched_cache import EnrichedCache
+from core.file_lock import exclusive
+from core.fuel_prices import FuelPriceProvider, FuelPrices
+from core.keyword_matcher import KeywordMatcher, any_of
+from core.maintenance_costs import MaintenanceIndex
+from core.sales_index import SalesYear, SIN_SEGMENTO
+from core.vehicle_stream import (
+    begin_generation,
+    content_hash,
+    file_signature,
+    frame_from_records,
+    load_vehicles,
+    release_generations,
+    vehicle_hashes,
+)
 
 def _to_num_shared(x: _Any) -> _Optional[float]:
     if x is None:
@@ -2008,17 +2062,19 @@ def _fuel_raw_shared(row: Dict[str, _Any]) -> str:
             return str(v)
     return ""
 
+_KML_COLUMNS_SHARED = (
+    "combinado_kml","kml_mixto","mixto_kml","rendimiento_mixto_kml","consumo_mixto_kml","consumo_combinado_kml",
+    "combinado_km_l","km_l_mixto","mixto_km_l","rendimiento_mixto_km_l","rendimiento_combinado_km_l","consumo_combinado_km_l",
+)
+_L100_COLUMNS_SHARED = ("mixto_l_100km","consumo_mixto_l_100km","l_100km_mixto")
+
 def _kml_from_row_shared(row: Dict[str, _Any]) -> _Optional[float]:
-    cand = [
-        "combinado_kml","kml_mixto","mixto_kml","rendimiento_mixto_kml","consumo_mixto_kml","consumo_combinado_kml",
-        "combinado_km_l","km_l_mixto","mixto_km_l","rendimiento_mixto_km_l","rendimiento_combinado_km_l","consumo_combinado_km_l",
-    ]
-    for c in cand:
+    for c in _KML_COLUMNS_SHARED:
         v = _to_num_shared(row.get(c))
         if v is not None and v > 0:
             return float(v)
     # L/100km -> kml
-    for c in ("mixto_l_100km","consumo_mixto_l_100km","l_100km_mixto"):
+    for c in _L100_COLUMNS_SHARED:
         v = _to_num_shared(row.get(c))
         if v is not None and v > 0:
             try:
@@ -2041,22 +2097,10 @@ def _kml_from_row_shared(row: Dict[str, _Any]) -> _Optional[float]:
 
 def _fuel_price_for_shared(row: Dict[str, _Any]) -> _Optional[float]:
     try:
-        cfg = get_config()
-        prices = cfg.get("fuel_prices", {})
+        fuel = _FUEL_PRICES.current()
     except Exception:
-        prices = {}
-    lc = _fuel_raw_shared(row).lower()
-    if not lc:
         return None
-    if "elect" in lc:
-        return 0.0
-    if "diesel" in lc:
-        return _to_num_shared(prices.get("diesel_litro"))
-    if "premium" in lc:
-        return _to_num_shared(prices.get("gasolina_premium_litro") or prices.get("gasolina_magna_litro"))
-    if "magna" in lc or "regular" in lc or any(k in lc for k in ("gas", "nafta", "petrol", "gasolina")):
-        return _to_num_shared(prices.get("gasolina_magna_litro") or prices.get("gasolina_premium_litro"))
-    return None
+    return fuel.price_for(_fuel_raw_shared(row))
 
 def ensure_fuel_60(row: Dict[str, _Any]) -> Dict[str, _Any]:
     out = dict(row)
@@ -2070,6 +2114,36 @@ def ensure_fuel_60(row: Dict[str, _Any]) -> Dict[str, _Any]:
                 pass
     return out
 
+# Frame version of ensure_fuel_60's pricing, used to reprice the whole catalog
+# when the fuel snapshot changes.
+def fuel_cost_60k_frame(df: "pd.DataFrame", prices: FuelPrices) -> "pd.Series":  # type: ignore[name-defined]
+    """``ensure_fuel_60`` cost of every row under ``prices``, unrounded (NaN when
+    kml or price is unknown).
+
+    Electrified rows (BEV, PHEV) stay NaN: their catalog cost mixes
+    electricity and is not a per-litre figure.
+    """
+    kml = pd.Series(float("nan"), index=df.index, dtype="float64")
+    for c in _KML_COLUMNS_SHARED:
+        v = num_column(df, c, _to_num_shared)
+        kml = kml.fillna(v.where(v > 0))
+    for c in _L100_COLUMNS_SHARED:
+        v = num_column(df, c, _to_num_shared)
+        kml = kml.fillna((100.0 / v).where(v > 0))
+    if "fuelEconomy" in df.columns:
+        fe = map_values(df["fuelEconomy"], lambda fe: _kml_from_row_shared({"fuelEconomy": fe}))
+        kml = kml.fillna(pd.to_numeric(fe, errors="coerce"))
+
+    def _price(v: _Any) -> _Optional[float]:
+        lc = str(v).lower() if v else ""
+        if any(k in lc for k in ("elect", "bev", "phev", "enchuf")):
+            return None
+        return prices.price_for(lc)
+
+    fuel = python_or(df, ("categoria_combustible_final", "tipo_de_combustible_original", "fuel_type"))
+    price = pd.to_numeric(map_values(fuel, _price), errors="coerce")
+    return (60000.0 / kml) * price
+
 def _to01_shared(v: _Any) -> int:
     try:
         s = str(v).strip().lower()
@@ -2082,19 +2156,60 @@ def _to01_shared(v: _Any) -> int:
     except Exception:
         return 0
 
+_MISSING_FEATURE_TOKENS = {
+    "na","n/a","n.a.","nd","n.d.","s/d","sin dato","sin datos",
+    "no disponible","ninguno","ninguna","null","-","--","tbd",
+    "por definir","por confirmar","por anunciar",
+}
+
+
+def _is_missing_feature_shared(val: _Any) -> bool:
+    if val is None or (pd is not None and val is pd.NA):
+        return True
+    if isinstance(val, bool):
+        return False
+    if isinstance(val, (int, float)):
+        try:
+            if float(val) != float(val):  # NaN guard
+                return True
+        except Exception:
+            return True
+        return False
+    try:
+        s = str(val).strip()
+    except Exception:
+        return False
+    if not s:
+        return True
+    sl = s.lower()
+    if sl in _MISSING_FEATURE_TOKENS:
+        return True
+    if sl.startswith("sin dato") or sl.startswith("no disponible"):
+        return True
+    return False
+
+
+_PILLAR_SCORE_KEYS = (
+    "equip_p_adas",
+    "equip_p_safety",
+    "equip_p_comfort",
+    "equip_p_infotainment",
+    "equip_p_traction",
+    "equip_p_utility",
+)
+_EQUIP_PROXY_KEYS = (
+    "android_auto","apple_carplay","tiene_pantalla_tactil","camara_360",
+    "sensor_punto_ciego","alerta_colision","abs","control_estabilidad",
+    "llave_inteligente","aire_acondicionado","apertura_remota_maletero",
+    "cierre_automatico_maletero","ventanas_electricas","seguros_electricos",
+)
+
+
 def ensure_equip_score(row: Dict[str, _Any]) -> Dict[str, _Any]:
     out = dict(row)
     def _avg_pillars() -> Optional[float]:
-        pillar_keys = (
-            "equip_p_adas",
-            "equip_p_safety",
-            "equip_p_comfort",
-            "equip_p_infotainment",
-            "equip_p_traction",
-            "equip_p_utility",
-        )
         vals: list[float] = []
-        for key in pillar_keys:
+        for key in _PILLAR_SCORE_KEYS:
             v = _to_num_shared(out.get(key))
             if v is None or v <= 0:
                 continue
@@ -2106,37 +2221,6 @@ def ensure_equip_score(row: Dict[str, _Any]) -> Dict[str, _Any]:
             return round(sum(vals) / float(len(vals)), 1)
         return None
 
-    missing_tokens = {
-        "na","n/a","n.a.","nd","n.d.","s/d","sin dato","sin datos",
-        "no disponible","ninguno","ninguna","null","-","--","tbd",
-        "por definir","por confirmar","por anunciar",
-    }
-
-    def _is_missing_feature(val: _Any) -> bool:
-        if val is None:
-            return True
-        if isinstance(val, bool):
-            return False
-        if isinstance(val, (int, float)):
-            try:
-                if float(val) != float(val):  # NaN guard
-                    return True
-            except Exception:
-                return True
-            return False
-        try:
-            s = str(val).strip()
-        except Exception:
-            return False
-        if not s:
-            return True
-        sl = s.lower()
-        if sl in missing_tokens:
-            return True
-        if sl.startswith("sin dato") or sl.startswith("no disponible"):
-            return True
-        return False
-
     avg = _avg_pillars()
     val = _to_num_shared(out.get("equip_score"))
     if avg is not None:
@@ -2152,16 +2236,10 @@ def ensure_equip_score(row: Dict[str, _Any]) -> Dict[str, _Any]:
             return out
     if val is not None and 0 < val <= 100:
         return out
-    keys = [
-        "android_auto","apple_carplay","tiene_pantalla_tactil","camara_360",
-        "sensor_punto_ciego","alerta_colision","abs","control_estabilidad",
-        "llave_inteligente","aire_acondicionado","apertura_remota_maletero",
-        "cierre_automatico_maletero","ventanas_electricas","seguros_electricos",
-    ]
     have = 0; present = 0
-    for k in keys:
+    for k in _EQUIP_PROXY_KEYS:
         valk = out.get(k)
-        if _is_missing_feature(valk):
+        if _is_missing_feature_shared(valk):
             continue
         present += 1
         if _to01_shared(valk):
@@ -2259,6 +2337,120 @@ def ensure_pillars(row: Dict[str, _Any]) -> Dict[str, _Any]:
     return out
 
 
+# DataFrame versions of ensure_pillars / ensure_equip_score: same flags and
+# thresholds, evaluated per column instead of per row dict. Missing cells (NaN)
+# behave like absent keys in the row versions.
+def ensure_pillars_frame(df: "pd.DataFrame") -> "pd.DataFrame":  # type: ignore[name-defined]
+    def _flag(*names: str):
+        return flag_any(df, names, _to01_shared)
+
+    def _num(col: str):
+        return num_column(df, col, _to_num_shared)
+
+    def _maybe(col: str, score) -> None:
+        val = round1(score.clip(lower=0.0, upper=100.0))
+        if col not in df.columns:
+            df[col] = val
+            return
+        cur = _num(col)
+        fill = cur.isna() | (cur <= 0)
+        if fill.any():
+            df[col] = df[col].where(~fill, val)
+
+    adas = (
+        _flag("alerta_colision", "adas_forward_collision_warning")
+        + _flag("sensor_punto_ciego", "adas_blind_spot_warning")
+        + _flag("camara_360", "adas_surround_view")
+        + _flag("asistente_estac_frontal", "adas_parking_sensors_front")
+        + _flag("asistente_estac_trasero", "adas_parking_sensors_rear")
+    )
+    _maybe("equip_p_adas", (adas / 5.0) * 100.0)
+
+    safety = (
+        _flag("abs", "safety_abs")
+        + _flag("control_estabilidad", "safety_esc")
+        + _flag("bolsas_cortina_todas_filas", "airbags_curtain_row1", "airbags_curtain_row2")
+        + _flag("bolsas_aire_delanteras_conductor", "airbags_front_driver")
+        + _flag("bolsas_aire_delanteras_pasajero", "airbags_front_passenger")
+    )
+    _maybe("equip_p_safety", (safety / 5.0) * 100.0)
+
+    hvac = (_num("hvac_zones") > 0).astype("int64")
+    comfort = (
+        _flag("llave_inteligente", "security_alarm")
+        + (_flag("aire_acondicionado") | hvac)
+        + _flag("apertura_remota_maletero", "comfort_power_tailgate")
+        + _flag("cierre_automatico_maletero", "comfort_auto_door_close")
+        + _flag("ventanas_electricas")
+        + _flag("seguros_electricos", "comfort_memory_settings", "comfort_memory_mirrors")
+    )
+    _maybe("equip_p_comfort", (comfort / 6.0) * 100.0)
+
+    info = (
+        _flag("tiene_pantalla_tactil", "infotainment_touchscreen")
+        + _flag("android_auto", "infotainment_android_auto", "infotainment_android_auto_wireless")
+        + _flag("apple_carplay", "infotainment_carplay", "infotainment_carplay_wireless")
+        + _flag("bocinas", "infotainment_audio_speakers")
+    )
+    _maybe("equip_p_infotainment", (info / 4.0) * 100.0)
+
+    traction = _flag("control_electrico_de_traccion", "safety_traction_control")
+    drivetrain = python_or(df, ["drivetrain", "driven_wheels"])
+    awd = map_values(
+        drivetrain,
+        lambda v: bool(v) and v == v and any(t in str(v).lower() for t in ("4x4", "awd", "4wd")),
+    ).astype(bool)
+    traction = traction.where(traction > 0, awd.astype("int64"))
+    _maybe("equip_p_traction", traction * 100.0)
+
+    utility = (
+        _flag("rieles_techo")
+        + (_num("power_12v_count") > 0).astype("int64")
+        + _flag("preparacion_remolque", "enganche_remolque", "asistente_remolque")
+        + _flag("tercera_fila")
+        + (_num("power_110v_count") > 0).astype("int64")
+    )
+    _maybe("equip_p_utility", (utility / 5.0) * 100.0)
+    return df
+
+
+def ensure_equip_score_frame(df: "pd.DataFrame") -> "pd.DataFrame":  # type: ignore[name-defined]
+    total = None
+    count = None
+    for key in _PILLAR_SCORE_KEYS:
+        v = num_column(df, key, _to_num_shared)
+        ok = v.notna() & (v > 0)
+        total = v.where(ok, 0.0) if total is None else total + v.where(ok, 0.0)
+        count = ok.astype("int64") if count is None else count + ok.astype("int64")
+    avg = round1((total / count).where(count > 0))
+
+    val = num_column(df, "equip_score", _to_num_shared)
+    use_avg = avg.notna() & (val.isna() | (val <= 0) | (val > 100) | ((val - avg).abs() >= 5.0))
+    keep = ~use_avg & val.notna() & (val > 0) & (val <= 100)
+
+    have = None
+    present = None
+    for key in _EQUIP_PROXY_KEYS:
+        col = column_or_none(df, key)
+        if col is None:
+            continue
+        seen = ~map_values(col, _is_missing_feature_shared).astype(bool)
+        on = seen & map_values(col, lambda v: _to01_shared(v) == 1).astype(bool)
+        present = seen.astype("int64") if present is None else present + seen.astype("int64")
+        have = on.astype("int64") if have is None else have + on.astype("int64")
+    if present is None:
+        proxy = pd.Series(50.0, index=df.index)
+    else:
+        proxy = round1((have / present.where(present > 0)) * 100.0).fillna(50.0)
+
+    computed = avg.where(use_avg, proxy)
+    if "equip_score" in df.columns:
+        df["equip_score"] = df["equip_score"].where(keep, computed)
+    else:
+        df["equip_score"] = computed
+    return df
+
+
 _AUTORADAR_JSON_ENV = "AUTORADAR_JSON_PATH"
 _AUTORADAR_JSON_CACHE: Dict[str, Any] = {"path": None, "mtime": None, "df": None}
 _CATALOG_SOURCE: Optional[str] = None
@@ -2294,130 +2486,133 @@ def _autoradar_json_path() -> Path:
     return candidate
 
 
-def _load_autoradar_dataframe() -> "pd.DataFrame":  # type: ignore[name-defined]
-    if pd is None:
-        raise HTTPException(status_code=500, detail="pandas not available in environment")
-    path = _autoradar_json_path()
-    if not path.exists():
-        raise HTTPException(status_code=404, detail=f"Autoradar catalog JSON not found: {path}")
-    mtime = path.stat().st_mtime
-    cache = _AUTORADAR_JSON_CACHE
-    cached_df = cache.get("df") if cache.get("mtime") == mtime else None
-    if cached_df is not None:
-        return cached_df.copy()
+# Column aliases for the Autoradar normalized JSON (dst, src). Base aliases always
+# create the destination column; legacy aliases only apply when the source exists.
+# Both fill the destination only where it is missing (column-wise setdefault).
+_AUTORADAR_BASE_ALIASES: tuple[tuple[str, str], ...] = (
+    ("vehicle_id", "uid"),
+    ("ano", "year"),
+    ("msrp", "price_msrp"),
+    ("precio_transaccion", "price_transaction"),
+    ("categoria_combustible_final", "fuel_type"),
+    ("tipo_de_combustible_original", "fuel_type_detail"),
+    ("combinado_kml", "fuel_combined_kml"),
+    ("ciudad_kml", "fuel_city_kml"),
+    ("carretera_kml", "fuel_highway_kml"),
+    ("caballos_fuerza", "engine_power_hp"),
+    ("longitud_mm", "length_mm"),
+    ("traccion", "drivetrain"),
+    ("transmision", "transmission"),
+)
+_AUTORADAR_LEGACY_ALIASES: tuple[tuple[str, str], ...] = (
+    ("android_auto", "infotainment_android_auto"),
+    ("android_auto_wireless", "infotainment_android_auto_wireless"),
+    ("apple_carplay", "infotainment_carplay"),
+    ("apple_carplay_wireless", "infotainment_carplay_wireless"),
+    ("tiene_pantalla_tactil", "infotainment_touchscreen"),
+    ("bocinas", "infotainment_audio_speakers"),
+    ("apertura_remota_maletero", "comfort_power_tailgate"),
+    ("cierre_automatico_maletero", "comfort_auto_door_close"),
+    ("carga_inalambrica", "comfort_wireless_charging"),
+    ("llave_inteligente", "security_alarm"),
+    ("techo_corredizo", "exterior_sunroof"),
+    ("asientos_calefaccion_conductor", "comfort_front_seat_heating"),
+    ("asientos_calefaccion_pasajero", "comfort_front_seat_heating"),
+    ("asientos_ventilacion_conductor", "comfort_front_seat_ventilation"),
+    ("asientos_ventilacion_pasajero", "comfort_front_seat_ventilation"),
+    ("alerta_colision", "adas_forward_collision_warning"),
+    ("sensor_punto_ciego", "adas_blind_spot_warning"),
+    ("camara_360", "adas_surround_view"),
+    ("asistente_estac_frontal", "adas_parking_sensors_front"),
+    ("asistente_estac_trasero", "adas_parking_sensors_rear"),
+    ("abs", "safety_abs"),
+    ("control_estabilidad", "safety_esc"),
+    ("bolsas_aire_delanteras_conductor", "airbags_front_driver"),
+    ("bolsas_aire_delanteras_pasajero", "airbags_front_passenger"),
+    ("driven_wheels", "drivetrain"),
+)
 
-    try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-    except Exception as exc:  # noqa: BLE001
-        raise HTTPException(status_code=500, detail=f"Could not parse Autoradar catalog JSON: {exc}") from exc
 
-    vehicles = payload.get("vehicles", []) if isinstance(payload, dict) else []
-    rows: list[Dict[str, Any]] = []
-    for entry in vehicles:
-        if not isinstance(entry, dict):
-            continue
-        row = dict(entry)
-        manufacturer = row.get("manufacturer")
-        if row.get("make") is None:
-            if isinstance(manufacturer, dict):
-                row["make"] = manufacturer.get("name")
-        model_obj = row.get("model")
-        if isinstance(model_obj, dict):
-            row.setdefault("model", model_obj.get("name"))
-        version_obj = row.get("version")
-        if isinstance(version_obj, dict):
-            row.setdefault("version", version_obj.get("name"))
-            if row.get("year") is None and version_obj.get("year") is not None:
-                row["year"] = version_obj.get("year")
-
-        row.setdefault("vehicle_id", row.get("uid"))
-        row.setdefault("ano", row.get("year"))
-        row.setdefault("msrp", row.get("price_msrp"))
-        row.setdefault("precio_transaccion", row.get("price_transaction"))
-        row.setdefault("categoria_combustible_final", row.get("fuel_type"))
-        row.setdefault("tipo_de_combustible_original", row.get("fuel_type_detail"))
-        row.setdefault("combinado_kml", row.get("fuel_combined_kml"))
-        row.setdefault("ciudad_kml", row.get("fuel_city_kml"))
-        row.setdefault("carretera_kml", row.get("fuel_highway_kml"))
-        row.setdefault("caballos_fuerza", row.get("engine_power_hp"))
-        row.setdefault("longitud_mm", row.get("length_mm"))
-        row.setdefault("traccion", row.get("drivetrain"))
-        row.setdefault("transmision", row.get("transmission"))
-        if not row.get("images_default"):
-            row["images_default"] = row.get("image_url") or row.get("photo_path")
-
-        # Legacy column aliases for downstream compatibility
-        if "infotainment_android_auto" in row:
-            row.setdefault("android_auto", row.get("infotainment_android_auto"))
-        if "infotainment_android_auto_wireless" in row:
-            row.setdefault("android_auto_wireless", row.get("infotainment_android_auto_wireless"))
-        if "infotainment_carplay" in row:
-            row.setdefault("apple_carplay", row.get("infotainment_carplay"))
-        if "infotainment_carplay_wireless" in row:
-            row.setdefault("apple_carplay_wireless", row.get("infotainment_carplay_wireless"))
-        if "infotainment_touchscreen" in row:
-            row.setdefault("tiene_pantalla_tactil", row.get("infotainment_touchscreen"))
-        if "infotainment_audio_speakers" in row:
-            row.setdefault("bocinas", row.get("infotainment_audio_speakers"))
-        if "comfort_power_tailgate" in row:
-            row.setdefault("apertura_remota_maletero", row.get("comfort_power_tailgate"))
-        if "comfort_auto_door_close" in row:
-            row.setdefault("cierre_automatico_maletero", row.get("comfort_auto_door_close"))
-        if "comfort_wireless_charging" in row:
-            row.setdefault("carga_inalambrica", row.get("comfort_wireless_charging"))
-        if "security_alarm" in row:
-            row.setdefault("llave_inteligente", row.get("security_alarm"))
-        if "exterior_sunroof" in row:
-            row.setdefault("techo_corredizo", row.get("exterior_sunroof"))
-        if "comfort_front_seat_heating" in row:
-            row.setdefault("asientos_calefaccion_conductor", row.get("comfort_front_seat_heating"))
-            row.setdefault("asientos_calefaccion_pasajero", row.get("comfort_front_seat_heating"))
-        if "comfort_front_seat_ventilation" in row:
-            row.setdefault("asientos_ventilacion_conductor", row.get("comfort_front_seat_ventilation"))
-            row.setdefault("asientos_ventilacion_pasajero", row.get("comfort_front_seat_ventilation"))
-        if "hvac_zones" in row and row.get("aire_acondicionado") is None:
-            zones = row.get("hvac_zones")
-            try:
-                row["aire_acondicionado"] = (float(zones) if zones is not None else 0) > 0
-            except Exception:
-                row["aire_acondicionado"] = zones
-        if "adas_forward_collision_warning" in row:
-            row.setdefault("alerta_colision", row.get("adas_forward_collision_warning"))
-        if "adas_blind_spot_warning" in row:
-            row.setdefault("sensor_punto_ciego", row.get("adas_blind_spot_warning"))
-        if "adas_surround_view" in row:
-            row.setdefault("camara_360", row.get("adas_surround_view"))
-        if "adas_parking_sensors_front" in row:
-            row.setdefault("asistente_estac_frontal", row.get("adas_parking_sensors_front"))
-        if "adas_parking_sensors_rear" in row:
-            row.setdefault("asistente_estac_trasero", row.get("adas_parking_sensors_rear"))
-        if "safety_abs" in row:
-            row.setdefault("abs", row.get("safety_abs"))
-        if "safety_esc" in row:
-            row.setdefault("control_estabilidad", row.get("safety_esc"))
-        if "airbags_curtain_row1" in row and "bolsas_cortina_todas_filas" not in row:
-            try:
-                curtain = bool(row.get("airbags_curtain_row1")) or bool(row.get("airbags_curtain_row2"))
-            except Exception:
-                curtain = row.get("airbags_curtain_row1")
-            row["bolsas_cortina_todas_filas"] = curtain
-        if "airbags_front_driver" in row:
-            row.setdefault("bolsas_aire_delanteras_conductor", row.get("airbags_front_driver"))
-        if "airbags_front_passenger" in row:
-            row.setdefault("bolsas_aire_delanteras_pasajero", row.get("airbags_front_passenger"))
-        if "power_12v_count" in row and row.get("enchufe_12v") is None:
-            try:
-                row["enchufe_12v"] = (float(row.get("power_12v_count")) if row.get("power_12v_count") is not None else 0) > 0
-            except Exception:
-                row["enchufe_12v"] = row.get("power_12v_count")
-        if "drivetrain" in row:
-            row.setdefault("driven_wheels", row.get("drivetrain"))
+def _apply_autoradar_aliases(df: "pd.DataFrame", records: list[Dict[str, Any]]) -> "pd.DataFrame":  # type: ignore[name-defined]
+    """Column-wise port of the per-vehicle alias block (``records`` = source dicts)."""
+    def _nested(col: str, key: str):
+        return df[col].map(lambda o: o.get(key) if isinstance(o, dict) else None)
 
-        row = ensure_pillars(row)
-        row = ensure_equip_score(row)
-        rows.append(row)
+    def _fill(col: str, values, where) -> None:
+        if col not in df.columns:
+            df[col] = values.where(where)
+            return
+        mask = df[col].isna() & where
+        if mask.any():
+            df[col] = df[col].where(~mask, values)
+
+    def _has(key: str):
+        return pd.Series(key_present(df, records, key), index=df.index, dtype=bool)
+
+    if "manufacturer" in df.columns:
+        make = _nested("manufacturer", "name")
+        _fill("make", make, make.notna())
+    if "version" in df.columns:
+        vyear = _nested("version", "year")
+        _fill("year", vyear, vyear.notna())
+
+    apply_alias_table(df, _AUTORADAR_BASE_ALIASES, create_missing=True, records=records)
+    images = python_or(df, ["image_url", "photo_path"])
+    if "images_default" in df.columns:
+        df["images_default"] = df["images_default"].where(truthy_mask(df["images_default"]), images)
+    else:
+        df["images_default"] = images
+
+    apply_alias_table(df, _AUTORADAR_LEGACY_ALIASES, records=records)
+
+    def _positive_or_raw(v: Any) -> Any:
+        try:
+            return (float(v) if v is not None else 0) > 0
+        except Exception:
+            return v
+
+    if "hvac_zones" in df.columns:
+        _fill("aire_acondicionado", map_values(df["hvac_zones"], _positive_or_raw), _has("hvac_zones"))
+    if "airbags_curtain_row1" in df.columns:
+        curtain = truthy_mask(df["airbags_curtain_row1"])
+        row2 = column_or_none(df, "airbags_curtain_row2")
+        if row2 is not None:
+            curtain = curtain | truthy_mask(row2)
+        where = _has("airbags_curtain_row1") & ~_has("bolsas_cortina_todas_filas")
+        if "bolsas_cortina_todas_filas" in df.columns:
+            df["bolsas_cortina_todas_filas"] = df["bolsas_cortina_todas_filas"].where(~where, curtain)
+        else:
+            df["bolsas_cortina_todas_filas"] = curtain.where(where)
+    if "power_12v_count" in df.columns:
+        _fill("enchufe_12v", map_values(df["power_12v_count"], _positive_or_raw), _has("power_12v_count"))
+    return df
+
+
+def _load_autoradar_dataframe(records: Optional[list[dict[str, Any]]] = None) -> "pd.DataFrame":  # type: ignore[name-defined]
+    """Autoradar vehicles as a frame; ``records`` builds just that subset (uncached)."""
+    if pd is None:
+        raise HTTPException(status_code=500, detail="pandas not available in environment")
+    path = _autoradar_json_path()
+    subset = records is not None
+    if not subset:
+        if not path.exists():
+            raise HTTPException(status_code=404, detail=f"Autoradar catalog JSON not found: {path}")
+        mtime = path.stat().st_mtime
+        cache = _AUTORADAR_JSON_CACHE
+        cached_df = cache.get("df") if cache.get("mtime") == mtime else None
+        if cached_df is not None:
+            return cached_df.copy()
+
+        try:
+            records = load_vehicles(path)
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPException(status_code=500, detail=f"Could not parse Autoradar catalog JSON: {exc}") from exc
 
-    df = pd.DataFrame(rows)
+    df = frame_from_records(records)
+    if not df.empty:
+        df = _apply_autoradar_aliases(df, records)
+        df = ensure_pillars_frame(df)
+        df = ensure_equip_score_frame(df)
     if df.empty:
         df = pd.DataFrame(columns=["vehicle_id", "make", "model", "version", "ano"])
 
@@ -2499,7 +2694,8 @@ def _load_autoradar_dataframe() -> "pd.DataFrame":  # type: ignore[name-defined]
     mapping = {c: _slug_column_name(c) for c in df.columns}
     df.rename(columns=mapping, inplace=True)
 
-    cache.update({"path": str(path), "mtime": mtime, "df": df.copy()})
+    if not subset:
+        cache.update({"path": str(path), "mtime": mtime, "df": df.copy()})
     return df
 
 # --------------------------- Prompt File Loader ---------------------------
@@ -2608,12 +2804,57 @@ def _load_prompts_for_lang(
 # ----------------------------- Options Index ------------------------------
 _OPTIONS_IDX: Optional[Dict[str, Any]] = None
 _OPTIONS_IDX_MTIMES: Dict[str, float] = {}
+_OPTIONS_IDX_LOCK = threading.Lock()
 # Aliases (canonicalization) cache
 _ALIASES: Optional[Dict[str, Any]] = None
 _ALIASES_MTIME: Optional[float] = None
-_BRAND_SALES_CACHE: Dict[int, Dict[str, list[int]]] = {}
-_BRAND_SALES_CACHE_MTIME: Dict[int, float] = {}
-_BRAND_SALES_CACHE_ALIAS_MTIME: Dict[int, float] = {}
+_ALIASES_CHECKED_AT = 0.0
+# alias_names.csv is stat'ed at most this often (seconds)
+_ALIASES_RECHECK_S = 2.0
+_ALIASES_VERSION = 0
+# Serialises alias reloads; the swap and the memo clear happen under it
+_ALIASES_LOCK = threading.Lock()
+
+
+class _CanonMemo:
+    """Bounded LRU of resolved names keyed by (alias version, raw input)."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self._data: "OrderedDict[Any, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Any, value: Optional[str]) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Resolved names (request strings included), bounded and keyed by alias version
+_CANON_MEMO: Dict[str, _CanonMemo] = {
+    kind: _CanonMemo(int(os.getenv("CANON_MEMO_SIZE", "4096"))) for kind in ("make", "model")
+}
+# Sales index per year: year -> ((file signature, alias mtime), SalesYear | None)
+_SALES_INDEX: Dict[int, tuple] = {}
+# Segment maps used with it: style -> (source files signature, seg_map)
+_SALES_SEGMENTS: Dict[str, tuple] = {}
+_SALES_INDEX_LOCK = threading.Lock()
 
 def _load_aliases() -> Dict[str, Any]:
     """Load alias mappings from data/aliases/alias_names.csv.
@@ -2621,13 +2862,26 @@ def _load_aliases() -> Dict[str, Any]:
     Format: scope,from_name,to_name,make,model,notes
     Supported scopes: make, model, version
     Matching is case-insensitive; canonical outputs are uppercased.
+
+    Model rules are also compiled into ``model_by_make`` ((make, from) -> to)
+    and ``model_global`` (from -> to), keeping the first rule per key as the
+    linear scan did. ``version`` identifies the load for the name memos.
     """
-    global _ALIASES, _ALIASES_MTIME
+    now = time.monotonic()
+    if _ALIASES is not None and now - _ALIASES_CHECKED_AT < _ALIASES_RECHECK_S:
+        return _ALIASES
+    with _ALIASES_LOCK:
+        return _reload_aliases(now)
+
+
+def _reload_aliases(now: float) -> Dict[str, Any]:
+    global _ALIASES, _ALIASES_MTIME, _ALIASES_CHECKED_AT, _ALIASES_VERSION
     p = ROOT / "data" / "aliases" / "alias_names.csv"
     mt = p.stat().st_mtime if p.exists() else -1
+    _ALIASES_CHECKED_AT = now
     if _ALIASES is not None and _ALIASES_MTIME == mt:
         return _ALIASES
-    aliases = {"make": {}, "model": []}  # type: ignore
+    aliases = {"make": {}, "model": [], "model_by_make": {}, "model_global": {}}  # type: ignore
     try:
         if p.exists():
             import csv
@@ -2651,6 +2905,15 @@ def _load_aliases() -> Dict[str, Any]:
                         })
     except Exception:
         pass
+    for rec in aliases["model"]:
+        if rec["make"]:
+            aliases["model_by_make"].setdefault((rec["make"], rec["from"]), rec["to"])
+        else:
+            aliases["model_global"].setdefault(rec["from"], rec["to"])
+    _ALIASES_VERSION += 1
+    aliases["version"] = _ALIASES_VERSION
+    _CANON_MEMO["make"].clear()
+    _CANON_MEMO["model"].clear()
     _ALIASES, _ALIASES_MTIME = aliases, mt
     return aliases
 
@@ -2691,6 +2954,19 @@ def _canon_make(v: Optional[str]) -> Optional[str]:
     if v is None:
         return v
     a = _load_aliases()
+    memo = _CANON_MEMO["make"]
+    if isinstance(v, str):
+        key = (a["version"], v)
+        hit = memo.get(key, memo)
+        if hit is not memo:
+            return hit
+        out = _resolve_make(a, v)
+        memo.put(key, out)
+        return out
+    return _resolve_make(a, v)
+
+
+def _resolve_make(a: Dict[str, Any], v: Any) -> str:
     vv = str(v).strip().upper()
     # Normalizar separadores para variantes tipo "GM-COMPANY"
     vv = vv.replace("-", " ").replace("_", " ")
@@ -2706,15 +2982,32 @@ def _canon_model(mk: Optional[str], md: Optional[str]) -> Optional[str]:
     a = _load_aliases()
     mk_up = str(mk or "").strip().upper()
     md_up = str(md or "").strip().upper()
-    # Prefer rules limited by make
-    for rec in a.get("model", []):
-        if rec.get("make") and rec.get("make") == mk_up and rec.get("from") == md_up:
-            return rec.get("to")
-    # Global model rules
-    for rec in a.get("model", []):
-        if (rec.get("make") is None) and rec.get("from") == md_up:
-            return rec.get("to")
-    return md_up
+    # Prefer rules limited by make, then global model rules
+    hit = a["model_by_make"].get((mk_up, md_up))
+    if hit is None:
+        hit = a["model_global"].get(md_up)
+    return md_up if hit is None else hit
+
+
+def _canon_make_series(series):
+    """``series.map(_canon_make)`` resolving each distinct value once."""
+    _load_aliases()
+    return map_values(series, _canon_make)
+
+
+def _canon_model_series(makes, models):
+    """Row-wise ``_canon_model(make, model)``, resolving each distinct pair once."""
+    version = _load_aliases()["version"]
+    memo = _CANON_MEMO["model"]
+    pairs = list(zip(makes.tolist(), models.tolist()))
+    resolved: Dict[tuple, Optional[str]] = {}
+    for pair in set(pairs):
+        hit = memo.get((version, pair), memo)
+        if hit is memo:
+            hit = _canon_model(*pair)
+            memo.put((version, pair), hit)
+        resolved[pair] = hit
+    return pd.Series([resolved[pair] for pair in pairs], index=models.index, dtype=object)
 # Lightweight cache for /options responses (keyed by query). TTL and invalidation
 _OPTIONS_CACHE: Dict[str, Dict[str, Any]] = {}
 
@@ -2744,7 +3037,36 @@ def _compact_key(s: str) -> str:
         return str(s or "").upper().replace(" ", "")
 
 
-_VEH_JSON_ENTRIES: Optional[list[dict[str, Any]]] = None
+# (signature of the candidate files, entries, lookup tiers) published as one
+# tuple, so readers never pair entries with the index of another load and an
+# edited/replaced JSON is picked up.
+_VEH_JSON_ENTRIES: Optional[tuple] = None
+_VEH_JSON_LOCK = threading.Lock()
+
+def _sales_year(year: int) -> Optional[SalesYear]:
+    """Index of data/enriched/sales_ytd_{year}.csv, rebuilt when the file or the aliases change.
+
+    None when the file is missing or unreadable.
+    """
+    path = ROOT / "data" / "enriched" / f"sales_ytd_{year}.csv"
+    _load_aliases()
+    sig = (file_signature(path), _ALIASES_MTIME)
+    hit = _SALES_INDEX.get(year)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    with _SALES_INDEX_LOCK:
+        hit = _SALES_INDEX.get(year)
+        if hit is not None and hit[0] == sig:
+            return hit[1]
+        idx = None
+        if sig[0] is not None and pd is not None:
+            try:
+                idx = SalesYear(pd.read_csv(path, low_memory=False), year, _canon_make, _canon_model)
+            except Exception:
+                idx = None
+        _SALES_INDEX[year] = (sig, idx)
+        return idx
+
 
 def _brand_sales_monthly(year: int) -> Dict[str, list[int]]:
     path = ROOT / "data" / "enriched" / f"sales_ytd_{year}.csv"
@@ -2753,92 +3075,210 @@ def _brand_sales_monthly(year: int) -> Dict[str, list[int]]:
         if year != 2025:
             return _brand_sales_monthly(2025)
         return {}
-    mtime = path.stat().st_mtime
-    aliases = _load_aliases()
-    alias_mtime = _ALIASES_MTIME or -1
-    cached = _BRAND_SALES_CACHE.get(year)
-    if (
-        cached is not None
-        and _BRAND_SALES_CACHE_MTIME.get(year) == mtime
-        and _BRAND_SALES_CACHE_ALIAS_MTIME.get(year) == alias_mtime
-    ):
-        return cached
-    try:
-        import pandas as _pd  # type: ignore
-        df = _pd.read_csv(path, low_memory=False)
-        df.columns = [str(c).strip().lower() for c in df.columns]
-        month_cols = [f"ventas_{year}_{m:02d}" for m in range(1, 13)]
-        available_cols = [col for col in month_cols if col in df.columns]
-        if not available_cols:
-            _BRAND_SALES_CACHE[year] = {}
-            _BRAND_SALES_CACHE_MTIME[year] = mtime
-            return {}
-        df["__mk_raw"] = df.get("make", _pd.Series(dtype=str)).astype(str).str.strip()
-        df["__mk"] = df["__mk_raw"].map(lambda v: (_canon_make(v) or str(v or "").strip().upper()))
-        totals: Dict[str, list[int]] = {}
-        for _, row in df.iterrows():
-            mk = str(row.get("__mk") or "").strip().upper()
-            if not mk:
+    idx = _sales_year(year)
+    return idx.brand_monthly() if idx is not None else {}
+
+
+def _normalize_seg_token(val: Optional[str]) -> str:
+    """Texto sin acentos ni apóstrofos tipográficos (nombres de segmento)."""
+    import unicodedata as _ud
+    s = str(val or "").strip()
+    if not s:
+        return ""
+    s = _ud.normalize('NFKD', s)
+    s = ''.join(ch for ch in s if _ud.category(ch) != 'Mn')
+    s = s.replace('’', "'").replace('´', "'").replace('`', "'")
+    return s
+
+
+def _compare_segment_map() -> Dict[tuple, str]:
+    """seg_map[(MK, MD)] = segmento para /compare.
+
+    Preferir equipo_veh_limpio_procesado.csv (columna body_type/body_style) como fuente de segmento por modelo.
+    Fallback: data/enriched/vehiculos_todos_flat.csv.
+    """
+    seg_map: Dict[tuple, str] = {}
+    try:
+        def _norm_seg(sv: str) -> str:
+            s0 = (sv or "").strip().lower()
+            if any(x in s0 for x in ("pick","cab","chasis","camioneta")): return "Pickup"
+            if any(x in s0 for x in ("todo terreno","suv","crossover","sport utility")): return "SUV'S"
+            if "van" in s0: return "Van"
+            if any(x in s0 for x in ("hatch","hb")): return "Hatchback"
+            if any(x in s0 for x in ("sedan","sedán","saloon")): return "Sedán"
+            return sv
+
+        built = False
+        # 1) equipo_veh_limpio_procesado.csv
+        proc = ROOT / "data" / "equipo_veh_limpio_procesado.csv"
+        if proc.exists():
+            f = pd.read_csv(proc, low_memory=False)
+            f.columns = [str(c).strip().lower() for c in f.columns]
+            col_seg = None
+            for c in ("body_type", "body_style"):
+                if c in f.columns:
+                    col_seg = c; break
+            if col_seg and {"make","model"}.issubset(f.columns):
+                ff = f[["make","model", col_seg]].dropna(how="any")
+                ff["seg"] = ff[col_seg].astype(str).map(_norm_seg)
+                grp = ff.groupby([ff["make"].astype(str).str.upper(), ff["model"].astype(str).str.upper()])["seg"].agg(lambda x: x.value_counts().idxmax())
+                seg_map = {k: v for k, v in grp.to_dict().items()}
+                built = True
+
+        # 2) Fallback: vehiculos_todos_flat.csv
+        if not built:
+            flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
+            if flat.exists():
+                f = pd.read_csv(flat, low_memory=False)
+                f.columns = [str(c).strip().lower() for c in f.columns]
+                if {"make","model"}.issubset(f.columns):
+                    ff = f[["make","model","segmento_ventas","body_style"]].dropna(how="all")
+                    ff["seg"] = ff["segmento_ventas"].fillna(ff["body_style"]).astype(str).map(_norm_seg)
+                    grp = ff.groupby([ff["make"].astype(str).str.upper(), ff["model"].astype(str).str.upper()])["seg"].agg(lambda x: x.value_counts().idxmax())
+                    seg_map = {k: v for k, v in grp.to_dict().items()}
+    except Exception:
+        return {}
+    return seg_map
+
+
+def _seasonality_segment_map() -> Dict[tuple, str]:
+    """seg_map[(MK, MD)] = segmento para /seasonality (body_style, luego segmento_ventas)."""
+    def _norm_seg(sv: str) -> str:
+        base = _normalize_seg_token(sv)
+        low = base.lower()
+        if any(x in low for x in ("pick","cab","chasis","camioneta")): return "Pickup"
+        if any(x in low for x in ("todo terreno","suv","crossover","sport utility")): return "SUV'S"
+        if "van" in low: return "Van"
+        if any(x in low for x in ("hatch","hb")): return "Hatchback"
+        if any(x in low for x in ("sedan","sedán","saloon")): return "Sedán"
+        return base
+
+    seg_map: Dict[tuple, str] = {}
+    try:
+        sources = (
+            (ROOT / "data" / "equipo_veh_limpio_procesado.csv", ("body_style", "segmento_ventas")),
+            (ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv", ("segmento_ventas", "body_style")),
+        )
+        for path, cols in sources:
+            if seg_map or not path.exists():
                 continue
-            bucket = totals.setdefault(mk, [0] * 12)
-            for idx, col in enumerate(month_cols):
-                try:
-                    val = int(float(row.get(col) or 0)) if col in df.columns else 0
-                except Exception:
-                    val = 0
-                if idx < len(bucket):
-                    bucket[idx] += val
-        _BRAND_SALES_CACHE[year] = totals
-        _BRAND_SALES_CACHE_MTIME[year] = mtime
-        _BRAND_SALES_CACHE_ALIAS_MTIME[year] = alias_mtime
-        return totals
+            f = pd.read_csv(path, low_memory=False)
+            f.columns = [str(c).strip().lower() for c in f.columns]
+            col = next((c for c in cols if c in f.columns), None)
+            if col and {"make","model"}.issubset(f.columns):
+                ff = f[["make","model", col]].dropna(how="any")
+                ff["seg"] = ff[col].astype(str).map(_norm_seg)
+                grp = ff.groupby([ff["make"].astype(str).str.upper(), ff["model"].astype(str).str.upper()])["seg"].agg(lambda x: x.value_counts().idxmax())
+                seg_map = {k: v for k, v in grp.to_dict().items()}
     except Exception:
-        _BRAND_SALES_CACHE[year] = {}
-        _BRAND_SALES_CACHE_MTIME[year] = mtime
-        _BRAND_SALES_CACHE_ALIAS_MTIME[year] = alias_mtime
+        seg_map = {}
+    return seg_map
+
+
+def _sales_segment_map(style: str) -> tuple:
+    """(seg_map, token) for ``style`` ("compare" | "seasonality"), rebuilt when its sources change.
+
+    ``token`` identifies the map for ``SalesYear.segments``.
+    """
+    sig = (
+        file_signature(ROOT / "data" / "equipo_veh_limpio_procesado.csv"),
+        file_signature(ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"),
+    )
+    hit = _SALES_SEGMENTS.get(style)
+    if hit is None or hit[0] != sig:
+        with _SALES_INDEX_LOCK:
+            hit = _SALES_SEGMENTS.get(style)
+            if hit is None or hit[0] != sig:
+                build = _compare_segment_map if style == "compare" else _seasonality_segment_map
+                hit = _SALES_SEGMENTS[style] = (sig, build() if pd is not None else {})
+    return hit[1], (style, sig)
+
+
+def _sales_segment_totals(year: int) -> Dict[str, int]:
+    """YTD units per /compare segment in sales_ytd_{year}.csv (empty when missing)."""
+    idx = _sales_year(year)
+    if idx is None:
         return {}
+    seg_map, token = _sales_segment_map("compare")
+    return idx.segment_totals(seg_map, token)
+
+
+def _vehicle_json_candidates() -> list[Path]:
+    return [
+        ROOT.parent / "Strapi" / "data" / "autoradar" / "normalized.jato.json",
+        ROOT.parent / "Strapi" / "data" / "autoradar" / "normalized.json",
+        ROOT / "data" / "vehiculos-todos-augmented.normalized.json",
+        ROOT / "data" / "vehiculos-todos-augmented.json",
+        ROOT / "data" / "vehiculos-todos.json",
+        ROOT / "data" / "vehiculos-todos2.json",
+        ROOT / "data" / "vehiculos-todos1.json",
+    ]
 
 
 def _load_vehicle_json_entries() -> list[dict[str, Any]]:
-    """Load vehicles from vehiculos-todos*.json once (preferring the most complete file).
+    """Load vehicles from vehiculos-todos*.json (preferring the most complete file).
 
     Each entry keeps canonical uppercase keys to speed up lookups when matching
-    make/model/version/year combinations.
+    make/model/version/year combinations. The result is reused until one of
+    the candidate files changes.
     """
+    return _vehicle_json_snapshot()[1]
+
+
+def _vehicle_json_snapshot() -> tuple:
+    """Current (sig, entries, index), reloaded when a candidate file changed."""
     global _VEH_JSON_ENTRIES
-    if _VEH_JSON_ENTRIES is not None:
-        return _VEH_JSON_ENTRIES
+    candidates = _vehicle_json_candidates()
+    sig = tuple(file_signature(p) for p in candidates)
+    snap = _VEH_JSON_ENTRIES
+    if snap is not None and snap[0] == sig:
+        return snap
+    with _VEH_JSON_LOCK:
+        snap = _VEH_JSON_ENTRIES
+        if snap is not None and snap[0] == sig:
+            return snap
+        entries = _read_vehicle_json_entries(candidates)
+        snap = _VEH_JSON_ENTRIES = (sig, entries, _index_vehicle_json_entries(entries))
+    return snap
+
+
+def _index_vehicle_json_entries(entries: list[dict[str, Any]]) -> Dict[str, Dict[tuple, dict[str, Any]]]:
+    """Lookup tiers used by _find_vehicle_json_entry; the first entry wins per key."""
+    index: Dict[str, Dict[tuple, dict[str, Any]]] = {"ver_year": {}, "compact_year": {}, "ver": {}, "compact": {}}
+    for ent in entries:
+        mk, md, vr, vc, yr = ent["mk"], ent["md"], ent["ver"], ent["ver_compact"], ent["year"]
+        index["ver_year"].setdefault((mk, md, vr, yr), ent)
+        index["compact_year"].setdefault((mk, md, vc, yr), ent)
+        index["ver"].setdefault((mk, md, vr), ent)
+        index["compact"].setdefault((mk, md, vc), ent)
+    return index
+
+
+def _find_vehicle_json_entry(mk: str, md: str, vr: str, yr: str) -> Optional[dict[str, Any]]:
+    """Entry for (make, model, version, year): exact, compact version, then any year."""
+    _sig, entries, index = _vehicle_json_snapshot()
+    if not entries:
+        return None
+    vc = _compact_key(vr)
+    hit = None
+    if yr:
+        hit = index["ver_year"].get((mk, md, vr, yr)) or index["compact_year"].get((mk, md, vc, yr))
+    return hit or index["ver"].get((mk, md, vr)) or index["compact"].get((mk, md, vc))
 
+
+def _read_vehicle_json_entries(candidates: list[Path]) -> list[dict[str, Any]]:
     entries: list[dict[str, Any]] = []
 
     def _up(s: Any) -> str:
         return str(s or "").strip().upper()
 
-    autoradar_repo_new = ROOT.parent / "Strapi" / "data" / "autoradar" / "normalized.jato.json"
-    autoradar_repo = ROOT.parent / "Strapi" / "data" / "autoradar" / "normalized.json"
-    candidates = [
-        autoradar_repo_new,
-        autoradar_repo,
-        ROOT / "data" / "vehiculos-todos-augmented.normalized.json",
-        ROOT / "data" / "vehiculos-todos-augmented.json",
-        ROOT / "data" / "vehiculos-todos.json",
-        ROOT / "data" / "vehiculos-todos2.json",
-        ROOT / "data" / "vehiculos-todos1.json",
-    ]
-
     seen_ids: set[str] = set()
 
     for path in candidates:
         try:
             if not path.exists():
                 continue
-            import json as _json
-
-            obj = _json.loads(path.read_text(encoding="utf-8"))
-            vehicles = obj.get("vehicles") if isinstance(obj, dict) else (obj if isinstance(obj, list) else [])
-            if not isinstance(vehicles, list):
-                continue
-            for raw in vehicles:
+            for raw in load_vehicles(path):
                 if not isinstance(raw, dict):
                     continue
                 try:
@@ -2908,8 +3348,7 @@ def _load_vehicle_json_entries() -> list[dict[str, Any]]:
         except Exception:
             continue
 
-    _VEH_JSON_ENTRIES = entries
-    return _VEH_JSON_ENTRIES
+    return entries
 
 def _options_paths() -> Dict[str, Path]:
     """Return sources used to build the options index.
@@ -2945,179 +3384,242 @@ def _options_paths() -> Dict[str, Path]:
     paths["json"] = p
     return paths
 
-def _ensure_options_index() -> None:
-    global _OPTIONS_IDX, _OPTIONS_IDX_MTIMES
-    paths = _options_paths()
-    mtimes = {}
-    for k, p in paths.items():
+# Bump when the layout or the build rules of the persisted options tree change
+_OPTIONS_TREE_VERSION = 1
+
+
+def _options_tree_path() -> Path:
+    return _catalog_snapshot_dir() / "options_tree.json"
+
+
+def _options_source_mtimes(paths: Dict[str, Path]) -> Dict[str, float]:
+    """mtime of every options source (-1 when missing), aliases included."""
+    mtimes: Dict[str, float] = {}
+    sources = list(paths.items()) + [("aliases", ROOT / "data" / "aliases" / "alias_names.csv")]
+    for k, p in sources:
         try:
             mtimes[k] = p.stat().st_mtime if p and p.exists() else -1.0
         except Exception:
             mtimes[k] = -1.0
-    if _OPTIONS_IDX is not None and mtimes == _OPTIONS_IDX_MTIMES:
-        return
-    # Build index
-    idx: Dict[str, Any] = {"models": {}, "models_compact": {}}
-    def add_item(mk: str, md: str, vr: Optional[str], yr: Optional[int]) -> None:
-        try:
-            if not md:
-                return
-            model_up = str(md).strip().upper()
-            model_c = _compact_key(md)
-            mk_up = str(mk or "").strip().upper()
-            try:
-                mk_up = _canon_make(mk_up) or mk_up
-            except Exception:
-                pass
-            yr_i = int(yr) if (yr is not None and str(yr).isdigit()) else None
-            # Restrict to allowed years to keep the index small and stable
-            if yr_i is not None and int(yr_i) not in ALLOWED_YEARS:
-                return
-            rec = idx["models"].setdefault(model_up, {"makes": set(), "years": set(), "versions_by_year": {}, "by_make": {}})
-            if mk_up:
-                rec["makes"].add(mk_up)
-                bm = rec["by_make"].setdefault(mk_up, {"years": set(), "versions_by_year": {}})
-            if yr_i is not None:
-                rec["years"].add(yr_i)
-                if vr:
-                    rec["versions_by_year"].setdefault(yr_i, set()).add(str(vr))
-                if mk_up:
-                    bm["years"].add(yr_i)
-                    if vr:
-                        bm["versions_by_year"].setdefault(yr_i, set()).add(str(vr))
-            # map compact model key
-            idx["models_compact"].setdefault(model_c, model_up)
-        except Exception:
-            pass
-        # Extra keyword-based fallback to populate pillars when columns vary
-        try:
-            import pandas as _pd
-            def _to01(v):
-                s = str(v).strip().lower()
-                if s in ("true","1","si","sí","estandar","estándar","incluido","standard","std","present","x","y"): return 1
-                if s in ("false","0","no","ninguno","na","n/a","no disponible","-"): return 0
-                try:
-                    return 1 if float(s)>0 else 0
-                except Exception:
-                    return 0
-            def _cols(keys):
-                ks = [k.lower() for k in keys]
-                out = []
-                for c in df.columns:
-                    lc = str(c).lower()
-                    if any(k in lc for k in ks):
-                        out.append(c)
-                return out
-            def _pillar_by_keys(keys):
-                cols = _cols(keys)
-                if not cols:
-                    return _pd.Series([0]*len(df))
-                binm = df[cols].map(_to01)
-                sc = (binm.sum(axis=1) / float(len(cols)) * 100.0).round(1)
-                return sc
-            def _need(col):
-                if col not in df.columns:
-                    return _pd.Series([True]*len(df))
-                return _pd.to_numeric(df[col], errors="coerce").fillna(0) <= 0
-            keys_adas = ["colisión","colision","frenado","punto ciego","blind spot","360","lane","lka","mantenimiento de carril","crucero adapt","acc","estac","rear cross","cross traffic","auto high","luces altas"]
-            keys_safety = ["abs","estabilidad","control estabilidad","airbag","bolsas","cortina"]
-            keys_comfort = ["llave","apertura","portón","porton","cierre","ventanas","seguros","calefacci","ventilaci","clima"]
-            keys_info = ["pantalla","táctil","tactil","android","carplay","bocinas","altav","speaker","wireless","cargador","hud","ambient"]
-            keys_trac = ["awd","4x4","4wd","tracci","driven_wheels","diff","bloqueo","low range","reductora","arrastre","tow","hitch"]
-            keys_util = [
-                "rieles","riel","remolque","enganche","gancho","arrastre","tow","hitch",
-                "12v","110v","toma","tomacorr","outlet",
-                "capacidad de carga","carga util","carga útil","payload",
-                "tercera fila","tercera_fila"
-            ]
-            def _apply(col, keys):
-                need = _need(col)
-                if not need.any():
-                    return
-                ser = _pillar_by_keys(keys)
-                if col not in df.columns:
-                    df[col] = None
-                df.loc[need, col] = ser[need]
-            _apply("equip_p_adas", keys_adas)
-            _apply("equip_p_safety", keys_safety)
-            _apply("equip_p_comfort", keys_comfort)
-            _apply("equip_p_infotainment", keys_info)
-            _apply("equip_p_traction", keys_trac)
-            _apply("equip_p_utility", keys_util)
-        except Exception:
-            pass
+    return mtimes
+
 
-    # Prefer curated versiones95 file when available (structure only)
+def _options_tree_view(tree: Dict[str, Any], catalog_years: Dict[str, Any], makes: List[str], models: List[str]) -> Dict[str, Any]:
+    """Lookup tables over a make -> model -> year -> versions tree.
+
+    Year 0 holds entries without a usable year. ``catalog_years`` is
+    model -> make -> years present in the main catalog; ``makes``/``models``
+    are the top-level menus.
+    """
+    by_model: Dict[str, Dict[str, Any]] = {}
+    for mk, mds in tree.items():
+        for md, yrs in mds.items():
+            by_model.setdefault(md, {})[mk] = yrs
+    by_compact: Dict[str, List[str]] = {}
+    for md in by_model:
+        by_compact.setdefault(_compact_key(md), []).append(md)
+    return {
+        "tree": tree,
+        "by_model": by_model,
+        "by_compact": by_compact,
+        "catalog_years": catalog_years,
+        "makes": makes,
+        "models": models,
+    }
+
+
+_OPTIONS_TREE_COLS = ["make", "model", "version", "ano"]
+
+
+def _options_source_frames(paths: Dict[str, Path]) -> List[Any]:
+    """make/model/version/ano rows of every options source, flagged by role.
+
+    ``menu`` rows (catalog, processed, flat) feed the top-level menus whatever
+    their year; ``catalog`` rows also provide the catalog years per model.
+    """
+    frames: List[Any] = []
+
+    def add(t, *, menu: bool = False, catalog: bool = False) -> None:
+        t = t.reindex(columns=_OPTIONS_TREE_COLS)
+        t["menu"] = menu
+        t["catalog"] = catalog
+        frames.append(t)
+
+    def from_records(rows: List[tuple]) -> None:
+        if rows:
+            add(pd.DataFrame(rows, columns=_OPTIONS_TREE_COLS))
+
+    # Curated versiones95 file (structure only)
     if "versiones95" in paths and paths["versiones95"].exists():
         try:
-            import json as _json
-            data = _json.loads(paths["versiones95"].read_text(encoding="utf-8"))
-            items = data if isinstance(data, list) else (data.get("items") if isinstance(data, dict) else [])
-            for v in items or []:
-                mk = str(v.get("MAKE") or v.get("make") or "").strip()
-                md = str(v.get("Model") or v.get("model") or "").strip()
-                ver = str(v.get("Version") or v.get("version") or "").strip()
-                yr = v.get("Año") or v.get("ano") or v.get("year")
-                try:
-                    yr = int(yr) if yr is not None else None
-                except Exception:
-                    yr = None
-                add_item(mk, md, ver, yr)
+            from_records([
+                (
+                    v.get("MAKE") or v.get("make"),
+                    v.get("Model") or v.get("model"),
+                    v.get("Version") or v.get("version"),
+                    v.get("Año") or v.get("ano") or v.get("year"),
+                )
+                for v in load_vehicles(paths["versiones95"], key="items")
+            ])
         except Exception:
             pass
-
-    # Legacy multi-source build (catalog + processed + flat + json)
-    try:
-        df0 = _load_catalog().copy()
-        if pd is not None and len(df0):
-            cols = [c for c in ["make","model","version","ano"] if c in df0.columns]
-            t = df0[cols].copy()
-            for c in ["make","model","version"]:
-                if c in t.columns:
-                    t[c] = t[c].astype(str)
-            if "ano" in t.columns:
-                t["ano"] = pd.to_numeric(t["ano"], errors="coerce").astype("Int64")
-            for _, r in t.iterrows():
-                add_item(r.get("make",""), r.get("model",""), r.get("version"), int(r.get("ano")) if pd.notna(r.get("ano")) else None)
-    except Exception:
-        pass
-    try:
-        p = paths.get("processed")
-        if p and p.exists() and pd is not None:
-            t = pd.read_csv(p, low_memory=False)
-            t.columns = [str(c).strip().lower() for c in t.columns]
-            if {"make","model","ano"}.issubset(t.columns):
-                for _, r in t.iterrows():
-                    add_item(r.get("make",""), r.get("model",""), r.get("version"), r.get("ano"))
-    except Exception:
-        pass
     try:
-        p = paths.get("flat")
-        if p and p.exists() and pd is not None:
-            t = pd.read_csv(p, low_memory=False)
-            t.columns = [str(c).strip().lower() for c in t.columns]
-            if {"make","model","ano"}.issubset(t.columns):
-                for _, r in t.iterrows():
-                    add_item(r.get("make",""), r.get("model",""), r.get("version"), r.get("ano"))
+        df0 = _load_catalog()
+        if len(df0):
+            add(df0[[c for c in _OPTIONS_TREE_COLS if c in df0.columns]], menu=True, catalog=True)
     except Exception:
         pass
+    for name in ("processed", "flat"):
+        try:
+            p = paths.get(name)
+            if p and p.exists():
+                t = pd.read_csv(p, usecols=lambda c: str(c).strip().lower() in _OPTIONS_TREE_COLS, low_memory=False)
+                t.columns = [str(c).strip().lower() for c in t.columns]
+                if {"make","model"}.issubset(t.columns):
+                    add(t, menu=True)
+        except Exception:
+            pass
     try:
         p = paths.get("json")
         if p and p.exists():
-            import json as _json
-            data = _json.loads(p.read_text(encoding="utf-8"))
-            items = data.get("vehicles") if isinstance(data, dict) else (data if isinstance(data, list) else [])
-            for v in items or []:
-                mk = (v.get("manufacturer",{}) or {}).get("name") or (v.get("make",{}) or {}).get("name") or ""
-                md = (v.get("model",{}) or {}).get("name") or ""
-                ver = (v.get("version",{}) or {}).get("name") or ""
-                yr = (v.get("version",{}) or {}).get("year") or None
-                add_item(mk, md, ver, yr)
+            from_records([
+                (
+                    (v.get("manufacturer",{}) or {}).get("name") or (v.get("make",{}) or {}).get("name"),
+                    (v.get("model",{}) or {}).get("name"),
+                    (v.get("version",{}) or {}).get("name"),
+                    (v.get("version",{}) or {}).get("year"),
+                )
+                for v in load_vehicles(p)
+            ])
     except Exception:
         pass
+    return frames
+
+
+def _build_options_tree(paths: Dict[str, Path]) -> Dict[str, Any]:
+    """Union every options source into a single make/model/year/versions tree.
+
+    Rows are normalised column-wise, deduplicated on their keys, makes are
+    canonicalised once per distinct value and the tree is filled by grouping.
+    """
+    if pd is None:
+        return _options_tree_view({}, {}, [], [])
+    frames = _options_source_frames(paths)
+    if not frames:
+        return _options_tree_view({}, {}, [], [])
+    t = pd.concat(frames, ignore_index=True, sort=False)
+
+    def text(col: str, *, upper: bool):
+        s = t[col].astype(object).where(t[col].notna(), "").astype(str).str.strip()
+        if upper:
+            s = s.str.upper()
+        return s.mask(s.str.upper().isin(["NAN", "NONE"]), "")
+
+    t = pd.DataFrame({
+        "make": text("make", upper=True),
+        "model": text("model", upper=True),
+        "version": text("version", upper=False),
+        "year": pd.to_numeric(t["ano"], errors="coerce").fillna(0).clip(lower=0).astype("int64"),
+        "menu": t["menu"].astype(bool),
+        "catalog": t["catalog"].astype(bool),
+    })
+    t = t[t["model"] != ""].drop_duplicates()
+    canon = _canon_make_series(t["make"])
+    t["make"] = canon.where(canon.notna() & (canon != ""), t["make"])
+    t = t.drop_duplicates()
+
+    tree: Dict[str, Dict[str, Dict[int, set]]] = {}
+    versions = t.groupby(["make", "model", "year"], sort=False)["version"].unique()
+    for (mk, md, yr), vs in versions.items():
+        tree.setdefault(mk, {}).setdefault(md, {})[int(yr)] = {v for v in vs if v}
+
+    catalog_years: Dict[str, Dict[str, set]] = {}
+    cat = t[t["catalog"] & (t["year"] > 0)]
+    for (md, mk), ys in cat.groupby(["model", "make"], sort=False)["year"].unique().items():
+        catalog_years.setdefault(md, {})[mk] = {int(y) for y in ys}
+
+    # Menus: every model/make seen in the menu sources, plus those of the other
+    # sources that have an allowed (or unknown) year.
+    menu = t[t["menu"] | (t["year"] == 0) | t["year"].isin(list(ALLOWED_YEARS))]
+    makes = sorted(mk for mk in menu["make"].unique().tolist() if mk)
+    models = sorted(menu["model"].unique().tolist())
+    return _options_tree_view(tree, catalog_years, makes, models)
+
+
+def _save_options_tree(sig: Dict[str, Any], idx: Dict[str, Any]) -> None:
+    if os.getenv("OPTIONS_TREE_ARTIFACT", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return
+    doc = {
+        "sig": sig,
+        "tree": {
+            mk: {md: {str(y): sorted(vs) for y, vs in yrs.items()} for md, yrs in mds.items()}
+            for mk, mds in idx["tree"].items()
+        },
+        "catalog_years": {
+            md: {mk: sorted(ys) for mk, ys in mks.items()} for md, mks in idx["catalog_years"].items()
+        },
+        "makes": idx["makes"],
+        "models": idx["models"],
+    }
+    try:
+        target = _options_tree_path()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(f".json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(doc, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, target)
+    except Exception as exc:
+        logger.warning("options tree not persisted: %s", exc)
+
+
+def _load_options_tree(sig: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Persisted options tree built from the same sources, or None."""
+    if os.getenv("OPTIONS_TREE_ARTIFACT", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+    try:
+        doc = json.loads(_options_tree_path().read_text(encoding="utf-8"))
+        if doc.get("sig") != sig:
+            return None
+        tree = {
+            mk: {md: {int(y): set(vs) for y, vs in yrs.items()} for md, yrs in mds.items()}
+            for mk, mds in doc["tree"].items()
+        }
+        catalog_years = {
+            md: {mk: set(ys) for mk, ys in mks.items()} for md, mks in doc["catalog_years"].items()
+        }
+        return _options_tree_view(tree, catalog_years, list(doc["makes"]), list(doc["models"]))
+    except Exception:
+        return None
+
+
+def _ensure_options_index() -> None:
+    """Keep ``_OPTIONS_IDX`` on the options tree of the current sources.
 
-    _OPTIONS_IDX = idx
-    _OPTIONS_IDX_MTIMES = mtimes
+    The tree is read from ``options_tree.json`` (next to the catalog snapshot)
+    when it was built from the same source mtimes, otherwise rebuilt from all
+    sources and persisted, so ``/options`` never reads the CSVs itself. The
+    rebuild holds a file lock: other workers wait for it and load the result.
+    """
+    global _OPTIONS_IDX, _OPTIONS_IDX_MTIMES
+    paths = _options_paths()
+    mtimes = _options_source_mtimes(paths)
+    if _OPTIONS_IDX is not None and mtimes == _OPTIONS_IDX_MTIMES:
+        return
+    with _OPTIONS_IDX_LOCK:
+        if _OPTIONS_IDX is not None and mtimes == _OPTIONS_IDX_MTIMES:
+            return
+        sig = {"v": _OPTIONS_TREE_VERSION, "mtimes": mtimes, "years": sorted(ALLOWED_YEARS)}
+        idx = _load_options_tree(sig)
+        if idx is None:
+            try:
+                with exclusive(_options_tree_path().with_suffix(".lock")):
+                    idx = _load_options_tree(sig)
+                    if idx is None:
+                        idx = _build_options_tree(paths)
+                        _save_options_tree(sig, idx)
+            except OSError:
+                idx = _build_options_tree(paths)
+        _OPTIONS_IDX = idx
+        _OPTIONS_IDX_MTIMES = mtimes
 
 def _norm_version_name(s: str | None) -> str:
     """Normalize common version tokens for consistent display.
@@ -3181,12 +3683,104 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count"],
 )
 
 
+# ------------------------ Conditional GET (ETag) -------------------------
+# Read endpoints whose payload only depends on the query and on the data files
+_ETAG_PATHS = {
+    "/options",
+    "/catalog",
+    "/dashboard",
+    "/seasonality",
+    "/sales/brand_monthly",
+    "/analytics/body_style_pillars",
+    "/config",
+}
+# Clients may keep the payload but must revalidate it on every use
+_ETAG_CACHE_CONTROL = "private, no-cache"
+# Data files are stat'ed at most this often (seconds); the catalog epoch is read live
+_DATA_SIG_RECHECK_S = 2.0
+_DATA_SIG: Dict[str, Any] = {"at": 0.0, "sig": None}
+
+
+def _data_files_sig() -> str:
+    """Hash of (name, mtime, size) of the files behind the read endpoints."""
+    now = time.monotonic()
+    if _DATA_SIG["sig"] is not None and now - _DATA_SIG["at"] < _DATA_SIG_RECHECK_S:
+        return _DATA_SIG["sig"]
+    import hashlib as _hashlib
+    paths: list[Path] = []
+    try:
+        paths.append(_catalog_source_path()[0])
+    except Exception:
+        pass
+    try:
+        paths.extend(p for p in _options_paths().values() if p)
+    except Exception:
+        pass
+    paths.append(ROOT / "data" / "aliases" / "alias_names.csv")
+    paths.extend(sorted((ROOT / "data" / "enriched").glob("sales_ytd_*.csv")))
+    paths.extend(sorted((ROOT / "data").glob("raiavl_venta_mensual_tr_cifra_*.csv")))
+    parts = [sorted(ALLOWED_YEARS)]
+    for p in paths:
+        parts.append([str(p), file_signature(p)])
+    sig = _hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+    _DATA_SIG.update({"at": now, "sig": sig})
+    return sig
+
+
+def _request_etag(request: Request) -> Optional[str]:
+    """Strong ETag of a read request under the current data, or None when unknown."""
+    import hashlib as _hashlib
+    parts = [request.url.path, sorted(request.query_params.multi_items()), _CATALOG_EPOCH, _data_files_sig()]
+    if request.url.path == "/config":
+        # fuel prices come from the snapshot; its version bumps when they change
+        parts.append(_FUEL_PRICES.version)
+    return '"' + _hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    for token in header.split(","):
+        token = token.strip()
+        if token == "*" or token.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@app.middleware("http")
+async def _conditional_get(request: Request, call_next):
+    """Answer If-None-Match with 304 (skipping the handler) on read endpoints.
+
+    The tag is taken before the handler runs, so it never claims data newer
+    than what the body was built from.
+    """
+    if request.method != "GET" or request.url.path not in _ETAG_PATHS or os.getenv("HTTP_ETAGS", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return await call_next(request)
+    try:
+        etag = _request_etag(request)
+    except Exception:
+        etag = None
+    if etag is None:
+        return await call_next(request)
+    inm = request.headers.get("if-none-match")
+    if inm and _etag_matches(inm, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _ETAG_CACHE_CONTROL})
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = _ETAG_CACHE_CONTROL
+    return response
+
+
 @app.on_event("startup")
 def _warm_startup_caches() -> None:
     """Preload heavy datasets so the first UI hits are responsive."""
+    try:
+        _FUEL_PRICES.current()
+    except Exception:
+        pass
     try:
         _load_catalog()
     except Exception:
@@ -3195,6 +3789,28 @@ def _warm_startup_caches() -> None:
         _ensure_options_index()
     except Exception:
         pass
+    try:
+        _catalog_fallback()
+    except Exception:
+        pass
+    # Poll catalog sources so changes are rebuilt before a request notices them
+    try:
+        interval = float(os.getenv("CATALOG_RELOAD_INTERVAL", "30"))
+    except Exception:
+        interval = 30.0
+    if interval > 0:
+        threading.Thread(
+            target=_catalog_reload_watcher, args=(interval,), name="catalog-watcher", daemon=True
+        ).start()
+    # Fuel prices are refreshed on their own schedule (default every 12 h)
+    try:
+        fuel_interval = float(os.getenv("FUEL_PRICES_REFRESH_S", str(12 * 3600)))
+    except Exception:
+        fuel_interval = 12 * 3600.0
+    if fuel_interval > 0:
+        threading.Thread(
+            target=_fuel_price_watcher, args=(fuel_interval,), name="fuel-prices", daemon=True
+        ).start()
 
 
 # Simple media proxy for vehicle images
@@ -5638,9 +6254,50 @@ def admin_delete_user(user_id: str, request: Request) -> Response:
     return Response(status_code=204)
 
 
-# ------------------------------ Basic config -----------------------------
-@app.get("/config")
-def get_config() -> Dict[str, Any]:
+# ------------------------------ Fuel prices ------------------------------
+_FUEL_PRICES_URL = "https://api.datos.gob.mx/v1/precio.gasolina.publico?pageSize=1000"
+# Defaults if remote/env are missing (reasonable public averages; overridable by env)
+_FUEL_PRICE_DEFAULTS = {
+    "gasolina_magna_litro": 24.0,
+    "gasolina_premium_litro": 26.0,
+    "diesel_litro": 25.0,
+    "electricidad_kwh": 2.8,
+}
+
+
+def _fetch_fuel_prices() -> Dict[str, Any]:
+    """National average prices (MX) from datos.gob.mx; only source/as_of on failure."""
+    url = _FUEL_PRICES_URL
+    try:
+        with urlopen(url, timeout=6) as fh:  # nosec - simple public dataset
+            data = json.loads(fh.read().decode("utf-8"))
+        results = data.get("results") or []
+        regs = [float(r.get("regular") or 0) for r in results if (r.get("regular") or "").strip()] or [None]
+        prems = [float(r.get("premium") or 0) for r in results if (r.get("premium") or "").strip()] or [None]
+        dies = [float(r.get("diesel") or 0) for r in results if (r.get("diesel") or "").strip()] or [None]
+        def avg(xs):
+            xs = [x for x in xs if x and x>0]
+            return round(sum(xs)/len(xs), 2) if xs else None
+        as_of = None
+        try:
+            # pick most recent date field if present
+            y = max((r.get("fecha") or r.get("date_insert") or "" for r in results))
+            as_of = y[:10] if y else None
+        except Exception:
+            pass
+        return {
+            "gasolina_magna_litro": avg(regs),
+            "gasolina_premium_litro": avg(prems),
+            "diesel_litro": avg(dies),
+            "as_of": as_of,
+            "source": url,
+        }
+    except Exception:
+        return {"source": url, "as_of": None}
+
+
+def _load_fuel_prices() -> FuelPrices:
+    """Snapshot from env overrides, then the remote averages, then defaults."""
     def _to_float(name: str, default: float | None = None) -> Optional[float]:
         try:
             v = os.getenv(name)
@@ -5649,52 +6306,42 @@ def get_config() -> Dict[str, Any]:
             return float(str(v).strip())
         except Exception:
             return default
-    # Optional online fetch for national average prices (MX)
-    def _fetch_fuel_prices() -> Dict[str, Any]:
-        url = "https://api.datos.gob.mx/v1/precio.gasolina.publico?pageSize=1000"
-        try:
-            with urlopen(url, timeout=6) as fh:  # nosec - simple public dataset
-                import json as _json
-                data = _json.loads(fh.read().decode("utf-8"))
-            results = data.get("results") or []
-            regs = [float(r.get("regular") or 0) for r in results if (r.get("regular") or "").strip()] or [None]
-            prems = [float(r.get("premium") or 0) for r in results if (r.get("premium") or "").strip()] or [None]
-            dies = [float(r.get("diesel") or 0) for r in results if (r.get("diesel") or "").strip()] or [None]
-            def avg(xs):
-                xs = [x for x in xs if x and x>0]
-                return round(sum(xs)/len(xs), 2) if xs else None
-            as_of = None
-            try:
-                # pick most recent date field if present
-                y = max((r.get("fecha") or r.get("date_insert") or "" for r in results))
-                as_of = y[:10] if y else None
-            except Exception:
-                pass
-            return {
-                "gasolina_magna_litro": avg(regs),
-                "gasolina_premium_litro": avg(prems),
-                "diesel_litro": avg(dies),
-                "as_of": as_of,
-                "source": url,
-            }
-        except Exception:
-            return {"source": url, "as_of": None}
-
-    # cache to avoid hitting network often
-    _cache = getattr(get_config, "_fuel_cache", None)
-    now = datetime.utcnow()
-    if not _cache or (now - _cache.get("ts", now - timedelta(days=2))) > timedelta(hours=12):
-        get_config._fuel_cache = {"ts": now, "remote": _fetch_fuel_prices()}  # type: ignore[attr-defined]
-
-    remote = getattr(get_config, "_fuel_cache", {}).get("remote", {})  # type: ignore[attr-defined]
-
-    # Defaults if remote/env are missing (reasonable public averages; overridable by env)
-    DEFAULTS = {
-        "gasolina_magna_litro": 24.0,
-        "gasolina_premium_litro": 26.0,
-        "diesel_litro": 25.0,
-        "electricidad_kwh": 2.8,
-    }
+    remote = _fetch_fuel_prices()
+    return FuelPrices(
+        gasolina_magna_litro=_to_float("PRECIO_GASOLINA_MAGNA_LITRO", remote.get("gasolina_magna_litro") or _FUEL_PRICE_DEFAULTS["gasolina_magna_litro"]),
+        gasolina_premium_litro=_to_float("PRECIO_GASOLINA_PREMIUM_LITRO", remote.get("gasolina_premium_litro") or _FUEL_PRICE_DEFAULTS["gasolina_premium_litro"]),
+        diesel_litro=_to_float("PRECIO_DIESEL_LITRO", remote.get("diesel_litro") or _FUEL_PRICE_DEFAULTS["diesel_litro"]),
+        electricidad_kwh=_to_float("PRECIO_ELECTRICIDAD_KWH", _FUEL_PRICE_DEFAULTS["electricidad_kwh"]),
+        as_of=remote.get("as_of"),
+        source=remote.get("source"),
+        fetched_at=datetime.utcnow(),
+    )
+
+
+# Current fuel prices; row computations read the snapshot, the watcher refreshes it
+_FUEL_PRICES = FuelPriceProvider(_load_fuel_prices)
+
+
+def _fuel_reprice_enabled() -> bool:
+    return os.getenv("FUEL_REPRICE_CATALOG", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _fuel_price_watcher(interval: float) -> None:
+    """Refresh the fuel snapshot every ``interval`` seconds, repricing the catalog on change."""
+    while True:
+        time.sleep(interval)
+        try:
+            prev = _FUEL_PRICES.loaded()
+            if _FUEL_PRICES.refresh() and prev is not None and _fuel_reprice_enabled():
+                _publish_repriced_catalog(prev, _FUEL_PRICES.current())
+        except Exception as exc:
+            logger.warning("fuel price refresh failed: %s", exc)
+
+
+# ------------------------------ Basic config -----------------------------
+@app.get("/config")
+def get_config() -> Dict[str, Any]:
+    fuel = _FUEL_PRICES.current()
 
     # Determine data last update times (catalog and key sources)
     def _fmt_ts(ts: float | None) -> Optional[str]:
@@ -5765,15 +6412,10 @@ def get_config() -> Dict[str, Any]:
         "prices_last_updated": _fmt_ts(prices_mtime),
         "industry_last_updated": _fmt_ts(industry_mtime),
         "data_sources_mtime": {k: _fmt_ts(v) for k, v in data_mtimes.items()},
-        "fuel_prices": {
-            "gasolina_magna_litro": _to_float("PRECIO_GASOLINA_MAGNA_LITRO", remote.get("gasolina_magna_litro") or DEFAULTS["gasolina_magna_litro"]),
-            "gasolina_premium_litro": _to_float("PRECIO_GASOLINA_PREMIUM_LITRO", remote.get("gasolina_premium_litro") or DEFAULTS["gasolina_premium_litro"]),
-            "diesel_litro": _to_float("PRECIO_DIESEL_LITRO", remote.get("diesel_litro") or DEFAULTS["diesel_litro"]),
-            "electricidad_kwh": _to_float("PRECIO_ELECTRICIDAD_KWH", DEFAULTS["electricidad_kwh"]),
-        },
+        "fuel_prices": fuel.as_dict(),
         "fuel_prices_meta": {
-            "as_of": remote.get("as_of"),
-            "source": remote.get("source"),
+            "as_of": fuel.as_of,
+            "source": fuel.source,
         },
         "allowed_model_years": sorted(ALLOWED_YEARS),
     }
@@ -5968,1451 +6610,2255 @@ def _catalog_csv_path() -> Path:
     return ROOT / "data" / "equipo_veh_limpio_procesado.csv"
 
 
-def _load_catalog():
-    global _DF, _DF_MTIME, _CATALOG_SOURCE
-    if pd is None:
-        raise HTTPException(status_code=500, detail="pandas not available in environment")
+# Persisted columnar snapshot of the fully built catalog. The rebuild in
+# _load_catalog reads ~10 files and runs many merges; when none of the inputs
+# changed we can load the final frame straight from disk instead.
+_CATALOG_SNAPSHOT_DIR_ENV = "CATALOG_SNAPSHOT_DIR"
+_CATALOG_SNAPSHOT_VERSION = "2"
+_CATALOG_SNAPSHOT_ENVS = (
+    CATALOG_PATH_ENV,
+    _MAINT_PATH_ENV,
+    _AUTORADAR_JSON_ENV,
+    "ANOS_PERMITIDOS",
+    "KILOMETROS_ANUALES",
+    "PRECIO_GASOLINA_MAGNA_LITRO",
+    "PRECIO_GASOLINA_PREMIUM_LITRO",
+    "PRECIO_DIESEL_LITRO",
+    "PRECIO_ELEC_KWH",
+    "PHEV_ELEC_SHARE",
+    "NOMBRE_COLUMNA_KML",
+    "NOMBRE_COLUMNA_TIPO_COMBUSTIBLE",
+    "CATALOG_COMPACT_DTYPES",
+)
 
-    json_path = _autoradar_json_path()
-    from_json = json_path.exists()
-    path = json_path if from_json else _catalog_csv_path()
-    if not path.exists():
-        raise HTTPException(status_code=404, detail=f"Catalog source not found: {path}")
 
-    m = path.stat().st_mtime
-    needs_reload = (
-        _DF is None
-        or _DF_MTIME != m
-        or (_CATALOG_SOURCE == "json" and not from_json)
-        or (_CATALOG_SOURCE == "csv" and from_json)
-    )
+_CATALOG_CODE_SIG: Dict[str, Optional[str]] = {"sig": None}
 
-    if needs_reload:
-        if from_json:
-            df = _load_autoradar_dataframe()
-        else:
-            df = pd.read_csv(path, low_memory=False)
-
-        def _slug(s: str) -> str:
-            return _slug_column_name(s)
-
-        mapping = {c: _slug(c) for c in df.columns}
-        df.rename(columns=mapping, inplace=True)
-        # common alias fixes
-        if "año" in df.columns and "ano" not in df.columns:
-            df.rename(columns={"año": "ano"}, inplace=True)
-        if "caballos_de_fuerza" in df.columns and "caballos_fuerza" not in df.columns:
-            df.rename(columns={"caballos_de_fuerza": "caballos_fuerza"}, inplace=True)
-        # align consumo de combustible columnas nuevas vs legadas
-        try:
-            if "fuel_combined_kml" in df.columns:
-                df["combinado_kml"] = df["fuel_combined_kml"].combine_first(df.get("combinado_kml"))
-            if "fuel_combined_l_100km" in df.columns:
-                df["combinado_l_100km"] = df["fuel_combined_l_100km"].combine_first(df.get("combinado_l_100km"))
-            if "fuel_city_kml" in df.columns:
-                df["ciudad_kml"] = df["fuel_city_kml"].combine_first(df.get("ciudad_kml"))
-            if "fuel_highway_kml" in df.columns:
-                df["carretera_kml"] = df["fuel_highway_kml"].combine_first(df.get("carretera_kml"))
-        except Exception:
-            pass
-        # Merge enriched feature pillars if available
-        try:
-            feat_path = ROOT / "data" / "enriched" / "features_matrix.csv"
-            if feat_path.exists():
-                feat = pd.read_csv(feat_path)
-                if "make" in feat.columns:
-                    feat["make"] = feat["make"].astype(str).str.upper().str.strip()
-                    feat["__join_make"] = feat["make"]
-                if "model" in feat.columns:
-                    feat["model"] = feat["model"].astype(str).str.upper().str.strip()
-                    feat["__join_model"] = feat["model"]
-                if "version" in feat.columns:
-                    feat["version"] = feat["version"].astype(str).str.strip()
-                    feat["__join_version"] = feat["version"].str.upper()
-                if "ano" in feat.columns:
-                    feat["ano"] = pd.to_numeric(feat["ano"], errors="coerce").astype("Int64")
-                value_cols = [c for c in feat.columns if c not in {"make", "model", "version", "ano", "__join_make", "__join_model", "__join_version"}]
-                rename_map = {c: f"{c}__feat" for c in value_cols}
-                feat = feat.rename(columns=rename_map)
-                if {"make", "model", "version"}.issubset(df.columns):
-                    df["__join_make"] = df["make"].astype(str).str.upper().str.strip()
-                    df["__join_model"] = df["model"].astype(str).str.upper().str.strip()
-                    df["__join_version"] = df["version"].astype(str).str.strip().str.upper()
-                    merge_keys_left = ["__join_make", "__join_model", "__join_version"]
-                    merge_keys_right = [key for key in ["__join_make", "__join_model", "__join_version"] if key in feat.columns]
-                    if "ano" in df.columns and "ano" in feat.columns:
-                        merge_keys_left.append("ano")
-                        merge_keys_right.append("ano")
-                    df = df.merge(
-                        feat,
-                        how="left",
-                        left_on=merge_keys_left,
-                        right_on=merge_keys_right,
-                    )
-                    for base_col in ("make", "model", "version"):
-                        col_x = f"{base_col}_x"
-                        col_y = f"{base_col}_y"
-                        if col_x in df.columns:
-                            df[base_col] = df[col_x]
-                            df.drop(columns=[col_x], inplace=True)
-                        if col_y in df.columns:
-                            df.drop(columns=[col_y], inplace=True)
-                    for col in value_cols:
-                        feat_col = f"{col}__feat"
-                        if feat_col not in df.columns:
-                            continue
-                        if col in df.columns:
-                            df[col] = df[col].combine_first(df[feat_col])
-                            df.drop(columns=[feat_col], inplace=True)
-                        else:
-                            df.rename(columns={feat_col: col}, inplace=True)
-                    df.drop(columns=["__join_make", "__join_model", "__join_version"], inplace=True, errors="ignore")
-                    df.drop(columns=[c for c in ["__join_make", "__join_model", "__join_version"] if c in feat.columns], inplace=True, errors="ignore")
-        except Exception:
-            pass
-        # normalize basic columns
-        for col in ("make", "model", "version"):
-            if col in df.columns:
-                df[col] = df[col].astype(str)
-        # Ensure horsepower fallback from original column when missing
-        try:
-            if {"caballos_fuerza","caballos_fuerza_original"}.issubset(df.columns):
-                cf = pd.to_numeric(df["caballos_fuerza"], errors="coerce")
-                cf_orig = pd.to_numeric(df["caballos_fuerza_original"], errors="coerce")
-                df["caballos_fuerza"] = cf.where(cf.notna() & (cf > 0), cf_orig)
-        except Exception:
-            pass
-        # Apply aliases (canonicalization) for make/model so the whole app uses canonical names
-        try:
-            _ = _load_aliases()
-            if {"make","model"}.issubset(df.columns):
-                df["make"] = df["make"].map(lambda s: _canon_make(s))
-                # model alias may depend on make
-                df["model"] = df.apply(lambda r: _canon_model(r.get("make"), r.get("model")), axis=1)
-        except Exception:
-            pass
-        # If TX is missing or 0, use MSRP as fallback
+
+def _catalog_code_signature() -> str:
+    """Digest of the code that builds the catalog (this module and core/*.py)
+    plus the pandas version, computed once per process."""
+    sig = _CATALOG_CODE_SIG["sig"]
+    if sig is None:
+        import hashlib as _hashlib
+        h = _hashlib.sha1(str(getattr(pd, "__version__", None)).encode("utf-8"))
+        for p in [Path(__file__).resolve(), *sorted((ROOT / "core").glob("*.py"))]:
+            h.update(str(p.name).encode("utf-8"))
+            try:
+                h.update(p.read_bytes())
+            except Exception:
+                pass
+        sig = _CATALOG_CODE_SIG["sig"] = h.hexdigest()
+    return sig
+
+
+def _catalog_snapshot_dir() -> Path:
+    env = os.getenv(_CATALOG_SNAPSHOT_DIR_ENV)
+    if env:
+        p = Path(env)
+        return p if p.is_absolute() else ROOT / p
+    return ROOT / "data" / "cache"
+
+
+def _catalog_input_paths(source: Path) -> list[Path]:
+    """Every file read while building the catalog (existing or not)."""
+    paths = [
+        source,
+        ROOT / "data" / "enriched" / "current.csv",
+        ROOT / "data" / "enriched" / "features_matrix.csv",
+        ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv",
+        ROOT / "data" / "vehiculos-todos.json",
+        ROOT / "data" / "versiones95_full_merged.json",
+        ROOT / "data" / "versiones95_full.json",
+        ROOT / "data" / "versiones95_2024_2026.json",
+        ROOT / "data" / "costos_mantenimiento.csv",
+        ROOT / "data" / "ventas_modelo_supabase.csv",
+        ROOT / "data" / "enriched" / "sales_ytd_2025.csv",
+        ROOT / "data" / "aliases" / "alias_names.csv",
+        ROOT / "scripts" / "enrich_catalog.py",
+    ]
+    maint_env = os.getenv(_MAINT_PATH_ENV)
+    if maint_env:
+        mp = Path(maint_env)
+        paths.append(mp if mp.is_absolute() else ROOT / mp)
+    return paths
+
+
+def _catalog_input_signature(source: Path, *, include_source: bool = True) -> str:
+    """Hash of (path, mtime, size) for every catalog input, the build code
+    (see ``_catalog_code_signature``) and the relevant env vars.
+
+    ``include_source=False`` leaves out the source file's stat so the hash only
+    changes when something other than the vehicle records changed.
+    """
+    import hashlib as _hashlib
+    parts: list[Any] = [_CATALOG_SNAPSHOT_VERSION, _catalog_code_signature(), str(source)]
+    for p in _catalog_input_paths(source)[0 if include_source else 1:]:
         try:
-            if {"msrp","precio_transaccion"}.issubset(df.columns):
-                tx = pd.to_numeric(df["precio_transaccion"], errors="coerce")
-                ms = pd.to_numeric(df["msrp"], errors="coerce")
-                df["precio_transaccion"] = tx.where(~(tx.isna() | (tx <= 0)), ms)
+            st = p.stat()
+            parts.append([str(p), st.st_mtime_ns, st.st_size])
         except Exception:
-            pass
-        # add normalized display version
+            parts.append([str(p), None, None])
+    parts.append([[k, os.getenv(k)] for k in _CATALOG_SNAPSHOT_ENVS])
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return _hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _read_catalog_snapshot(sig: str):
+    """Return the persisted catalog frame when its signature matches, else None."""
+    if pd is None or os.getenv("CATALOG_SNAPSHOT", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+    base = _catalog_snapshot_dir()
+    meta_path = base / "catalog_snapshot.json"
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if meta.get("signature") != sig:
+        return None
+    fmt = meta.get("format")
+    try:
+        if fmt == "parquet":
+            df = pd.read_parquet(base / "catalog_snapshot.parquet")
+            # Arrow round-trips missing values in mixed object columns as None;
+            # the in-memory build uses NaN there, so restore it.
+            for c in df.columns:
+                if df[c].dtype == object:
+                    df[c] = df[c].where(df[c].notna(), float("nan"))
+            return df
+        if fmt == "pickle":
+            return pd.read_pickle(base / "catalog_snapshot.pkl")
+    except Exception:
+        return None
+    return None
+
+
+def _write_catalog_snapshot(df, sig: str) -> None:
+    """Persist the built catalog (Parquet when pyarrow is available, pickle otherwise)."""
+    if os.getenv("CATALOG_SNAPSHOT", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return
+    base = _catalog_snapshot_dir()
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+    except Exception:
+        return
+    fmt = None
+    target = None
+    try:
+        import importlib.util as _importlib_util
+        if _importlib_util.find_spec("pyarrow") is None:
+            raise ImportError("pyarrow")
+        target = base / "catalog_snapshot.parquet"
+        tmp = target.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, target)
+        fmt = "parquet"
+    except Exception:
+        # Mixed-type object columns (or missing pyarrow) -> pickle keeps dtypes verbatim
         try:
-            if "version" in df.columns:
-                df["version_display"] = df["version"].map(_norm_version_name)
+            target = base / "catalog_snapshot.pkl"
+            tmp = target.with_suffix(".pkl.tmp")
+            df.to_pickle(tmp)
+            os.replace(tmp, target)
+            fmt = "pickle"
         except Exception:
-            pass
-        if "ano" in df.columns:
+            return
+    try:
+        meta = {
+            "signature": sig,
+            "format": fmt,
+            "file": target.name if target else None,
+            "rows": int(len(df)),
+            "cols": int(len(df.columns)),
+            "written_at": datetime.utcnow().isoformat() + "Z",
+        }
+        meta_path = base / "catalog_snapshot.json"
+        tmp_meta = meta_path.with_suffix(".json.tmp")
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_meta, meta_path)
+    except Exception:
+        pass
+
+
+_CATALOG_BUILD_REPORT: Dict[str, Any] = {"last": None, "running": None}
+
+
+def _publish_build_report(report: BuildReport, df) -> None:
+    _CATALOG_BUILD_REPORT["last"] = report.finish(df)
+    _CATALOG_BUILD_REPORT["running"] = None
+    logger.info("catalog build %.1f ms: %s", report.total_ms or 0.0, report.summary())
+
+
+# Keyword families for the raw-JSON equipment parsing in _flat_enrichment,
+# compiled once so each equipment text is scanned a single time.
+_EQUIP_POSITIVE_RX = any_of(("serie", "incluido", "sí", "si", "estándar", "estandar", "yes", "y"))
+_EQUIP_FIRST_NUM_RX = re.compile(r"(\d+[\.,]?\d*)")
+_EQUIP_QUANT_MATCHER = KeywordMatcher({
+    "speakers": ("bocinas", "altav", "parlant", "speaker"),
+    "usb": ("usb",),
+    "usb_c": ("usb-c", "usb c", "tipo c", "type-c", "type c"),
+    "usb_a": ("usb-a", "usb a", "tipo a", "type-a", "type a"),
+    "12v": ("12v",),
+    "110v": ("110v",),
+    "outlet": ("toma", "tomacorr", "power"),
+    "screen": ("pantalla", "display", "screen"),
+    "cluster": ("cluster", "clúster", "instrument"),
+    "zones": ("zonas", "zone"),
+    "climate": ("clima", "climate", "aire"),
+    "seats": ("capacidad de asientos", "capacidad asientos", "seats", "asientos"),
+    "adas_lane_keep": ("lane keep", "mantenimiento de carril", "lane centering", "lka"),
+    "adas_acc": ("crucero adaptativo", "acc", "adaptive cruise"),
+    "rear_cross_traffic": ("tráfico cruzado", "rear cross", "cross traffic"),
+    "auto_high_beam": ("luces altas autom", "auto high beam", "matrix"),
+    "hud": ("head‑up", "head up", "hud"),
+    "ambient_lighting": ("iluminación ambiental", "ambient lighting"),
+    "handsfree": ("manos libres", "hands‑free", "hands free", "kick"),
+    "tailgate": ("portón", "cajuela", "tailgate"),
+    "tow_prep": ("preparación remolque", "preparacion remolque", "tow prep"),
+    "tow_hitch": ("enganche", "remolque", "hitch"),
+    "diff_lock": ("bloqueo", "diferencial", "lock diff"),
+    "low_range": ("reductora", "low range", "4l"),
+    "rear_side_airbags": ("bolsas laterales traseras", "laterales traseras", "rear side airbag"),
+    "curtain_all_rows": ("cortina", "todas las filas", "all rows curtain"),
+})
+_EQUIP_QUANT_COUNTS = (
+    "speakers_count", "usb_a_count", "usb_c_count", "power_12v_count", "power_110v_count",
+    "screen_main_in", "screen_cluster_in", "climate_zones", "seats_capacity",
+)
+_EQUIP_QUANT_FLAGS = (
+    "adas_lane_keep", "adas_acc", "rear_cross_traffic", "auto_high_beam", "hud", "ambient_lighting",
+    "handsfree_tailgate", "tow_prep", "tow_hitch", "diff_lock", "low_range",
+    "rear_side_airbags", "curtain_all_rows",
+)
+# (pillar, points, keywords): points are added once per rule hit in the bag
+_EQUIP_PILLAR_RULES = (
+    ("equip_p_adas", 10, ("frenado de emergencia", "aeb", "autonomous emergency")),
+    ("equip_p_adas", 8, ("crucero adaptativo", "acc", "stop & go", "stop&go", "cca")),
+    ("equip_p_adas", 7, ("mantenimiento de carril", "lane keep", "lane centering", "lka")),
+    ("equip_p_adas", 6, ("punto ciego", "blind spot", "blis")),
+    ("equip_p_adas", 5, ("tráfico cruzado", "rear cross", "cross traffic")),
+    ("equip_p_adas", 5, ("cámara 360", "camara 360", "surround view", "around view")),
+    ("equip_p_adas", 4, ("park assist", "auto park", "asistente estacionamiento")),
+    ("equip_p_safety", 8, ("airbag", "bolsa de aire")),
+    ("equip_p_safety", 6, ("abs", "control de estabilidad", "esc", "esp", "vdc")),
+    ("equip_p_safety", 4, ("isofix", "latch")),
+    ("equip_p_comfort", 6, ("asiento eléctrico", "memoria asiento", "calefacción asiento", "ventilación asiento", "calefaccion", "ventilacion")),
+    ("equip_p_comfort", 5, ("climatizador", "dual zone", "tri zone", "3 zonas", "2 zonas")),
+    ("equip_p_comfort", 4, ("portón eléctrico", "cajuela eléctrica", "power tailgate")),
+    ("equip_p_comfort", 3, ("llave inteligente", "keyless", "smart key")),
+    ("equip_p_infotainment", 6, ("android auto", "apple carplay")),
+    ("equip_p_infotainment", 4, ("pantalla", "display", "touchscreen")),
+    ("equip_p_infotainment", 4, ("altavoces", "bocinas", "speakers")),
+    ("equip_p_infotainment", 3, ("usb-c", "usb c", "tipo c", "type-c", "usb-a", "usb a", "tipo a", "type-a")),
+    ("equip_p_infotainment", 3, ("wireless charging", "carga inalámbrica", "carga inalambrica")),
+    ("equip_p_traction", 8, ("awd", "4x4", "4wd")),
+    ("equip_p_traction", 5, ("bloqueo", "diferencial", "lock diff")),
+    ("equip_p_utility", 3, ("toma 12v", "12v", "power 12v", "toma de corriente", "tomacorriente", "power outlet", "outlet", "tomacorriente trasero", "110v", "220v")),
+    ("equip_p_utility", 3, ("rieles", "riel techo", "roof rail", "barra techo", "barras de techo")),
+    ("equip_p_utility", 4, ("remolque", "enganche", "trailer", "gancho", "arrastre", "tow", "hitch", "capacidad de carga", "carga util", "carga útil", "payload")),
+)
+_EQUIP_PILLAR_MATCHER = KeywordMatcher({i: kws for i, (_p, _pts, kws) in enumerate(_EQUIP_PILLAR_RULES)})
+_EQUIP_PILLAR_CAPS = {
+    "equip_p_adas": 45.0,
+    "equip_p_safety": 18.0,
+    "equip_p_comfort": 18.0,
+    "equip_p_infotainment": 20.0,
+    "equip_p_traction": 13.0,
+    "equip_p_utility": 10.0,
+}
+# First matching family wins, in this order
+_EQUIP_FUEL_FAMILIES = (
+    ("bev", ("bev", "eléctrico", "electrico", "ev")),
+    ("phev", ("phev", "enchuf")),
+    ("hev", ("hev", "híbrido", "hibrido")),
+    ("diesel", ("diesel", "diésel", "tdi", "td", "dsl")),
+    ("gasolina premium", ("premium", "ron98")),
+    ("gasolina", ("gasolina", "nafta", "petrol")),
+)
+_EQUIP_FUEL_MATCHER = KeywordMatcher(dict(_EQUIP_FUEL_FAMILIES))
+
+
+_RAW_VEHICLE_JSON_CANDIDATES = (
+    ROOT / "data" / "vehiculos-todos.json",
+    ROOT / "data" / "versiones95_full_merged.json",
+    ROOT / "data" / "versiones95_full.json",
+    ROOT / "data" / "versiones95_2024_2026.json",
+)
+_FLAT_ENRICHMENT_CACHE: Dict[str, Any] = {"sig": None, "edf": None}
+
+
+def _flat_enrichment_sig() -> tuple:
+    """Signature of the two files _flat_enrichment depends on."""
+    flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
+    raw_json = next((p for p in _RAW_VEHICLE_JSON_CANDIDATES if p.exists()), None)
+    return (
+        file_signature(flat),
+        str(raw_json) if raw_json is not None else None,
+        file_signature(raw_json) if raw_json is not None else None,
+    )
+
+
+def _flat_enrichment(sources: Dict[str, Any], report: BuildReport):
+    """vehiculos_todos_flat.csv completed with the raw vehicle JSON, keyed by __mk/__md/__vr/__yr.
+
+    Depends only on those two files (not on the catalog), so the result is
+    cached by their signature and reused by later rebuilds; callers get a copy.
+    """
+    sig = _flat_enrichment_sig()
+    cached = _FLAT_ENRICHMENT_CACHE
+    if cached["edf"] is not None and cached["sig"] == sig:
+        return cached["edf"].copy()
+    flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
+    if not flat.exists():
+        return None
+    # Not prefetched when the cache looked valid at submit time
+    edf = _prefetched(sources, "flat") if "flat" in sources else _read_lower_csv(flat, low_memory=False)
+    raw_json = sig[1]
+    # Normalize common aliases coming from JSON/flat
+    try:
+        rename_map = {}
+        # dimensions
+        for src in ["longitud (mm)", "largo (mm)", "longitud_mm", "largo_mm"]:
+            if src in edf.columns: rename_map[src] = "longitud_mm"; break
+        for src in ["ancho (mm)", "anchura (mm)", "ancho_mm", "width_mm", "anchura_mm", "ancho"]:
+            if src in edf.columns: rename_map[src] = "ancho_mm"; break
+        for src in ["altura (mm)", "alto (mm)", "altura_mm", "alto_mm", "height_mm", "alto"]:
+            if src in edf.columns: rename_map[src] = "altura_mm"; break
+        # performance metrics
+        for c in list(edf.columns):
+            lc = str(c).lower()
+            if ("0-100" in lc or "0–100" in lc or "0 a 100" in lc) and ("s" in lc or "seg" in lc):
+                rename_map[c] = "accel_0_100_s"
+        if "velocidad_maxima_kmh" in edf.columns and "vmax_kmh" not in edf.columns:
+            rename_map["velocidad_maxima_kmh"] = "vmax_kmh"
+        if "v_max_kmh" in edf.columns and "vmax_kmh" not in edf.columns:
+            rename_map["v_max_kmh"] = "vmax_kmh"
+        # images
+        if "photo path" in edf.columns and "images_default" not in edf.columns:
+            rename_map["photo path"] = "images_default"
+        if rename_map:
+            edf.rename(columns=rename_map, inplace=True)
+    except Exception:
+        pass
+    # build join keys upper
+    def up(s):
+        return str(s or "").strip().upper()
+    if {"make","model"}.issubset(edf.columns):
+        edf["__mk"] = edf["make"].map(up)
+        edf["__md"] = edf["model"].map(up)
+    if "version" in edf.columns:
+        edf["__vr"] = edf["version"].map(up)
+    if "ano" in edf.columns:
+        edf["__yr"] = pd.to_numeric(edf["ano"], errors="coerce").astype("Int64")
+
+    report.stage("json_equipment", edf)
+    # Optional: enrich with raw JSON if available (for dimensions/accel)
+    try:
+        # Consider multiple JSON candidates (prefer newest curated files)
+        jdf = None
+        if "raw_json" in sources:
+            jdf = _prefetched(sources, "raw_json")
+        elif raw_json is not None:
+            jdf = _read_raw_vehicle_json(Path(raw_json))
+        if jdf is not None:
+            # basic columns
+            aliases = {}
+            if "make" not in jdf.columns and "marca" in jdf.columns: aliases["marca"] = "make"
+            if "model" not in jdf.columns and "modelo" in jdf.columns: aliases["modelo"] = "model"
+            if "version" not in jdf.columns and "versión" in jdf.columns: aliases["versión"] = "version"
+            if "ano" not in jdf.columns and "año" in jdf.columns: aliases["año"] = "ano"
+            # dimensions & performance + body style
+            for src in ["longitud (mm)", "largo (mm)", "longitud_mm", "largo_mm"]:
+                if src in jdf.columns: aliases[src] = "longitud_mm"; break
+            for src in ["ancho (mm)", "anchura (mm)", "ancho_mm", "anchura_mm", "width_mm", "ancho"]:
+                if src in jdf.columns: aliases[src] = "ancho_mm"; break
+            for src in ["altura (mm)", "alto (mm)", "altura_mm", "alto_mm", "height_mm", "alto"]:
+                if src in jdf.columns: aliases[src] = "altura_mm"; break
+            for src in ["body style","body_style","bodystyle","segment","segmento","segmento ventas","segmento_ventas"]:
+                if src in jdf.columns: aliases[src] = "body_style"; break
+            if "photo path" in jdf.columns and "images_default" not in jdf.columns:
+                aliases["photo path"] = "images_default"
+            if aliases:
+                jdf.rename(columns=aliases, inplace=True)
+            # detect accel columns heuristically
+            for c in list(jdf.columns):
+                lc = str(c).lower()
+                if ("0-100" in lc or "0–100" in lc or "0 a 100" in lc) and ("s" in lc or "seg" in lc):
+                    jdf.rename(columns={c: "accel_0_100_s"}, inplace=True)
+            # Extract fuel economy from nested fuelEconomy dict -> *_kml
             try:
-                df["ano"] = df["ano"].astype(int)
+                if "fuelEconomy" in jdf.columns:
+                    import re as _re
+                    def _to_kml(v):
+                        """Interpretar cualquier número como km/l (incluido 'mpg' mal rotulado)."""
+                        try:
+                            if v is None:
+                                return None
+                            s = str(v).strip().lower()
+                            if s == "" or s in {"nan","none","null","-"}:
+                                return None
+                            # Si aparece 'mpg', tratarlo como km/l (bug en el JSON)
+                            m = _re.search(r"(\d+[\.,]?\d*)\s*mpg", s)
+                            if m:
+                                return float(m.group(1).replace(',', '.'))
+                            # l/100km → km/l
+                            m = _re.search(r"(\d+[\.,]?\d*)\s*l\s*/\s*100\s*km", s)
+                            if m:
+                                l100 = float(m.group(1).replace(',', '.'))
+                                return 100.0 / l100 if l100>0 else None
+                            # km/l explícito
+                            m = _re.search(r"(\d+[\.,]?\d*)\s*(km/?l|kml)", s)
+                            if m:
+                                return float(m.group(1).replace(',', '.'))
+                            # número suelto ⇒ km/l
+                            m = _re.search(r"(\d+[\.,]?\d*)", s)
+                            if m:
+                                return float(m.group(1).replace(',', '.'))
+                            return None
+                        except Exception:
+                            return None
+                    def _fe_field(fe, key):
+                        if isinstance(fe, dict):
+                            return _to_kml(fe.get(key))
+                        return None
+                    jdf["combinado_kml"] = jdf["fuelEconomy"].map(lambda fe: _fe_field(fe, 'combined'))
+                    jdf["ciudad_kml"] = jdf["fuelEconomy"].map(lambda fe: _fe_field(fe, 'city'))
+                    jdf["carretera_kml"] = jdf["fuelEconomy"].map(lambda fe: _fe_field(fe, 'highway'))
             except Exception:
                 pass
-        # Ensure equip_score exists for charts; and fill missing/zero rows
-        try:
-            needs_score_all = ("equip_score" not in df.columns) or df["equip_score"].isna().all()
-        except Exception:
-            needs_score_all = True
-        def _compute_proxy_scores(dframe):
+            # Extract electrification fields (battery/carga/autonomía) from nested dicts
             try:
-                # Try library scorer first
-                from scripts.enrich_catalog import compute_scores  # type: ignore
-                return compute_scores(dframe)
-            except Exception:
-                # Fallback: crude proxy using presence of common features
-                import pandas as _pd
-                candidate_cols = [
-                    c for c in dframe.columns
-                    if any(k in c for k in (
-                        "android", "carplay", "camara", "sensor_punto_ciego",
-                        "control_estabilidad", "abs", "techo", "llave_inteligente",
-                        "camara_360", "bolsas_aire", "asistente"))
-                ]
-                def _to01(v):
-                    s = str(v).strip().lower()
-                    if s in ("true","1","si","sí","estandar","estándar","incluido","standard","std"):
-                        return 1
-                    if s in ("false","0","no","ninguno","na","n/a","no disponible","-"):
-                        return 0
+                def _from_ev(obj):
+                    out = {"battery_kwh": None, "charge_ac_kw": None, "charge_dc_kw": None,
+                           "ev_range_km": None, "charge_time_10_80_min": None}
                     try:
-                        return 1 if float(s)>0 else 0
+                        if not isinstance(obj, dict):
+                            return out
+                        # common keys at top-level
+                        bat = obj.get("battery") or {}
+                        chg = obj.get("charging") or {}
+                        if isinstance(bat, dict):
+                            out["battery_kwh"] = bat.get("capacityKwh") or bat.get("kwh") or bat.get("capacity")
+                        if isinstance(chg, dict):
+                            out["charge_ac_kw"] = chg.get("acKw") or chg.get("ac_kw") or chg.get("ac")
+                            out["charge_dc_kw"] = chg.get("dcKw") or chg.get("dc_kw") or chg.get("dc")
+                            out["charge_time_10_80_min"] = chg.get("timeTo80Min") or chg.get("time_10_80_min")
+                        rng = obj.get("rangeKm") or obj.get("range_km") or obj.get("autonomia_km") or obj.get("autonomia")
+                        if rng is not None:
+                            out["ev_range_km"] = rng
                     except Exception:
-                        return 0
-                if candidate_cols:
-                    score = dframe[candidate_cols].apply(lambda col: col.map(_to01))
-                    score_sum = score.sum(axis=1)
-                    mx = float(score_sum.max()) if len(score_sum)>0 else 0.0
-                    dframe["equip_score"] = (score_sum * (100.0 / mx)).round(1) if mx>0 else 0
-                return dframe
-        if needs_score_all:
-            try:
-                df = _compute_proxy_scores(df)
+                        return out
+                    return out
+                # Try top-level 'ev'/'battery'/'charging'
+                if any(k in jdf.columns for k in ("ev","battery","charging","version")):
+                    ev_df = pd.DataFrame()
+                    if "ev" in jdf.columns:
+                        ev_df = jdf["ev"].map(_from_ev).apply(pd.Series)
+                    # Also check within version
+                    try:
+                        if "version" in jdf.columns:
+                            from_ver = jdf["version"].map(_from_ev).apply(pd.Series)
+                            ev_df = ev_df.combine_first(from_ver)
+                    except Exception:
+                    	pass
+                    for col in ["battery_kwh","charge_ac_kw","charge_dc_kw","ev_range_km","charge_time_10_80_min"]:
+                        try:
+                            if col not in jdf.columns:
+                                jdf[col] = ev_df.get(col)
+                            else:
+                                base = pd.to_numeric(jdf[col], errors="coerce")
+                                new = pd.to_numeric(ev_df.get(col), errors="coerce")
+                                jdf[col] = jdf[col].where(~(base.isna() | (base == 0)), new)
+                        except Exception:
+                            pass
             except Exception:
                 pass
-        # Even si la columna existe, rellena valores faltantes/<=0 con un proxy simple
-        try:
-            import pandas as _pd
-            if "equip_score" not in df.columns:
-                df["equip_score"] = None
-            mask = _pd.to_numeric(df.get("equip_score"), errors="coerce").fillna(0) <= 0
-            if mask.any():
-                df2 = df.copy()
-                df2 = _compute_proxy_scores(df2)
-                df.loc[mask, "equip_score"] = df2.loc[mask, "equip_score"]
+            # Extraer tren motriz desde 'version'
+            try:
+                if "version" in jdf.columns:
+                    def _from_ver(v):
+                        try:
+                            t = (v or {}).get("transmission")
+                            d = (v or {}).get("drivetrain")
+                            dw = (str(d or "").strip().lower() or None)
+                            doors = (v or {}).get("doors")
+                            body = (v or {}).get("bodyStyle")
+                            return t, d, dw, doors, body
+                        except Exception:
+                            return None, None, None, None, None
+                    cols = jdf["version"].map(_from_ver).apply(pd.Series)
+                    cols.columns = ["transmision","traccion","driven_wheels","doors","body_style_from_ver"]
+                    for cname in ["transmision","traccion","driven_wheels","doors"]:
+                        if cname not in jdf.columns:
+                            jdf[cname] = cols[cname]
+                        else:
+                            base = jdf[cname]
+                            new = cols[cname]
+                            jdf[cname] = base.where(~(base.isna() | (base=="")), new)
+                    # Preferir body_style de 'version' si existe
+                    if "body_style" not in jdf.columns:
+                        jdf["body_style"] = cols["body_style_from_ver"]
+                    else:
+                        jdf["body_style"] = jdf["body_style"].combine_first(cols["body_style_from_ver"])
+            except Exception:
+                pass
+            # Compute a coarse equipment score from nested 'equipment' if present
+            try:
+                if "equipment" in jdf.columns:
+                    def _eq(e):
+                        try:
+                            cnt = 0
+                            if not isinstance(e, dict):
+                                return None
+                            neg = {"no disponible","-","0","none","n/a","na","ninguno"}
+                            for _k, arr in e.items():
+                                if not isinstance(arr, list):
+                                    continue
+                                for it in arr:
+                                    if not isinstance(it, dict):
+                                        continue
+                                    val = str(it.get("value", "")).strip().lower()
+                                    std = bool(it.get("standard"))
+                                    attrs = it.get("attributes") or []
+                                    text = " ".join([val] + [str(a.get("value","")) for a in attrs]).lower()
+                                    if (std and val not in neg) or _EQUIP_POSITIVE_RX.search(text):
+                                        cnt += 1
+                            return cnt
+                        except Exception:
+                            return None
+                    equipment = jdf["equipment"].tolist()
+                    n_eq = len(equipment)
+                    jdf["equip_score"] = pd.Series([_eq(e) for e in equipment], index=jdf.index, dtype=object)
+                    try:
+                        mx = float(pd.to_numeric(jdf["equip_score"], errors="coerce").max())
+                        if mx and mx > 0:
+                            jdf["equip_score"] = pd.to_numeric(jdf["equip_score"], errors="coerce").fillna(0).mul(100.0/mx).round(1)
+                    except Exception:
+                        pass
+                    import numpy as np  # type: ignore
+                    # Extract quantitative counts from nested equipment (heuristics).
+                    # Each item text is scanned once by _EQUIP_QUANT_MATCHER and
+                    # the results land in preallocated columns (last hit wins).
+                    def _first_num(text: str):
+                        m = _EQUIP_FIRST_NUM_RX.search(text)
+                        return float(m.group(1).replace(',', '.')) if m else None
+                    qcols = {c: np.full(n_eq, np.nan) for c in _EQUIP_QUANT_COUNTS}
+                    qcols.update({c: np.full(n_eq, None, dtype=object) for c in _EQUIP_QUANT_FLAGS})
+                    def _quant(i, e):
+                        if not isinstance(e, dict):
+                            return
+                        for _k, arr in e.items():
+                            if not isinstance(arr, list):
+                                continue
+                            for it in arr:
+                                if not isinstance(it, dict):
+                                    continue
+                                name = str(it.get("name", ""))
+                                value = str(it.get("value", ""))
+                                attrs = it.get("attributes", []) or []
+                                text = f"{name} {value} " + " ".join([f"{a.get('name','')} {a.get('value','')}" for a in attrs])
+                                t = text.lower()
+                                hit = _EQUIP_QUANT_MATCHER.labels(t)
+                                if not hit:
+                                    continue
+                                v = _first_num(t)
+                                if v is not None:
+                                    if "speakers" in hit:
+                                        qcols["speakers_count"][i] = round(v)
+                                    if "usb" in hit:
+                                        if "usb_c" in hit:
+                                            qcols["usb_c_count"][i] = round(v)
+                                        if "usb_a" in hit:
+                                            qcols["usb_a_count"][i] = round(v)
+                                    if "outlet" in hit:
+                                        if "12v" in hit:
+                                            qcols["power_12v_count"][i] = round(v)
+                                        if "110v" in hit:
+                                            qcols["power_110v_count"][i] = round(v)
+                                    if "screen" in hit:
+                                        qcols["screen_cluster_in" if "cluster" in hit else "screen_main_in"][i] = v
+                                    if "zones" in hit and "climate" in hit:
+                                        qcols["climate_zones"][i] = round(v)
+                                    if "seats" in hit:
+                                        qcols["seats_capacity"][i] = round(v)
+                                for flag in _EQUIP_QUANT_FLAGS:
+                                    if flag in hit:
+                                        qcols[flag][i] = True
+                                if "handsfree" in hit and "tailgate" in hit:
+                                    qcols["handsfree_tailgate"][i] = True
+                    for i, e in enumerate(equipment):
+                        try:
+                            _quant(i, e)
+                        except Exception:
+                            # keep what the row produced before the bad item
+                            pass
+                    qdf = pd.DataFrame(qcols, index=jdf.index)
+                    for col in _EQUIP_QUANT_COUNTS + _EQUIP_QUANT_FLAGS:
+                        try:
+                            if col not in jdf.columns:
+                                jdf[col] = qdf[col]
+                            else:
+                                base = pd.to_numeric(jdf[col], errors="coerce")
+                                new = pd.to_numeric(qdf[col], errors="coerce")
+                                jdf[col] = jdf[col].where(~(base.isna() | (base == 0)), new)
+                        except Exception:
+                            pass
+                    # Infer fuel/energy category directly from JSON text
+                    def _infer_fuel_from_json(cur, version, eq):
+                        try:
+                            # prefer existing
+                            cur = str(cur or "").strip().lower()
+                            if cur not in ("", "nan", "none", "null", "-"):
+                                return cur
+                            texts = [str(version or "")]
+                            if isinstance(eq, dict):
+                                for _k, arr in eq.items():
+                                    if isinstance(arr, list):
+                                        for it in arr:
+                                            if isinstance(it, dict):
+                                                texts.append(str(it.get("name","")))
+                                                texts.append(str(it.get("value","")))
+                            hit = _EQUIP_FUEL_MATCHER.labels(" ".join(texts).lower())
+                            for fuel, _kws in _EQUIP_FUEL_FAMILIES:
+                                if fuel in hit:
+                                    return fuel
+                            return None
+                        except Exception:
+                            return None
+                    try:
+                        cur_fuel = jdf["categoria_combustible_final"].tolist() if "categoria_combustible_final" in jdf.columns else [None] * n_eq
+                        versions = jdf["version"].tolist() if "version" in jdf.columns else [None] * n_eq
+                        jdf["categoria_combustible_final"] = pd.Series(
+                            [_infer_fuel_from_json(c, v, e) for c, v, e in zip(cur_fuel, versions, equipment)],
+                            index=jdf.index, dtype=object,
+                        )
+                    except Exception:
+                        pass
+                    # Reconstruct pillar scores (0..100) from equipment text bag (JSON-first)
+                    pcols = {c: np.zeros(n_eq) for c in _EQUIP_PILLAR_CAPS}
+                    for i, e in enumerate(equipment):
+                        if not isinstance(e, dict):
+                            continue
+                        try:
+                            items = []
+                            for _k, arr in e.items():
+                                if isinstance(arr, list):
+                                    for it in arr:
+                                        if isinstance(it, dict):
+                                            vals = [str(it.get("name","")), str(it.get("value",""))]
+                                            for a in it.get("attributes") or []:
+                                                vals.append(str(a.get("name","")))
+                                                vals.append(str(a.get("value","")))
+                                            items.append(" ".join(vals).lower())
+                        except Exception:
+                            continue
+                        hit = _EQUIP_PILLAR_MATCHER.labels(" \n ".join(items))
+                        points = dict.fromkeys(_EQUIP_PILLAR_CAPS, 0.0)
+                        for rule in hit:
+                            pillar, pts, _kws = _EQUIP_PILLAR_RULES[rule]
+                            points[pillar] += pts
+                        # Normalize basic caps to 0..100
+                        for pillar, pts in points.items():
+                            if pts > 0:
+                                pcols[pillar][i] = round(min(100.0, pts * (100.0 / _EQUIP_PILLAR_CAPS[pillar])), 1)
+                    for c, values in pcols.items():
+                        jdf[c] = values
+            except Exception:
+                pass
+            # build keys
+            if {"make","model"}.issubset(jdf.columns):
+                jdf["__mk"] = jdf["make"].map(up)
+                jdf["__md"] = jdf["model"].map(up)
+            if "version" in jdf.columns:
+                jdf["__vr"] = jdf["version"].map(up)
+            if "ano" in jdf.columns:
+                jdf["__yr"] = pd.to_numeric(jdf["ano"], errors="coerce").astype("Int64")
+            # keep only useful columns to avoid duplications
+            keep = [c for c in jdf.columns if c in {
+                "make","model","version","ano","__mk","__md","__vr","__yr",
+                # dimensiones y desempeño
+                "longitud_mm","ancho_mm","altura_mm","accel_0_100_s","vmax_kmh","body_style",
+                # tren motriz
+                "transmision","traccion","driven_wheels","doors",
+                # imagen
+                "images_default",
+                # infotainment y conectividad
+                "audio_brand","speakers_count","screen_main_in","screen_cluster_in",
+                "usb_a_count","usb_c_count","power_12v_count","power_110v_count","wireless_charging",
+                # fuel/energy inferred from JSON
+                "categoria_combustible_final",
+                # electrificación
+                "battery_kwh","charge_ac_kw","charge_dc_kw","ev_range_km","charge_time_10_80_min",
+                # garantías
+                "warranty_full_months","warranty_full_km","warranty_powertrain_months","warranty_powertrain_km",
+                "warranty_roadside_months","warranty_roadside_km","warranty_corrosion_months","warranty_corrosion_km",
+                "warranty_electric_months","warranty_electric_km","warranty_battery_months","warranty_battery_km",
+                # pilares precalculados del JSON (si existieran)
+                "equip_p_adas","equip_p_safety","equip_p_comfort","equip_p_infotainment",
+                "equip_p_traction","equip_p_utility","equip_p_performance","equip_p_efficiency","equip_p_electrification",
+            }]
+            # additionally, propagate dynamic feature flags from JSON (feat_*)
+            keep += [c for c in jdf.columns if isinstance(c, str) and c.startswith("feat_")]
+            if keep:
+                edf = pd.concat([edf, jdf[keep]], ignore_index=True, sort=False)
+                # collapse duplicates by key preferring first non-null
+                if {"__mk","__md","__yr"}.issubset(edf.columns):
+                    gb_keys = ["__mk","__md","__yr"] + (["__vr"] if "__vr" in edf.columns else [])
+                    edf = edf.groupby(gb_keys, dropna=False).first().reset_index()
+    except Exception as exc:
+        report.fail(exc)
+    _FLAT_ENRICHMENT_CACHE.update({"sig": sig, "edf": edf.copy()})
+    return edf
+
+
+def _read_lower_csv(path: Path, **kw):
+    t = pd.read_csv(path, **kw)
+    t.columns = [str(c).strip().lower() for c in t.columns]
+    return t
+
+
+def _read_features_matrix(path: Path):
+    feat = pd.read_csv(path)
+    if "make" in feat.columns:
+        feat["make"] = feat["make"].astype(str).str.upper().str.strip()
+        feat["__join_make"] = feat["make"]
+    if "model" in feat.columns:
+        feat["model"] = feat["model"].astype(str).str.upper().str.strip()
+        feat["__join_model"] = feat["model"]
+    if "version" in feat.columns:
+        feat["version"] = feat["version"].astype(str).str.strip()
+        feat["__join_version"] = feat["version"].str.upper()
+    if "ano" in feat.columns:
+        feat["ano"] = pd.to_numeric(feat["ano"], errors="coerce").astype("Int64")
+    value_cols = [c for c in feat.columns if c not in {"make", "model", "version", "ano", "__join_make", "__join_model", "__join_version"}]
+    rename_map = {c: f"{c}__feat" for c in value_cols}
+    return feat.rename(columns=rename_map)
+
+
+def _read_raw_vehicle_json(path: Path):
+    jdf = frame_from_records(load_vehicles(path))
+    jdf.columns = [str(c).strip().lower() for c in jdf.columns]
+    return jdf
+
+
+def _catalog_maintenance_path() -> Optional[Path]:
+    candidates = []
+    maint_env = os.getenv(_MAINT_PATH_ENV)
+    if maint_env:
+        mp = Path(maint_env)
+        if not mp.is_absolute():
+            mp = ROOT / mp
+        candidates.append(mp)
+    # default local path
+    candidates.append(ROOT / "data" / "costos_mantenimiento.csv")
+    return next((p for p in candidates if p.exists()), None)
+
+
+def _prefetch_catalog_sources(
+    path: Path, from_json: bool, records: Optional[list[dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Start reading every independent catalog input on a thread pool.
+
+    Returns name -> Future. Only the reads (and per-source normalization that
+    does not depend on the catalog) run concurrently; _build_catalog still
+    merges in its fixed order, so results do not depend on scheduling. A
+    missing optional file maps to None; read errors surface from
+    ``.result()`` inside the stage that consumes them.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+
+    jobs: Dict[str, Any] = {}
+    if from_json:
+        jobs["source"] = partial(_load_autoradar_dataframe, records)
+    else:
+        jobs["source"] = partial(pd.read_csv, path, low_memory=False)
+    feat_path = ROOT / "data" / "enriched" / "features_matrix.csv"
+    if feat_path.exists():
+        jobs["features"] = partial(_read_features_matrix, feat_path)
+    flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
+    # The flat CSV + raw JSON are only read when _flat_enrichment has no cached result
+    flat_cached = _FLAT_ENRICHMENT_CACHE["edf"] is not None and _FLAT_ENRICHMENT_CACHE["sig"] == _flat_enrichment_sig()
+    if flat.exists():
+        if not flat_cached:
+            jobs["flat"] = partial(_read_lower_csv, flat, low_memory=False)
+        jobs["audio"] = _build_audio_lookup
+    raw_json = next((p for p in _RAW_VEHICLE_JSON_CANDIDATES if p.exists()), None)
+    if raw_json is not None and not flat_cached:
+        jobs["raw_json"] = partial(_read_raw_vehicle_json, raw_json)
+    mp = _catalog_maintenance_path()
+    if mp is not None:
+        jobs["maintenance"] = partial(_read_lower_csv, mp, low_memory=False)
+    sales_path = ROOT / "data" / "ventas_modelo_supabase.csv"
+    if sales_path.exists():
+        jobs["sales"] = partial(_read_lower_csv, sales_path, low_memory=False)
+    sales_ytd = ROOT / "data" / "enriched" / "sales_ytd_2025.csv"
+    if sales_ytd.exists():
+        jobs["sales_ytd"] = partial(_read_lower_csv, sales_ytd, low_memory=False)
+
+    try:
+        workers = int(os.getenv("CATALOG_BUILD_WORKERS", "0"))
+    except Exception:
+        workers = 0
+    if workers <= 0:
+        workers = min(len(jobs), os.cpu_count() or 1)
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="catalog-io")
+    futures: Dict[str, Any] = {}
+    for name, job in jobs.items():
+        futures[name] = pool.submit(job)
+    # Workers finish the queued reads; nothing else is submitted
+    pool.shutdown(wait=False)
+    return futures
+
+
+def _prefetched(futures: Dict[str, Any], name: str):
+    fut = futures.get(name)
+    return fut.result() if fut is not None else None
+
+
+# Incremental rebuilds. Each built catalog remembers a content hash per
+# vehicle_id; when only the vehicle source changed, the next build re-derives
+# just the changed/added records and reuses the previous rows for the rest.
+# "gates" are the whole-frame decisions of that build (see _build_catalog_frame).
+# "df" is a weak reference: the base frame is whatever epoch is still alive
+# (normally the published one), never an extra copy kept for the next build.
+# Opt-in (CATALOG_INCREMENTAL=1): hashing every record costs about as much as
+# deriving it, so on a catalog of ~1k vehicles a full build is still faster
+# even when only a few percent of the records changed.
+_CATALOG_ROW_STATE: Dict[str, Any] = {"rest_sig": None, "hashes": None, "df": None, "gates": None}
+
+
+def _catalog_incremental_enabled() -> bool:
+    return os.getenv("CATALOG_INCREMENTAL", "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _catalog_record_key(rec: Dict[str, Any]) -> str:
+    # Mirrors the vehicle_id <- uid alias (setdefault on key presence)
+    v = rec["vehicle_id"] if "vehicle_id" in rec else rec.get("uid")
+    return "" if v is None else str(v)
+
+
+def _catalog_row_hashes(path: Path) -> tuple[Optional[list[str]], Optional[Dict[str, str]]]:
+    """(vehicle ids in source order, id -> content hash), or (None, None) when ids are not unique.
+
+    The hashes come from the same parse of ``path`` the source frame is built
+    from (see ``vehicle_hashes``).
+    """
+    keys: list[str] = []
+    hashes: Dict[str, str] = {}
+    for rec, digest in zip(*vehicle_hashes(path)):
+        key = _catalog_record_key(rec)
+        if not key or key in hashes:
+            return None, None
+        keys.append(key)
+        hashes[key] = digest
+    return keys, hashes
+
+
+def _catalog_rows_path() -> Path:
+    return _catalog_snapshot_dir() / "catalog_rows.json"
+
+
+def _remember_catalog_rows(
+    path: Path,
+    df,
+    hashes: Optional[Dict[str, str]],
+    snap_sig: Optional[str],
+    gates: Optional[Dict[str, bool]] = None,
+) -> None:
+    """Keep (and persist next to the snapshot) the row hashes of the frame just built."""
+    if hashes is None:
+        _CATALOG_ROW_STATE.update({"rest_sig": None, "hashes": None, "df": None, "gates": None})
+        return
+    try:
+        rest_sig = _catalog_input_signature(path, include_source=False)
+    except Exception:
+        return
+    _CATALOG_ROW_STATE.update({"rest_sig": rest_sig, "hashes": hashes, "df": weakref.ref(df), "gates": gates})
+    if not snap_sig or os.getenv("CATALOG_SNAPSHOT", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return
+    try:
+        target = _catalog_rows_path()
+        tmp = target.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"rest_sig": rest_sig, "snapshot_sig": snap_sig, "hashes": hashes, "gates": gates}), encoding="utf-8")
+        os.replace(tmp, target)
+    except Exception:
+        pass
+
+
+def _catalog_incremental_base(rest_sig: str):
+    """Previous (frame, hashes, gates) built from the same non-source inputs, or None."""
+    state = _CATALOG_ROW_STATE
+    prev = state["df"]() if state["df"] is not None else None
+    if prev is not None and state["rest_sig"] == rest_sig:
+        return prev, state["hashes"], state["gates"]
+    try:
+        saved = json.loads(_catalog_rows_path().read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if saved.get("rest_sig") != rest_sig or not isinstance(saved.get("hashes"), dict):
+        return None
+    prev = _read_catalog_snapshot(str(saved.get("snapshot_sig")))
+    if prev is None:
+        return None
+    return prev, saved["hashes"], saved.get("gates")
+
+
+def _equip_library_scorer():
+    """``scripts.enrich_catalog.compute_scores``, or None when it cannot be imported."""
+    try:
+        from scripts.enrich_catalog import compute_scores  # type: ignore
+    except Exception:
+        return None
+    return compute_scores
+
+
+def _build_catalog_incremental(
+    path: Path,
+    report: BuildReport,
+    keys: list[str],
+    hashes: Dict[str, str],
+    gates: Optional[Dict[str, bool]] = None,
+):
+    """Rebuild only the vehicles whose content hash changed; None means do a full build.
+
+    The whole-frame gates of the subset build must match those of the
+    previous full frame. Every gate is an "all rows lack it" test, so when
+    both agree the merged frame decides the same way; when they differ (or
+    removed vehicles may have been the only ones carrying a value) the
+    result could differ from a full build and None is returned. ``gates``
+    receives the decisions that hold for the returned frame.
+    """
+    if not _catalog_incremental_enabled():
+        return None
+    # The proxy fallback normalises equip_score by the frame max, which is
+    # not row-local; only the library scorer allows partial builds.
+    if _equip_library_scorer() is None:
+        return None
+    base = _catalog_incremental_base(_catalog_input_signature(path, include_source=False))
+    if base is None:
+        return None
+    prev, prev_hashes, prev_gates = base
+    if "vehicle_id" not in prev.columns or not isinstance(prev_gates, dict):
+        return None
+    prev_keys = prev["vehicle_id"].astype(str)
+    if set(prev_keys.unique()) != set(prev_hashes):
+        return None
+    changed = [k for k in keys if prev_hashes.get(k) != hashes[k]]
+    try:
+        max_ratio = float(os.getenv("CATALOG_INCREMENTAL_MAX_RATIO", "0.25"))
+    except Exception:
+        max_ratio = 0.25
+    if len(changed) > max_ratio * max(1, len(keys)):
+        return None
+    unchanged = {k for k, h in hashes.items() if prev_hashes.get(k) == h}
+    parts = [prev[prev_keys.isin(unchanged).to_numpy()]]
+    if changed:
+        changed_set = set(changed)
+        records = [rec for rec in load_vehicles(path) if _catalog_record_key(rec) in changed_set]
+        sub_gates: Dict[str, bool] = {}
+        parts.append(_build_catalog_frame(path, True, report, records=records, gates=sub_gates))
+        if sub_gates != prev_gates:
+            return None
+    elif len(unchanged) < len(prev_hashes) and not all(prev_gates.values()):
+        # Only removals: a gate may flip if the removed rows held its values
+        return None
+    if gates is not None:
+        gates.update(prev_gates)
+    report.stage("incremental_merge", parts[0])
+    df = pd.concat(parts, ignore_index=True, sort=False)
+    order = {k: i for i, k in enumerate(keys)}
+    pos = df["vehicle_id"].astype(str).map(order)
+    df = df.iloc[pos.argsort(kind="stable").to_numpy()].reset_index(drop=True)
+    report.meta["incremental"] = {
+        "changed": len(changed),
+        "removed": len(set(prev_hashes) - set(hashes)),
+        "reused": len(unchanged),
+    }
+    return df
+
+
+def _build_catalog_frame(
+    path: Path,
+    from_json: bool,
+    report: BuildReport,
+    records: Optional[list[dict[str, Any]]] = None,
+    gates: Optional[Dict[str, bool]] = None,
+):
+    """Read, merge and derive the catalog rows (everything but dtype compaction).
+
+    ``records`` restricts the Autoradar source to those vehicles. The joins
+    are row-local (left joins keyed by make/model/version/year), but a few
+    derivations only run when a column is missing for *every* row (equipment
+    score, fuel cost, warranty score). Their outcomes are recorded in
+    ``gates`` so an incremental build can tell whether the subset decided
+    the same way the full frame did.
+    """
+    report.stage("load_source")
+    sources = _prefetch_catalog_sources(path, from_json, records)
+    df = _prefetched(sources, "source")
+
+    report.stage("normalize_columns", df)
+
+    def _slug(s: str) -> str:
+        return _slug_column_name(s)
+
+    mapping = {c: _slug(c) for c in df.columns}
+    df.rename(columns=mapping, inplace=True)
+    # common alias fixes
+    if "año" in df.columns and "ano" not in df.columns:
+        df.rename(columns={"año": "ano"}, inplace=True)
+    if "caballos_de_fuerza" in df.columns and "caballos_fuerza" not in df.columns:
+        df.rename(columns={"caballos_de_fuerza": "caballos_fuerza"}, inplace=True)
+    # align consumo de combustible columnas nuevas vs legadas
+    try:
+        if "fuel_combined_kml" in df.columns:
+            df["combinado_kml"] = df["fuel_combined_kml"].combine_first(df.get("combinado_kml"))
+        if "fuel_combined_l_100km" in df.columns:
+            df["combinado_l_100km"] = df["fuel_combined_l_100km"].combine_first(df.get("combinado_l_100km"))
+        if "fuel_city_kml" in df.columns:
+            df["ciudad_kml"] = df["fuel_city_kml"].combine_first(df.get("ciudad_kml"))
+        if "fuel_highway_kml" in df.columns:
+            df["carretera_kml"] = df["fuel_highway_kml"].combine_first(df.get("carretera_kml"))
+    except Exception as exc:
+        report.fail(exc)
+    report.stage("features_merge", df)
+    # Merge enriched feature pillars if available
+    try:
+        feat = _prefetched(sources, "features")
+        if feat is not None:
+            value_cols = [c[: -len("__feat")] for c in feat.columns if str(c).endswith("__feat")]
+            if {"make", "model", "version"}.issubset(df.columns):
+                df["__join_make"] = df["make"].astype(str).str.upper().str.strip()
+                df["__join_model"] = df["model"].astype(str).str.upper().str.strip()
+                df["__join_version"] = df["version"].astype(str).str.strip().str.upper()
+                merge_keys_left = ["__join_make", "__join_model", "__join_version"]
+                merge_keys_right = [key for key in ["__join_make", "__join_model", "__join_version"] if key in feat.columns]
+                if "ano" in df.columns and "ano" in feat.columns:
+                    merge_keys_left.append("ano")
+                    merge_keys_right.append("ano")
+                df = df.merge(
+                    feat,
+                    how="left",
+                    left_on=merge_keys_left,
+                    right_on=merge_keys_right,
+                )
+                for base_col in ("make", "model", "version"):
+                    col_x = f"{base_col}_x"
+                    col_y = f"{base_col}_y"
+                    if col_x in df.columns:
+                        df[base_col] = df[col_x]
+                        df.drop(columns=[col_x], inplace=True)
+                    if col_y in df.columns:
+                        df.drop(columns=[col_y], inplace=True)
+                for col in value_cols:
+                    feat_col = f"{col}__feat"
+                    if feat_col not in df.columns:
+                        continue
+                    if col in df.columns:
+                        df[col] = df[col].combine_first(df[feat_col])
+                        df.drop(columns=[feat_col], inplace=True)
+                    else:
+                        df.rename(columns={feat_col: col}, inplace=True)
+                df.drop(columns=["__join_make", "__join_model", "__join_version"], inplace=True, errors="ignore")
+                df.drop(columns=[c for c in ["__join_make", "__join_model", "__join_version"] if c in feat.columns], inplace=True, errors="ignore")
+    except Exception as exc:
+        report.fail(exc)
+    report.stage("canonicalize", df)
+    # normalize basic columns
+    for col in ("make", "model", "version"):
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+    # Ensure horsepower fallback from original column when missing
+    try:
+        if {"caballos_fuerza","caballos_fuerza_original"}.issubset(df.columns):
+            cf = pd.to_numeric(df["caballos_fuerza"], errors="coerce")
+            cf_orig = pd.to_numeric(df["caballos_fuerza_original"], errors="coerce")
+            df["caballos_fuerza"] = cf.where(cf.notna() & (cf > 0), cf_orig)
+    except Exception as exc:
+        report.fail(exc)
+    # Apply aliases (canonicalization) for make/model so the whole app uses canonical names
+    try:
+        _ = _load_aliases()
+        if {"make","model"}.issubset(df.columns):
+            df["make"] = _canon_make_series(df["make"])
+            # model alias may depend on make
+            df["model"] = _canon_model_series(df["make"], df["model"])
+    except Exception as exc:
+        report.fail(exc)
+    # If TX is missing or 0, use MSRP as fallback
+    try:
+        if {"msrp","precio_transaccion"}.issubset(df.columns):
+            tx = pd.to_numeric(df["precio_transaccion"], errors="coerce")
+            ms = pd.to_numeric(df["msrp"], errors="coerce")
+            df["precio_transaccion"] = tx.where(~(tx.isna() | (tx <= 0)), ms)
+    except Exception as exc:
+        report.fail(exc)
+    # add normalized display version
+    try:
+        if "version" in df.columns:
+            df["version_display"] = df["version"].map(_norm_version_name)
+    except Exception as exc:
+        report.fail(exc)
+    if "ano" in df.columns:
+        try:
+            df["ano"] = df["ano"].astype(int)
         except Exception:
             pass
-
-        # Fallback muy ligero para pilares (equip_p_*) cuando faltan o son 0
+    report.stage("scores", df)
+    # Ensure equip_score exists for charts; and fill missing/zero rows
+    try:
+        needs_score_all = ("equip_score" not in df.columns) or df["equip_score"].isna().all()
+    except Exception:
+        needs_score_all = True
+    if gates is not None:
+        gates["equip_score"] = bool(needs_score_all)
+    def _compute_proxy_scores(dframe):
         try:
+            # Try library scorer first
+            return _equip_library_scorer()(dframe)
+        except Exception:
+            # Fallback: crude proxy using presence of common features
             import pandas as _pd
+            candidate_cols = [
+                c for c in dframe.columns
+                if any(k in c for k in (
+                    "android", "carplay", "camara", "sensor_punto_ciego",
+                    "control_estabilidad", "abs", "techo", "llave_inteligente",
+                    "camara_360", "bolsas_aire", "asistente"))
+            ]
             def _to01(v):
                 s = str(v).strip().lower()
-                if s in ("true","1","si","sí","estandar","estándar","incluido","standard","std"): return 1
-                if s in ("false","0","no","ninguno","na","n/a","no disponible","-"): return 0
+                if s in ("true","1","si","sí","estandar","estándar","incluido","standard","std"):
+                    return 1
+                if s in ("false","0","no","ninguno","na","n/a","no disponible","-"):
+                    return 0
                 try:
                     return 1 if float(s)>0 else 0
                 except Exception:
                     return 0
-            def _pillar(cols: list[str]) -> _pd.Series:
-                cols = [c for c in cols if c in df.columns]
-                if not cols:
-                    return _pd.Series([0]*len(df))
-                binm = df[cols].map(_to01)
-                sc = (binm.sum(axis=1) / float(len(cols)) * 100.0).round(1)
-                return sc
-            # Mapas de columnas → pilares (usar solo si existen)
-            p_adas = _pillar(["alerta_colision","sensor_punto_ciego","camara_360","asistente_estac_frontal","asistente_estac_trasero"]) \
-                     if "alerta_colision" in df.columns or "sensor_punto_ciego" in df.columns or "camara_360" in df.columns else None
-            p_safety = _pillar(["abs","control_estabilidad","bolsas_cortina_todas_filas","bolsas_aire_delanteras_conductor","bolsas_aire_delanteras_pasajero"]) \
-                      if "abs" in df.columns or "control_estabilidad" in df.columns else None
-            p_comfort = _pillar(["llave_inteligente","aire_acondicionado","apertura_remota_maletero","cierre_automatico_maletero","ventanas_electricas","seguros_electricos"]) \
-                       if "llave_inteligente" in df.columns or "aire_acondicionado" in df.columns else None
-            p_info = _pillar(["tiene_pantalla_tactil","android_auto","apple_carplay","bocinas"]) \
-                    if "tiene_pantalla_tactil" in df.columns or "android_auto" in df.columns or "apple_carplay" in df.columns else None
-            # tracción/utilidad
-            # tracción: control de tracción + (driven_wheels contiene 4x4/awd)
-            if "driven_wheels" in df.columns:
-                tr_bool = df["driven_wheels"].astype(str).str.lower().str.contains("4x4|awd|4wd|4wd", regex=True).map(lambda x: 1 if x else 0)
-            else:
-                tr_bool = _pd.Series([0]*len(df))
-            if "control_electrico_de_traccion" in df.columns:
-                tr_bool = tr_bool.combine_first(df["control_electrico_de_traccion"].map(_to01))
-            p_trac = (tr_bool * 100.0).round(1)
-            p_util = _pillar(["rieles_techo","enchufe_12v","preparacion_remolque","enganche_remolque","tercera_fila"]) \
-                     if "rieles_techo" in df.columns or "enchufe_12v" in df.columns or "preparacion_remolque" in df.columns or "enganche_remolque" in df.columns else None
-
-            def _fill(col: str, series):
-                if series is None: return
-                if col not in df.columns:
-                    df[col] = None
-                m = _pd.to_numeric(df[col], errors="coerce").fillna(0) <= 0
-                if m.any():
-                    df.loc[m, col] = series[m]
-            _fill("equip_p_adas", p_adas)
-            _fill("equip_p_safety", p_safety)
-            _fill("equip_p_comfort", p_comfort)
-            _fill("equip_p_infotainment", p_info)
-            _fill("equip_p_traction", p_trac)
-            _fill("equip_p_utility", p_util)
+            if candidate_cols:
+                score = dframe[candidate_cols].apply(lambda col: col.map(_to01))
+                score_sum = score.sum(axis=1)
+                mx = float(score_sum.max()) if len(score_sum)>0 else 0.0
+                dframe["equip_score"] = (score_sum * (100.0 / mx)).round(1) if mx>0 else 0
+            return dframe
+    if needs_score_all:
+        try:
+            df = _compute_proxy_scores(df)
         except Exception:
             pass
-        else:
-            # Fill only rows with NaN or 0
+    # Even si la columna existe, rellena valores faltantes/<=0 con un proxy simple
+    try:
+        import pandas as _pd
+        if "equip_score" not in df.columns:
+            df["equip_score"] = None
+        mask = _pd.to_numeric(df.get("equip_score"), errors="coerce").fillna(0) <= 0
+        if mask.any():
+            df2 = df.copy()
+            df2 = _compute_proxy_scores(df2)
+            df.loc[mask, "equip_score"] = df2.loc[mask, "equip_score"]
+    except Exception as exc:
+        report.fail(exc)
+
+    # Fallback muy ligero para pilares (equip_p_*) cuando faltan o son 0
+    try:
+        import pandas as _pd
+        def _to01(v):
+            s = str(v).strip().lower()
+            if s in ("true","1","si","sí","estandar","estándar","incluido","standard","std"): return 1
+            if s in ("false","0","no","ninguno","na","n/a","no disponible","-"): return 0
             try:
-                mask = df["equip_score"].isna() | (pd.to_numeric(df["equip_score"], errors="coerce").fillna(0) == 0)
-                if mask.any():
-                    temp = df.copy()
-                    temp = _compute_proxy_scores(temp)
-                    df.loc[mask, "equip_score"] = temp.loc[mask, "equip_score"]
+                return 1 if float(s)>0 else 0
             except Exception:
-                pass
-        # Ensure fuel_cost_60k_mxn present (derive from kml + fuel prices if missing)
+                return 0
+        def _pillar(cols: list[str]) -> _pd.Series:
+            cols = [c for c in cols if c in df.columns]
+            if not cols:
+                return _pd.Series([0]*len(df))
+            binm = df[cols].map(_to01)
+            sc = (binm.sum(axis=1) / float(len(cols)) * 100.0).round(1)
+            return sc
+        # Mapas de columnas → pilares (usar solo si existen)
+        p_adas = _pillar(["alerta_colision","sensor_punto_ciego","camara_360","asistente_estac_frontal","asistente_estac_trasero"]) \
+                 if "alerta_colision" in df.columns or "sensor_punto_ciego" in df.columns or "camara_360" in df.columns else None
+        p_safety = _pillar(["abs","control_estabilidad","bolsas_cortina_todas_filas","bolsas_aire_delanteras_conductor","bolsas_aire_delanteras_pasajero"]) \
+                  if "abs" in df.columns or "control_estabilidad" in df.columns else None
+        p_comfort = _pillar(["llave_inteligente","aire_acondicionado","apertura_remota_maletero","cierre_automatico_maletero","ventanas_electricas","seguros_electricos"]) \
+                   if "llave_inteligente" in df.columns or "aire_acondicionado" in df.columns else None
+        p_info = _pillar(["tiene_pantalla_tactil","android_auto","apple_carplay","bocinas"]) \
+                if "tiene_pantalla_tactil" in df.columns or "android_auto" in df.columns or "apple_carplay" in df.columns else None
+        # tracción/utilidad
+        # tracción: control de tracción + (driven_wheels contiene 4x4/awd)
+        if "driven_wheels" in df.columns:
+            tr_bool = df["driven_wheels"].astype(str).str.lower().str.contains("4x4|awd|4wd|4wd", regex=True).map(lambda x: 1 if x else 0)
+        else:
+            tr_bool = _pd.Series([0]*len(df))
+        if "control_electrico_de_traccion" in df.columns:
+            tr_bool = tr_bool.combine_first(df["control_electrico_de_traccion"].map(_to01))
+        p_trac = (tr_bool * 100.0).round(1)
+        p_util = _pillar(["rieles_techo","enchufe_12v","preparacion_remolque","enganche_remolque","tercera_fila"]) \
+                 if "rieles_techo" in df.columns or "enchufe_12v" in df.columns or "preparacion_remolque" in df.columns or "enganche_remolque" in df.columns else None
+
+        def _fill(col: str, series):
+            if series is None: return
+            if col not in df.columns:
+                df[col] = None
+            m = _pd.to_numeric(df[col], errors="coerce").fillna(0) <= 0
+            if m.any():
+                df.loc[m, col] = series[m]
+        _fill("equip_p_adas", p_adas)
+        _fill("equip_p_safety", p_safety)
+        _fill("equip_p_comfort", p_comfort)
+        _fill("equip_p_infotainment", p_info)
+        _fill("equip_p_traction", p_trac)
+        _fill("equip_p_utility", p_util)
+    except Exception as exc:
+        report.fail(exc)
+    else:
+        # Fill only rows with NaN or 0
         try:
-            missing_fuel = ("fuel_cost_60k_mxn" not in df.columns) or df["fuel_cost_60k_mxn"].isna().all()
-        except Exception:
-            missing_fuel = True
-        if missing_fuel:
-            try:
-                from scripts.enrich_catalog import fuel_costs  # type: ignore
-                df = fuel_costs(df)
-            except Exception:
-                pass
-        # Rough fallback: if fuel cost is still NaN or 0 for ICE vehicles, estimate with default KML & prices
-        try:
-            if "fuel_cost_60k_mxn" in df.columns:
-                fc = pd.to_numeric(df["fuel_cost_60k_mxn"], errors="coerce")
-                needs = fc.isna() | (fc <= 0)
-                if needs.any():
-                    def _default_fuel_cost(categ):
-                        kml = 12.0; price = 24.0
-                        if "premium" in categ: kml = 11.0; price = 26.0
-                        if "diesel" in categ: kml = 14.0; price = 26.0
-                        return (kml, price)
-                    def _bev_cost(row):
-                        cons = None
-                        for cc in ["consumo_kwh_100km","consumo_electrico_kwh_100km","kwh_100km","kwh/100km","kwh_por_100km"]:
-                            try:
-                                v = row.get(cc)
-                                if v is not None and str(v) != "" and not pd.isna(v):
-                                    cons = float(v); break
-                            except Exception:
-                                pass
-                        if cons is None:
-                            try:
-                                bat = float(row.get("battery_kwh") or row.get("bateria_kwh") or 0)
-                                rng = float(row.get("autonomia_km") or row.get("rango_km") or 0)
-                                if bat>0 and rng>0:
-                                    cons = bat / rng * 100.0
-                            except Exception:
-                                cons = None
-                        if cons is None:
-                            seg = str(row.get("segmento_ventas") or row.get("body_style") or "").lower()
-                            cons = 18.0 if any(s in seg for s in ("todo terreno","suv","crossover")) else (22.0 if any(s in seg for s in ("pickup","camioneta","chasis")) else 16.0)
-                        try:
-                            price_e = float(os.getenv("PRECIO_ELEC_KWH","2.9"))
-                        except Exception:
-                            price_e = 2.9
-                        return round(cons * (60000.0/100.0) * price_e, 0)
-                    def est(row):
-                        c = str(row.get("categoria_combustible_final") or "").lower()
-                        if any(k in c for k in ("bev","eléctrico","electrico")):
-                            return _bev_cost(row)
-                        if any(k in c for k in ("phev","enchuf")):
-                            # mezcla: electricidad + combustible
-                            try:
-                                elec_share = float(os.getenv("PHEV_ELEC_SHARE","0.6"))
-                            except Exception:
-                                elec_share = 0.6
-                            elec = _bev_cost(row)
-                            kml, price = _default_fuel_cost(c)
-                            fuel = round((60000.0 / max(1.0,kml)) * price, 0)
-                            return round(elec_share*elec + (1.0-elec_share)*fuel, 0)
-                        # ICE
-                        kml, price = _default_fuel_cost(c)
-                        return round((60000.0 / max(1.0,kml)) * price, 0)
-                    est_vals = df.apply(est, axis=1)
-                    df.loc[needs, "fuel_cost_60k_mxn"] = df.loc[needs, "fuel_cost_60k_mxn"].where(~needs, est_vals)
+            mask = df["equip_score"].isna() | (pd.to_numeric(df["equip_score"], errors="coerce").fillna(0) == 0)
+            if mask.any():
+                temp = df.copy()
+                temp = _compute_proxy_scores(temp)
+                df.loc[mask, "equip_score"] = temp.loc[mask, "equip_score"]
         except Exception:
             pass
-
-        # Merge enriched equipment from vehiculos_todos_flat.csv if present
+    report.stage("fuel_cost", df)
+    # Ensure fuel_cost_60k_mxn present (derive from kml + fuel prices if missing)
+    try:
+        missing_fuel = ("fuel_cost_60k_mxn" not in df.columns) or df["fuel_cost_60k_mxn"].isna().all()
+    except Exception:
+        missing_fuel = True
+    if gates is not None:
+        gates["fuel_cost_60k_mxn"] = bool(missing_fuel)
+    if missing_fuel:
         try:
-            flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
-            if flat.exists():
-                edf = pd.read_csv(flat, low_memory=False)
-                edf.columns = [str(c).strip().lower() for c in edf.columns]
-                # Normalize common aliases coming from JSON/flat
-                try:
-                    rename_map = {}
-                    # dimensions
-                    for src in ["longitud (mm)", "largo (mm)", "longitud_mm", "largo_mm"]:
-                        if src in edf.columns: rename_map[src] = "longitud_mm"; break
-                    for src in ["ancho (mm)", "anchura (mm)", "ancho_mm", "width_mm", "anchura_mm", "ancho"]:
-                        if src in edf.columns: rename_map[src] = "ancho_mm"; break
-                    for src in ["altura (mm)", "alto (mm)", "altura_mm", "alto_mm", "height_mm", "alto"]:
-                        if src in edf.columns: rename_map[src] = "altura_mm"; break
-                    # performance metrics
-                    for c in list(edf.columns):
-                        lc = str(c).lower()
-                        if ("0-100" in lc or "0–100" in lc or "0 a 100" in lc) and ("s" in lc or "seg" in lc):
-                            rename_map[c] = "accel_0_100_s"
-                    if "velocidad_maxima_kmh" in edf.columns and "vmax_kmh" not in edf.columns:
-                        rename_map["velocidad_maxima_kmh"] = "vmax_kmh"
-                    if "v_max_kmh" in edf.columns and "vmax_kmh" not in edf.columns:
-                        rename_map["v_max_kmh"] = "vmax_kmh"
-                    # images
-                    if "photo path" in edf.columns and "images_default" not in edf.columns:
-                        rename_map["photo path"] = "images_default"
-                    if rename_map:
-                        edf.rename(columns=rename_map, inplace=True)
-                except Exception:
-                    pass
-                # build join keys upper
-                def up(s):
-                    return str(s or "").strip().upper()
-                if {"make","model"}.issubset(edf.columns):
-                    edf["__mk"] = edf["make"].map(up)
-                    edf["__md"] = edf["model"].map(up)
-                if "version" in edf.columns:
-                    edf["__vr"] = edf["version"].map(up)
-                if "ano" in edf.columns:
-                    edf["__yr"] = pd.to_numeric(edf["ano"], errors="coerce").astype("Int64")
-
-                # Optional: enrich with raw JSON if available (for dimensions/accel)
-                try:
-                    # Consider multiple JSON candidates (prefer newest curated files)
-                    json_candidates = [
-                        ROOT / "data" / "vehiculos-todos.json",
-                        ROOT / "data" / "versiones95_full_merged.json",
-                        ROOT / "data" / "versiones95_full.json",
-                        ROOT / "data" / "versiones95_2024_2026.json",
-                    ]
-                    raw_json = next((p for p in json_candidates if p.exists()), None)
-                    if raw_json and raw_json.exists():
-                        import json as _json
-                        with raw_json.open("r", encoding="utf-8") as f:
-                            _obj = _json.load(f)
-                        # Many curated dumps wrap vehicles under a 'vehicles' key; unwrap it
-                        if isinstance(_obj, dict) and "vehicles" in _obj:
-                            arr = _obj.get("vehicles") or []
-                        else:
-                            arr = _obj
-                        # Ensure we have a list of dicts
-                        if not isinstance(arr, list):
-                            arr = []
-                        jdf = pd.DataFrame(arr)
-                        jdf.columns = [str(c).strip().lower() for c in jdf.columns]
-                        # basic columns
-                        aliases = {}
-                        if "make" not in jdf.columns and "marca" in jdf.columns: aliases["marca"] = "make"
-                        if "model" not in jdf.columns and "modelo" in jdf.columns: aliases["modelo"] = "model"
-                        if "version" not in jdf.columns and "versión" in jdf.columns: aliases["versión"] = "version"
-                        if "ano" not in jdf.columns and "año" in jdf.columns: aliases["año"] = "ano"
-                        # dimensions & performance + body style
-                        for src in ["longitud (mm)", "largo (mm)", "longitud_mm", "largo_mm"]:
-                            if src in jdf.columns: aliases[src] = "longitud_mm"; break
-                        for src in ["ancho (mm)", "anchura (mm)", "ancho_mm", "anchura_mm", "width_mm", "ancho"]:
-                            if src in jdf.columns: aliases[src] = "ancho_mm"; break
-                        for src in ["altura (mm)", "alto (mm)", "altura_mm", "alto_mm", "height_mm", "alto"]:
-                            if src in jdf.columns: aliases[src] = "altura_mm"; break
-                        for src in ["body style","body_style","bodystyle","segment","segmento","segmento ventas","segmento_ventas"]:
-                            if src in jdf.columns: aliases[src] = "body_style"; break
-                        if "photo path" in jdf.columns and "images_default" not in jdf.columns:
-                            aliases["photo path"] = "images_default"
-                        if aliases:
-                            jdf.rename(columns=aliases, inplace=True)
-                        # detect accel columns heuristically
-                        for c in list(jdf.columns):
-                            lc = str(c).lower()
-                            if ("0-100" in lc or "0–100" in lc or "0 a 100" in lc) and ("s" in lc or "seg" in lc):
-                                jdf.rename(columns={c: "accel_0_100_s"}, inplace=True)
-                        # Extract fuel economy from nested fuelEconomy dict -> *_kml
+            from scripts.enrich_catalog import fuel_costs  # type: ignore
+            df = fuel_costs(df)
+        except Exception:
+            pass
+    # Rough fallback: if fuel cost is still NaN or 0 for ICE vehicles, estimate with default KML & prices
+    try:
+        if "fuel_cost_60k_mxn" in df.columns:
+            fc = pd.to_numeric(df["fuel_cost_60k_mxn"], errors="coerce")
+            needs = fc.isna() | (fc <= 0)
+            if needs.any():
+                def _default_fuel_cost(categ):
+                    kml = 12.0; price = 24.0
+                    if "premium" in categ: kml = 11.0; price = 26.0
+                    if "diesel" in categ: kml = 14.0; price = 26.0
+                    return (kml, price)
+                def _bev_cost(row):
+                    cons = None
+                    for cc in ["consumo_kwh_100km","consumo_electrico_kwh_100km","kwh_100km","kwh/100km","kwh_por_100km"]:
                         try:
-                            if "fuelEconomy" in jdf.columns:
-                                import re as _re
-                                def _to_kml(v):
-                                    """Interpretar cualquier número como km/l (incluido 'mpg' mal rotulado)."""
-                                    try:
-                                        if v is None:
-                                            return None
-                                        s = str(v).strip().lower()
-                                        if s == "" or s in {"nan","none","null","-"}:
-                                            return None
-                                        # Si aparece 'mpg', tratarlo como km/l (bug en el JSON)
-                                        m = _re.search(r"(\d+[\.,]?\d*)\s*mpg", s)
-                                        if m:
-                                            return float(m.group(1).replace(',', '.'))
-                                        # l/100km → km/l
-                                        m = _re.search(r"(\d+[\.,]?\d*)\s*l\s*/\s*100\s*km", s)
-                                        if m:
-                                            l100 = float(m.group(1).replace(',', '.'))
-                                            return 100.0 / l100 if l100>0 else None
-                                        # km/l explícito
-                                        m = _re.search(r"(\d+[\.,]?\d*)\s*(km/?l|kml)", s)
-                                        if m:
-                                            return float(m.group(1).replace(',', '.'))
-                                        # número suelto ⇒ km/l
-                                        m = _re.search(r"(\d+[\.,]?\d*)", s)
-                                        if m:
-                                            return float(m.group(1).replace(',', '.'))
-                                        return None
-                                    except Exception:
-                                        return None
-                                def _fe_field(fe, key):
-                                    if isinstance(fe, dict):
-                                        return _to_kml(fe.get(key))
-                                    return None
-                                jdf["combinado_kml"] = jdf["fuelEconomy"].map(lambda fe: _fe_field(fe, 'combined'))
-                                jdf["ciudad_kml"] = jdf["fuelEconomy"].map(lambda fe: _fe_field(fe, 'city'))
-                                jdf["carretera_kml"] = jdf["fuelEconomy"].map(lambda fe: _fe_field(fe, 'highway'))
+                            v = row.get(cc)
+                            if v is not None and str(v) != "" and not pd.isna(v):
+                                cons = float(v); break
                         except Exception:
                             pass
-                        # Extract electrification fields (battery/carga/autonomía) from nested dicts
+                    if cons is None:
                         try:
-                            def _from_ev(obj):
-                                out = {"battery_kwh": None, "charge_ac_kw": None, "charge_dc_kw": None,
-                                       "ev_range_km": None, "charge_time_10_80_min": None}
-                                try:
-                                    if not isinstance(obj, dict):
-                                        return out
-                                    # common keys at top-level
-                                    bat = obj.get("battery") or {}
-                                    chg = obj.get("charging") or {}
-                                    if isinstance(bat, dict):
-                                        out["battery_kwh"] = bat.get("capacityKwh") or bat.get("kwh") or bat.get("capacity")
-                                    if isinstance(chg, dict):
-                                        out["charge_ac_kw"] = chg.get("acKw") or chg.get("ac_kw") or chg.get("ac")
-                                        out["charge_dc_kw"] = chg.get("dcKw") or chg.get("dc_kw") or chg.get("dc")
-                                        out["charge_time_10_80_min"] = chg.get("timeTo80Min") or chg.get("time_10_80_min")
-                                    rng = obj.get("rangeKm") or obj.get("range_km") or obj.get("autonomia_km") or obj.get("autonomia")
-                                    if rng is not None:
-                                        out["ev_range_km"] = rng
-                                except Exception:
-                                    return out
-                                return out
-                            # Try top-level 'ev'/'battery'/'charging'
-                            if any(k in jdf.columns for k in ("ev","battery","charging","version")):
-                                ev_df = pd.DataFrame()
-                                if "ev" in jdf.columns:
-                                    ev_df = jdf["ev"].map(_from_ev).apply(pd.Series)
-                                # Also check within version
-                                try:
-                                    if "version" in jdf.columns:
-                                        from_ver = jdf["version"].map(_from_ev).apply(pd.Series)
-                                        ev_df = ev_df.combine_first(from_ver)
-                                except Exception:
-                                	pass
-                                for col in ["battery_kwh","charge_ac_kw","charge_dc_kw","ev_range_km","charge_time_10_80_min"]:
-                                    try:
-                                        if col not in jdf.columns:
-                                            jdf[col] = ev_df.get(col)
-                                        else:
-                                            base = pd.to_numeric(jdf[col], errors="coerce")
-                                            new = pd.to_numeric(ev_df.get(col), errors="coerce")
-                                            jdf[col] = jdf[col].where(~(base.isna() | (base == 0)), new)
-                                    except Exception:
-                                        pass
+                            bat = float(row.get("battery_kwh") or row.get("bateria_kwh") or 0)
+                            rng = float(row.get("autonomia_km") or row.get("rango_km") or 0)
+                            if bat>0 and rng>0:
+                                cons = bat / rng * 100.0
                         except Exception:
-                            pass
-                        # Extraer tren motriz desde 'version'
+                            cons = None
+                    if cons is None:
+                        seg = str(row.get("segmento_ventas") or row.get("body_style") or "").lower()
+                        cons = 18.0 if any(s in seg for s in ("todo terreno","suv","crossover")) else (22.0 if any(s in seg for s in ("pickup","camioneta","chasis")) else 16.0)
+                    try:
+                        price_e = float(os.getenv("PRECIO_ELEC_KWH","2.9"))
+                    except Exception:
+                        price_e = 2.9
+                    return round(cons * (60000.0/100.0) * price_e, 0)
+                def est(row):
+                    c = str(row.get("categoria_combustible_final") or "").lower()
+                    if any(k in c for k in ("bev","eléctrico","electrico")):
+                        return _bev_cost(row)
+                    if any(k in c for k in ("phev","enchuf")):
+                        # mezcla: electricidad + combustible
                         try:
-                            if "version" in jdf.columns:
-                                def _from_ver(v):
-                                    try:
-                                        t = (v or {}).get("transmission")
-                                        d = (v or {}).get("drivetrain")
-                                        dw = (str(d or "").strip().lower() or None)
-                                        doors = (v or {}).get("doors")
-                                        body = (v or {}).get("bodyStyle")
-                                        return t, d, dw, doors, body
-                                    except Exception:
-                                        return None, None, None, None, None
-                                cols = jdf["version"].map(_from_ver).apply(pd.Series)
-                                cols.columns = ["transmision","traccion","driven_wheels","doors","body_style_from_ver"]
-                                for cname in ["transmision","traccion","driven_wheels","doors"]:
-                                    if cname not in jdf.columns:
-                                        jdf[cname] = cols[cname]
-                                    else:
-                                        base = jdf[cname]
-                                        new = cols[cname]
-                                        jdf[cname] = base.where(~(base.isna() | (base=="")), new)
-                                # Preferir body_style de 'version' si existe
-                                if "body_style" not in jdf.columns:
-                                    jdf["body_style"] = cols["body_style_from_ver"]
-                                else:
-                                    jdf["body_style"] = jdf["body_style"].combine_first(cols["body_style_from_ver"])
+                            elec_share = float(os.getenv("PHEV_ELEC_SHARE","0.6"))
                         except Exception:
-                            pass
-                        # Compute a coarse equipment score from nested 'equipment' if present
+                            elec_share = 0.6
+                        elec = _bev_cost(row)
+                        kml, price = _default_fuel_cost(c)
+                        fuel = round((60000.0 / max(1.0,kml)) * price, 0)
+                        return round(elec_share*elec + (1.0-elec_share)*fuel, 0)
+                    # ICE
+                    kml, price = _default_fuel_cost(c)
+                    return round((60000.0 / max(1.0,kml)) * price, 0)
+                est_vals = df.apply(est, axis=1)
+                df.loc[needs, "fuel_cost_60k_mxn"] = df.loc[needs, "fuel_cost_60k_mxn"].where(~needs, est_vals)
+    except Exception as exc:
+        report.fail(exc)
+
+    report.stage("flat_read", df)
+    # Merge enriched equipment from vehiculos_todos_flat.csv if present
+    try:
+        edf = _flat_enrichment(sources, report)
+        if edf is not None:
+            def up(s):
+                return str(s or "").strip().upper()
+
+            report.stage("flat_merge", df)
+            left = df.copy()
+            if {"make","model"}.issubset(left.columns):
+                left["__mk"] = left["make"].astype(str).map(up)
+                left["__md"] = left["model"].astype(str).map(up)
+            if "version" in left.columns:
+                left["__vr"] = left["version"].astype(str).map(up)
+            if "ano" in left.columns:
+                left["__yr"] = pd.to_numeric(left["ano"], errors="coerce").astype("Int64")
+
+            # prefer version-level join, then model-level
+            cols_to_merge = [c for c in edf.columns if c not in {"make","model","version","ano","__mk","__md","__vr","__yr"}]
+            if "__vr" in left.columns and "__vr" in edf.columns:
+                left = left.merge(edf[["__mk","__md","__yr","__vr", *cols_to_merge]], on=["__mk","__md","__yr","__vr"], how="left", suffixes=("", "_from_json"))
+            else:
+                left = left.merge(edf[["__mk","__md","__yr", *cols_to_merge]], on=["__mk","__md","__yr"], how="left", suffixes=("", "_from_json"))
+
+            # JSON manda 100%: si existe columna _from_json, sobrescribe siempre
+            def prefer_json(col: str):
+                j = f"{col}_from_json"
+                if j not in left.columns:
+                    return
+                if col not in left.columns:
+                    left[col] = left[j]
+                else:
+                    mask = left[col].isna()
+                    if mask.any():
+                        left.loc[mask, col] = left.loc[mask, j]
+                left.drop(columns=[j], inplace=True, errors="ignore")
+
+            prefer_json("equip_score")
+            prefer_json("combinado_kml")
+            prefer_json("ciudad_kml")
+            prefer_json("carretera_kml")
+            prefer_json("body_style")
+            # Tren motriz / transmisión
+            prefer_json("transmision")
+            prefer_json("traccion")
+            prefer_json("driven_wheels")
+            prefer_json("doors")
+            # Infer fuel category if missing (from existing fields or version text)
+            try:
+                if "categoria_combustible_final" not in left.columns:
+                    left["categoria_combustible_final"] = None
+                def _infer_fuel(row):
+                    try:
+                        val = str(row.get("categoria_combustible_final") or "").strip().lower()
+                        if val not in ("", "nan", "none", "null", "-"):
+                            return val
+                        raw = " ".join([
+                            str(row.get("tipo_de_combustible_original") or ""),
+                            str(row.get("tipo_combustible") or ""),
+                            str(row.get("combustible") or ""),
+                            str(row.get("version") or ""),
+                        ]).lower()
+                        if any(k in raw for k in ("bev","eléctrico","electrico","ev")):
+                            return "bev"
+                        if any(k in raw for k in ("phev","enchuf")):
+                            return "phev"
+                        if any(k in raw for k in ("hev","híbrido","hibrido")):
+                            return "hev"
+                        if any(k in raw for k in ("diesel","diésel","tdi","td","dsl")):
+                            return "diesel"
+                        if any(k in raw for k in ("premium","ron98")):
+                            return "gasolina premium"
+                        return "gasolina"
+                    except Exception:
+                        return None
+                left["categoria_combustible_final"] = left.apply(_infer_fuel, axis=1)
+            except Exception:
+                pass
+            # performance metrics
+            prefer_json("caballos_fuerza")
+            prefer_json("torque_nm")
+            prefer_json("accel_0_100_s")
+            prefer_json("vmax_kmh")
+            # dimensions & image
+            prefer_json("longitud_mm")
+            prefer_json("ancho_mm")
+            prefer_json("altura_mm")
+            prefer_json("images_default")
+            # electrification
+            prefer_json("battery_kwh")
+            prefer_json("charge_ac_kw")
+            prefer_json("charge_dc_kw")
+            prefer_json("ev_range_km")
+            prefer_json("charge_time_10_80_min")
+            # infotainment details (copy from _from_json if present)
+            for _c in [
+                "audio_brand","speakers_count","screen_main_in","screen_cluster_in",
+                "usb_a_count","usb_c_count","power_12v_count","power_110v_count","wireless_charging",
+                "warranty_full_months","warranty_full_km","warranty_powertrain_months","warranty_powertrain_km",
+                "warranty_roadside_months","warranty_roadside_km","warranty_corrosion_months","warranty_corrosion_km",
+                "warranty_electric_months","warranty_electric_km","warranty_battery_months","warranty_battery_km"
+            ]:
+                j = f"{_c}_from_json"
+                if j in left.columns:
+                    left[_c] = left[j]
+                    left.drop(columns=[j], inplace=True, errors="ignore")
+            # Heurísticas: convertir textos comunes a números (capacidad de asientos, zonas de clima, bocinas)
+            try:
+                import re as _re
+                import pandas as _pd
+                def _first_num(text: Any) -> Any:
+                    try:
+                        s = str(text or "")
+                        m = _re.search(r"(\d+[\.,]?\d*)", s)
+                        if not m:
+                            return None
+                        return float(m.group(1).replace(',', '.'))
+                    except Exception:
+                        return None
+                def _word_to_int(text: Any) -> Any:
+                    try:
+                        s = str(text or "").strip().lower()
+                        m = {
+                            "uno":1, "una":1, "dos":2, "tres":3, "cuatro":4, "cinco":5,
+                            "seis":6, "siete":7, "ocho":8, "nueve":9, "diez":10, "once":11, "doce":12,
+                        }
+                        return m.get(s)
+                    except Exception:
+                        return None
+                def _coerce_to_int_series(sr: _pd.Series) -> _pd.Series:
+                    def _f(x):
+                        v = _first_num(x)
+                        if v is not None:
+                            try:
+                                return int(round(float(v)))
+                            except Exception:
+                                return None
+                        return _word_to_int(x)
+                    return sr.map(_f)
+                # seats_capacity ← 'capacidad de asientos'
+                if "seats_capacity" not in left.columns:
+                    left["seats_capacity"] = None
+                if "capacidad de asientos" in left.columns:
+                    src = _coerce_to_int_series(left["capacidad de asientos"])
+                    mask = _pd.to_numeric(left["seats_capacity"], errors="coerce").isna() & src.notna()
+                    left.loc[mask, "seats_capacity"] = src[mask]
+                # climate_zones ← 'zonas con control del clima'
+                if "climate_zones" not in left.columns:
+                    left["climate_zones"] = None
+                for cand in ["zonas con control del clima", "zonas_control_del_clima", "zonas_clima"]:
+                    if cand in left.columns:
+                        src = _coerce_to_int_series(left[cand])
+                        mask = _pd.to_numeric(left["climate_zones"], errors="coerce").isna() & src.notna()
+                        left.loc[mask, "climate_zones"] = src[mask]
+                # bocinas: si la columna existe en texto, extraer primer número
+                if "bocinas" in left.columns:
+                    ser = _coerce_to_int_series(left["bocinas"])
+                    mask = ser.notna()
+                    # Asignar solo donde podamos extraer número (no pisar strings útiles)
+                    try:
+                        left.loc[mask, "bocinas"] = ser[mask]
+                    except Exception:
+                        pass
+            except Exception:
+                pass
+            # propagate feature flags and pillar scores (copy if not present)
+            for c in cols_to_merge:
+                if c.endswith("_from_json"):
+                    continue
+                if (c.startswith("feat_") or c.startswith("equip_p_")):
+                    jf = f"{c}_from_json"
+                    if jf in left.columns:
+                        left[c] = left[jf]
+                left.drop(columns=[f"{c}_from_json"], inplace=True, errors="ignore")
+
+            # JSON 100% para todas las MY: si hay columnas *_from_json restantes, sobrescribir SIEMPRE
+            try:
+                json_cols = [c for c in left.columns if c.endswith("_from_json")]
+                for col in json_cols:
+                    base = col[:-11]
+                    if base not in left.columns:
+                        left[base] = None
+                    left[base] = left[col]
+                    left.drop(columns=[col], inplace=True, errors="ignore")
+            except Exception:
+                pass
+
+            # Derivar columna visible 'pasajeros' desde seats_capacity si existe
+            try:
+                if "seats_capacity" in left.columns:
+                    import pandas as _pd
+                    left["pasajeros"] = _pd.to_numeric(left["seats_capacity"], errors="coerce").astype("Int64")
+            except Exception:
+                pass
+
+            df = left
+
+            # Compute warranty_score on the fly if missing or zeroed
+            try:
+                need_ws = ("warranty_score" not in df.columns) or df["warranty_score"].fillna(0).eq(0).all()
+            except Exception:
+                need_ws = True
+            if gates is not None:
+                gates["warranty_score"] = bool(need_ws)
+            if need_ws:
+                try:
+                    def _num(v):
                         try:
-                            if "equipment" in jdf.columns:
-                                def _eq(e):
-                                    try:
-                                        cnt = 0
-                                        if not isinstance(e, dict):
-                                            return None
-                                        neg = {"no disponible","-","0","none","n/a","na","ninguno"}
-                                        pos = {"serie","incluido","sí","si","estándar","estandar","yes","y"}
-                                        for _k, arr in e.items():
-                                            if not isinstance(arr, list):
-                                                continue
-                                            for it in arr:
-                                                if not isinstance(it, dict):
-                                                    continue
-                                                val = str(it.get("value", "")).strip().lower()
-                                                std = bool(it.get("standard"))
-                                                attrs = it.get("attributes") or []
-                                                text = " ".join([val] + [str(a.get("value","")) for a in attrs]).lower()
-                                                ok = False
-                                                if std and val not in neg:
-                                                    ok = True
-                                                if any(p in text for p in pos):
-                                                    ok = True
-                                                if ok:
-                                                    cnt += 1
-                                        return cnt
-                                    except Exception:
-                                        return None
-                                jdf["equip_score"] = jdf["equipment"].map(_eq)
-                                try:
-                                    mx = float(pd.to_numeric(jdf["equip_score"], errors="coerce").max())
-                                    if mx and mx > 0:
-                                        jdf["equip_score"] = pd.to_numeric(jdf["equip_score"], errors="coerce").fillna(0).mul(100.0/mx).round(1)
-                                except Exception:
-                                    pass
-                                # Extract quantitative counts from nested equipment (heuristics)
-                                import re as _re
-                                def _first_num(text: str):
-                                    try:
-                                        m = _re.search(r"(\d+[\.,]?\d*)", text)
-                                        if not m:
-                                            return None
-                                        s = m.group(1).replace(',', '.')
-                                        v = float(s)
-                                        return v
-                                    except Exception:
-                                        return None
-                                def _quant(e):
-                                    out = {"speakers_count": None, "usb_a_count": None, "usb_c_count": None,
-                                           "power_12v_count": None, "power_110v_count": None,
-                                           "screen_main_in": None, "screen_cluster_in": None,
-                                           # extras visibles
-                                           "climate_zones": None, "seats_capacity": None,
-                                           "adas_lane_keep": None, "adas_acc": None,
-                                           "rear_cross_traffic": None, "auto_high_beam": None,
-                                           "hud": None, "ambient_lighting": None,
-                                           "handsfree_tailgate": None,
-                                           "tow_prep": None, "tow_hitch": None,
-                                           "diff_lock": None, "low_range": None,
-                                           "rear_side_airbags": None, "curtain_all_rows": None}
-                                    try:
-                                        if not isinstance(e, dict):
-                                            return out
-                                        for _k, arr in e.items():
-                                            if not isinstance(arr, list):
-                                                continue
-                                            for it in arr:
-                                                if not isinstance(it, dict):
-                                                    continue
-                                                name = str(it.get("name", ""))
-                                                value = str(it.get("value", ""))
-                                                attrs = it.get("attributes", []) or []
-                                                text = f"{name} {value} " + " ".join([f"{a.get('name','')} {a.get('value','')}" for a in attrs])
-                                                t = text.lower()
-                                                # Speakers
-                                                if any(k in t for k in ("bocinas","altav","parlant","speaker")):
-                                                    v = _first_num(t)
-                                                    if v is not None:
-                                                        out["speakers_count"] = int(round(v))
-                                                # USB-A / USB-C
-                                                if "usb" in t:
-                                                    if any(k in t for k in ("usb-c","usb c","tipo c","type-c","type c")):
-                                                        v = _first_num(t)
-                                                        if v is not None:
-                                                            out["usb_c_count"] = int(round(v))
-                                                    if any(k in t for k in ("usb-a","usb a","tipo a","type-a","type a")):
-                                                        v = _first_num(t)
-                                                        if v is not None:
-                                                            out["usb_a_count"] = int(round(v))
-                                                # Power 12V / 110V
-                                                if "12v" in t and ("toma" in t or "tomacorr" in t or "power" in t):
-                                                    v = _first_num(t)
-                                                    if v is not None:
-                                                        out["power_12v_count"] = int(round(v))
-                                                if "110v" in t and ("toma" in t or "tomacorr" in t or "power" in t):
-                                                    v = _first_num(t)
-                                                    if v is not None:
-                                                        out["power_110v_count"] = int(round(v))
-                                                # Screens
-                                                if ("pantalla" in t or "display" in t or "screen" in t):
-                                                    v = _first_num(t)
-                                                    if v is not None:
-                                                        if any(k in t for k in ("cluster","clúster","instrument")):
-                                                            out["screen_cluster_in"] = float(v)
-                                                        else:
-                                                            out["screen_main_in"] = float(v)
-                                                # Climate zones
-                                                if any(k in t for k in ("zonas","zone")) and any(k in t for k in ("clima","climate","aire")):
-                                                    v = _first_num(t)
-                                                    if v is not None: out["climate_zones"] = int(round(v))
-                                                # Seats capacity
-                                                if any(k in t for k in ("capacidad de asientos","capacidad asientos","seats","asientos")):
-                                                    v = _first_num(t)
-                                                    if v is not None: out["seats_capacity"] = int(round(v))
-                                                # ADAS flags
-                                                if any(k in t for k in ("lane keep","mantenimiento de carril","lane centering","lka")):
-                                                    out["adas_lane_keep"] = True
-                                                if any(k in t for k in ("crucero adaptativo","acc","adaptive cruise")):
-                                                    out["adas_acc"] = True
-                                                if any(k in t for k in ("tráfico cruzado","rear cross","cross traffic")):
-                                                    out["rear_cross_traffic"] = True
-                                                if any(k in t for k in ("luces altas autom","auto high beam","matrix")):
-                                                    out["auto_high_beam"] = True
-                                                if any(k in t for k in ("head‑up","head up","hud")):
-                                                    out["hud"] = True
-                                                if any(k in t for k in ("iluminación ambiental","ambient lighting")):
-                                                    out["ambient_lighting"] = True
-                                                # Tailgate handsfree
-                                                if any(k in t for k in ("manos libres","hands‑free","hands free","kick")) and any(k in t for k in ("portón","cajuela","tailgate")):
-                                                    out["handsfree_tailgate"] = True
-                                                # Tow / off‑road
-                                                if any(k in t for k in ("preparación remolque","preparacion remolque","tow prep")):
-                                                    out["tow_prep"] = True
-                                                if any(k in t for k in ("enganche","remolque","hitch")):
-                                                    out["tow_hitch"] = True
-                                                if any(k in t for k in ("bloqueo","diferencial","lock diff")):
-                                                    out["diff_lock"] = True
-                                                if any(k in t for k in ("reductora","low range","4l")):
-                                                    out["low_range"] = True
-                                                # Airbags
-                                                if any(k in t for k in ("bolsas laterales traseras","laterales traseras","rear side airbag")):
-                                                    out["rear_side_airbags"] = True
-                                                if any(k in t for k in ("cortina","todas las filas","all rows curtain")):
-                                                    out["curtain_all_rows"] = True
-                                    except Exception:
-                                        return out
-                                    return out
-                                qdf = jdf["equipment"].map(_quant).apply(pd.Series)
-                                for col in [
-                                    "speakers_count","usb_a_count","usb_c_count","power_12v_count","power_110v_count",
-                                    "screen_main_in","screen_cluster_in","climate_zones","seats_capacity",
-                                    "adas_lane_keep","adas_acc","rear_cross_traffic","auto_high_beam","hud","ambient_lighting",
-                                    "handsfree_tailgate","tow_prep","tow_hitch","diff_lock","low_range",
-                                    "rear_side_airbags","curtain_all_rows"
-                                ]:
-                                    try:
-                                        if col not in jdf.columns:
-                                            jdf[col] = qdf[col]
-                                        else:
-                                            base = pd.to_numeric(jdf[col], errors="coerce")
-                                            new = pd.to_numeric(qdf[col], errors="coerce")
-                                            jdf[col] = jdf[col].where(~(base.isna() | (base == 0)), new)
-                                    except Exception:
-                                        pass
-                                # Infer fuel/energy category directly from JSON text
-                                def _infer_fuel_from_json(row):
-                                    try:
-                                        # prefer existing
-                                        cur = str(row.get("categoria_combustible_final") or "").strip().lower()
-                                        if cur not in ("", "nan", "none", "null", "-"):
-                                            return cur
-                                        texts = []
-                                        try:
-                                            texts.append(str(row.get("version") or ""))
-                                        except Exception:
-                                            pass
-                                        try:
-                                            eq = row.get("equipment")
-                                            if isinstance(eq, dict):
-                                                for _k, arr in eq.items():
-                                                    if isinstance(arr, list):
-                                                        for it in arr:
-                                                            if isinstance(it, dict):
-                                                                texts.append(str(it.get("name","")))
-                                                                texts.append(str(it.get("value","")))
-                                        except Exception:
-                                            pass
-                                        s = " ".join(texts).lower()
-                                        if any(k in s for k in ("bev","eléctrico","electrico","ev")):
-                                            return "bev"
-                                        if any(k in s for k in ("phev","enchuf")):
-                                            return "phev"
-                                        if any(k in s for k in ("hev","híbrido","hibrido")):
-                                            return "hev"
-                                        if any(k in s for k in ("diesel","diésel","tdi","td","dsl")):
-                                            return "diesel"
-                                        if any(k in s for k in ("premium","ron98")):
-                                            return "gasolina premium"
-                                        if any(k in s for k in ("gasolina","nafta","petrol")):
-                                            return "gasolina"
-                                        return None
-                                    except Exception:
-                                        return None
-                                try:
-                                    jdf["categoria_combustible_final"] = jdf.apply(_infer_fuel_from_json, axis=1)
-                                except Exception:
-                                    pass
-                                # Reconstruct pillar scores (0..100) from equipment text bag (JSON-first)
-                                def _pillars(e):
-                                    out = {
-                                        "equip_p_adas": 0.0,
-                                        "equip_p_safety": 0.0,
-                                        "equip_p_comfort": 0.0,
-                                        "equip_p_infotainment": 0.0,
-                                        "equip_p_traction": 0.0,
-                                        "equip_p_utility": 0.0,
-                                    }
-                                    try:
-                                        if not isinstance(e, dict):
-                                            return out
-                                        items = []
-                                        for _k, arr in e.items():
-                                            if isinstance(arr, list):
-                                                for it in arr:
-                                                    if isinstance(it, dict):
-                                                        vals = [str(it.get("name","")), str(it.get("value",""))]
-                                                        for a in it.get("attributes") or []:
-                                                            vals.append(str(a.get("name","")))
-                                                            vals.append(str(a.get("value","")))
-                                                        items.append(" ".join(vals).lower())
-                                        bag = " \n ".join(items)
-                                        def has(*words):
-                                            return any(w in bag for w in words)
-                                        # ADAS
-                                        if has("frenado de emergencia","aeb","autonomous emergency"): out["equip_p_adas"] += 10
-                                        if has("crucero adaptativo","acc","stop & go","stop&go","cca"): out["equip_p_adas"] += 8
-                                        if has("mantenimiento de carril","lane keep","lane centering","lka"): out["equip_p_adas"] += 7
-                                        if has("punto ciego","blind spot","blis"): out["equip_p_adas"] += 6
-                                        if has("tráfico cruzado","rear cross","cross traffic"): out["equip_p_adas"] += 5
-                                        if has("cámara 360","camara 360","surround view","around view"): out["equip_p_adas"] += 5
-                                        if has("park assist","auto park","asistente estacionamiento"): out["equip_p_adas"] += 4
-                                        # Safety
-                                        if has("airbag","bolsa de aire"): out["equip_p_safety"] += 8
-                                        if has("abs") or has("control de estabilidad","esc","esp","vdc"): out["equip_p_safety"] += 6
-                                        if has("isofix","latch"): out["equip_p_safety"] += 4
-                                        # Comfort
-                                        if has("asiento eléctrico","memoria asiento","calefacción asiento","ventilación asiento","calefaccion","ventilacion"): out["equip_p_comfort"] += 6
-                                        if has("climatizador","dual zone","tri zone","3 zonas","2 zonas"): out["equip_p_comfort"] += 5
-                                        if has("portón eléctrico","cajuela eléctrica","power tailgate"): out["equip_p_comfort"] += 4
-                                        if has("llave inteligente","keyless","smart key"): out["equip_p_comfort"] += 3
-                                        # Infotainment
-                                        if has("android auto","apple carplay"): out["equip_p_infotainment"] += 6
-                                        if has("pantalla","display","touchscreen"): out["equip_p_infotainment"] += 4
-                                        if has("altavoces","bocinas","speakers"): out["equip_p_infotainment"] += 4
-                                        if has("usb-c","usb c","tipo c","type-c") or has("usb-a","usb a","tipo a","type-a"): out["equip_p_infotainment"] += 3
-                                        if has("wireless charging","carga inalámbrica","carga inalambrica"): out["equip_p_infotainment"] += 3
-                                        # Traction/Utility
-                                        if has("awd","4x4","4wd"): out["equip_p_traction"] += 8
-                                        if has("bloqueo","diferencial","lock diff"): out["equip_p_traction"] += 5
-                                        if has("toma 12v","12v","power 12v","toma de corriente","tomacorriente","power outlet","outlet","tomacorriente trasero") or has("110v","220v"): out["equip_p_utility"] += 3
-                                        if has("rieles","riel techo","roof rail","barra techo","barras de techo"): out["equip_p_utility"] += 3
-                                        if has("remolque","enganche","trailer","gancho","arrastre","tow","hitch","capacidad de carga","carga util","carga útil","payload"): out["equip_p_utility"] += 4
-                                        # Normalize basic caps to 0..100
-                                        caps = {
-                                            "equip_p_adas": 45.0,
-                                            "equip_p_safety": 18.0,
-                                            "equip_p_comfort": 18.0,
-                                            "equip_p_infotainment": 20.0,
-                                            "equip_p_traction": 13.0,
-                                            "equip_p_utility": 10.0,
-                                        }
-                                        for k in out:
-                                            m = caps.get(k, 1.0)
-                                            out[k] = round(min(100.0, out[k]*(100.0/m)), 1) if out[k]>0 else 0.0
-                                        return out
-                                    except Exception:
-                                        return out
-                                pcols = jdf["equipment"].map(_pillars).apply(pd.Series)
-                                for c in ["equip_p_adas","equip_p_safety","equip_p_comfort","equip_p_infotainment","equip_p_traction","equip_p_utility"]:
-                                    if c in pcols.columns:
-                                        jdf[c] = pcols[c]
+                            return float(v)
                         except Exception:
-                            pass
-                        # build keys
-                        if {"make","model"}.issubset(jdf.columns):
-                            jdf["__mk"] = jdf["make"].map(up)
-                            jdf["__md"] = jdf["model"].map(up)
-                        if "version" in jdf.columns:
-                            jdf["__vr"] = jdf["version"].map(up)
-                        if "ano" in jdf.columns:
-                            jdf["__yr"] = pd.to_numeric(jdf["ano"], errors="coerce").astype("Int64")
-                        # keep only useful columns to avoid duplications
-                        keep = [c for c in jdf.columns if c in {
-                            "make","model","version","ano","__mk","__md","__vr","__yr",
-                            # dimensiones y desempeño
-                            "longitud_mm","ancho_mm","altura_mm","accel_0_100_s","vmax_kmh","body_style",
-                            # tren motriz
-                            "transmision","traccion","driven_wheels","doors",
-                            # imagen
-                            "images_default",
-                            # infotainment y conectividad
-                            "audio_brand","speakers_count","screen_main_in","screen_cluster_in",
-                            "usb_a_count","usb_c_count","power_12v_count","power_110v_count","wireless_charging",
-                            # fuel/energy inferred from JSON
-                            "categoria_combustible_final",
-                            # electrificación
-                            "battery_kwh","charge_ac_kw","charge_dc_kw","ev_range_km","charge_time_10_80_min",
-                            # garantías
-                            "warranty_full_months","warranty_full_km","warranty_powertrain_months","warranty_powertrain_km",
-                            "warranty_roadside_months","warranty_roadside_km","warranty_corrosion_months","warranty_corrosion_km",
-                            "warranty_electric_months","warranty_electric_km","warranty_battery_months","warranty_battery_km",
-                            # pilares precalculados del JSON (si existieran)
-                            "equip_p_adas","equip_p_safety","equip_p_comfort","equip_p_infotainment",
-                            "equip_p_traction","equip_p_utility","equip_p_performance","equip_p_efficiency","equip_p_electrification",
-                        }]
-                        # additionally, propagate dynamic feature flags from JSON (feat_*)
-                        keep += [c for c in jdf.columns if isinstance(c, str) and c.startswith("feat_")]
-                        if keep:
-                            edf = pd.concat([edf, jdf[keep]], ignore_index=True, sort=False)
-                            # collapse duplicates by key preferring first non-null
-                            if {"__mk","__md","__yr"}.issubset(edf.columns):
-                                gb_keys = ["__mk","__md","__yr"] + (["__vr"] if "__vr" in edf.columns else [])
-                                edf = edf.groupby(gb_keys, dropna=False).first().reset_index()
+                            return None
+                    def _ws_row(r):
+                        fm = _num(r.get("warranty_full_months")) or 0.0
+                        fk = _num(r.get("warranty_full_km")) or 0.0
+                        pm = _num(r.get("warranty_powertrain_months")) or 0.0
+                        pk = _num(r.get("warranty_powertrain_km")) or 0.0
+                        rm = _num(r.get("warranty_roadside_months")) or 0.0
+                        cm = _num(r.get("warranty_corrosion_months")) or 0.0
+                        em = _num(r.get("warranty_electric_months")) or (_num(r.get("warranty_battery_months")) or 0.0)
+                        s = 0.0
+                        s += min(30.0, (fm/36.0) * 30.0)
+                        s += min(10.0, (fk/60000.0) * 10.0) if fk>0 else 0.0
+                        s += min(25.0, (pm/72.0) * 25.0)
+                        s += min(10.0, (pk/100000.0) * 10.0) if pk>0 else 0.0
+                        s += min(10.0, (rm/36.0) * 10.0)
+                        s += min(5.0, (cm/60.0) * 5.0)
+                        s += min(10.0, (em/96.0) * 10.0)
+                        return round(s, 1)
+                    df["warranty_score"] = df.apply(_ws_row, axis=1)
                 except Exception:
                     pass
-
+    except Exception as exc:
+        report.fail(exc)
+
+    report.stage("maintenance_merge", df)
+    # Try to merge maintenance costs (service_cost_60k_mxn)
+    try:
+        mdf = _prefetched(sources, "maintenance")
+        if mdf is not None:
+            # normalize expected columns
+            col_map = {}
+            if "make" not in mdf.columns and "marca" in mdf.columns: col_map["marca"] = "make"
+            if "model" not in mdf.columns and "modelo" in mdf.columns: col_map["modelo"] = "model"
+            if "version" not in mdf.columns and "versión" in mdf.columns: col_map["versión"] = "version"
+            if "ano" not in mdf.columns and "año" in mdf.columns: col_map["año"] = "ano"
+            if "60000" in mdf.columns: col_map["60000"] = "service_cost_60k_mxn"
+            if col_map:
+                mdf.rename(columns=col_map, inplace=True)
+            # coerce types
+            for c in ("make","model","version"):
+                if c in mdf.columns:
+                    mdf[c] = mdf[c].astype(str)
+            if "ano" in mdf.columns:
+                anos = pd.to_numeric(mdf["ano"], errors="coerce")
+                try:
+                    anos = anos.round().astype("Int64")
+                except Exception:
+                    import pandas as _pd
+                    anos = _pd.array(anos.round(), dtype="Int64")
+                mdf["ano"] = anos
+            if "service_cost_60k_mxn" in mdf.columns:
+                # Normalizar: quitar símbolos y mapear "Incluido"/"Sin costo" a 0 + bandera incluida
+                raw = mdf["service_cost_60k_mxn"].astype(str)
+                # Detectar 'Incluido' antes de limpiar
+                included_mask = raw.str.contains(r"(?i)\b(?:inclu[íi]do|incl\.|sin\s*costo|gratis)\b", regex=True)
+                ser = raw.str.replace("$", "", regex=False).str.replace(",", "", regex=False)
+                ser = ser.replace(r"(?i)\s*(?:inclu[íi]do|incl\.|sin\s*costo|gratis)\s*", "0", regex=True)
+                mdf["service_cost_60k_mxn"] = pd.to_numeric(ser, errors="coerce")
+                mdf["service_included_60k"] = included_mask.fillna(False).astype(bool)
+            # Build normalized join keys (upper)
+            def up(s):
+                return str(s or "").strip().upper()
+            if {"make","model","ano"}.issubset(mdf.columns):
+                mdf["__mk"] = mdf["make"].map(up)
+                mdf["__md"] = mdf["model"].map(up)
+                # compact model (remove non-alnum) to improve matches like "4 RUNNER" vs "4RUNNER"
+                import re as _re
+                mdf["__mdc"] = mdf["__md"].map(lambda s: _re.sub(r"[^A-Z0-9]", "", str(s)))
+                try:
+                    mdf["__yr"] = pd.to_numeric(mdf["ano"], errors="coerce").round().astype("Int64")
+                except Exception:
+                    import pandas as _pd
+                    mdf["__yr"] = _pd.array(pd.to_numeric(mdf["ano"], errors="coerce").round(), dtype="Int64")
+                if "version" in mdf.columns:
+                    mdf["__vr"] = mdf["version"].map(up)
+                # First do (mk, md, yr, vr)
                 left = df.copy()
                 if {"make","model"}.issubset(left.columns):
                     left["__mk"] = left["make"].astype(str).map(up)
                     left["__md"] = left["model"].astype(str).map(up)
+                    import re as _re
+                    left["__mdc"] = left["__md"].map(lambda s: _re.sub(r"[^A-Z0-9]", "", str(s)))
+                if "ano" in left.columns:
+                    anos_left = pd.to_numeric(left["ano"], errors="coerce")
+                    try:
+                        left["__yr"] = anos_left.round().astype("Int64")
+                    except Exception:
+                        import pandas as _pd
+                        left["__yr"] = _pd.array(anos_left.round(), dtype="Int64")
                 if "version" in left.columns:
                     left["__vr"] = left["version"].astype(str).map(up)
-                if "ano" in left.columns:
-                    left["__yr"] = pd.to_numeric(left["ano"], errors="coerce").astype("Int64")
-
-                # prefer version-level join, then model-level
-                cols_to_merge = [c for c in edf.columns if c not in {"make","model","version","ano","__mk","__md","__vr","__yr"}]
-                if "__vr" in left.columns and "__vr" in edf.columns:
-                    left = left.merge(edf[["__mk","__md","__yr","__vr", *cols_to_merge]], on=["__mk","__md","__yr","__vr"], how="left", suffixes=("", "_from_json"))
+                svc = None
+                if "__vr" in left.columns and "__vr" in mdf.columns:
+                    svc = mdf[["__mk","__md","__yr","__vr","service_cost_60k_mxn","service_included_60k"]]
+                    left = left.merge(svc, on=["__mk","__md","__yr","__vr"], how="left")
                 else:
-                    left = left.merge(edf[["__mk","__md","__yr", *cols_to_merge]], on=["__mk","__md","__yr"], how="left", suffixes=("", "_from_json"))
-
-                # JSON manda 100%: si existe columna _from_json, sobrescribe siempre
-                def prefer_json(col: str):
-                    j = f"{col}_from_json"
-                    if j not in left.columns:
-                        return
-                    if col not in left.columns:
-                        left[col] = left[j]
-                    else:
-                        mask = left[col].isna()
-                        if mask.any():
-                            left.loc[mask, col] = left.loc[mask, j]
-                    left.drop(columns=[j], inplace=True, errors="ignore")
-
-                prefer_json("equip_score")
-                prefer_json("combinado_kml")
-                prefer_json("ciudad_kml")
-                prefer_json("carretera_kml")
-                prefer_json("body_style")
-                # Tren motriz / transmisión
-                prefer_json("transmision")
-                prefer_json("traccion")
-                prefer_json("driven_wheels")
-                prefer_json("doors")
-                # Infer fuel category if missing (from existing fields or version text)
+                    left["service_cost_60k_mxn"] = None
+                    left["service_included_60k"] = None
+                # Fill missing by (mk, md, yr)
                 try:
-                    if "categoria_combustible_final" not in left.columns:
-                        left["categoria_combustible_final"] = None
-                    def _infer_fuel(row):
+                    # merge by (make, model, year)
+                    svc2 = mdf.groupby(["__mk","__md","__yr"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
+                    left = left.merge(svc2, on=["__mk","__md","__yr"], how="left", suffixes=("", "_by_model"))
+                    for suffix in ("service_cost_60k_mxn_by_model", "service_included_60k_by_model"):
+                        if suffix in left.columns:
+                            base = suffix.replace("_by_model", "")
+                            if base not in left.columns:
+                                left[base] = pd.NA
+                            mask_assign = left[base].isna()
+                            if mask_assign.any():
+                                left.loc[mask_assign, base] = left.loc[mask_assign, suffix]
+                    left.drop(columns=[c for c in left.columns if c.endswith("_by_model")], inplace=True, errors="ignore")
+                    # if still missing, try compact model join (make, modelC, year)
+                    missing_mask = left["service_cost_60k_mxn"].isna()
+                    if missing_mask.any():
+                        svc3 = mdf.groupby(["__mk","__mdc","__yr"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
+                        left = left.merge(svc3, left_on=["__mk","__mdc","__yr"], right_on=["__mk","__mdc","__yr"], how="left", suffixes=("", "_by_model_c"))
+                        for suffix in ("service_cost_60k_mxn_by_model_c", "service_included_60k_by_model_c"):
+                            if suffix in left.columns:
+                                base = suffix.replace("_by_model_c", "")
+                                if base not in left.columns:
+                                    left[base] = pd.NA
+                                mask_assign = left[base].isna()
+                                if mask_assign.any():
+                                    left.loc[mask_assign, base] = left.loc[mask_assign, suffix]
+                        left.drop(columns=[c for c in left.columns if c.endswith("_by_model_c")], inplace=True, errors="ignore")
+                    # if still missing, ignore year and match by version when present
+                    missing_mask = left["service_cost_60k_mxn"].isna()
+                    if missing_mask.any() and "__vr" in left.columns and "__vr" in mdf.columns:
+                        # exact version (make, model, version) ignoring year
+                        svc4 = mdf.groupby(["__mk","__md","__vr"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
+                        left = left.merge(svc4, on=["__mk","__md","__vr"], how="left", suffixes=("", "_by_ver"))
+                        mask_idx = missing_mask & left["service_cost_60k_mxn"].isna()
+                        if mask_idx.any() and "service_cost_60k_mxn_by_ver" in left.columns:
+                            left.loc[mask_idx, "service_cost_60k_mxn"] = left.loc[mask_idx, "service_cost_60k_mxn_by_ver"]
+                        if mask_idx.any() and "service_included_60k_by_ver" in left.columns:
+                            left.loc[mask_idx, "service_included_60k"] = left.loc[mask_idx, "service_included_60k_by_ver"]
+                        left.drop(columns=[c for c in left.columns if c.endswith("_by_ver")], inplace=True, errors="ignore")
+                    # final fallback: compact model + version, ignoring year
+                    missing_mask = left["service_cost_60k_mxn"].isna()
+                    if missing_mask.any() and "__vr" in left.columns and "__vr" in mdf.columns:
+                        import re as _re
+                        mdf["__vrc"] = mdf.get("__vr").map(lambda s: _re.sub(r"[^A-Z0-9]", "", str(s)))
+                        left["__vrc"] = left.get("__vr").map(lambda s: _re.sub(r"[^A-Z0-9]", "", str(s)))
+                        svc5 = mdf.groupby(["__mk","__mdc","__vrc"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
+                        left = left.merge(svc5, left_on=["__mk","__mdc","__vrc"], right_on=["__mk","__mdc","__vrc"], how="left", suffixes=("", "_by_ver_c"))
+                        mask_idx = missing_mask & left["service_cost_60k_mxn"].isna()
+                        if mask_idx.any() and "service_cost_60k_mxn_by_ver_c" in left.columns:
+                            left.loc[mask_idx, "service_cost_60k_mxn"] = left.loc[mask_idx, "service_cost_60k_mxn_by_ver_c"]
+                        if mask_idx.any() and "service_included_60k_by_ver_c" in left.columns:
+                            left.loc[mask_idx, "service_included_60k"] = left.loc[mask_idx, "service_included_60k_by_ver_c"]
+                        left.drop(columns=[c for c in left.columns if c.endswith("_by_ver_c")], inplace=True, errors="ignore")
+                    # ultimate fallback: match by (make, model) across any year and any version
+                    missing_mask = left["service_cost_60k_mxn"].isna()
+                    if missing_mask.any():
                         try:
-                            val = str(row.get("categoria_combustible_final") or "").strip().lower()
-                            if val not in ("", "nan", "none", "null", "-"):
-                                return val
-                            raw = " ".join([
-                                str(row.get("tipo_de_combustible_original") or ""),
-                                str(row.get("tipo_combustible") or ""),
-                                str(row.get("combustible") or ""),
-                                str(row.get("version") or ""),
-                            ]).lower()
-                            if any(k in raw for k in ("bev","eléctrico","electrico","ev")):
-                                return "bev"
-                            if any(k in raw for k in ("phev","enchuf")):
-                                return "phev"
-                            if any(k in raw for k in ("hev","híbrido","hibrido")):
-                                return "hev"
-                            if any(k in raw for k in ("diesel","diésel","tdi","td","dsl")):
-                                return "diesel"
-                            if any(k in raw for k in ("premium","ron98")):
-                                return "gasolina premium"
-                            return "gasolina"
+                            svc6 = mdf.groupby(["__mk","__md"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
+                            left = left.merge(svc6, on=["__mk","__md"], how="left", suffixes=("", "_by_model_any"))
+                            for suffix in ("service_cost_60k_mxn_by_model_any", "service_included_60k_by_model_any"):
+                                if suffix in left.columns:
+                                    base = suffix.replace("_by_model_any", "")
+                                    if base not in left.columns:
+                                        left[base] = pd.NA
+                                    mask_assign = left[base].isna()
+                                    if mask_assign.any():
+                                        left.loc[mask_assign, base] = left.loc[mask_assign, suffix]
+                            left.drop(columns=[c for c in left.columns if c.endswith("_by_model_any")], inplace=True, errors="ignore")
                         except Exception:
-                            return None
-                    left["categoria_combustible_final"] = left.apply(_infer_fuel, axis=1)
+                            pass
                 except Exception:
                     pass
-                # performance metrics
-                prefer_json("caballos_fuerza")
-                prefer_json("torque_nm")
-                prefer_json("accel_0_100_s")
-                prefer_json("vmax_kmh")
-                # dimensions & image
-                prefer_json("longitud_mm")
-                prefer_json("ancho_mm")
-                prefer_json("altura_mm")
-                prefer_json("images_default")
-                # electrification
-                prefer_json("battery_kwh")
-                prefer_json("charge_ac_kw")
-                prefer_json("charge_dc_kw")
-                prefer_json("ev_range_km")
-                prefer_json("charge_time_10_80_min")
-                # infotainment details (copy from _from_json if present)
-                for _c in [
-                    "audio_brand","speakers_count","screen_main_in","screen_cluster_in",
-                    "usb_a_count","usb_c_count","power_12v_count","power_110v_count","wireless_charging",
-                    "warranty_full_months","warranty_full_km","warranty_powertrain_months","warranty_powertrain_km",
-                    "warranty_roadside_months","warranty_roadside_km","warranty_corrosion_months","warranty_corrosion_km",
-                    "warranty_electric_months","warranty_electric_km","warranty_battery_months","warranty_battery_km"
-                ]:
-                    j = f"{_c}_from_json"
-                    if j in left.columns:
-                        left[_c] = left[j]
-                        left.drop(columns=[j], inplace=True, errors="ignore")
-                # Heurísticas: convertir textos comunes a números (capacidad de asientos, zonas de clima, bocinas)
+                # Sync back
+                if "service_cost_60k_mxn" in left.columns:
+                    # Enforce minimum of 1 MXN when not incluido; respetar ceros explícitos como "incluido".
+                    try:
+                        yrs = None
+                        if "__yr" in left.columns:
+                            yrs_raw = pd.to_numeric(left.get("__yr"), errors="coerce")
+                            try:
+                                yrs = yrs_raw.round().astype("Int64")
+                            except Exception:
+                                import pandas as _pd
+                                yrs = pd.Series(_pd.array(yrs_raw.round(), dtype="Int64"), index=left.index)
+                        val = pd.to_numeric(left["service_cost_60k_mxn"], errors="coerce")
+                        zero_mask = val.fillna(pd.NA).eq(0)
+                        if "service_included_60k" in left.columns:
+                            inc_series = pd.Series(left["service_included_60k"], index=left.index).astype("boolean").fillna(False) | zero_mask.fillna(False)
+                            left["service_included_60k"] = inc_series.astype(bool)
+                        else:
+                            inc_series = zero_mask.fillna(False)
+                        mask = val.fillna(0).le(0)
+                        if yrs is not None:
+                            mask = mask & yrs.isin([2024, 2025, 2026])
+                        if inc_series is not None:
+                            mask = mask & (~inc_series)
+                        left.loc[mask, "service_cost_60k_mxn"] = 1.0
+                    except Exception:
+                        pass
+                    df["service_cost_60k_mxn"] = left["service_cost_60k_mxn"]
+                if "service_included_60k" in left.columns:
+                    df["service_included_60k"] = left["service_included_60k"]
+                # Extra pass: resolver valores faltantes o sentinelas (1 MXN) con los mismos datos
                 try:
-                    import re as _re
-                    import pandas as _pd
-                    def _first_num(text: Any) -> Any:
-                        try:
-                            s = str(text or "")
-                            m = _re.search(r"(\d+[\.,]?\d*)", s)
-                            if not m:
+                    svc_series = pd.to_numeric(df.get("service_cost_60k_mxn"), errors="coerce") if "service_cost_60k_mxn" in df.columns else None
+                except Exception:
+                    svc_series = None
+                if svc_series is not None:
+                    need_mask = svc_series.isna() | (svc_series == 1.0)
+                    if need_mask.any():
+                        # Prepara lista de registros válidos (0 = incluido)
+                        recs = []
+                        for _, rec in mdf.iterrows():
+                            try:
+                                val = float(rec.get("service_cost_60k_mxn"))
+                            except Exception:
+                                continue
+                            if val < 0 or val == 1.0 or pd.isna(val):
+                                continue
+                            mk_r = str(rec.get("__mk") or rec.get("make") or "").strip().upper()
+                            md_r = str(rec.get("__md") or rec.get("model") or "").strip().upper()
+                            vr_r = str(rec.get("__vr") or rec.get("version") or "").strip().upper()
+                            yr_r = rec.get("__yr")
+                            try:
+                                yr_r = int(yr_r) if yr_r is not None and not pd.isna(yr_r) else None
+                            except Exception:
+                                yr_r = None
+                            recs.append({
+                                "mk": mk_r,
+                                "md": md_r,
+                                "mdc": str(rec.get("__mdc") or ""),
+                                "vr": vr_r,
+                                "vrc": str(rec.get("__vrc") or ""),
+                                "yr": yr_r,
+                                "val": val,
+                                "inc": bool(rec.get("service_included_60k", False)) or (val == 0),
+                            })
+                        def _pick(filter_fn):
+                            cands = [r for r in recs if filter_fn(r)]
+                            if not cands:
                                 return None
-                            return float(m.group(1).replace(',', '.'))
-                        except Exception:
-                            return None
-                    def _word_to_int(text: Any) -> Any:
-                        try:
-                            s = str(text or "").strip().lower()
-                            m = {
-                                "uno":1, "una":1, "dos":2, "tres":3, "cuatro":4, "cinco":5,
-                                "seis":6, "siete":7, "ocho":8, "nueve":9, "diez":10, "once":11, "doce":12,
-                            }
-                            return m.get(s)
-                        except Exception:
-                            return None
-                    def _coerce_to_int_series(sr: _pd.Series) -> _pd.Series:
-                        def _f(x):
-                            v = _first_num(x)
-                            if v is not None:
+                            cands.sort(key=lambda r: (0 if r["val"] == 0 else 1, r["val"]))
+                            return cands[0]
+                        idxs = df.index[need_mask]
+                        for idx in idxs:
+                            try:
+                                mk0 = _canon_make(df.at[idx, "make"]) or str(df.at[idx, "make"] or "").strip().upper()
+                                md0 = _canon_model(mk0, df.at[idx, "model"]) or str(df.at[idx, "model"] or "").strip().upper()
+                                vr0 = str(df.at[idx, "version"] or "").strip().upper()
+                                vr0c = _compact_key(vr0)
                                 try:
-                                    return int(round(float(v)))
+                                    yr_raw = df.at[idx, "ano"]
+                                    yr0 = int(round(float(yr_raw))) if yr_raw is not None and str(yr_raw).strip() != "" else None
                                 except Exception:
-                                    return None
-                            return _word_to_int(x)
-                        return sr.map(_f)
-                    # seats_capacity ← 'capacidad de asientos'
-                    if "seats_capacity" not in left.columns:
-                        left["seats_capacity"] = None
-                    if "capacidad de asientos" in left.columns:
-                        src = _coerce_to_int_series(left["capacidad de asientos"])
-                        mask = _pd.to_numeric(left["seats_capacity"], errors="coerce").isna() & src.notna()
-                        left.loc[mask, "seats_capacity"] = src[mask]
-                    # climate_zones ← 'zonas con control del clima'
-                    if "climate_zones" not in left.columns:
-                        left["climate_zones"] = None
-                    for cand in ["zonas con control del clima", "zonas_control_del_clima", "zonas_clima"]:
-                        if cand in left.columns:
-                            src = _coerce_to_int_series(left[cand])
-                            mask = _pd.to_numeric(left["climate_zones"], errors="coerce").isna() & src.notna()
-                            left.loc[mask, "climate_zones"] = src[mask]
-                    # bocinas: si la columna existe en texto, extraer primer número
-                    if "bocinas" in left.columns:
-                        ser = _coerce_to_int_series(left["bocinas"])
-                        mask = ser.notna()
-                        # Asignar solo donde podamos extraer número (no pisar strings útiles)
-                        try:
-                            left.loc[mask, "bocinas"] = ser[mask]
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-                # propagate feature flags and pillar scores (copy if not present)
-                for c in cols_to_merge:
-                    if c.endswith("_from_json"):
-                        continue
-                    if (c.startswith("feat_") or c.startswith("equip_p_")):
-                        jf = f"{c}_from_json"
-                        if jf in left.columns:
-                            left[c] = left[jf]
-                    left.drop(columns=[f"{c}_from_json"], inplace=True, errors="ignore")
+                                    yr0 = None
+                                candidate = _pick(lambda r: r["mk"] == mk0 and r["md"] == md0 and r["yr"] == yr0 and (r["vr"] == vr0 or (vr0c and r["vrc"] == vr0c)))
+                                if candidate is None and yr0 is not None:
+                                    candidate = _pick(lambda r: r["mk"] == mk0 and r["md"] == md0 and r["yr"] == yr0)
+                                if candidate is None:
+                                    candidate = _pick(lambda r: r["mk"] == mk0 and r["md"] == md0 and r["yr"] == 2025)
+                                if candidate is None:
+                                    candidate = _pick(lambda r: r["mk"] == mk0 and r["md"] == md0)
+                                if candidate is None:
+                                    continue
+                                df.at[idx, "service_cost_60k_mxn"] = float(candidate["val"])
+                                if candidate.get("inc") or float(candidate["val"]) == 0.0:
+                                    df.at[idx, "service_included_60k"] = True
+                            except Exception:
+                                continue
+    except Exception as exc:
+        report.fail(exc)
+
+    report.stage("sales_merge", df)
+    # Merge sales overlay (ventas por modelo/año y share por segmento)
+    try:
+        s = _prefetched(sources, "sales")
+        if s is not None:
+            # normalize
+            if "anio" in s.columns and "ano" not in s.columns:
+                s.rename(columns={"anio": "ano"}, inplace=True)
+            if "unidades" in s.columns:
+                s.rename(columns={"unidades": "ventas_unidades"}, inplace=True)
+            if "segmento" in s.columns:
+                s.rename(columns={"segmento": "segmento_ventas"}, inplace=True)
+            for c in ("make","model"):
+                if c in s.columns:
+                    s[c] = s[c].astype(str)
+            if "ano" in s.columns:
+                s["ano"] = pd.to_numeric(s["ano"], errors="coerce").astype("Int64")
+            if "ventas_unidades" in s.columns:
+                s["ventas_unidades"] = pd.to_numeric(s["ventas_unidades"], errors="coerce")
+            # compute segment totals per año
+            seg_tot = None
+            if {"segmento_ventas","ano","ventas_unidades"}.issubset(s.columns):
+                seg_tot = s.groupby(["segmento_ventas","ano"], dropna=False)["ventas_unidades"].sum().reset_index().rename(columns={"ventas_unidades":"ventas_seg_total"})
+            # join by (make,model,ano)
+            if {"make","model"}.issubset(df.columns) and "ano" in df.columns and {"make","model","ano"}.issubset(s.columns):
+                left = df.merge(s[["make","model","ano","segmento_ventas","ventas_unidades"]], on=["make","model","ano"], how="left")
+                if seg_tot is not None:
+                    left = left.merge(seg_tot, on=["segmento_ventas","ano"], how="left")
+                    try:
+                        left["ventas_share_seg_pct"] = (pd.to_numeric(left["ventas_unidades"], errors="coerce") / pd.to_numeric(left["ventas_seg_total"], errors="coerce") * 100.0)
+                    except Exception:
+                        pass
+                df = left
+    except Exception as exc:
+        report.fail(exc)
+
+    report.stage("sales_ytd_merge", df)
+    # Merge YTD sales per model from processed monthly file (2025)
+    try:
+        s = _prefetched(sources, "sales_ytd")
+        if s is not None:
+            def up2(v):
+                return str(v or "").strip().upper()
+            s["__mk"] = s.get("make", pd.Series(dtype=str)).map(up2)
+            s["__md"] = s.get("model", pd.Series(dtype=str)).map(up2)
+            s["__yr"] = pd.to_numeric(s.get("ano"), errors="coerce").astype("Int64")
+            left = df.copy()
+            if {"make","model"}.issubset(left.columns):
+                left["__mk"] = left["make"].astype(str).map(up2)
+                left["__md"] = left["model"].astype(str).map(up2)
+            if "ano" in left.columns:
+                left["__yr"] = pd.to_numeric(left.get("ano"), errors="coerce").astype("Int64")
+            cols = [c for c in s.columns if c not in {"make","model","ano","__mk","__md","__yr"}]
+            # Primary join: (make, model, year)
+            left = left.merge(s[["__mk","__md","__yr", *cols]], on=["__mk","__md","__yr"], how="left", suffixes=("", "_ytd"))
+            # Fallback: if no monthly data matched because the selected year is not in the CSV,
+            # attach 2025 monthly data by (make, model) ignoring year so that charts can render.
+            try:
+                missing = left.get("ventas_ytd_2025").isna() if "ventas_ytd_2025" in left.columns else None
+            except Exception:
+                missing = None
+            if missing is not None and missing.any():
+                s_any = s.groupby(["__mk","__md"], dropna=False)[cols].first().reset_index()
+                left = left.merge(s_any, on=["__mk","__md"], how="left", suffixes=("", "_any"))
+                for c in cols:
+                    try:
+                        src = f"{c}_any"
+                        if c in left.columns and src in left.columns:
+                            left.loc[missing, c] = left.loc[missing, c].combine_first(left.loc[missing, src])
+                    except Exception:
+                        pass
+                # Clean helper columns
+                left.drop(columns=[c for c in left.columns if c.endswith("_any") or c.endswith("_ytd")], inplace=True, errors="ignore")
+            df = left
+    except Exception as exc:
+        report.fail(exc)
+
+    report.stage("segments", df)
+    # Set segments directly from catalog body_style (with only 'todo terreno' -> "SUV'S")
+    try:
+        if "segmento_ventas" not in df.columns:
+            df["segmento_ventas"] = None
+        if "body_style" in df.columns:
+            def _seg_from_body(s: str) -> str | None:
+                s = str(s or "").strip()
+                if not s or s.lower() in {"nan","none","null","na","n/a","-"}:
+                    return None
+                return "SUV'S" if "todo terreno" in s.lower() else s
+            # Overwrite to ensure consistent source for segments
+            df["segmento_ventas"] = df["body_style"].map(_seg_from_body)
+    except Exception as exc:
+        report.fail(exc)
+    return df
+
+
+def _build_catalog(path: Path, from_json: bool):
+    """Build the catalog frame from ``path`` without touching the shared globals.
+
+    Runs on the reloader thread (or inline on a cold start); callers publish
+    the result through _reload_catalog.
+    """
+    report = BuildReport(
+        "catalog",
+        trace_python=os.getenv("CATALOG_BUILD_TRACEMALLOC", "0") in {"1", "true", "True"},
+        source=str(path),
+        snapshot_hit=False,
+    )
+    _CATALOG_BUILD_REPORT["running"] = report
+    report.stage("snapshot_read")
+    snap_sig = None
+    try:
+        snap_sig = _catalog_input_signature(path)
+        snap = _read_catalog_snapshot(snap_sig)
+    except Exception as exc:
+        report.fail(exc)
+        snap = None
+    if snap is not None:
+        report.meta["snapshot_hit"] = True
+        _publish_build_report(report, snap)
+        return snap
+    df = None
+    row_keys: Optional[list[str]] = None
+    row_hashes: Optional[Dict[str, str]] = None
+    gates: Dict[str, bool] = {}
+    if from_json and _catalog_incremental_enabled():
+        report.stage("row_hashes")
+        try:
+            row_keys, row_hashes = _catalog_row_hashes(path)
+        except Exception as exc:
+            report.fail(exc)
+        if row_hashes is not None:
+            try:
+                df = _build_catalog_incremental(path, report, row_keys, row_hashes, gates)
+            except Exception as exc:
+                report.fail(exc)
+                df = None
+    if df is None:
+        gates.clear()
+        df = _build_catalog_frame(path, from_json, report, gates=gates)
+    report.stage("compact_dtypes", df)
+    if os.getenv("CATALOG_COMPACT_DTYPES", "1").strip().lower() not in {"0", "false", "no", "off"}:
+        try:
+            df = compact_frame(df)
+        except Exception as exc:
+            report.fail(exc)
+    # Column-by-column assembly leaves one block per column; consolidate once
+    # so per-request row slices (_catalog_lookup) take a few dozen blocks
+    # instead of ~280.
+    df = df.copy()
+    report.stage("snapshot_write", df)
+    if snap_sig:
+        try:
+            _write_catalog_snapshot(df, snap_sig)
+        except Exception as exc:
+            report.fail(exc)
+    _remember_catalog_rows(path, df, row_hashes, snap_sig, gates)
+    _publish_build_report(report, df)
+    return df
+
+# Catalog epochs. The built frame is published by swapping the _DF reference,
+# so requests keep reading the previous epoch while the next one is built off
+# the request path; only one build runs at a time.
+_CATALOG_BUILD_LOCK = threading.RLock()
+_CATALOG_RELOAD_LOCK = threading.Lock()
+_CATALOG_RELOAD_THREAD: Optional[threading.Thread] = None
+_CATALOG_EPOCH = 0
+_CATALOG_RELOAD_STATS: Dict[str, Any] = {
+    "building": False,
+    "last_reload_ms": None,
+    "last_reload_at": None,
+    "last_error": None,
+    "reloads": 0,
+}
+
+
+def _catalog_source_path() -> tuple[Path, bool]:
+    json_path = _autoradar_json_path()
+    from_json = json_path.exists()
+    return (json_path if from_json else _catalog_csv_path()), from_json
+
+
+def _catalog_is_current(m: float, from_json: bool) -> bool:
+    return _DF is not None and _DF_MTIME == m and _CATALOG_SOURCE == ("json" if from_json else "csv")
+
+
+def _reload_catalog(path: Path, from_json: bool, m: float) -> None:
+    """Single-flight build of ``path`` followed by an atomic swap of _DF."""
+    global _DF, _DF_MTIME, _CATALOG_SOURCE, _CATALOG_EPOCH
+    with _CATALOG_BUILD_LOCK:
+        if _catalog_is_current(m, from_json):
+            return
+        t0 = time.perf_counter()
+        _CATALOG_RELOAD_STATS["building"] = True
+        # Dumps parsed from here on are shared by this build and the epoch it publishes
+        generation = begin_generation()
+        try:
+            df = _build_catalog(path, from_json)
+        except Exception as exc:
+            _CATALOG_RELOAD_STATS["last_error"] = str(getattr(exc, "detail", None) or exc)
+            running = _CATALOG_BUILD_REPORT.get("running")
+            if running is not None:
+                running.fail(exc)
+                _publish_build_report(running, None)
+            raise
+        finally:
+            _CATALOG_RELOAD_STATS["building"] = False
+        try:
+            _catalog_index(df)
+            _catalog_search(df)
+        except Exception as exc:
+            logger.warning("catalog index build failed: %s", exc)
+        elapsed_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        _DF = df
+        _DF_MTIME = m
+        _CATALOG_SOURCE = "json" if from_json else "csv"
+        _CATALOG_EPOCH += 1
+        # Parses only the previous epoch used are not needed any more
+        release_generations(generation)
+        _CATALOG_RELOAD_STATS.update({
+            "last_reload_ms": elapsed_ms,
+            "last_reload_at": datetime.utcnow().isoformat() + "Z",
+            "last_error": None,
+            "reloads": _CATALOG_RELOAD_STATS["reloads"] + 1,
+        })
+        logger.info("catalog epoch %s ready in %.1f ms (%s)", _CATALOG_EPOCH, elapsed_ms, path)
+
+
+# A catalog fuel cost counts as priced by the fuel formula when it is within
+# this many pesos of it (sources keep cents or round to whole pesos)
+_FUEL_REPRICE_TOLERANCE = 0.5
+
+
+def _reprice_catalog_fuel(df, old: FuelPrices, new: FuelPrices) -> tuple:
+    """(frame, rows changed) with ``fuel_cost_60k_mxn`` moved from ``old`` to ``new`` prices.
+
+    Only costs that came from the fuel formula under ``old`` (see
+    ``fuel_cost_60k_frame``) are repriced, to cents; costs from any other
+    source, missing costs and electrified rows are left as they are. ``df``
+    itself is returned when nothing changes.
+    """
+    if "fuel_cost_60k_mxn" not in df.columns or old.as_dict() == new.as_dict():
+        return df, 0
+    before = fuel_cost_60k_frame(df, old)
+    after = fuel_cost_60k_frame(df, new)
+    cur = num_column(df, "fuel_cost_60k_mxn", _to_num_shared)
+    from_formula = (cur - before).abs() <= _FUEL_REPRICE_TOLERANCE
+    upd = from_formula & after.notna() & (after.round(2) != cur)
+    if not upd.any():
+        return df, 0
+    col = df["fuel_cost_60k_mxn"]
+    if pd.api.types.is_numeric_dtype(col):
+        col = col.astype("float64")
+    return df.assign(fuel_cost_60k_mxn=col.where(~upd, after.round(2))), int(upd.sum())
+
+
+def _publish_repriced_catalog(old: FuelPrices, new: FuelPrices) -> int:
+    """Move the loaded catalog's formula-priced fuel costs from ``old`` to ``new``
+    prices and publish the result as a new epoch.
+
+    Called when a fuel refresh changes prices; catalog rebuilds keep the
+    costs of their sources. Returns the number of rows repriced (0 publishes
+    nothing).
+    """
+    global _DF, _CATALOG_EPOCH
+    with _CATALOG_BUILD_LOCK:
+        df = _DF
+        if df is None or pd is None:
+            return 0
+        repriced, changed = _reprice_catalog_fuel(df, old, new)
+        if not changed:
+            return 0
+        try:
+            _catalog_index(repriced)
+            _catalog_search(repriced)
+        except Exception as exc:
+            logger.warning("catalog index build failed: %s", exc)
+        _DF = repriced
+        _CATALOG_EPOCH += 1
+        logger.info("catalog epoch %s: fuel cost repriced for %s rows", _CATALOG_EPOCH, changed)
+        return changed
+
+
+def _check_catalog_reload() -> None:
+    """Rebuild the catalog in the current thread when its source changed."""
+    path, from_json = _catalog_source_path()
+    if not path.exists():
+        return
+    m = path.stat().st_mtime
+    if not _catalog_is_current(m, from_json):
+        _reload_catalog(path, from_json, m)
+
+
+def _catalog_reload_worker() -> None:
+    try:
+        _check_catalog_reload()
+    except Exception as exc:
+        logger.warning("background catalog reload failed: %s", exc)
+
+
+def _schedule_catalog_reload() -> None:
+    """Start a background rebuild unless one is already running."""
+    global _CATALOG_RELOAD_THREAD
+    with _CATALOG_RELOAD_LOCK:
+        if _CATALOG_RELOAD_THREAD is not None and _CATALOG_RELOAD_THREAD.is_alive():
+            return
+        _CATALOG_RELOAD_THREAD = threading.Thread(
+            target=_catalog_reload_worker, name="catalog-reload", daemon=True
+        )
+        _CATALOG_RELOAD_THREAD.start()
+
+
+def _catalog_reload_watcher(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        _catalog_reload_worker()
+
+
+def _catalog_status() -> Dict[str, Any]:
+    return {
+        "epoch": _CATALOG_EPOCH,
+        "source": _CATALOG_SOURCE,
+        "mtime": _DF_MTIME,
+        "rows": int(len(_DF)) if _DF is not None else None,
+        **_CATALOG_RELOAD_STATS,
+    }
+
+
+def _load_catalog():
+    if pd is None:
+        raise HTTPException(status_code=500, detail="pandas not available in environment")
+
+    path, from_json = _catalog_source_path()
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=f"Catalog source not found: {path}")
+
+    m = path.stat().st_mtime
+    current = _DF
+    if current is not None and _catalog_is_current(m, from_json):
+        return current
+    if current is None:
+        # Cold start: nothing to serve yet, so build inline
+        _reload_catalog(path, from_json, m)
+        return _DF
+    # Stale: keep serving the previous epoch while the next one builds
+    _schedule_catalog_reload()
+    return current
+
+
+def _catalog_view():
+    """Catalog frame safe to filter/assign on without touching the shared cache.
+
+    Under pandas Copy-on-Write (default since pandas 3) a shallow copy is
+    enough: column writes copy only the touched column, so callers no longer
+    pay for a deep copy of all ~280 columns per request. A pandas without the
+    CoW option keeps the previous deep copy.
+
+    Handlers that need only some rows should not start from this view:
+    build their masks on ``_load_catalog()`` (read-only) or resolve rows with
+    ``_catalog_lookup`` and index the shared frame, which copies just the
+    selected rows.
+    """
+    df = _load_catalog()
+    if _PANDAS_COW:
+        return df.copy(deep=False)
+    return df.copy()
+
+
+def _competitor_segment(s: Any) -> Optional[str]:
+    """Segment bucket used by /auto_competitors (robust body style mapping)."""
+    s_raw = str(s or "").strip()
+    s = s_raw.lower()
+    for a, b in (("á","a"),("é","e"),("í","i"),("ó","o"),("ú","u"),("ñ","n")):
+        s = s.replace(a, b)
+    if not s or s in {"nan","none","null","na","n/a","-"}:
+        return None
+    if "chasis" in s:
+        if "pick" in s:
+            return "Pickup"
+        return "Chasis Cabina"
+    if any(x in s for x in ("pick", "pickup", "pick-up")):
+        return "Pickup"
+    if "camioneta" in s and "pick" in s:
+        return "Pickup"
+    if any(x in s for x in ("todo terreno","suv","suvs","crossover","sport utility")):
+        return "SUV'S"
+    if "van" in s or "panel" in s:
+        return "Van"
+    if any(x in s for x in ("hatch","hb")):
+        return "Hatchback"
+    if any(x in s for x in ("sedan","sedán","saloon")):
+        return "Sedán"
+    return s_raw.title()
+
+
+def _object_column(df, name: str):
+    col = column_or_none(df, name)
+    if col is None:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    return col.astype(object)
+
+
+def _key_segment(df):
+    # segmento_ventas bucket, upper-case ("NAN" for missing, as astype(str) gave)
+    return map_values(_object_column(df, "segmento_ventas"), lambda v: _normalize_body_style_label(str(v)).upper())
+
 
-                # JSON 100% para todas las MY: si hay columnas *_from_json restantes, sobrescribir SIEMPRE
-                try:
-                    json_cols = [c for c in left.columns if c.endswith("_from_json")]
-                    for col in json_cols:
-                        base = col[:-11]
-                        if base not in left.columns:
-                            left[base] = None
-                        left[base] = left[col]
-                        left.drop(columns=[col], inplace=True, errors="ignore")
-                except Exception:
-                    pass
+def _key_body_style_label(df):
+    sv, bs = _object_column(df, "segmento_ventas"), _object_column(df, "body_style")
+    return map_values(sv.where(sv.notna(), bs), _normalize_body_style_label)
 
-                # Derivar columna visible 'pasajeros' desde seats_capacity si existe
-                try:
-                    if "seats_capacity" in left.columns:
-                        import pandas as _pd
-                        left["pasajeros"] = _pd.to_numeric(left["seats_capacity"], errors="coerce").astype("Int64")
-                except Exception:
-                    pass
 
-                df = left
+def _key_competitor_segment(col: str):
+    return lambda df: map_values(_object_column(df, col), lambda v: _competitor_segment(str(v)))
 
-                # Compute warranty_score on the fly if missing or zeroed
-                try:
-                    need_ws = ("warranty_score" not in df.columns) or df["warranty_score"].fillna(0).eq(0).all()
-                except Exception:
-                    need_ws = True
-                if need_ws:
-                    try:
-                        def _num(v):
-                            try:
-                                return float(v)
-                            except Exception:
-                                return None
-                        def _ws_row(r):
-                            fm = _num(r.get("warranty_full_months")) or 0.0
-                            fk = _num(r.get("warranty_full_km")) or 0.0
-                            pm = _num(r.get("warranty_powertrain_months")) or 0.0
-                            pk = _num(r.get("warranty_powertrain_km")) or 0.0
-                            rm = _num(r.get("warranty_roadside_months")) or 0.0
-                            cm = _num(r.get("warranty_corrosion_months")) or 0.0
-                            em = _num(r.get("warranty_electric_months")) or (_num(r.get("warranty_battery_months")) or 0.0)
-                            s = 0.0
-                            s += min(30.0, (fm/36.0) * 30.0)
-                            s += min(10.0, (fk/60000.0) * 10.0) if fk>0 else 0.0
-                            s += min(25.0, (pm/72.0) * 25.0)
-                            s += min(10.0, (pk/100000.0) * 10.0) if pk>0 else 0.0
-                            s += min(10.0, (rm/36.0) * 10.0)
-                            s += min(5.0, (cm/60.0) * 5.0)
-                            s += min(10.0, (em/96.0) * 10.0)
-                            return round(s, 1)
-                        df["warranty_score"] = df.apply(_ws_row, axis=1)
-                    except Exception:
-                        pass
-        except Exception:
-            pass
 
-        # Try to merge maintenance costs (service_cost_60k_mxn)
-        try:
-            maint_env = os.getenv(_MAINT_PATH_ENV)
-            # Fallback sensible si no se define la variable de entorno
-            candidates = []
-            if maint_env:
-                mp = Path(maint_env)
-                if not mp.is_absolute():
-                    mp = ROOT / mp
-                candidates.append(mp)
-            # default local path
-            candidates.append(ROOT / "data" / "costos_mantenimiento.csv")
-            mp = next((p for p in candidates if p.exists()), None)
-            if mp is not None and mp.exists():
-                mdf = pd.read_csv(mp, low_memory=False)
-                mdf.columns = [str(c).strip().lower() for c in mdf.columns]
-                # normalize expected columns
-                col_map = {}
-                if "make" not in mdf.columns and "marca" in mdf.columns: col_map["marca"] = "make"
-                if "model" not in mdf.columns and "modelo" in mdf.columns: col_map["modelo"] = "model"
-                if "version" not in mdf.columns and "versión" in mdf.columns: col_map["versión"] = "version"
-                if "ano" not in mdf.columns and "año" in mdf.columns: col_map["año"] = "ano"
-                if "60000" in mdf.columns: col_map["60000"] = "service_cost_60k_mxn"
-                if col_map:
-                    mdf.rename(columns=col_map, inplace=True)
-                # coerce types
-                for c in ("make","model","version"):
-                    if c in mdf.columns:
-                        mdf[c] = mdf[c].astype(str)
-                if "ano" in mdf.columns:
-                    anos = pd.to_numeric(mdf["ano"], errors="coerce")
-                    try:
-                        anos = anos.round().astype("Int64")
-                    except Exception:
-                        import pandas as _pd
-                        anos = _pd.array(anos.round(), dtype="Int64")
-                    mdf["ano"] = anos
-                if "service_cost_60k_mxn" in mdf.columns:
-                    # Normalizar: quitar símbolos y mapear "Incluido"/"Sin costo" a 0 + bandera incluida
-                    raw = mdf["service_cost_60k_mxn"].astype(str)
-                    # Detectar 'Incluido' antes de limpiar
-                    included_mask = raw.str.contains(r"(?i)\b(?:inclu[íi]do|incl\.|sin\s*costo|gratis)\b", regex=True)
-                    ser = raw.str.replace("$", "", regex=False).str.replace(",", "", regex=False)
-                    ser = ser.replace(r"(?i)\s*(?:inclu[íi]do|incl\.|sin\s*costo|gratis)\s*", "0", regex=True)
-                    mdf["service_cost_60k_mxn"] = pd.to_numeric(ser, errors="coerce")
-                    mdf["service_included_60k"] = included_mask.fillna(False).astype(bool)
-                # Build normalized join keys (upper)
-                def up(s):
-                    return str(s or "").strip().upper()
-                if {"make","model","ano"}.issubset(mdf.columns):
-                    mdf["__mk"] = mdf["make"].map(up)
-                    mdf["__md"] = mdf["model"].map(up)
-                    # compact model (remove non-alnum) to improve matches like "4 RUNNER" vs "4RUNNER"
-                    import re as _re
-                    mdf["__mdc"] = mdf["__md"].map(lambda s: _re.sub(r"[^A-Z0-9]", "", str(s)))
-                    try:
-                        mdf["__yr"] = pd.to_numeric(mdf["ano"], errors="coerce").round().astype("Int64")
-                    except Exception:
-                        import pandas as _pd
-                        mdf["__yr"] = _pd.array(pd.to_numeric(mdf["ano"], errors="coerce").round(), dtype="Int64")
-                    if "version" in mdf.columns:
-                        mdf["__vr"] = mdf["version"].map(up)
-                    # First do (mk, md, yr, vr)
-                    left = df.copy()
-                    if {"make","model"}.issubset(left.columns):
-                        left["__mk"] = left["make"].astype(str).map(up)
-                        left["__md"] = left["model"].astype(str).map(up)
-                        import re as _re
-                        left["__mdc"] = left["__md"].map(lambda s: _re.sub(r"[^A-Z0-9]", "", str(s)))
-                    if "ano" in left.columns:
-                        anos_left = pd.to_numeric(left["ano"], errors="coerce")
-                        try:
-                            left["__yr"] = anos_left.round().astype("Int64")
-                        except Exception:
-                            import pandas as _pd
-                            left["__yr"] = _pd.array(anos_left.round(), dtype="Int64")
-                    if "version" in left.columns:
-                        left["__vr"] = left["version"].astype(str).map(up)
-                    svc = None
-                    if "__vr" in left.columns and "__vr" in mdf.columns:
-                        svc = mdf[["__mk","__md","__yr","__vr","service_cost_60k_mxn","service_included_60k"]]
-                        left = left.merge(svc, on=["__mk","__md","__yr","__vr"], how="left")
-                    else:
-                        left["service_cost_60k_mxn"] = None
-                        left["service_included_60k"] = None
-                    # Fill missing by (mk, md, yr)
-                    try:
-                        # merge by (make, model, year)
-                        svc2 = mdf.groupby(["__mk","__md","__yr"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
-                        left = left.merge(svc2, on=["__mk","__md","__yr"], how="left", suffixes=("", "_by_model"))
-                        for suffix in ("service_cost_60k_mxn_by_model", "service_included_60k_by_model"):
-                            if suffix in left.columns:
-                                base = suffix.replace("_by_model", "")
-                                if base not in left.columns:
-                                    left[base] = pd.NA
-                                mask_assign = left[base].isna()
-                                if mask_assign.any():
-                                    left.loc[mask_assign, base] = left.loc[mask_assign, suffix]
-                        left.drop(columns=[c for c in left.columns if c.endswith("_by_model")], inplace=True, errors="ignore")
-                        # if still missing, try compact model join (make, modelC, year)
-                        missing_mask = left["service_cost_60k_mxn"].isna()
-                        if missing_mask.any():
-                            svc3 = mdf.groupby(["__mk","__mdc","__yr"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
-                            left = left.merge(svc3, left_on=["__mk","__mdc","__yr"], right_on=["__mk","__mdc","__yr"], how="left", suffixes=("", "_by_model_c"))
-                            for suffix in ("service_cost_60k_mxn_by_model_c", "service_included_60k_by_model_c"):
-                                if suffix in left.columns:
-                                    base = suffix.replace("_by_model_c", "")
-                                    if base not in left.columns:
-                                        left[base] = pd.NA
-                                    mask_assign = left[base].isna()
-                                    if mask_assign.any():
-                                        left.loc[mask_assign, base] = left.loc[mask_assign, suffix]
-                            left.drop(columns=[c for c in left.columns if c.endswith("_by_model_c")], inplace=True, errors="ignore")
-                        # if still missing, ignore year and match by version when present
-                        missing_mask = left["service_cost_60k_mxn"].isna()
-                        if missing_mask.any() and "__vr" in left.columns and "__vr" in mdf.columns:
-                            # exact version (make, model, version) ignoring year
-                            svc4 = mdf.groupby(["__mk","__md","__vr"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
-                            left = left.merge(svc4, on=["__mk","__md","__vr"], how="left", suffixes=("", "_by_ver"))
-                            mask_idx = missing_mask & left["service_cost_60k_mxn"].isna()
-                            if mask_idx.any() and "service_cost_60k_mxn_by_ver" in left.columns:
-                                left.loc[mask_idx, "service_cost_60k_mxn"] = left.loc[mask_idx, "service_cost_60k_mxn_by_ver"]
-                            if mask_idx.any() and "service_included_60k_by_ver" in left.columns:
-                                left.loc[mask_idx, "service_included_60k"] = left.loc[mask_idx, "service_included_60k_by_ver"]
-                            left.drop(columns=[c for c in left.columns if c.endswith("_by_ver")], inplace=True, errors="ignore")
-                        # final fallback: compact model + version, ignoring year
-                        missing_mask = left["service_cost_60k_mxn"].isna()
-                        if missing_mask.any() and "__vr" in left.columns and "__vr" in mdf.columns:
-                            import re as _re
-                            mdf["__vrc"] = mdf.get("__vr").map(lambda s: _re.sub(r"[^A-Z0-9]", "", str(s)))
-                            left["__vrc"] = left.get("__vr").map(lambda s: _re.sub(r"[^A-Z0-9]", "", str(s)))
-                            svc5 = mdf.groupby(["__mk","__mdc","__vrc"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
-                            left = left.merge(svc5, left_on=["__mk","__mdc","__vrc"], right_on=["__mk","__mdc","__vrc"], how="left", suffixes=("", "_by_ver_c"))
-                            mask_idx = missing_mask & left["service_cost_60k_mxn"].isna()
-                            if mask_idx.any() and "service_cost_60k_mxn_by_ver_c" in left.columns:
-                                left.loc[mask_idx, "service_cost_60k_mxn"] = left.loc[mask_idx, "service_cost_60k_mxn_by_ver_c"]
-                            if mask_idx.any() and "service_included_60k_by_ver_c" in left.columns:
-                                left.loc[mask_idx, "service_included_60k"] = left.loc[mask_idx, "service_included_60k_by_ver_c"]
-                            left.drop(columns=[c for c in left.columns if c.endswith("_by_ver_c")], inplace=True, errors="ignore")
-                        # ultimate fallback: match by (make, model) across any year and any version
-                        missing_mask = left["service_cost_60k_mxn"].isna()
-                        if missing_mask.any():
-                            try:
-                                svc6 = mdf.groupby(["__mk","__md"], dropna=False)[["service_cost_60k_mxn","service_included_60k"]].first().reset_index()
-                                left = left.merge(svc6, on=["__mk","__md"], how="left", suffixes=("", "_by_model_any"))
-                                for suffix in ("service_cost_60k_mxn_by_model_any", "service_included_60k_by_model_any"):
-                                    if suffix in left.columns:
-                                        base = suffix.replace("_by_model_any", "")
-                                        if base not in left.columns:
-                                            left[base] = pd.NA
-                                        mask_assign = left[base].isna()
-                                        if mask_assign.any():
-                                            left.loc[mask_assign, base] = left.loc[mask_assign, suffix]
-                                left.drop(columns=[c for c in left.columns if c.endswith("_by_model_any")], inplace=True, errors="ignore")
-                            except Exception:
-                                pass
-                    except Exception:
-                        pass
-                    # Sync back
-                    if "service_cost_60k_mxn" in left.columns:
-                        # Enforce minimum of 1 MXN when not incluido; respetar ceros explícitos como "incluido".
-                        try:
-                            yrs = None
-                            if "__yr" in left.columns:
-                                yrs_raw = pd.to_numeric(left.get("__yr"), errors="coerce")
-                                try:
-                                    yrs = yrs_raw.round().astype("Int64")
-                                except Exception:
-                                    import pandas as _pd
-                                    yrs = pd.Series(_pd.array(yrs_raw.round(), dtype="Int64"), index=left.index)
-                            val = pd.to_numeric(left["service_cost_60k_mxn"], errors="coerce")
-                            zero_mask = val.fillna(pd.NA).eq(0)
-                            if "service_included_60k" in left.columns:
-                                inc_series = pd.Series(left["service_included_60k"], index=left.index).astype("boolean").fillna(False) | zero_mask.fillna(False)
-                                left["service_included_60k"] = inc_series.astype(bool)
-                            else:
-                                inc_series = zero_mask.fillna(False)
-                            mask = val.fillna(0).le(0)
-                            if yrs is not None:
-                                mask = mask & yrs.isin([2024, 2025, 2026])
-                            if inc_series is not None:
-                                mask = mask & (~inc_series)
-                            left.loc[mask, "service_cost_60k_mxn"] = 1.0
-                        except Exception:
-                            pass
-                        df["service_cost_60k_mxn"] = left["service_cost_60k_mxn"]
-                    if "service_included_60k" in left.columns:
-                        df["service_included_60k"] = left["service_included_60k"]
-                    # Extra pass: resolver valores faltantes o sentinelas (1 MXN) con los mismos datos
-                    try:
-                        svc_series = pd.to_numeric(df.get("service_cost_60k_mxn"), errors="coerce") if "service_cost_60k_mxn" in df.columns else None
-                    except Exception:
-                        svc_series = None
-                    if svc_series is not None:
-                        need_mask = svc_series.isna() | (svc_series == 1.0)
-                        if need_mask.any():
-                            # Prepara lista de registros válidos (0 = incluido)
-                            recs = []
-                            for _, rec in mdf.iterrows():
-                                try:
-                                    val = float(rec.get("service_cost_60k_mxn"))
-                                except Exception:
-                                    continue
-                                if val < 0 or val == 1.0 or pd.isna(val):
-                                    continue
-                                mk_r = str(rec.get("__mk") or rec.get("make") or "").strip().upper()
-                                md_r = str(rec.get("__md") or rec.get("model") or "").strip().upper()
-                                vr_r = str(rec.get("__vr") or rec.get("version") or "").strip().upper()
-                                yr_r = rec.get("__yr")
-                                try:
-                                    yr_r = int(yr_r) if yr_r is not None and not pd.isna(yr_r) else None
-                                except Exception:
-                                    yr_r = None
-                                recs.append({
-                                    "mk": mk_r,
-                                    "md": md_r,
-                                    "mdc": str(rec.get("__mdc") or ""),
-                                    "vr": vr_r,
-                                    "vrc": str(rec.get("__vrc") or ""),
-                                    "yr": yr_r,
-                                    "val": val,
-                                    "inc": bool(rec.get("service_included_60k", False)) or (val == 0),
-                                })
-                            def _pick(filter_fn):
-                                cands = [r for r in recs if filter_fn(r)]
-                                if not cands:
-                                    return None
-                                cands.sort(key=lambda r: (0 if r["val"] == 0 else 1, r["val"]))
-                                return cands[0]
-                            idxs = df.index[need_mask]
-                            for idx in idxs:
-                                try:
-                                    mk0 = _canon_make(df.at[idx, "make"]) or str(df.at[idx, "make"] or "").strip().upper()
-                                    md0 = _canon_model(mk0, df.at[idx, "model"]) or str(df.at[idx, "model"] or "").strip().upper()
-                                    vr0 = str(df.at[idx, "version"] or "").strip().upper()
-                                    vr0c = _compact_key(vr0)
-                                    try:
-                                        yr_raw = df.at[idx, "ano"]
-                                        yr0 = int(round(float(yr_raw))) if yr_raw is not None and str(yr_raw).strip() != "" else None
-                                    except Exception:
-                                        yr0 = None
-                                    candidate = _pick(lambda r: r["mk"] == mk0 and r["md"] == md0 and r["yr"] == yr0 and (r["vr"] == vr0 or (vr0c and r["vrc"] == vr0c)))
-                                    if candidate is None and yr0 is not None:
-                                        candidate = _pick(lambda r: r["mk"] == mk0 and r["md"] == md0 and r["yr"] == yr0)
-                                    if candidate is None:
-                                        candidate = _pick(lambda r: r["mk"] == mk0 and r["md"] == md0 and r["yr"] == 2025)
-                                    if candidate is None:
-                                        candidate = _pick(lambda r: r["mk"] == mk0 and r["md"] == md0)
-                                    if candidate is None:
-                                        continue
-                                    df.at[idx, "service_cost_60k_mxn"] = float(candidate["val"])
-                                    if candidate.get("inc") or float(candidate["val"]) == 0.0:
-                                        df.at[idx, "service_included_60k"] = True
-                                except Exception:
-                                    continue
-        except Exception:
-            pass
+# Derived buckets materialised next to the canonical keys (CatalogIndex.keys)
+_CATALOG_KEY_BUCKETS = {
+    "segment": _key_segment,
+    "body_style_label": _key_body_style_label,
+    "competitor_segment_bs": _key_competitor_segment("body_style"),
+    "competitor_segment_sv": _key_competitor_segment("segmento_ventas"),
+}
 
-        # Merge sales overlay (ventas por modelo/año y share por segmento)
-        try:
-            sales_path = ROOT / "data" / "ventas_modelo_supabase.csv"
-            if sales_path.exists():
-                s = pd.read_csv(sales_path, low_memory=False)
-                s.columns = [str(c).strip().lower() for c in s.columns]
-                # normalize
-                if "anio" in s.columns and "ano" not in s.columns:
-                    s.rename(columns={"anio": "ano"}, inplace=True)
-                if "unidades" in s.columns:
-                    s.rename(columns={"unidades": "ventas_unidades"}, inplace=True)
-                if "segmento" in s.columns:
-                    s.rename(columns={"segmento": "segmento_ventas"}, inplace=True)
-                for c in ("make","model"):
-                    if c in s.columns:
-                        s[c] = s[c].astype(str)
-                if "ano" in s.columns:
-                    s["ano"] = pd.to_numeric(s["ano"], errors="coerce").astype("Int64")
-                if "ventas_unidades" in s.columns:
-                    s["ventas_unidades"] = pd.to_numeric(s["ventas_unidades"], errors="coerce")
-                # compute segment totals per año
-                seg_tot = None
-                if {"segmento_ventas","ano","ventas_unidades"}.issubset(s.columns):
-                    seg_tot = s.groupby(["segmento_ventas","ano"], dropna=False)["ventas_unidades"].sum().reset_index().rename(columns={"ventas_unidades":"ventas_seg_total"})
-                # join by (make,model,ano)
-                if {"make","model"}.issubset(df.columns) and "ano" in df.columns and {"make","model","ano"}.issubset(s.columns):
-                    left = df.merge(s[["make","model","ano","segmento_ventas","ventas_unidades"]], on=["make","model","ano"], how="left")
-                    if seg_tot is not None:
-                        left = left.merge(seg_tot, on=["segmento_ventas","ano"], how="left")
-                        try:
-                            left["ventas_share_seg_pct"] = (pd.to_numeric(left["ventas_unidades"], errors="coerce") / pd.to_numeric(left["ventas_seg_total"], errors="coerce") * 100.0)
-                        except Exception:
-                            pass
-                    df = left
-        except Exception:
-            pass
 
-        # Merge YTD sales per model from processed monthly file (2025)
-        try:
-            sales_ytd = ROOT / "data" / "enriched" / "sales_ytd_2025.csv"
-            if sales_ytd.exists():
-                s = pd.read_csv(sales_ytd, low_memory=False)
-                s.columns = [str(c).strip().lower() for c in s.columns]
-                def up2(v):
-                    return str(v or "").strip().upper()
-                s["__mk"] = s.get("make", pd.Series(dtype=str)).map(up2)
-                s["__md"] = s.get("model", pd.Series(dtype=str)).map(up2)
-                s["__yr"] = pd.to_numeric(s.get("ano"), errors="coerce").astype("Int64")
-                left = df.copy()
-                if {"make","model"}.issubset(left.columns):
-                    left["__mk"] = left["make"].astype(str).map(up2)
-                    left["__md"] = left["model"].astype(str).map(up2)
-                if "ano" in left.columns:
-                    left["__yr"] = pd.to_numeric(left.get("ano"), errors="coerce").astype("Int64")
-                cols = [c for c in s.columns if c not in {"make","model","ano","__mk","__md","__yr"}]
-                # Primary join: (make, model, year)
-                left = left.merge(s[["__mk","__md","__yr", *cols]], on=["__mk","__md","__yr"], how="left", suffixes=("", "_ytd"))
-                # Fallback: if no monthly data matched because the selected year is not in the CSV,
-                # attach 2025 monthly data by (make, model) ignoring year so that charts can render.
-                try:
-                    missing = left.get("ventas_ytd_2025").isna() if "ventas_ytd_2025" in left.columns else None
-                except Exception:
-                    missing = None
-                if missing is not None and missing.any():
-                    s_any = s.groupby(["__mk","__md"], dropna=False)[cols].first().reset_index()
-                    left = left.merge(s_any, on=["__mk","__md"], how="left", suffixes=("", "_any"))
-                    for c in cols:
-                        try:
-                            src = f"{c}_any"
-                            if c in left.columns and src in left.columns:
-                                left.loc[missing, c] = left.loc[missing, c].combine_first(left.loc[missing, src])
-                        except Exception:
-                            pass
-                    # Clean helper columns
-                    left.drop(columns=[c for c in left.columns if c.endswith("_any") or c.endswith("_ytd")], inplace=True, errors="ignore")
-                df = left
-        except Exception:
-            pass
+# (frame, CatalogIndex) of the latest indexed epoch, swapped as one tuple
+_CATALOG_INDEX: tuple = (None, None)
+_CATALOG_INDEX_LOCK = threading.Lock()
+
+
+def _catalog_index(df=None) -> CatalogIndex:
+    """CatalogIndex of ``df`` (default: the current catalog), built once per epoch."""
+    global _CATALOG_INDEX
+    if df is None:
+        df = _load_catalog()
+    frame, index = _CATALOG_INDEX
+    if frame is df:
+        return index
+    with _CATALOG_INDEX_LOCK:
+        frame, index = _CATALOG_INDEX
+        if frame is not df:
+            index = CatalogIndex(df, extra=_CATALOG_KEY_BUCKETS)
+            _CATALOG_INDEX = (df, index)
+    return index
+
+
+# (frame, CatalogSearch) of the latest indexed epoch, swapped as one tuple
+_CATALOG_SEARCH: tuple = (None, None)
+_CATALOG_SEARCH_LOCK = threading.Lock()
+
+
+def _catalog_search(df=None) -> CatalogSearch:
+    """N-gram search over canonical make/model/version of ``df``, built once per epoch."""
+    global _CATALOG_SEARCH
+    if df is None:
+        df = _load_catalog()
+    frame, search = _CATALOG_SEARCH
+    if frame is df:
+        return search
+    keys = _catalog_index(df).keys
+    with _CATALOG_SEARCH_LOCK:
+        frame, search = _CATALOG_SEARCH
+        if frame is not df:
+            empty = [""] * len(keys)
+            search = CatalogSearch(
+                keys["make"] if "make" in keys.columns else empty,
+                keys["model"] if "model" in keys.columns else empty,
+                keys["version"] if "version" in keys.columns else empty,
+            )
+            _CATALOG_SEARCH = (df, search)
+    return search
 
-        # Set segments directly from catalog body_style (with only 'todo terreno' -> "SUV'S")
-        try:
-            if "segmento_ventas" not in df.columns:
-                df["segmento_ventas"] = None
-            if "body_style" in df.columns:
-                def _seg_from_body(s: str) -> str | None:
-                    s = str(s or "").strip()
-                    if not s or s.lower() in {"nan","none","null","na","n/a","-"}:
-                        return None
-                    return "SUV'S" if "todo terreno" in s.lower() else s
-                # Overwrite to ensure consistent source for segments
-                df["segmento_ventas"] = df["body_style"].map(_seg_from_body)
-        except Exception:
-            pass
 
-        _DF = df
-        _DF_MTIME = m
-        _CATALOG_SOURCE = "json" if from_json else "csv"
-    return _DF
+def _catalog_lookup(make: Any = None, model: Any = None, year: Any = None, version: Any = None, *, compact: bool = False):
+    """Catalog rows matching the given keys (upper-case text, numeric year), in frame order.
+
+    Resolved through the per-epoch CatalogIndex instead of full-frame masks;
+    the result is a new frame, safe to modify.
+    """
+    df = _load_catalog()
+    return df.take(_catalog_index(df).rows(make, model, year, version, compact=compact))
 
 
 # ------------------------------- API: /options ---------------------------
@@ -7420,10 +8866,9 @@ def _load_catalog():
 def get_options(make: Optional[str] = None, model: Optional[str] = None, year: Optional[int] = None) -> Dict[str, Any]:
     """Opciones ligeras para autocompletar.
 
-    Evita cargar el catálogo completo; usa un índice precalculado y solo cae a
-    fuentes pesadas cuando es estrictamente necesario.
+    Responde desde el árbol marca → modelo → año → versiones precalculado
+    (``_ensure_options_index``); no lee fuentes en disco por petición.
     """
-    df0 = None  # catálogo completo (lazy)
     try:
         _ensure_options_index()
     except Exception:
@@ -7449,96 +8894,16 @@ def get_options(make: Optional[str] = None, model: Optional[str] = None, year: O
     except Exception:
         pass
 
-    df = None  # se cargará bajo demanda si se necesita
-    _ensure_options_index()
-    idx = _OPTIONS_IDX or {"models": {}, "models_compact": {}}
-    # Restrict default option sources to allowed years (2024+). However, to avoid empty brand/model lists,
-    # compute top-level makes/models from the full catalog (df0) and apply year filtering only for year-specific lists.
-    if df is not None:
-        try:
-            if "ano" in df.columns:
-                df = df[df["ano"].isin(list(ALLOWED_YEARS))]
-        except Exception:
-            pass
-    # If a specific year is requested, filter lists to that year
-    if year is not None and (df is not None) and "ano" in df.columns:
-        try:
-            df = df[df["ano"] == int(year)]
-        except Exception:
-            pass
+    idx = _OPTIONS_IDX or _options_tree_view({}, {}, [], [])
+    allowed = set(ALLOWED_YEARS)
 
     def u(x: Optional[str]) -> Optional[str]:
         return x.upper() if isinstance(x, str) else x
 
-    # Build top-level lists from FULL catalog (df0) to avoid empty brand/model lists
-    # when ALLOWED_YEARS filtering removes too much data. Year-specific lists below
-    # will respect ALLOWED_YEARS, but the global brand/model menus should be complete.
-    makes_all: list[str] = []
-    models_all: list[str] = []
-    # 1) Derivar de índice ligero (rápido)
-    try:
-        if idx and idx.get("models"):
-            models_all = sorted(list(idx["models"].keys()))
-            mkset = set()
-            for rec in idx["models"].values():
-                for mk in (rec.get("makes") or set()):
-                    mk_norm = _canon_make(str(mk)) or str(mk).strip().upper()
-                    if mk_norm:
-                        mkset.add(mk_norm)
-            makes_all = sorted(list(mkset))
-    except Exception:
-        pass
-    # 2) Unir con fuentes adicionales (flat/processed/catalog) para cobertura completa
-    if pd is not None:
-        try:
-            makes_set = set(map(str, makes_all))
-            models_set = set(map(str, models_all))
-            # a) flat enriquecido (ligero)
-            try:
-                flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
-                if flat.exists():
-                    t = pd.read_csv(flat, usecols=[c for c in ["make","model","ano"] if True], low_memory=True)
-                    t.columns = [str(c).strip().lower() for c in t.columns]
-                    if "make" in t.columns:
-                        for mk in t["make"].astype(str).dropna().unique().tolist():
-                            mk_norm = _canon_make(mk) or str(mk).strip().upper()
-                            if mk_norm:
-                                makes_set.add(mk_norm)
-                    if "model" in t.columns:
-                        models_set.update(t["model"].astype(str).str.upper().dropna().unique().tolist())
-            except Exception:
-                pass
-            # b) processed
-            try:
-                proc = ROOT / "data" / "equipo_veh_limpio_procesado.csv"
-                if proc.exists():
-                    t = pd.read_csv(proc, usecols=["make","model","ano"], low_memory=True)
-                    t.columns = [str(c).strip().lower() for c in t.columns]
-                    if "make" in t.columns:
-                        for mk in t["make"].astype(str).dropna().unique().tolist():
-                            mk_norm = _canon_make(mk) or str(mk).strip().upper()
-                            if mk_norm:
-                                makes_set.add(mk_norm)
-                    if "model" in t.columns:
-                        models_set.update(t["model"].astype(str).str.upper().dropna().unique().tolist())
-            except Exception:
-                pass
-            # c) catálogo principal (usar dataframe ya cargado)
-            try:
-                cat_df = _load_catalog()
-                if "make" in cat_df.columns:
-                    for mk in cat_df["make"].astype(str).dropna().unique().tolist():
-                        mk_norm = _canon_make(mk) or str(mk).strip().upper()
-                        if mk_norm:
-                            makes_set.add(mk_norm)
-                if "model" in cat_df.columns:
-                    models_set.update(cat_df["model"].astype(str).str.upper().dropna().unique().tolist())
-            except Exception:
-                pass
-            makes_all = sorted(list(makes_set))
-            models_all = sorted(list(models_set))
-        except Exception:
-            pass
+    # Top-level brand/model menus come from every source (not only allowed
+    # years); year-specific lists below respect ALLOWED_YEARS.
+    makes_all: list[str] = list(idx["makes"])
+    models_all: list[str] = list(idx["models"])
 
     payload: Dict[str, Any] = {
         "makes": makes_all,
@@ -7589,108 +8954,34 @@ def get_options(make: Optional[str] = None, model: Optional[str] = None, year: O
             return []
 
     if model:
-        def _compact(s: str) -> str:
-            import re as _re
-            return _re.sub(r"[^A-Z0-9]", "", str(s or "").upper())
         target = (model or "").upper()
-        target_c = _compact(model)
-        # Pull from index first
-        model_key = target
-        if model_key not in idx["models"] and target_c in idx.get("models_compact", {}):
-            model_key = idx["models_compact"][target_c]
-        rec = idx["models"].get(model_key) or {"makes": set(), "years": set(), "versions_by_year": {}, "by_make": {}}
-        mf = set(rec.get("makes", set()))
-        years_set = set(rec.get("years", set()))
+        target_c = _compact_key(model)
+        # make -> year -> versions for the model and its compact spellings (CX-30/CX30)
+        recs: Dict[str, Dict[int, set]] = {}
+        for md in {target, *idx["by_compact"].get(target_c, [])}:
+            for mk, yrs in idx["by_model"].get(md, {}).items():
+                merged = recs.setdefault(mk, {})
+                for y, vs in yrs.items():
+                    merged.setdefault(y, set()).update(vs)
+        mf = {mk for mk, yrs in recs.items() if mk and (0 in yrs or allowed.intersection(yrs))}
+        if make and make.upper() in recs:
+            mf.add(make.upper())
+        if not mf:
+            mf = {mk for mk in recs if mk}
+        years_set = {y for yrs in recs.values() for y in yrs if y}
         versions_set: set[str] = set()
         if year is not None:
-            byyr = rec.get("versions_by_year", {}).get(int(year), set())
-            versions_set.update(byyr)
-            if make:
-                bm = rec.get("by_make", {}).get(make.upper(), {})
-                versions_set.update(bm.get("versions_by_year", {}).get(int(year), set()))
-        # Merge from processed / flat / JSON vehicles only when index lacks enough info
-        if (not years_set) or (year is not None and not versions_set) or (make and make.upper() not in mf):
-            try:
-                # Processed base catalog
-                proc = ROOT / "data" / "equipo_veh_limpio_procesado.csv"
-                if proc.exists():
-                    t = pd.read_csv(proc, low_memory=False)
-                    t.columns = [str(c).strip().lower() for c in t.columns]
-                    if {"make","model","ano"}.issubset(t.columns):
-                        tt = t[(t["model"].astype(str).str.upper()==target) | (t["model"].astype(str).map(_compact)==target_c)]
-                        if make and "make" in tt.columns:
-                            # Canonicalize make before comparison to avoid alias mismatches
-                            mk_up = tt["make"].astype(str).map(lambda s: (_canon_make(s) or str(s).strip().upper()))
-                            tt = tt[mk_up == make.upper()]
-                        mf.update(tt["make"].astype(str).str.upper().dropna().unique().tolist())
-                        years_set.update(pd.to_numeric(tt["ano"], errors="coerce").dropna().astype(int).unique().tolist())
-                        if year and "version" in tt.columns:
-                            vv = tt[pd.to_numeric(tt["ano"], errors="coerce").fillna(0).astype(int)==int(year)]["version"].dropna().astype(str).tolist()
-                            versions_set.update(vv)
-                # Flat enriched
-                flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
-                if flat.exists():
-                    t = pd.read_csv(flat, low_memory=False)
-                    t.columns = [str(c).strip().lower() for c in t.columns]
-                    if {"make","model","ano"}.issubset(t.columns):
-                        tt = t[(t["model"].astype(str).str.upper()==target) | (t["model"].astype(str).map(_compact)==target_c)]
-                        if make and "make" in tt.columns:
-                            mk_up = tt["make"].astype(str).map(lambda s: (_canon_make(s) or str(s).strip().upper()))
-                            tt = tt[mk_up == make.upper()]
-                        mf.update(tt["make"].astype(str).str.upper().dropna().unique().tolist())
-                        years_set.update(pd.to_numeric(tt["ano"], errors="coerce").dropna().astype(int).unique().tolist())
-                        if year and "version" in tt.columns:
-                            vv = tt[pd.to_numeric(tt["ano"], errors="coerce").fillna(0).astype(int)==int(year)]["version"].dropna().astype(str).tolist()
-                            versions_set.update(vv)
-                # JSON curated direct
-                import json as _json
-                js = ROOT / "data" / "vehiculos-todos.json"
-                if not js.exists():
-                    js = ROOT / "data" / "vehiculos-todos1.json"
-                if js.exists():
-                    data = _json.loads(js.read_text(encoding="utf-8"))
-                    items = data.get("vehicles") if isinstance(data, dict) else (data if isinstance(data, list) else [])
-                    for v in items or []:
-                        mk = (v.get("manufacturer",{}) or {}).get("name") or (v.get("make",{}) or {}).get("name") or ""
-                        md = (v.get("model",{}) or {}).get("name") or ""
-                        yr = (v.get("version",{}) or {}).get("year") or None
-                        mk_can = _canon_make(mk) or str(mk).strip().upper()
-                        if (str(md).strip().upper()==target or _compact(md)==target_c) and ((not make) or (mk_can==make.upper())):
-                            if mk:
-                                mk_norm = mk_can or _canon_make(mk) or str(mk).strip().upper()
-                                if mk_norm:
-                                    mf.add(mk_norm)
-                            try:
-                                years_set.add(int(yr))
-                            except Exception:
-                                pass
-                            if year and yr is not None and str(yr).isdigit() and int(yr)==int(year):
-                                name = (v.get("version") or {}).get("name") or ""
-                                if name:
-                                    versions_set.add(str(name))
-            except Exception:
-                pass
-        if df0 is None:
-            try:
-                df0 = _load_catalog().copy()
-            except Exception:
-                df0 = None
-        if df0 is not None and len(df0):
-            try:
-                sub_cat = df0.copy()
-                if "make" in sub_cat.columns:
-                    if make:
-                        sub_cat = sub_cat[sub_cat["make"].astype(str).str.upper() == make.upper()]
-                    elif mf:
-                        sub_cat = sub_cat[sub_cat["make"].astype(str).str.upper().isin(mf)]
-                if "model" in sub_cat.columns:
-                    sub_cat = sub_cat[sub_cat["model"].astype(str).str.upper() == target]
-                if "ano" in sub_cat.columns:
-                    cat_years = set(pd.to_numeric(sub_cat["ano"], errors="coerce").dropna().astype(int).tolist())
-                    if cat_years:
-                        years_set = {y for y in years_set if y in cat_years} or cat_years
-            except Exception:
-                pass
+            for yrs in recs.values():
+                versions_set.update(yrs.get(int(year), ()))
+        # Years offered for the model are those of the main catalog when it has any
+        try:
+            cat = idx["catalog_years"].get(target, {})
+            cat_makes = [make.upper()] if make else (mf or list(cat))
+            cat_years = set().union(*(cat.get(mk, set()) for mk in cat_makes))
+            if cat_years:
+                years_set = {y for y in years_set if y in cat_years} or cat_years
+        except Exception:
+            pass
         years_all = sorted([y for y in years_set if y in ALLOWED_YEARS])
         mf = sorted(list(mf))
         years = _filter_years(years_all)
@@ -7710,18 +9001,10 @@ def get_options(make: Optional[str] = None, model: Optional[str] = None, year: O
             payload["autofill"]["make_from_model"] = mf[0]
             if not make and len(mf) == 1:
                 payload["selected"]["make"] = mf[0]
-        # Final fallback: derive versions from main catalog for selected filters
+        # Final fallback: versions of the in-memory catalog for the selected filters
         if year and not payload.get("versions") and (pd is not None):
             try:
-                if df0 is None:
-                    df0 = _load_catalog().copy()
-                sub2 = df0.copy()
-                if make and "make" in sub2.columns:
-                    sub2 = sub2[sub2["make"].astype(str).str.upper() == make.upper()]
-                if model and "model" in sub2.columns:
-                    sub2 = sub2[sub2["model"].astype(str).str.upper() == model.upper()]
-                if "ano" in sub2.columns:
-                    sub2 = sub2[pd.to_numeric(sub2["ano"], errors="coerce").fillna(0).astype(int) == int(year)]
+                sub2 = _catalog_lookup(make or None, model, int(year))
                 if "version" in sub2.columns:
                     vlist = [str(x) for x in sub2["version"].dropna().tolist()]
                     vlist = _uniq_versions(vlist)
@@ -7731,46 +9014,16 @@ def get_options(make: Optional[str] = None, model: Optional[str] = None, year: O
                 pass
 
     if make and not model:
-        sub = df
-        if sub is None and idx:
-            # sin catálogo en memoria: derivar modelos por marca desde el índice
-            try:
-                models = []
-                years_all = []
-                for m, rec in (idx.get("models") or {}).items():
-                    makes = {str(x).upper() for x in rec.get("makes", set())}
-                    if make.upper() in makes:
-                        yrs = set(rec.get("years", set()))
-                        if yrs.intersection(ALLOWED_YEARS):
-                            models.append(m)
-                            years_all.extend(list(yrs))
-                payload = payload  # no-op keep scope
-            except Exception:
-                pass
-        if sub is not None:
-            sub = sub[sub["make"].str.upper() == make.upper()]
-        models = sorted(sub["model"].str.upper().dropna().unique().tolist()) if (sub is not None and len(sub)) else (locals().get('models') or [])
-        years_all = sorted(sub.get("ano", pd.Series(dtype=int)).dropna().unique().tolist()) if (sub is not None and len(sub)) else (locals().get('years_all') or [])
-        # Add from index
-        try:
-            _ensure_options_index()
-            idx = _OPTIONS_IDX or {"models": {}}
-            if idx.get("models"):
-                for m, rec in idx["models"].items():
-                    makes = {str(x).upper() for x in rec.get("makes", set())}
-                    if make.upper() in makes:
-                        # Incluir solo modelos con años permitidos
-                        yrs = set(rec.get("years", set()))
-                        if yrs.intersection(ALLOWED_YEARS):
-                            models.append(m)
-                            years_all.extend(list(yrs))
-                models = sorted(list(set(models)))
-                years_all = sorted(list({int(y) for y in years_all if int(y) in ALLOWED_YEARS}))
-        except Exception:
-            pass
-        years = _filter_years(years_all)
-        payload["models_for_make"] = models
-        payload["years"] = years
+        models = []
+        years_all = set()
+        for md, yrs in idx["tree"].get(make.upper(), {}).items():
+            # Incluir solo modelos con años permitidos
+            ys = allowed.intersection(yrs)
+            if ys:
+                models.append(md)
+                years_all.update(ys)
+        payload["models_for_make"] = sorted(models)
+        payload["years"] = _filter_years(list(years_all))
 
     # Dedup de versiones (case-insensitive) para evitar 'LIMITED HEV' y 'Limited HEV'
     try:
@@ -7794,208 +9047,358 @@ def get_options(make: Optional[str] = None, model: Optional[str] = None, year: O
 
 
 # -------------------------------- API: /catalog --------------------------
-@app.get("/catalog")
-def get_catalog(limit: int = Query(1000, ge=1, le=20000), make: Optional[str] = None, model: Optional[str] = None, year: Optional[int] = None, format: Optional[str] = None, q: Optional[str] = None) -> Any:  # type: ignore
-    df = _load_catalog()
-    # Canonicalize incoming filters
-    make = _canon_make(make) if make else make
-    model = _canon_model(make, model) if model else model
-    sub = df
-    if make:
-        sub = sub[sub["make"].str.upper() == make.upper()]
-    if model:
-        sub = sub[sub["model"].str.upper() == model.upper()]
-    if year and "ano" in sub.columns:
-        sub = sub[sub["ano"] == int(year)]
-    if q:
+# Rows /catalog merges in from the vehicle JSON and the processed/flat CSVs
+# when filtering by make/model (or when a search misses the catalog). Built
+# once per signature of those files and the aliases, with a CatalogIndex
+# over its canonical keys.
+# (signature, (frame, CatalogIndex, search text)), swapped as one tuple
+_CATALOG_FALLBACK: tuple = (None, None)
+_CATALOG_FALLBACK_LOCK = threading.Lock()
+_CATALOG_FALLBACK_CSV_COLS = [
+    "make", "model", "version", "ano", "msrp", "precio_transaccion",
+    "categoria_combustible_final", "combinado_kml", "caballos_fuerza", "longitud_mm",
+]
+
+
+def _catalog_fallback_paths() -> Dict[str, Path]:
+    pjson = ROOT / "data" / "vehiculos-todos.json"
+    if not pjson.exists():
+        pjson = ROOT / "data" / "vehiculos-todos1.json"
+    return {
+        "json": pjson,
+        "processed": ROOT / "data" / "equipo_veh_limpio_procesado.csv",
+        "flat": ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv",
+        "aliases": ROOT / "data" / "aliases" / "alias_names.csv",
+    }
+
+
+def _fallback_kml(val: Any) -> Optional[float]:
+    try:
+        s = str(val or "").strip().lower()
+        if not s or s in {"nan","none","null","-"}: return None
+        # Tratar 'mpg' como km/l (bug en JSON)
+        m = re.search(r"(\d+[\.,]?\d*)\s*mpg", s)
+        if m: return float(m.group(1).replace(',', '.'))
+        m = re.search(r"(\d+[\.,]?\d*)\s*l\s*/\s*100\s*km", s)
+        if m:
+            l100 = float(m.group(1).replace(',', '.'))
+            return 100.0/l100 if l100>0 else None
+        m = re.search(r"(\d+[\.,]?\d*)\s*(km/?l|kml)", s)
+        if m: return float(m.group(1).replace(',', '.'))
+        m = re.search(r"(\d+[\.,]?\d*)", s)
+        if m: return float(m.group(1).replace(',', '.'))
+        return None
+    except Exception:
+        return None
+
+
+def _build_catalog_fallback(paths: Dict[str, Path]):
+    """(frame, search text per row) of every fallback row, canonicalised once."""
+    rows: list[dict] = []
+    text: list[str] = []
+
+    def _num(x):
         try:
-            token = str(q).strip().upper()
-            mask = None
-            for col in ("make","model","version"):
-                if col in sub.columns:
-                    m = sub[col].astype(str).str.upper().str.contains(token, na=False)
-                    mask = m if mask is None else (mask | m)
-            if mask is not None:
-                sub = sub[mask]
+            v = float(str(x).replace(',', '').strip())
+            return v
         except Exception:
-            pass
-    # Fallback: if no rows after filters, try building from external sources (processed/flat/JSON)
-    token_q = str(q or "").strip().upper()
-    needs_fallback = bool(make or model or token_q)
-    if needs_fallback:
+            return None
+
+    def _add_row(mk, md, vr, yr, msrp=None, tx=None, fuel=None, kml=None, hp=None, length=None, eq=None, extra: Optional[Dict[str, Any]] = None):
+        # canonicalize fallback rows too
+        mk = _canon_make(mk) or str(mk or '').upper()
+        md = _canon_model(mk, md) or str(md or '').upper()
         try:
-            mk_up = _canon_make(make) or (make or "").upper()
-            md_up = _canon_model(make, model) or (model or "").upper()
+            yr_int = int(yr) if yr is not None else None
+        except Exception:
+            yr_int = None
+        if yr_int is not None and ALLOWED_YEARS and yr_int not in ALLOWED_YEARS:
+            return
+        # Precio TX: si no existe o no es válido, usa MSRP como fallback
+        txf = _num(tx)
+        msf = _num(msrp)
+        specs = FALLBACK_SPEC_OVERRIDES.get((mk, md)) or {}
+        row: Dict[str, Any] = {
+            "make": mk,
+            "model": md,
+            "version": vr,
+            "ano": yr_int,
+            "msrp": msrp,
+            "precio_transaccion": (txf if (txf is not None and txf > 0) else msf),
+            "categoria_combustible_final": fuel or specs.get("categoria_combustible_final"),
+            "combinado_kml": kml,
+            "caballos_fuerza": hp or specs.get("caballos_fuerza"),
+            "longitud_mm": length or specs.get("longitud_mm"),
+            "equip_score": eq,
+        }
+        for extra_key, extra_value in specs.items():
+            if extra_key in {"caballos_fuerza", "longitud_mm", "categoria_combustible_final"}:
+                continue
+            if row.get(extra_key) in (None, "") and extra_value is not None:
+                row[extra_key] = extra_value
+        if extra:
+            for key, value in extra.items():
+                if value is None:
+                    continue
+                if row.get(key) in (None, ""):
+                    continue
+                row[key] = value
+        rows.append(row)
+        text.append("\0".join(str(v or "").upper() for v in (mk, md, vr)))
+
+    # JSON
+    if paths["json"].exists():
+        for v in load_vehicles(paths["json"]):
+            mk = (v.get("make",{}) or {}).get("name") or (v.get("manufacturer",{}) or {}).get("name") or ""
+            md = (v.get("model",{}) or {}).get("name") or ""
+            ver = (v.get("version",{}) or {}).get("name") or ""
+            yr = (v.get("version",{}) or {}).get("year") or None
+            if mk and md and yr and str(yr).isdigit():
+                fe = (v.get("fuelEconomy",{}) or {})
+                kml = _fallback_kml(fe.get("combined")) or _fallback_kml(fe.get("city")) or _fallback_kml(fe.get("highway"))
+                specs_extra = v.get("specs") or {}
+                extra = {
+                    "segmento_display": (v.get("version") or {}).get("bodyStyle") or (v.get("model") or {}).get("bodyStyleName") or None,
+                    "segmento_ventas": (v.get("model") or {}).get("segmentCategory") or None,
+                    "body_style": (v.get("version") or {}).get("bodyStyle") or None,
+                    "caballos_fuerza": specs_extra.get("caballos_fuerza"),
+                    "longitud_mm": specs_extra.get("longitud_mm"),
+                }
+                _add_row(mk, md, ver, int(yr), msrp=(v.get("pricing",{}) or {}).get("msrp"), kml=kml, extra=extra)
+    # Processed and flat CSVs
+    for name in ("processed", "flat"):
+        p = paths[name]
+        if not p.exists():
+            continue
+        t = pd.read_csv(p, usecols=lambda c: str(c).strip().lower() in _CATALOG_FALLBACK_CSV_COLS, low_memory=False)
+        t.columns = [str(c).strip().lower() for c in t.columns]
+        t = t.reindex(columns=_CATALOG_FALLBACK_CSV_COLS)
+        t = t.astype(object).where(t.notna(), None)
+        for mk, md, vr, yr, msrp, tx, fuel, kml, hp, length in t.itertuples(index=False, name=None):
+            _add_row(mk or "", md or "", vr, yr, msrp=msrp, tx=tx, fuel=fuel, kml=kml, hp=hp, length=length)
+
+    frame = pd.DataFrame(rows)
+    if not frame.empty:
+        for col in ("make", "model", "version"):
+            if col in frame.columns:
+                frame[col] = frame[col].astype(str).str.strip().str.upper()
+        if "ano" in frame.columns:
+            frame["ano"] = pd.to_numeric(frame["ano"], errors="coerce")
+    return frame, pd.Series(text, index=frame.index, dtype=object)
+
+
+def _catalog_fallback():
+    """(frame, CatalogIndex, search text) of the fallback rows for the current files."""
+    paths = _catalog_fallback_paths()
+    sig = [str(paths["json"])] + [file_signature(p) for p in paths.values()]
+    global _CATALOG_FALLBACK
+    built_for, table = _CATALOG_FALLBACK
+    if built_for == sig:
+        return table
+    with _CATALOG_FALLBACK_LOCK:
+        built_for, table = _CATALOG_FALLBACK
+        if built_for != sig:
+            frame, text = _build_catalog_fallback(paths)
+            table = (frame, CatalogIndex(frame), text)
+            _CATALOG_FALLBACK = (sig, table)
+    return table
+
+
+# Output columns filled from other columns by _catalog_api_row (needed when projecting)
+_CATALOG_DERIVED_FROM: Dict[str, tuple] = {
+    "precio_transaccion": ("price_transaction", "msrp"),
+    "caballos_fuerza": ("engine_power_hp",),
+    "longitud_mm": ("length_mm",),
+    "combinado_kml": ("fuel_combined_kml",),
+    "combinado_l_100km": ("fuel_combined_l_100km",),
+    "ciudad_kml": ("fuel_city_kml",),
+    "carretera_kml": ("fuel_highway_kml",),
+}
+# Rows converted to dicts at a time when serialising a /catalog page
+_CATALOG_RECORD_CHUNK = 1000
 
-            def _allowed_year(yr: Optional[int]) -> bool:
-                if yr is None:
-                    return True
-                try:
-                    yr_int = int(yr)
-                except Exception:
-                    return False
-                return (not ALLOWED_YEARS) or (yr_int in ALLOWED_YEARS)
 
-            def _matches_query(mk: str, md: str, vr: str) -> bool:
-                if not token_q:
-                    return True
-                target = [mk, md, vr]
-                for val in target:
-                    if token_q in str(val or "").upper():
-                        return True
-                return False
+def _catalog_blank(value: Any) -> bool:
+    """None, "" or NaN (float columns keep NaN after ``where(notna, None)``)."""
+    if value is None or value == "":
+        return True
+    try:
+        return bool(value != value)
+    except Exception:
+        return False
 
-            def _add_row(arr, mk, md, vr, yr, msrp=None, tx=None, fuel=None, kml=None, hp=None, length=None, eq=None, extra: Optional[Dict[str, Any]] = None):
-                # canonicalize fallback rows too
-                mk = _canon_make(mk) or str(mk or '').upper()
-                md = _canon_model(mk, md) or str(md or '').upper()
-                try:
-                    yr_int = int(yr) if yr is not None else None
-                except Exception:
-                    yr_int = None
-                if yr_int is not None and not _allowed_year(yr_int):
-                    return
-                if not _matches_query(mk, md, vr):
-                    return
 
-                def _num(x):
-                    try:
-                        v = float(str(x).replace(',', '').strip())
-                        return v
-                    except Exception:
-                        return None
+def _catalog_api_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill spec overrides and legacy column names of one /catalog row (in place)."""
+    try:
+        mk_key = str(row.get("make") or row.get("make_slug") or "").strip().upper()
+        md_key = str(row.get("model") or row.get("model_slug") or "").strip().upper()
+        override = FALLBACK_SPEC_OVERRIDES.get((mk_key, md_key))
+        if override:
+            for key, value in override.items():
+                if value is None:
+                    continue
+                if key not in row or row.get(key) in (None, ""):
+                    row[key] = value
+        if row.get("precio_transaccion") in (None, ""):
+            pt = row.get("price_transaction") or row.get("msrp")
+            if pt not in (None, ""):
+                row["precio_transaccion"] = pt
+        if row.get("caballos_fuerza") in (None, "") and row.get("engine_power_hp") not in (None, ""):
+            row["caballos_fuerza"] = row.get("engine_power_hp")
+        if row.get("longitud_mm") in (None, "") and row.get("length_mm") not in (None, ""):
+            row["longitud_mm"] = row.get("length_mm")
+
+        # Spec aliases only overwrite with a real value (NaN cells count as missing)
+        fc = row.get("fuel_combined_kml")
+        if not _catalog_blank(fc):
+            row["combinado_kml"] = fc
+        fl = row.get("fuel_combined_l_100km")
+        if not _catalog_blank(fl):
+            row["combinado_l_100km"] = fl
+        city = row.get("fuel_city_kml")
+        if not _catalog_blank(city):
+            row["ciudad_kml"] = city
+        hw = row.get("fuel_highway_kml")
+        if not _catalog_blank(hw):
+            row["carretera_kml"] = hw
+    except Exception:
+        pass
+    return row
 
-                row = {c: None for c in df.columns}
-                # Precio TX: si no existe o no es válido, usa MSRP como fallback
-                txf = _num(tx)
-                msf = _num(msrp)
-                specs = FALLBACK_SPEC_OVERRIDES.get((mk, md)) or {}
-                row.update({
-                    "make": mk,
-                    "model": md,
-                    "version": vr,
-                    "ano": yr_int,
-                    "msrp": msrp,
-                    "precio_transaccion": (txf if (txf is not None and txf > 0) else msf),
-                    "categoria_combustible_final": fuel or specs.get("categoria_combustible_final"),
-                    "combinado_kml": kml,
-                    "caballos_fuerza": hp or specs.get("caballos_fuerza"),
-                    "longitud_mm": length or specs.get("longitud_mm"),
-                    "equip_score": eq,
-                })
-                for extra_key, extra_value in specs.items():
-                    if extra_key in {"caballos_fuerza", "longitud_mm", "categoria_combustible_final"}:
-                        continue
-                    if row.get(extra_key) in (None, "") and extra_value is not None:
-                        row[extra_key] = extra_value
-                if extra:
-                    for key, value in extra.items():
-                        if value is None:
-                            continue
-                        if row.get(key) in (None, ""):
-                            continue
-                        row[key] = value
-                arr.append(row)
 
-            new_rows: list[dict] = []
-            import json as _json, re as _re
-            def _to_kml(val):
-                try:
-                    s = str(val or "").strip().lower()
-                    if not s or s in {"nan","none","null","-"}: return None
-                    # Tratar 'mpg' como km/l (bug en JSON)
-                    m = _re.search(r"(\d+[\.,]?\d*)\s*mpg", s)
-                    if m: return float(m.group(1).replace(',', '.'))
-                    m = _re.search(r"(\d+[\.,]?\d*)\s*l\s*/\s*100\s*km", s)
-                    if m:
-                        l100 = float(m.group(1).replace(',', '.'))
-                        return 100.0/l100 if l100>0 else None
-                    m = _re.search(r"(\d+[\.,]?\d*)\s*(km/?l|kml)", s)
-                    if m: return float(m.group(1).replace(',', '.'))
-                    m = _re.search(r"(\d+[\.,]?\d*)", s)
-                    if m: return float(m.group(1).replace(',', '.'))
-                    return None
-                except Exception:
-                    return None
-            # JSON
-            pjson = ROOT / "data" / "vehiculos-todos.json"
-            if not pjson.exists(): pjson = ROOT / "data" / "vehiculos-todos1.json"
-            if pjson.exists():
-                data = _json.loads(pjson.read_text(encoding="utf-8"))
-                items = data.get("vehicles") if isinstance(data, dict) else (data if isinstance(data, list) else [])
-                for v in items or []:
-                    mk = (v.get("make",{}) or {}).get("name") or (v.get("manufacturer",{}) or {}).get("name") or ""
-                    md = (v.get("model",{}) or {}).get("name") or ""
-                    ver = (v.get("version",{}) or {}).get("name") or ""
-                    yr = (v.get("version",{}) or {}).get("year") or None
-                    if mk and md and yr and str(yr).isdigit():
-                        if (not make or mk.upper()==mk_up) and (not model or md.upper()==md_up) and (not year or int(yr)==int(year)):
-                            msrp = (v.get("pricing",{}) or {}).get("msrp")
-                            fe = (v.get("fuelEconomy",{}) or {})
-                            kml = _to_kml(fe.get("combined")) or _to_kml(fe.get("city")) or _to_kml(fe.get("highway"))
-                            specs_extra = v.get("specs") or {}
-                            extra = {
-                                "segmento_display": (v.get("version") or {}).get("bodyStyle") or (v.get("model") or {}).get("bodyStyleName") or None,
-                                "segmento_ventas": (v.get("model") or {}).get("segmentCategory") or None,
-                                "body_style": (v.get("version") or {}).get("bodyStyle") or None,
-                                "caballos_fuerza": specs_extra.get("caballos_fuerza"),
-                                "longitud_mm": specs_extra.get("longitud_mm"),
-                            }
-                            _add_row(new_rows, mk, md, ver, int(yr), msrp=msrp, kml=kml, extra=extra)
-            # Processed CSV
-            pproc = ROOT / "data" / "equipo_veh_limpio_procesado.csv"
-            if pproc.exists() and pd is not None:
-                t = pd.read_csv(pproc, low_memory=False)
-                t.columns = [str(c).strip().lower() for c in t.columns]
-                q = t.copy()
-                if make:
-                    q = q[q["make"].astype(str).str.upper()==mk_up]
-                if model:
-                    q = q[q["model"].astype(str).str.upper()==md_up]
-                if year and "ano" in q.columns:
-                    q = q[pd.to_numeric(q["ano"], errors="coerce").fillna(0).astype(int)==int(year)]
-                for _, r in q.iterrows():
-                    _add_row(new_rows, r.get("make",""), r.get("model",""), r.get("version"), int(r.get("ano")) if not pd.isna(r.get("ano")) else None,
-                             msrp=r.get("msrp"), tx=r.get("precio_transaccion"), fuel=r.get("categoria_combustible_final"), kml=r.get("combinado_kml"), hp=r.get("caballos_fuerza"), length=r.get("longitud_mm"))
-            # Flat CSV
-            pflat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
-            if pflat.exists() and pd is not None:
-                t = pd.read_csv(pflat, low_memory=False)
-                t.columns = [str(c).strip().lower() for c in t.columns]
-                q = t.copy()
-                if make:
-                    q = q[q["make"].astype(str).str.upper()==mk_up]
-                if model:
-                    q = q[q["model"].astype(str).str.upper()==md_up]
-                if year and "ano" in q.columns:
-                    q = q[pd.to_numeric(q["ano"], errors="coerce").fillna(0).astype(int)==int(year)]
-                for _, r in q.iterrows():
-                    _add_row(new_rows, r.get("make",""), r.get("model",""), r.get("version"), int(r.get("ano")) if not pd.isna(r.get("ano")) else None,
-                             msrp=r.get("msrp"), tx=r.get("precio_transaccion"), fuel=r.get("categoria_combustible_final"), kml=r.get("combinado_kml"), hp=r.get("caballos_fuerza"), length=r.get("longitud_mm"))
-            if new_rows:
-                fallback_df = pd.DataFrame(new_rows)
-                if not fallback_df.empty:
-                    for col in ("make", "model", "version"):
-                        if col in fallback_df.columns:
-                            fallback_df[col] = fallback_df[col].astype(str).str.strip()
-                            if col in {"make", "model", "version"}:
-                                fallback_df[col] = fallback_df[col].str.upper()
-                    if "ano" in fallback_df.columns:
-                        fallback_df["ano"] = pd.to_numeric(fallback_df["ano"], errors="coerce")
-                    if len(sub):
-                        try:
-                            sub = pd.concat([sub, fallback_df], ignore_index=True, sort=False)
-                            dedupe_keys = [c for c in ["make", "model", "version", "ano"] if c in sub.columns]
-                            if dedupe_keys:
-                                sub = sub.drop_duplicates(subset=dedupe_keys, keep="last")
-                        except Exception:
-                            sub = fallback_df
-                    else:
+def _catalog_records(page, fields: Optional[List[str]] = None):
+    """Yield the API rows of ``page`` chunk by chunk, projected to ``fields`` when given."""
+    if fields:
+        needed = set(fields) | {"make", "model", "make_slug", "model_slug"}
+        for f in fields:
+            needed.update(_CATALOG_DERIVED_FROM.get(f, ()))
+        page = page[[c for c in page.columns if c in needed]]
+    for start in range(0, len(page), _CATALOG_RECORD_CHUNK):
+        chunk = page.iloc[start:start + _CATALOG_RECORD_CHUNK]
+        for row in chunk.where(chunk.notna(), None).to_dict(orient="records"):
+            row = _catalog_api_row(row)
+            yield {f: row.get(f) for f in fields} if fields else row
+
+
+def _json_scalar(value: Any) -> Any:
+    """json.dumps fallback for numpy scalars and timestamps."""
+    item = getattr(value, "item", None)
+    if callable(item):
+        return item()
+    return str(value)
+
+
+def _catalog_cursor_epoch() -> str:
+    return f"{_CATALOG_EPOCH}.{_data_files_sig()[:12]}"
+
+
+def _catalog_query_sig(*params: Any) -> str:
+    """Short digest of the /catalog filters a cursor belongs to."""
+    import hashlib as _hashlib
+    raw = json.dumps([None if p is None else str(p) for p in params], ensure_ascii=False)
+    return _hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def _catalog_cursor(offset: int, query_sig: str) -> str:
+    """Opaque /catalog cursor: row offset bound to the data epoch and the query it was issued for."""
+    raw = f"{_catalog_cursor_epoch()}:{query_sig}:{int(offset)}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _catalog_cursor_offset(cursor: str, query_sig: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        epoch, sig, offset = raw.rsplit(":", 2)
+        offset_i = int(offset)
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor inválido")
+    if offset_i < 0:
+        raise HTTPException(status_code=400, detail="cursor inválido")
+    if sig != query_sig:
+        raise HTTPException(status_code=400, detail="cursor inválido: pertenece a otra consulta")
+    if epoch != _catalog_cursor_epoch():
+        raise HTTPException(status_code=410, detail="cursor expirado: los datos cambiaron, reinicia la paginación")
+    return offset_i
+
+
+@app.get("/catalog")
+def get_catalog(response: Response, limit: int = Query(1000, ge=1, le=20000), make: Optional[str] = None, model: Optional[str] = None, year: Optional[int] = None, format: Optional[str] = None, q: Optional[str] = None, cursor: Optional[str] = None, fields: Optional[str] = None) -> Any:  # type: ignore
+    """Catalog rows matching the filters, ``limit`` per page.
+
+    ``cursor`` continues from the ``next_cursor``/``X-Next-Cursor`` of the
+    previous page with the same filters (400 with other filters, 410 once
+    the data changed), ``fields`` projects each row
+    to a comma-separated column list and ``format=ndjson`` streams one JSON
+    row per line.
+    """
+    df = _load_catalog()
+    query_sig = _catalog_query_sig(make, model, year, q, fields)
+    # Canonicalize incoming filters
+    make = _canon_make(make) if make else make
+    model = _canon_model(make, model) if model else model
+    sub = df
+    if make or model or year:
+        sub = _catalog_lookup(make or None, model or None, int(year) if year else None)
+    q_exact = False
+    if q:
+        try:
+            import numpy as np  # type: ignore
+
+            # Ranked n-gram hits (best first), restricted to the filtered rows
+            found = _catalog_search(df).search(q)
+            q_exact = bool(found) and found[0][1] >= SEARCH_EXACT
+            pos = np.concatenate([rows for rows, _score in found]) if found else np.empty(0, dtype=np.intp)
+            if sub is not df:
+                pos = pos[df.index[pos].isin(sub.index)]
+            sub = df.take(pos)
+        except Exception:
+            try:
+                token = str(q).strip().upper()
+                q_exact = True
+                mask = None
+                for col in ("make","model","version"):
+                    if col in sub.columns:
+                        m = sub[col].astype(str).str.upper().str.contains(token, na=False)
+                        mask = m if mask is None else (mask | m)
+                if mask is not None:
+                    sub = sub[mask]
+            except Exception:
+                pass
+    # Fallback: if no rows after filters, try building from external sources (processed/flat/JSON).
+    # A free-text search answered verbatim by the catalog index does not go to
+    # disk; typo-tolerant hits alone do, and give way to verbatim ones there.
+    token_q = str(q or "").strip().upper()
+    q_fuzzy = bool(token_q) and (sub.empty or not q_exact)
+    needs_fallback = bool(make or model) or q_fuzzy
+    if needs_fallback:
+        try:
+            mk_up = _canon_make(make) or (make or "").upper()
+            md_up = _canon_model(make, model) or (model or "").upper()
+            fb, fb_index, fb_text = _catalog_fallback()
+            pos = fb_index.rows(mk_up if make else None, md_up if model else None, int(year) if year else None)
+            if token_q and len(pos):
+                pos = pos[fb_text.iloc[pos].str.contains(token_q, regex=False).to_numpy()]
+            if len(pos):
+                # object columns: cells the fallback lacks stay None, not float NaN
+                fallback_df = fb.take(pos).reindex(columns=list(dict.fromkeys([*df.columns, *fb.columns]))).astype(object)
+                if len(sub) and not q_fuzzy:
+                    try:
+                        sub = pd.concat([sub, fallback_df], ignore_index=True, sort=False)
+                        dedupe_keys = [c for c in ["make", "model", "version", "ano"] if c in sub.columns]
+                        if dedupe_keys:
+                            sub = sub.drop_duplicates(subset=dedupe_keys, keep="last")
+                    except Exception:
                         sub = fallback_df
+                else:
+                    sub = fallback_df
         except Exception:
             pass
 
-    # Normalise and deduplicate after merging fallback
+    # Normalise and deduplicate after merging fallback (an unfiltered request
+    # still holds the shared epoch frame, which must not be written to)
+    if sub is df:
+        sub = df.copy(deep=not _PANDAS_COW)
     try:
         for col in ("make", "model", "version"):
             if col in sub.columns:
@@ -8010,43 +9413,27 @@ def get_catalog(limit: int = Query(1000, ge=1, le=20000), make: Optional[str] =
     except Exception:
         pass
 
-    rows = sub.head(limit).where(sub.notna(), None).to_dict(orient="records")
-    for row in rows:
-        try:
-            mk_key = str(row.get("make") or row.get("make_slug") or "").strip().upper()
-            md_key = str(row.get("model") or row.get("model_slug") or "").strip().upper()
-            override = FALLBACK_SPEC_OVERRIDES.get((mk_key, md_key))
-            if override:
-                for key, value in override.items():
-                    if value is None:
-                        continue
-                    if key not in row or row.get(key) in (None, ""):
-                        row[key] = value
-            if row.get("precio_transaccion") in (None, ""):
-                pt = row.get("price_transaction") or row.get("msrp")
-                if pt not in (None, ""):
-                    row["precio_transaccion"] = pt
-            if row.get("caballos_fuerza") in (None, "") and row.get("engine_power_hp") not in (None, ""):
-                row["caballos_fuerza"] = row.get("engine_power_hp")
-            if row.get("longitud_mm") in (None, "") and row.get("length_mm") not in (None, ""):
-                row["longitud_mm"] = row.get("length_mm")
-
-            fc = row.get("fuel_combined_kml")
-            if fc not in (None, ""):
-                row["combinado_kml"] = fc
-            fl = row.get("fuel_combined_l_100km")
-            if fl not in (None, ""):
-                row["combinado_l_100km"] = fl
-            city = row.get("fuel_city_kml")
-            if city not in (None, ""):
-                row["ciudad_kml"] = city
-            hw = row.get("fuel_highway_kml")
-            if hw not in (None, ""):
-                row["carretera_kml"] = hw
-        except Exception:
-            continue
-    if (format or "").lower() in {"obj", "object", "json"}:
-        return {"count": len(rows), "items": rows, "total": len(rows)}
+    total = int(len(sub))
+    offset = _catalog_cursor_offset(cursor, query_sig) if cursor else 0
+    page = sub.iloc[offset:offset + limit]
+    next_cursor = _catalog_cursor(offset + limit, query_sig) if offset + limit < total else None
+    projection = [f.strip() for f in str(fields or "").split(",") if f.strip()] or None
+    fmt = (format or "").lower()
+    if fmt == "ndjson":
+        headers = {"X-Total-Count": str(total)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        lines = (
+            json.dumps(row, ensure_ascii=False, default=_json_scalar) + "\n"
+            for row in _catalog_records(page, projection)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
+    rows = list(_catalog_records(page, projection))
+    if fmt in {"obj", "object", "json"}:
+        return {"count": len(rows), "items": rows, "total": total, "next_cursor": next_cursor}
+    response.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return rows
 
 
@@ -8109,8 +9496,96 @@ def _compare_core(
     usage_ctx = _membership_usage_precheck(request, payload) if increment_usage else None
     dealer_id = _extract_dealer_id(request, payload)
     _enforce_dealer_access(dealer_id)
-    own = payload.get("own") or {}
-    competitors = payload.get("competitors") or []
+    result = _compare_jobs([(payload.get("own") or {}, payload.get("competitors") or [])])[0]
+    if increment_usage:
+        _membership_usage_commit(usage_ctx, "compare")
+    return result
+
+
+# Service costs from the maintenance CSVs: (files signature, MaintenanceIndex | None)
+_MAINT_INDEX: tuple = (None, None)
+_MAINT_INDEX_LOCK = threading.Lock()
+
+
+def _maintenance_index() -> Optional[MaintenanceIndex]:
+    """Index of the maintenance cost CSVs, rebuilt when one of them changes."""
+    global _MAINT_INDEX
+    paths = [ROOT / "data" / "costos_mantenimiento.csv", ROOT / "data" / "enriched" / "costos_mantenimiento_enriched.csv"]
+    sig = tuple(file_signature(p) for p in paths)
+    cached_sig, idx = _MAINT_INDEX
+    if cached_sig == sig:
+        return idx
+    with _MAINT_INDEX_LOCK:
+        cached_sig, idx = _MAINT_INDEX
+        if cached_sig != sig:
+            try:
+                idx = MaintenanceIndex(paths)
+            except Exception:
+                idx = None
+            _MAINT_INDEX = (sig, idx)
+    return idx
+
+
+def _compare_year_pref(own: Mapping[str, Any]) -> int:
+    """Sales year /compare uses for a base vehicle (its model year, else 2025)."""
+    try:
+        return int(own.get("ano")) if own.get("ano") else 2025
+    except Exception:
+        return 2025
+
+
+# Enriched rows shared by /compare, /compare/batch, /insights, /price_explain
+# and /dealer_insights (per worker)
+_ENRICHED_CACHE = EnrichedCache(int(os.getenv("ENRICHED_CACHE_SIZE", "2048")))
+_ENRICHED_FILES_SIG: Dict[str, Any] = {"at": 0.0, "sig": None}
+
+
+def _enrichment_epoch() -> tuple:
+    """Data an enriched row depends on beyond the row itself.
+
+    Catalog epoch, the read-endpoint files (sales, aliases, options), the
+    files only the enrichment reads (features overlay, maintenance costs,
+    vehicle JSON) and the fuel prices snapshot used for the 60k energy cost.
+    """
+    now = time.monotonic()
+    files = _ENRICHED_FILES_SIG["sig"]
+    if files is None or now - _ENRICHED_FILES_SIG["at"] >= _DATA_SIG_RECHECK_S:
+        paths = [
+            ROOT / "data" / "overrides" / "features_overlay.csv",
+            ROOT / "data" / "costos_mantenimiento.csv",
+            ROOT / "data" / "enriched" / "costos_mantenimiento_enriched.csv",
+            *_vehicle_json_candidates(),
+        ]
+        files = tuple(file_signature(p) for p in paths)
+        _ENRICHED_FILES_SIG.update({"at": now, "sig": files})
+    return (_CATALOG_EPOCH, _data_files_sig(), files, _FUEL_PRICES.version)
+
+
+def _enriched_row(kind: str, row: Mapping[str, Any], fn: Callable[[Dict[str, Any]], Any], *scope: Any) -> Any:
+    """``fn(dict(row))`` through ``_ENRICHED_CACHE``.
+
+    The key is the vehicle identity (make, model, year, version), ``kind``
+    and ``scope`` (which enrichment and its parameters), the data epoch and a
+    digest of the whole input row, since callers may send edited rows.
+    """
+    ident = tuple(str(row.get(k) or "").strip().upper() for k in ("make", "model", "ano", "version"))
+    key = (kind, ident, scope, _enrichment_epoch(), content_hash(dict(row)))
+    return _ENRICHED_CACHE.get_or_compute(key, lambda: fn(dict(row)))
+
+
+def _ensure_base_metrics(row: Mapping[str, Any]) -> Dict[str, Any]:
+    """Energía 60k, score de equipo y pilares (cacheado)."""
+    return _enriched_row("base", row, lambda r: ensure_pillars(ensure_equip_score(ensure_fuel_60(r))))
+
+
+def _compare_jobs(jobs: List[tuple]) -> List[Dict[str, Any]]:
+    """/compare results for each (own, competitors) job, in order.
+
+    Sales lookups and overlays are built once per call and enriched rows come
+    from ``_ENRICHED_CACHE``; the comparison against each base is computed
+    per job. All bases must share ``_compare_year_pref`` (the sales year the
+    lookups are built for).
+    """
     def to_num(x):
         try:
             return float(x)
@@ -8431,26 +9906,7 @@ def _compare_core(
                     pass
         return None
     def _fuel_price_for(row: Dict[str, Any]) -> Optional[float]:
-        try:
-            cfg = get_config()
-        except Exception:
-            cfg = {"fuel_prices": {}}
-        prices = cfg.get("fuel_prices", {})
-        lc = _fuel_raw(row).lower()
-        if not lc:
-            return None
-        if "elect" in lc:
-            return 0.0
-        if "diesel" in lc:
-            return to_num(prices.get("diesel_litro"))
-        if "premium" in lc:
-            return to_num(prices.get("gasolina_premium_litro") or prices.get("gasolina_magna_litro"))
-        # magna / regular / gasolina genérica
-        if "magna" in lc or "regular" in lc:
-            return to_num(prices.get("gasolina_magna_litro") or prices.get("gasolina_premium_litro"))
-        if any(k in lc for k in ("gas", "nafta", "petrol", "gasolina")):
-            return to_num(prices.get("gasolina_magna_litro") or prices.get("gasolina_premium_litro"))
-        return None
+        return fuel_prices.price_for(_fuel_raw(row))
     def ensure_fuel_60(row: Dict[str, Any]) -> Dict[str, Any]:
         out = dict(row)
         if out.get("fuel_cost_60k_mxn") is None:
@@ -8612,10 +10068,6 @@ def _compare_core(
           3) For each feature missing in `row`, copy the value from the picked candidate when non-empty.
         """
         try:
-            df = _load_catalog().copy()
-            for c in ("make", "model", "version"):
-                if c in df.columns:
-                    df[c] = df[c].astype(str)
             mk = str(row.get("make") or "").strip().upper()
             md = str(row.get("model") or "").strip().upper()
             vr = str(row.get("version") or "").strip().upper()
@@ -8623,9 +10075,12 @@ def _compare_core(
                 yr = int(row.get("ano")) if row.get("ano") is not None else None
             except Exception:
                 yr = None
-            sub_all = df[(df.get("make").astype(str).str.upper() == mk) & (df.get("model").astype(str).str.upper() == md)]
+            sub_all = _catalog_lookup(mk, md)
             if sub_all.empty:
                 return
+            for c in ("make", "model", "version"):
+                if c in sub_all.columns:
+                    sub_all[c] = sub_all[c].astype(str)
             sub = sub_all.copy()
             year_used: Optional[int] = None
             if yr is not None and "ano" in sub.columns:
@@ -8788,131 +10243,16 @@ def _compare_core(
         except Exception:
             pass
 
-    # Optional: model-level YTD units from precomputed monthly file (sum of all versions)
-    def _build_model_ytd_lookup(year: int) -> Dict[tuple, tuple[int, Optional[int]]]:
-        """Return {(MAKE,MODEL,YEAR): (ytd_units, last_month_with_data)}"""
-        out: Dict[tuple, tuple[int, Optional[int]]] = {}
-        try:
-            path = ROOT / "data" / "enriched" / f"sales_ytd_{year}.csv"
-            if not path.exists() and year != 2025:
-                path = ROOT / "data" / "enriched" / "sales_ytd_2025.csv"
-            if not path.exists():
-                return out
-            import pandas as _pd  # lazy import
-            s = _pd.read_csv(path, low_memory=False)
-            s.columns = [str(c).strip().lower() for c in s.columns]
-            def up(v): return str(v or "").strip().upper()
-            s["__mk"] = s.get("make", _pd.Series(dtype=str)).map(up)
-            s["__md"] = s.get("model", _pd.Series(dtype=str)).map(up)
-            s["__yr"] = _pd.to_numeric(s.get("ano"), errors="coerce").astype("Int64")
-            # sumar columnas mensuales ventas_{year}_MM si existen
-            months = [c for c in s.columns if str(c).startswith(f"ventas_{year}_")]
-            if not months:
-                return out
-            s["__ytd"] = s[months].apply(lambda r: _pd.to_numeric(r, errors="coerce").fillna(0).sum(), axis=1)
-            # último mes con datos
-            def _last_m(row):
-                for m in range(12, 0, -1):
-                    col = f"ventas_{year}_{m:02d}"
-                    try:
-                        v = float(row.get(col))
-                        if v and v > 0:
-                            return m
-                    except Exception:
-                        pass
-                return None
-            s["__lm"] = s.apply(_last_m, axis=1)
-            for _, row in s.iterrows():
-                raw_mk = row["__mk"]
-                mk = _canon_make(raw_mk) or raw_mk
-                raw_md = row["__md"]
-                md = _canon_model(mk, raw_md) or raw_md
-                yr_val = int(row["__yr"]) if not _pd.isna(row["__yr"]) else year
-                key = (mk, md, yr_val)
-                ytd = int(float(row.get("__ytd") or 0))
-                lm = (int(row.get("__lm")) if row.get("__lm") == row.get("__lm") else None)
-                out[key] = (ytd, lm)
-        except Exception:
-            return out
-        return out
-
-    def _build_segment_totals(year: int) -> tuple[Dict[str, int], Dict[tuple, str]]:
-        """Return (segment_ytd_totals, seg_map[(MK,MD)] = seg).
-
-        Preferir equipo_veh_limpio_procesado.csv (columna body_style/body_type) como fuente de segmento por modelo.
-        Fallback: data/enriched/vehiculos_todos_flat.csv.
-        """
-        totals: Dict[str, int] = {}
-        seg_map: Dict[tuple, str] = {}
-        try:
-            import pandas as _pd
-            def _norm_seg(sv: str) -> str:
-                s0 = (sv or "").strip().lower()
-                if any(x in s0 for x in ("pick","cab","chasis","camioneta")): return "Pickup"
-                if any(x in s0 for x in ("todo terreno","suv","crossover","sport utility")): return "SUV'S"
-                if "van" in s0: return "Van"
-                if any(x in s0 for x in ("hatch","hb")): return "Hatchback"
-                if any(x in s0 for x in ("sedan","sedán","saloon")): return "Sedán"
-                return sv
-
-            built = False
-            # 1) equipo_veh_limpio_procesado.csv
-            proc = ROOT / "data" / "equipo_veh_limpio_procesado.csv"
-            if proc.exists():
-                f = _pd.read_csv(proc, low_memory=False)
-                f.columns = [str(c).strip().lower() for c in f.columns]
-                col_seg = None
-                for c in ("body_type", "body_style"):
-                    if c in f.columns:
-                        col_seg = c; break
-                if col_seg and {"make","model"}.issubset(f.columns):
-                    ff = f[["make","model", col_seg]].dropna(how="any")
-                    ff["seg"] = ff[col_seg].astype(str).map(_norm_seg)
-                    grp = ff.groupby([ff["make"].astype(str).str.upper(), ff["model"].astype(str).str.upper()])["seg"].agg(lambda x: x.value_counts().idxmax())
-                    seg_map = {k: v for k, v in grp.to_dict().items()}
-                    built = True
-
-            # 2) Fallback: vehiculos_todos_flat.csv
-            if not built:
-                flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
-                if flat.exists():
-                    f = _pd.read_csv(flat, low_memory=False)
-                    f.columns = [str(c).strip().lower() for c in f.columns]
-                    if {"make","model"}.issubset(f.columns):
-                        ff = f[["make","model","segmento_ventas","body_style"]].dropna(how="all")
-                        ff["seg"] = ff["segmento_ventas"].fillna(ff["body_style"]).astype(str).map(_norm_seg)
-                        grp = ff.groupby([ff["make"].astype(str).str.upper(), ff["model"].astype(str).str.upper()])["seg"].agg(lambda x: x.value_counts().idxmax())
-                        seg_map = {k: v for k, v in grp.to_dict().items()}
-
-            # 3) ventas YTD por segmento
-            path = ROOT / "data" / "enriched" / f"sales_ytd_{year}.csv"
-            if not path.exists():
-                path = ROOT / "data" / "enriched" / "sales_ytd_2025.csv"
-            if not path.exists():
-                return totals, seg_map
-            s = _pd.read_csv(path, low_memory=False)
-            s.columns = [str(c).strip().lower() for c in s.columns]
-            def up(v): return str(v or "").strip().upper()
-            s["__mk"], s["__md"] = s.get("make"," ").map(up), s.get("model"," ").map(up)
-            s["seg"] = s.apply(lambda r: seg_map.get((r["__mk"], r["__md"])) or "(sin segmento)", axis=1)
-            months = [c for c in s.columns if str(c).startswith(f"ventas_{year}_")]
-            if not months:
-                return totals, seg_map
-            s["__ytd"] = s[months].apply(lambda r: _pd.to_numeric(r, errors="coerce").fillna(0).sum(), axis=1)
-            by = s.groupby("seg")["__ytd"].sum()
-            totals = {str(k): int(v) for k, v in by.to_dict().items()}
-        except Exception:
-            return totals, seg_map
-        return totals, seg_map
-
-    try:
-        yr_pref = int(own.get("ano")) if own.get("ano") else 2025
-    except Exception:
-        yr_pref = 2025
-    _MODEL_YTD = _build_model_ytd_lookup(yr_pref)
-    _SEG_TOTALS, _SEG_MAP = _build_segment_totals(yr_pref)
+    yr_pref = _compare_year_pref(jobs[0][0] if jobs else {})
+    # One fuel price snapshot for every row of this call
+    fuel_prices = _FUEL_PRICES.current()
+    # Sales come from the per-epoch index (model YTD, segment totals, monthlies)
+    _SALES_PREF = _sales_year(yr_pref)
+    _SALES_2025 = _sales_year(2025)
+    _SEG_MAP = _sales_segment_map("compare")[0]
+    _SEG_TOTALS = _sales_segment_totals(yr_pref)
     # Precompute 2025 totals for fallback shares
-    _SEG_TOTALS_2025, _SEG_MAP_2025 = _build_segment_totals(2025)
+    _SEG_TOTALS_2025 = _sales_segment_totals(2025)
 
     # Attach monthly sales (ventas_2025_MM) to a row when available in catalog; fall back to 2025 by (make,model)
     def _attach_monthlies(row: Dict[str, Any]) -> Dict[str, Any]:
@@ -8921,47 +10261,33 @@ def _compare_core(
         md = _canon_model(mk, row.get("model")) or ""
         try:
             # Prefer sales_ytd_2025.csv
-            path = ROOT / "data" / "enriched" / "sales_ytd_2025.csv"
-            if path.exists() and pd is not None:
-                s = pd.read_csv(path, low_memory=False)
-                s.columns = [str(c).strip().lower() for c in s.columns]
-                def up(v): return str(v or "").strip().upper()
-                s["__mk"], s["__md"] = s.get("make"," ").map(up), s.get("model"," ").map(up)
-                pick = None
-                ss = s[(s["__mk"] == mk) & (s["__md"] == md)]
-                if not ss.empty:
-                    pick = ss.iloc[0]
-                if pick is None:
-                    # model-only match
-                    ss2 = s[s["__md"] == md]
-                    if not ss2.empty:
-                        pick = ss2.sort_values(by=list(ss2.columns)).iloc[0]
-                if pick is not None:
-                    for m in range(1,13):
-                        col = f"ventas_2025_{m:02d}"
-                        if col in s.columns and row.get(col) is None:
-                            try:
-                                row[col] = int(float(pick.get(col) or 0))
-                            except Exception:
-                                pass
-                    if row.get("ventas_ytd_2025") is None and "ventas_ytd_2025" in s.columns:
-                        try: row["ventas_ytd_2025"] = int(float(pick.get("ventas_ytd_2025") or 0))
-                        except Exception: pass
+            pos = _SALES_2025.pick(mk, md) if _SALES_2025 is not None else None
+            if pos is not None:
+                for m in _SALES_2025.months:
+                    col = f"ventas_2025_{m:02d}"
+                    v = _SALES_2025.monthly_raw[pos, m - 1]
+                    if row.get(col) is None and v == v:
+                        row[col] = int(v)
+                ytd_rep = _SALES_2025.ytd_reported
+                if row.get("ventas_ytd_2025") is None and ytd_rep is not None and ytd_rep[pos] == ytd_rep[pos]:
+                    row["ventas_ytd_2025"] = int(ytd_rep[pos])
         except Exception:
             pass
         # Fallback: catalog (por si tuviera campos mensuales)
         try:
-            dfc = _load_catalog().copy()
-            sub = dfc[(dfc.get("make").astype(str) == mk) & (dfc.get("model").astype(str) == md)]
-            if not sub.empty:
+            # Index lookup narrows to the model's rows; the exact match runs on that slice
+            sub = _catalog_lookup(mk, md) if mk and md else None
+            if sub is not None:
+                sub = sub[(sub["make"].astype(str) == mk) & (sub["model"].astype(str) == md)]
+            if sub is not None and not sub.empty:
                 p = sub.iloc[0]
                 for m in range(1,13):
                     col = f"ventas_2025_{m:02d}"
-                    if col in dfc.columns and row.get(col) is None:
+                    if col in sub.columns and row.get(col) is None:
                         v = p.get(col)
                         if v is not None:
                             row[col] = v
-                if row.get("ventas_ytd_2025") is None and "ventas_ytd_2025" in dfc.columns:
+                if row.get("ventas_ytd_2025") is None and "ventas_ytd_2025" in sub.columns:
                     row["ventas_ytd_2025"] = p.get("ventas_ytd_2025")
         except Exception:
             pass
@@ -8969,45 +10295,34 @@ def _compare_core(
 
     def _model_ytd(mk: str, md: str, yr: int) -> tuple[Optional[int], Optional[int], Optional[int]]:
         try:
-            key = (mk, md, yr)
-            if key in _MODEL_YTD:
-                ytd, lm = _MODEL_YTD[key]
-                return ytd, lm, yr
-            # fallback: try 2025, then any year for that (mk,md)
-            if (mk, md, 2025) in _MODEL_YTD:
-                ytd, lm = _MODEL_YTD[(mk, md, 2025)]
-                return ytd, lm, 2025
-            # fallback 2: any year for that (mk,md)
-            for (mk2, md2, y), val in _MODEL_YTD.items():
-                if mk2 == mk and md2 == md:
-                    ytd, lm = val
+            sales = _SALES_PREF
+            if sales is not None:
+                hit = sales.units(mk, md, yr)
+                if hit is not None:
+                    ytd, lm = hit
+                    return ytd, lm, yr
+                # fallback: try 2025, then any year for that (mk,md)
+                hit = sales.units(mk, md, 2025)
+                if hit is not None:
+                    ytd, lm = hit
+                    return ytd, lm, 2025
+                # fallback 2: any year for that (mk,md)
+                found = sales.units_any_year(mk, md)
+                if found is not None:
+                    (ytd, lm), y = found
                     return ytd, lm, int(y)
-            # fallback 3: match by model only (brand name variations)
-            cands: list[tuple[int, Optional[int]]] = []
-            for (mk2, md2, y), val in _MODEL_YTD.items():
-                if md2 == md:
-                    cands.append(val)
-            if cands:
-                # pick the one with max YTD
-                ytd, lm = sorted(cands, key=lambda t: (t[0] or 0), reverse=True)[0]
-                # año desconocido; asume 2025 si el archivo existe (regla de negocio)
-                return ytd, lm, 2025
-            # Ultimate fallback: load 2025 lookup and match by (make,model) or model-only
-            try:
-                y2025 = _build_model_ytd_lookup(2025)
-                if (mk, md, 2025) in y2025:
-                    ytd, lm = y2025[(mk, md, 2025)]
+                # fallback 3: match by model only (brand name variations), max YTD
+                hit = sales.units_by_model(md)
+                if hit is not None:
+                    ytd, lm = hit
+                    # año desconocido; asume 2025 si el archivo existe (regla de negocio)
                     return ytd, lm, 2025
-                # model-only within 2025 map
-                cands_25: list[tuple[int, Optional[int]]] = []
-                for (mk2, md2, y), val in y2025.items():
-                    if y == 2025 and md2 == md:
-                        cands_25.append(val)
-                if cands_25:
-                    ytd, lm = sorted(cands_25, key=lambda t: (t[0] or 0), reverse=True)[0]
+            # Ultimate fallback: 2025 lookup by (make,model) or model-only
+            if _SALES_2025 is not None:
+                hit = _SALES_2025.units(mk, md, 2025) or _SALES_2025.units_by_model(md, same_year=True)
+                if hit is not None:
+                    ytd, lm = hit
                     return ytd, lm, 2025
-            except Exception:
-                pass
         except Exception:
             pass
         return None, None, None
@@ -9019,8 +10334,7 @@ def _compare_core(
             mk = str(row.get("make") or "").strip().upper()
             md = str(row.get("model") or "").strip().upper()
             if v is None and mk and md and pd is not None:
-                t = _load_catalog().copy()
-                t = t[(t.get("make").astype(str).str.upper()==mk) & (t.get("model").astype(str).str.upper()==md)]
+                t = _catalog_lookup(mk, md)
                 if col in t.columns:
                     cand = pd.to_numeric(t[col], errors="coerce").dropna()
                     if len(cand):
@@ -9034,8 +10348,7 @@ def _compare_core(
             mk = str(row.get("make") or "").strip().upper()
             md = str(row.get("model") or "").strip().upper()
             if (val in (None, "", float('nan'))) and mk and md and pd is not None:
-                t = _load_catalog().copy()
-                t = t[(t.get("make").astype(str).str.upper()==mk) & (t.get("model").astype(str).str.upper()==md)]
+                t = _catalog_lookup(mk, md)
                 if col in t.columns:
                     ser = t[col].dropna().astype(str)
                     if len(ser):
@@ -9052,33 +10365,7 @@ def _compare_core(
             yr = str(row.get("ano") or "").strip()
             if not (mk and md and vr):
                 return
-            entries = _load_vehicle_json_entries()
-            if not entries:
-                return
-
-            vr_compact = _compact_key(vr)
-
-            hit_entry = None
-            if yr:
-                for ent in entries:
-                    if ent["mk"] == mk and ent["md"] == md and ent["ver"] == vr and ent["year"] == yr:
-                        hit_entry = ent
-                        break
-                if not hit_entry:
-                    for ent in entries:
-                        if ent["mk"] == mk and ent["md"] == md and ent["ver_compact"] == vr_compact and ent["year"] == yr:
-                            hit_entry = ent
-                            break
-            if not hit_entry:
-                for ent in entries:
-                    if ent["mk"] == mk and ent["md"] == md and ent["ver"] == vr:
-                        hit_entry = ent
-                        break
-            if not hit_entry:
-                for ent in entries:
-                    if ent["mk"] == mk and ent["md"] == md and ent["ver_compact"] == vr_compact:
-                        hit_entry = ent
-                        break
+            hit_entry = _find_vehicle_json_entry(mk, md, vr, yr)
             if not hit_entry:
                 return
 
@@ -9948,12 +11235,12 @@ def _compare_core(
             # Tratar 1.0 como sentinela (permitir sobreescritura)
             if v is not None and v > 1:
                 return
-            dfc = _load_catalog().copy()
             mk = _canon_make(row.get("make"))
             md = _canon_model(mk, row.get("model"))
             if mk is None or md is None:
                 return
-            sub = dfc[(dfc.get("make").astype(str) == mk) & (dfc.get("model").astype(str) == md)]
+            # make/model are stored canonical (upper-case), so the index key matches
+            sub = _catalog_lookup(mk, md)
             pick_val = None
             if "service_cost_60k_mxn" in sub.columns:
                 try:
@@ -9976,71 +11263,14 @@ def _compare_core(
             pass
 
     def _ensure_service_from_csv(row: Dict[str, Any]) -> None:
-        """Lookup service_cost_60k_mxn directly from data/costos_mantenimiento.csv using
-        flexible matching and prefer values > 1 (ignora sentinela 1).
+        """Lookup service_cost_60k_mxn from data/costos_mantenimiento.csv (índice por época)
+        using flexible matching and prefer values > 1 (ignora sentinela 1).
         Orden de preferencia: (mk, md, yr, vr) -> (mk, md, yr) -> (mk, md, 2025) -> (mk, md, any).
         """
         try:
             vcur = to_num(row.get("service_cost_60k_mxn"))
-            import csv as _csv
-            # Leer principal y fallback enriquecido
-            paths = [ROOT / "data" / "costos_mantenimiento.csv", ROOT / "data" / "enriched" / "costos_mantenimiento_enriched.csv"]
-            recs = []
-            for prio, p in enumerate(paths):
-                if not p.exists():
-                    continue
-                with p.open("r", encoding="utf-8", newline="") as f:
-                    rd = _csv.DictReader(f)
-                    for r in rd:
-                        mk = str(r.get("MAKE") or r.get("Make") or r.get("make") or "").strip().upper()
-                        md = str(r.get("Model") or r.get("MODEL") or r.get("model") or "").strip().upper()
-                        vr_raw = str(r.get("Version") or r.get("VERSION") or r.get("version") or "").strip().upper()
-                        vr = vr_raw
-                        try:
-                            yr = int(str(r.get("Año") or r.get("ano") or r.get("AÑO") or "").strip())
-                        except Exception:
-                            yr = None
-                        # Parse value: allow numeric and textual 'Incluido'. Algunas fuentes usan
-                        # otras columnas ("60000", "Costo 60k", etc.); tomamos el primer valor disponible.
-                        raw_val = None
-                        for col in (
-                            "service_cost_60k_mxn",
-                            "ServiceCost60k",
-                            "service_cost",
-                            "60000",
-                            "Costo_60k",
-                            "Costo 60k",
-                        ):
-                            v = r.get(col)
-                            if v not in (None, ""):
-                                raw_val = v
-                                break
-                        raw = str(raw_val or "").strip()
-                        val = None
-                        if raw != "":
-                            low = raw.lower().strip()
-                            # Accept 'incluido' or similar as 0 (incluido)
-                            if any(tok in low for tok in ("incluido","inclu","gratis","incl.")):
-                                val = 0.0
-                            else:
-                                try:
-                                    raw_num = raw.replace(",", "").replace("$", "")
-                                    val = float(raw_num)
-                                except Exception:
-                                    val = None
-                        # Acepta 0 (incluido) y >1; ignora sólo 1 (sentinela) o negativos/NaN
-                        if val is None or (val == 1) or (val < 0):
-                            continue
-                        recs.append({
-                            "mk": mk,
-                            "md": md,
-                            "vr": vr,
-                            "vr_compact": _compact_key(vr),
-                            "yr": yr,
-                            "val": val,
-                            "prio": prio,
-                        })
-            if not recs:
+            idx = _maintenance_index()
+            if idx is None or not idx.size:
                 return
             mk0 = _canon_make(row.get("make")) or str(row.get("make") or "").strip().upper()
             md0 = _canon_model(mk0, row.get("model")) or str(row.get("model") or "").strip().upper()
@@ -10050,21 +11280,7 @@ def _compare_core(
                 yr0 = int(row.get("ano")) if row.get("ano") is not None else None
             except Exception:
                 yr0 = None
-            def pick(filter_fn):
-                cand = [r for r in recs if filter_fn(r)]
-                if not cand:
-                    return None
-                cand.sort(key=lambda x: (x.get("prio", 1), 0 if x["val"] == 0 else 1, x["val"]))
-                return cand[0]["val"]
-            # Exact (mk, md, yr, vr)
-            vr0_compact = _compact_key(vr0)
-            val = pick(lambda r: r["mk"]==mk0 and r["md"]==md0 and r["yr"]==yr0 and (r["vr"]==vr0 or r.get("vr_compact")==vr0_compact))
-            if val is None and yr0 is not None:
-                val = pick(lambda r: r["mk"]==mk0 and r["md"]==md0 and r["yr"]==yr0)
-            if val is None:
-                val = pick(lambda r: r["mk"]==mk0 and r["md"]==md0 and r["yr"]==2025)
-            if val is None:
-                val = pick(lambda r: r["mk"]==mk0 and r["md"]==md0)
+            val = idx.lookup(mk0, md0, yr0, vr0)
             if val is not None:
                 row["service_cost_60k_mxn"] = float(val)
             elif vcur is not None and vcur > 1:
@@ -10072,121 +11288,124 @@ def _compare_core(
                 row["service_cost_60k_mxn"] = float(vcur)
         except Exception:
             pass
-    for _c in ("caballos_fuerza","longitud_mm","combinado_kml","ciudad_kml","carretera_kml","msrp","precio_transaccion"):
-        _fill_from_model(own, _c)
-    for _s in ("categoria_combustible_final","tipo_de_combustible_original","body_style","transmision","traccion","driven_wheels","doors","images_default"):
-        _fill_from_model_any(own, _s)
-    # Fallback directo desde JSON para corregir FE (mpg->kml) y tren motriz si faltan
-    _fill_from_json(own)
-    # Enriquecer features booleanos desde catálogo si faltan
-    _ensure_features_from_catalog(own)
-    # Usar catálogo/overlays/CSV; no setear sentinela 1 MXN
-    _ensure_service_from_catalog(own)
-    _ensure_service_from_csv(own)
-    # No aplicar overlay a la base para no ocultar "ellos sí (nosotros no)" cuando falten datos reales
-
-    # TX fallback: si falta o <=0, usa MSRP
-    try:
-        tx = to_num(own.get("precio_transaccion"))
-        if (tx is None) or (tx <= 0):
-            p = to_num(own.get("msrp"))
-            if p is not None:
-                own["precio_transaccion"] = p
-    except Exception:
-        pass
-    # Fuel 60k fallback
-    own = ensure_fuel_60(own)
-    own = ensure_pillars(own)
-    own = ensure_equip_score(own)
-    own = _attach_monthlies(own)
-
-    # Calcular/normalizar bono según regla TX>0 y TX<MSRP
-    b = bonus(own)
-    if b is not None:
-        own["bono"] = b
-    else:
-        # remover bono inválido
+    def _enrich_own(own: Dict[str, Any]) -> Dict[str, Any]:
+        """Base vehicle enrichment (the features overlay is only applied to competitors)."""
+        for _c in ("caballos_fuerza","longitud_mm","combinado_kml","ciudad_kml","carretera_kml","msrp","precio_transaccion"):
+            _fill_from_model(own, _c)
+        for _s in ("categoria_combustible_final","tipo_de_combustible_original","body_style","transmision","traccion","driven_wheels","doors","images_default"):
+            _fill_from_model_any(own, _s)
+        # Fallback directo desde JSON para corregir FE (mpg->kml) y tren motriz si faltan
+        _fill_from_json(own)
+        # Enriquecer features booleanos desde catálogo si faltan
+        _ensure_features_from_catalog(own)
+        # Usar catálogo/overlays/CSV; no setear sentinela 1 MXN
+        _ensure_service_from_catalog(own)
+        _ensure_service_from_csv(own)
+        # No aplicar overlay a la base para no ocultar "ellos sí (nosotros no)" cuando falten datos reales
+
+        # TX fallback: si falta o <=0, usa MSRP
+        try:
+            tx = to_num(own.get("precio_transaccion"))
+            if (tx is None) or (tx <= 0):
+                p = to_num(own.get("msrp"))
+                if p is not None:
+                    own["precio_transaccion"] = p
+        except Exception:
+            pass
+        # Fuel 60k fallback
+        own = ensure_fuel_60(own)
+        own = ensure_pillars(own)
+        own = ensure_equip_score(own)
+        own = _attach_monthlies(own)
+
+        # Calcular/normalizar bono según regla TX>0 y TX<MSRP
+        b = bonus(own)
+        if b is not None:
+            own["bono"] = b
+        else:
+            # remover bono inválido
+            try:
+                if "bono" in own: del own["bono"]
+                if "bono_mxn" in own: del own["bono_mxn"]
+            except Exception:
+                pass
+        if own.get("tco_60k_mxn") is None:
+            t = tco60(own)
+            if t is not None:
+                own["tco_60k_mxn"] = t
+        if own.get("tco_total_60k_mxn") is None:
+            tt = tco60_total(own)
+            if tt is not None:
+                own["tco_total_60k_mxn"] = tt
+        # Extra inferences for display completeness. The model-level fill above
+        # takes the first catalog row, so a version whose name states more HP
+        # (e.g. "... 110hp" over a 90hp sibling) is corrected from its own text.
         try:
-            if "bono" in own: del own["bono"]
-            if "bono_mxn" in own: del own["bono_mxn"]
+            _infer_hp_from_texts(own)
+            _ensure_audio_speakers(own)
         except Exception:
             pass
-    if own.get("tco_60k_mxn") is None:
-        t = tco60(own)
-        if t is not None:
-            own["tco_60k_mxn"] = t
-    if own.get("tco_total_60k_mxn") is None:
-        tt = tco60_total(own)
-        if tt is not None:
-            own["tco_total_60k_mxn"] = tt
-    # Extra inferences for display completeness
-    try:
-        _infer_hp_from_texts(own)
-        _ensure_audio_speakers(own)
-    except Exception:
-        pass
-    if own.get("cost_per_hp_mxn") is None:
-        cph = cost_per_hp(own)
-        if cph is not None:
-            own["cost_per_hp_mxn"] = cph
-    _normalize_common_types(own)
-    if own.get("price_per_seat") is None:
-        pps = price_per_seat(own)
-        if pps is not None:
-            own["price_per_seat"] = pps
-    epp = equip_price_per_point(own)
-    if epp is not None:
-        own["equip_price_per_point"] = epp
-    # derive display segment
-    seg_disp = _seg_display(own)
-    if seg_disp:
-        own["segmento_display"] = seg_disp
-    else:
+        if own.get("cost_per_hp_mxn") is None:
+            cph = cost_per_hp(own)
+            if cph is not None:
+                own["cost_per_hp_mxn"] = cph
+        _normalize_common_types(own)
+        if own.get("price_per_seat") is None:
+            pps = price_per_seat(own)
+            if pps is not None:
+                own["price_per_seat"] = pps
+        epp = equip_price_per_point(own)
+        if epp is not None:
+            own["equip_price_per_point"] = epp
+        # derive display segment
+        seg_disp = _seg_display(own)
+        if seg_disp:
+            own["segmento_display"] = seg_disp
+        else:
+            try:
+                mk = str(own.get("make") or "").strip().upper()
+                md = str(own.get("model") or "").strip().upper()
+                segk = _SEG_MAP.get((mk, md))
+                if segk:
+                    own["segmento_display"] = segk
+                else:
+                    # Fallback: infer from any catalog row for this model (any year)
+                    sub = _catalog_lookup(mk, md)
+                    cand = None
+                    if "segmento_ventas" in sub.columns:
+                        cand = sub["segmento_ventas"].dropna().astype(str).tolist()
+                    if (not cand) and "body_style" in sub.columns:
+                        cand = sub["body_style"].dropna().astype(str).tolist()
+                    if cand:
+                        s0 = str(cand[0])
+                        own["segmento_display"] = _seg_display({"segmento_ventas": s0, "body_style": s0}) or s0
+            except Exception:
+                pass
+        # normalized version for own
+        vd = _ver_display(own)
+        if vd:
+            # No mostrar etiqueta de versión en la gráfica para el vehículo base
+            own["version_display"] = ""
+        # attach model-level YTD for own
         try:
             mk = str(own.get("make") or "").strip().upper()
             md = str(own.get("model") or "").strip().upper()
-            segk = _SEG_MAP.get((mk, md))
-            if segk:
-                own["segmento_display"] = segk
-            else:
-                # Fallback: infer from any catalog row for this model (any year)
-                dfc = _load_catalog().copy()
-                sub = dfc[(dfc.get("make").astype(str).str.upper()==mk) & (dfc.get("model").astype(str).str.upper()==md)]
-                cand = None
-                if "segmento_ventas" in sub.columns:
-                    cand = sub["segmento_ventas"].dropna().astype(str).tolist()
-                if (not cand) and "body_style" in sub.columns:
-                    cand = sub["body_style"].dropna().astype(str).tolist()
-                if cand:
-                    s0 = str(cand[0])
-                    own["segmento_display"] = _seg_display({"segmento_ventas": s0, "body_style": s0}) or s0
+            yr = int(own.get("ano")) if own.get("ano") else yr_pref
+            ytd, lm, year_used = _model_ytd(mk, md, yr)  # type: ignore
+            if ytd is not None:
+                own["ventas_model_ytd"] = int(ytd)
+                if lm is not None:
+                    own["ventas_model_ytd_month"] = int(lm)
+            # compute segment share from totals
+            segk = _SEG_MAP.get((mk, md)) or seg_disp
+            if segk and ytd is not None:
+                totals = _SEG_TOTALS_2025 if year_used == 2025 else _SEG_TOTALS
+                tot = totals.get(segk)
+                if tot:
+                    own["ventas_model_seg_share_pct"] = round((int(ytd) / float(tot)) * 100.0, 1)
         except Exception:
             pass
-    # normalized version for own
-    vd = _ver_display(own)
-    if vd:
-        # No mostrar etiqueta de versión en la gráfica para el vehículo base
-        own["version_display"] = ""
-    # attach model-level YTD for own
-    try:
-        mk = str(own.get("make") or "").strip().upper()
-        md = str(own.get("model") or "").strip().upper()
-        yr = int(own.get("ano")) if own.get("ano") else yr_pref
-        ytd, lm, year_used = _model_ytd(mk, md, yr)  # type: ignore
-        if ytd is not None:
-            own["ventas_model_ytd"] = int(ytd)
-            if lm is not None:
-                own["ventas_model_ytd_month"] = int(lm)
-        # compute segment share from totals
-        segk = _SEG_MAP.get((mk, md)) or seg_disp
-        if segk and ytd is not None:
-            totals = _SEG_TOTALS_2025 if year_used == 2025 else _SEG_TOTALS
-            tot = totals.get(segk)
-            if tot:
-                own["ventas_model_seg_share_pct"] = round((int(ytd) / float(tot)) * 100.0, 1)
-    except Exception:
-        pass
-    base = {k: to_num(own.get(k)) for k in NUMERIC_KEYS if k in own}
+        return own
 
     # Equipment match based on pillar proximity (0..100)
     def equip_match_pct(base_row: Dict[str, Any], comp_row: Dict[str, Any]) -> Optional[float]:
@@ -10297,7 +11516,6 @@ def _compare_core(
             return None, None, None
         except Exception:
             return None, None, None
-    comps = []
     # Helper truthy
     def _truthy(v: Any) -> bool:
         s = str(v).strip().lower()
@@ -10360,7 +11578,8 @@ def _compare_core(
         except Exception:
             pass
 
-    for c in competitors:
+    def _enrich_competitor(c: Dict[str, Any]) -> tuple:
+        """(enriched competitor, allow_zero_sales); independent of the base."""
         allow_zero_sales = False
         if "__allow_zero_sales" in c:
             try:
@@ -10467,6 +11686,10 @@ def _compare_core(
                     c["ventas_model_seg_share_pct"] = round((int(ytd) / float(tot)) * 100.0, 1)
         except Exception:
             pass
+        return c, allow_zero_sales
+
+    def _compare_item(own: Dict[str, Any], base: Dict[str, Any], c: Dict[str, Any], allow_zero_sales: bool) -> Optional[Dict[str, Any]]:
+        """Competitor entry (item, deltas, diffs) vs ``own``; None when excluded."""
         # include equipment match pct
         match = equip_match_pct(own, c)
         if match is not None:
@@ -10624,7 +11847,7 @@ def _compare_core(
         try:
             sales_ytd = to_num(c.get("ventas_model_ytd"))
             if sales_ytd is not None and sales_ytd <= 0 and not allow_zero_sales:
-                continue
+                return None
         except Exception:
             pass
 
@@ -10636,23 +11859,33 @@ def _compare_core(
                 deltas[k] = {"delta": v - b, "delta_pct": ((v - b) / b * 100) if b else None}
         item["deltas"] = deltas
         item["diffs"] = diffs
-        comps.append(item)
-    audit("resp", "/compare", body={"competitors": len(comps)})
-    own_clean = _drop_nulls(own)
-    comps_clean: List[Dict[str, Any]] = []
-    for entry in comps:
-        cleaned_entry = {}
-        for key, val in entry.items():
-            cleaned_entry[key] = _drop_nulls(val)
-        comps_clean.append(cleaned_entry)
-    result = {
-        "own": own_clean,
-        "competitors": comps_clean,
-        "meta": {"delta_convention": "competitor_minus_base"},
-    }
-    if increment_usage:
-        _membership_usage_commit(usage_ctx, "compare")
-    return result
+        return item
+
+    # Enriched rows come from the shared cache; sales shares depend on yr_pref
+    results: List[Dict[str, Any]] = []
+    for own_in, competitors in jobs:
+        own = _enriched_row("compare_own", own_in or {}, _enrich_own, yr_pref)
+        base = {k: to_num(own.get(k)) for k in NUMERIC_KEYS if k in own}
+        comps = []
+        for c_in in competitors or []:
+            c, allow_zero_sales = _enriched_row("compare_comp", c_in, _enrich_competitor, yr_pref)
+            item = _compare_item(own, base, dict(c), allow_zero_sales)
+            if item is not None:
+                comps.append(item)
+        audit("resp", "/compare", body={"competitors": len(comps)})
+        own_clean = _drop_nulls(own)
+        comps_clean: List[Dict[str, Any]] = []
+        for entry in comps:
+            cleaned_entry = {}
+            for key, val in entry.items():
+                cleaned_entry[key] = _drop_nulls(val)
+            comps_clean.append(cleaned_entry)
+        results.append({
+            "own": own_clean,
+            "competitors": comps_clean,
+            "meta": {"delta_convention": "competitor_minus_base"},
+        })
+    return results
 
 
 @app.post("/compare")
@@ -10660,6 +11893,52 @@ def post_compare(payload: Dict[str, Any], request: Request) -> Dict[str, Any]:
     return _compare_core(payload, request)
 
 
+# Maximum number of base vehicles accepted by /compare/batch
+_COMPARE_BATCH_MAX = int(os.getenv("COMPARE_BATCH_MAX", "50"))
+
+
+@app.post("/compare/batch")
+def post_compare_batch(payload: Dict[str, Any], request: Request) -> Dict[str, Any]:
+    """Varias comparaciones en una llamada.
+
+    Body:
+      - bases: lista de vehículos base; cada elemento es la fila base o
+        ``{"own": fila, "competitors": [...]}`` con rivales propios
+      - competitors: rivales compartidos por las bases sin lista propia
+
+    Cada vehículo distinto se enriquece una sola vez; ``results`` trae, en el
+    orden de ``bases``, el mismo objeto que devolvería /compare. Cada base
+    cuenta como una comparación para la membresía.
+    """
+    bases = payload.get("bases")
+    if not isinstance(bases, list) or not bases:
+        raise HTTPException(status_code=400, detail="bases debe ser una lista no vacía")
+    if len(bases) > _COMPARE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"máximo {_COMPARE_BATCH_MAX} bases por llamada")
+    shared = payload.get("competitors") or []
+    jobs: List[tuple] = []
+    for entry in bases:
+        if not isinstance(entry, Mapping):
+            raise HTTPException(status_code=400, detail="cada base debe ser un objeto")
+        if "own" in entry:
+            comps = entry.get("competitors")
+            jobs.append((entry.get("own") or {}, shared if comps is None else (comps or [])))
+        else:
+            jobs.append((entry, shared))
+    usage_ctx = _membership_usage_precheck(request, payload, units=len(jobs))
+    _enforce_dealer_access(_extract_dealer_id(request, payload))
+    # Sales lookups depend on the base model year: one pass per distinct year
+    by_year: Dict[int, List[int]] = {}
+    for i, (own, _comps) in enumerate(jobs):
+        by_year.setdefault(_compare_year_pref(own), []).append(i)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    for positions in by_year.values():
+        for i, res in zip(positions, _compare_jobs([jobs[i] for i in positions])):
+            results[i] = res
+    _membership_usage_commit(usage_ctx, "compare", count=len(jobs))
+    return {"results": results, "meta": {"bases": len(jobs), "delta_convention": "competitor_minus_base"}}
+
+
 # ------------------------------ Insights (OpenAI) -------------------------
 @app.post("/insights")
 def post_insights(payload: Dict[str, Any], request: Request) -> Dict[str, Any]:
@@ -12808,9 +14087,7 @@ def post_price_explain(payload: Dict[str, Any]) -> Dict[str, Any]:
         except Exception:
             pass
         # Energía 60k y equipo
-        out = ensure_fuel_60(out)
-        out = ensure_equip_score(out)
-        out = ensure_pillars(out)
+        out = _ensure_base_metrics(out)
         # Bono válido
         def _bonus(row: Dict[str, Any]) -> Optional[float]:
             p = to_num(row.get("msrp"))
@@ -12920,18 +14197,27 @@ def post_price_explain(payload: Dict[str, Any]) -> Dict[str, Any]:
     apples = {"ok": ok, "motivos_no": ([] if ok else motivos)}
 
     # ---- estimación de coeficientes (β) ----
+    def _peer_rows():
+        """Same-segment catalog rows within ±1 year of ``own``.
+
+        Masks are computed on the shared frame; only the selected rows are copied.
+        """
+        import pandas as _pd
+        import numpy as _np  # local
+        df = _load_catalog()
+        keep = _np.ones(len(df), dtype=bool)
+        if "segmento_ventas" in df.columns or "body_style" in df.columns:
+            cand = df.get("segmento_ventas") if "segmento_ventas" in df.columns else df.get("body_style")
+            keep &= cand.astype(str).fillna("").str.lower().apply(lambda s: _seg_display({"segmento_ventas": s})==seg_a).to_numpy(dtype=bool)
+        ya = int(own.get("ano") or 0) if own.get("ano") else None
+        if ya is not None and "ano" in df.columns:
+            yr = _pd.to_numeric(df["ano"], errors="coerce")
+            keep &= ((yr >= (ya-1)) & (yr <= (ya+1))).fillna(False).to_numpy(dtype=bool)
+        return df[keep]
+
     def _cph_ref() -> Optional[float]:
         try:
-            df = _load_catalog().copy()
-            if "segmento_ventas" in df.columns or "body_style" in df.columns:
-                cand = df.get("segmento_ventas") if "segmento_ventas" in df.columns else df.get("body_style")
-                mask = cand.astype(str).fillna("").str.lower().apply(lambda s: _seg_display({"segmento_ventas": s})==seg_a)
-                df = df[mask]
-            ya = int(own.get("ano") or 0) if own.get("ano") else None
-            if ya is not None and "ano" in df.columns:
-                import pandas as _pd
-                yr = _pd.to_numeric(df["ano"], errors="coerce")
-                df = df[(yr >= (ya-1)) & (yr <= (ya+1))]
+            df = _peer_rows()
             import pandas as _pd
             hp = _pd.to_numeric(df.get("caballos_fuerza"), errors="coerce")
             pr = _pd.to_numeric(df.get("precio_transaccion").fillna(df.get("msrp")), errors="coerce")
@@ -12969,15 +14255,7 @@ def post_price_explain(payload: Dict[str, Any]) -> Dict[str, Any]:
         try:
             import pandas as _pd
             import numpy as _np  # local
-            df = _load_catalog().copy()
-            if "segmento_ventas" in df.columns or "body_style" in df.columns:
-                cand = df.get("segmento_ventas") if "segmento_ventas" in df.columns else df.get("body_style")
-                mask = cand.astype(str).fillna("").str.lower().apply(lambda s: _seg_display({"segmento_ventas": s})==seg_a)
-                df = df[mask]
-            ya = int(own.get("ano") or 0) if own.get("ano") else None
-            if ya is not None and "ano" in df.columns:
-                yr = _pd.to_numeric(df["ano"], errors="coerce")
-                df = df[(yr >= (ya-1)) & (yr <= (ya+1))]
+            df = _peer_rows()
             df["__bucket"] = df[["categoria_combustible_final","tipo_de_combustible_original","fuel_type"]].astype(str).agg(" ", axis=1)
             df = df[df["__bucket"].astype(str).str.lower().apply(lambda s: (_fuel_bucket({"categoria_combustible_final": s})==fb_a))]
             df = df.copy()
@@ -13212,14 +14490,18 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
 
     Body: { own: {...}, k?: int, same_segment?: bool, same_propulsion?: bool }
     """
-    df0 = _load_catalog().copy()
-    df = df0.copy()
+    # df0 is the shared epoch (read-only); df holds only the rows copied out of it
+    df0 = _load_catalog()
+    keys = _catalog_index(df0).keys
+    df = df0
     # limit years of interest if present
     if "ano" in df.columns:
         try:
             df = df[df["ano"].isin(list(ALLOWED_YEARS))]
         except Exception:
             pass
+    if df is df0:
+        df = df0.copy(deep=not _PANDAS_COW)
     own = payload.get("own") or {}
     k = int(payload.get("k", 3) or 3)
     same_segment = bool(payload.get("same_segment") or False)
@@ -13242,11 +14524,11 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
     yr = int(own.get("ano")) if own.get("ano") else None
 
     if mk and not include_same_brand:
-        df = df[df["make"].str.upper() != mk]  # exclude same brand by default
+        df = df[(keys.loc[df.index, "make"] != mk).to_numpy()]  # exclude same brand by default
     if md and yr is not None:
         # exclude the same exact model-year
         if "ano" in df.columns:
-            df = df[~((df["model"].str.upper() == md) & (df["ano"] == yr))]
+            df = df[~((keys.loc[df.index, "model"] == md) & (keys.loc[df.index, "year"] == yr)).to_numpy()]
     # Keep a copy without year restriction to allow graceful fallback later
     df_no_year = df.copy()
     # restrict to same MY unless explicitly allowed
@@ -13257,45 +14539,29 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
             pass
 
     # optional: filter by same segment/body style (robust mapping)
-    def _norm_segment(s: str) -> Optional[str]:
-        s_raw = str(s or "").strip()
-        s = s_raw.lower()
-        for a, b in (("á","a"),("é","e"),("í","i"),("ó","o"),("ú","u"),("ñ","n")):
-            s = s.replace(a, b)
-        if not s or s in {"nan","none","null","na","n/a","-"}:
-            return None
-        if "chasis" in s:
-            if "pick" in s:
-                return "Pickup"
-            return "Chasis Cabina"
-        if any(x in s for x in ("pick", "pickup", "pick-up")):
-            return "Pickup"
-        if "camioneta" in s and "pick" in s:
-            return "Pickup"
-        if any(x in s for x in ("todo terreno","suv","suvs","crossover","sport utility")):
-            return "SUV'S"
-        if "van" in s or "panel" in s:
-            return "Van"
-        if any(x in s for x in ("hatch","hb")):
-            return "Hatchback"
-        if any(x in s for x in ("sedan","sedán","saloon")):
-            return "Sedán"
-        return s_raw.title()
+    # Segment buckets: _competitor_segment, precomputed per epoch in the key frame
+    _norm_segment = _competitor_segment
+
+    def _seg_series(frame):
+        """Segment bucket of ``frame`` rows: body_style first, then segmento_ventas."""
+        if "body_style" in frame.columns:
+            series = keys.loc[frame.index, "competitor_segment_bs"]
+            if not series.isna().all():
+                return series
+        if "segmento_ventas" in frame.columns:
+            return keys.loc[frame.index, "competitor_segment_sv"]
+        return None
 
     base_seg_fixed: Optional[str] = None
     if same_segment and md:
         try:
             # Determine base segment using available columns (prefer normalized sales segment)
             # Build compact model keys to handle variants like "BT-50" vs "BT 50"
-            import re as _re
-            def _compact(s: str) -> str:
-                return _re.sub(r"[^A-Z0-9]", "", str(s or "").upper())
-            df0_loc = df0.copy()
-            if "model" in df0_loc.columns:
-                df0_loc["__mdc"] = df0_loc["model"].astype(str).map(_compact)
-            base_rows = df0_loc[(df0_loc["model"].str.upper() == md) | (df0_loc.get("__mdc") == _compact(md))]
-            if yr is not None and "ano" in df0_loc.columns:
-                base_rows = base_rows[base_rows["ano"] == yr] if not base_rows.empty else df0_loc[(df0_loc.get("__mdc") == _compact(md))]
+            md_c = _compact_key(md)
+            same_model_c = (keys["model_c"] == md_c).to_numpy()
+            base_rows = df0[(keys["model"] == md).to_numpy() | same_model_c]
+            if yr is not None and "ano" in df0.columns:
+                base_rows = base_rows[base_rows["ano"] == yr] if not base_rows.empty else df0[same_model_c]
             base_seg: Optional[str] = _norm_segment(own.get("segment") or own.get("segmento_ventas") or own.get("body_style"))
             if not base_rows.empty:
                 # try any non-null across potential duplicates
@@ -13314,10 +14580,7 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
                         break
             # If still unknown, try to infer from any year for the same model
             if not base_seg:
-                any0 = df0.copy()
-                if "model" in any0.columns:
-                    any0["__mdc"] = any0["model"].astype(str).map(_compact)
-                any_model = any0[(any0["model"].str.upper() == md) | (any0.get("__mdc") == _compact(md))]
+                any_model = df0[(keys["model"] == md).to_numpy() | same_model_c]
                 if not any_model.empty:
                     if "segmento_ventas" in any_model.columns:
                         for v in any_model["segmento_ventas"].astype(str).tolist():
@@ -13332,15 +14595,11 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
             # Apply filter if we could resolve a segment
             if base_seg:
                 # Build candidate segment column preferring body_style over generic segment tags
-                cand_seg = None
-                if "body_style" in df.columns:
-                    cand_seg = df["body_style"].astype(str).map(_norm_segment)
-                if (cand_seg is None or cand_seg.isna().all()) and "segmento_ventas" in df.columns:
-                    cand_seg = df["segmento_ventas"].astype(str).map(_norm_segment)
+                cand_seg = _seg_series(df)
                 if cand_seg is not None:
                     # Compare as text ignoring case; drop rows without segment
                     m = cand_seg.fillna("").str.upper()
-                    df = df[(m != "") & (m == str(base_seg).upper())]
+                    df = df[((m != "") & (m == str(base_seg).upper())).to_numpy()]
                     base_seg_fixed = str(base_seg)
         except Exception:
             pass
@@ -13371,7 +14630,7 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
     df_after_segment = df.copy()
     if same_propulsion and "categoria_combustible_final" in df.columns and md:
         try:
-            base = df0[(df0["model"].str.upper() == md) & ((df0["ano"] == yr) if yr is not None and "ano" in df0.columns else True)]
+            base = df0[((keys["model"] == md) & ((df0["ano"] == yr) if yr is not None and "ano" in df0.columns else True)).to_numpy()]
             bucket = None
             if not base.empty:
                 bucket = _prop_bucket(str(base.iloc[0].get("categoria_combustible_final", "")))
@@ -13408,7 +14667,7 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
     own_score = _to_float(own.get("equip_score"))
     if (own_len is None or own_score is None) and md:
         try:
-            base = df0[(df0["model"].str.upper() == md) & ((df0["ano"] == yr) if yr is not None and "ano" in df0.columns else True)]
+            base = df0[((keys["model"] == md) & ((df0["ano"] == yr) if yr is not None and "ano" in df0.columns else True)).to_numpy()]
             if own_len is None and "longitud_mm" in df0.columns and not base.empty:
                 own_len = _to_float(base.iloc[0].get("longitud_mm"))
             if own_score is None and "equip_score" in df0.columns and not base.empty:
@@ -13472,17 +14731,9 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
             base = df_no_year.copy()
             if base_seg_fixed:
                 try:
-                    def _seg_series(frame):
-                        if "body_style" in frame.columns:
-                            SERIES = frame["body_style"].astype(str).map(_norm_segment)
-                            if not SERIES.isna().all():
-                                return SERIES
-                        if "segmento_ventas" in frame.columns:
-                            return frame["segmento_ventas"].astype(str).map(_norm_segment)
-                        return None
                     cs = _seg_series(base)
                     if cs is not None:
-                        base = base[cs.fillna("").str.upper() == str(base_seg_fixed).upper()]
+                        base = base[(cs.fillna("").str.upper() == str(base_seg_fixed).upper()).to_numpy()]
                 except Exception:
                     pass
             if propulsion_bucket and "categoria_combustible_final" in base.columns and same_propulsion:
@@ -13498,17 +14749,9 @@ def auto_competitors(payload: Dict[str, Any], request: Request) -> Dict[str, Any
     # Final safeguard: enforce same-segment after ranking (in case of missing seg in some rows earlier)
     if same_segment and base_seg_fixed:
         try:
-            def _seg_series(frame):
-                if "body_style" in frame.columns:
-                    SERIES = frame["body_style"].astype(str).map(_norm_segment)
-                    if not SERIES.isna().all():
-                        return SERIES
-                if "segmento_ventas" in frame.columns:
-                    return frame["segmento_ventas"].astype(str).map(_norm_segment)
-                return None
             cand = _seg_series(out)
             if cand is not None:
-                out = out[cand.fillna("").str.upper() == str(base_seg_fixed).upper()]
+                out = out[(cand.fillna("").str.upper() == str(base_seg_fixed).upper()).to_numpy()]
         except Exception:
             pass
     if same_propulsion and propulsion_bucket:
@@ -13598,18 +14841,14 @@ def version_diffs(make: Optional[str] = None, model: Optional[str] = None, year:
     """
     if not model:
         raise HTTPException(status_code=400, detail="model es requerido")
-    df = _load_catalog().copy()
+    try:
+        year_key = int(year) if year is not None else None
+    except Exception:
+        year_key = None
+    sub = _catalog_lookup(make or None, model, year_key)
     for c in ("make","model","version"):
-        if c in df.columns:
-            df[c] = df[c].astype(str)
-    sub = df[df["model"].str.upper() == model.upper()].copy()
-    if make:
-        sub = sub[sub["make"].str.upper() == make.upper()]
-    if year is not None and "ano" in sub.columns:
-        try:
-            sub = sub[pd.to_numeric(sub["ano"], errors="coerce") == int(year)]
-        except Exception:
-            pass
+        if c in sub.columns:
+            sub[c] = sub[c].astype(str)
     if sub.empty:
         # Fallback: construir versiones desde fuentes enriquecidas (flat/JSON) para no dejar vacío
         try:
@@ -13812,7 +15051,7 @@ def version_diffs(make: Optional[str] = None, model: Optional[str] = None, year:
 # --------------------------------- Health --------------------------------
 @app.get("/health")
 def health() -> Dict[str, Any]:
-    return {"ok": True, "ts": datetime.utcnow().isoformat() + "Z"}
+    return {"ok": True, "ts": datetime.utcnow().isoformat() + "Z", "catalog": _catalog_status()}
 
 
 # ------------------------------- Dashboard --------------------------------
@@ -13822,37 +15061,32 @@ def dashboard(segment: Optional[str] = Query(None)) -> Dict[str, Any]:
 
     Counts are computed for allowed years (2024+) when possible.
     """
-    df = _load_catalog().copy()
+    # Read-only: the filters below only select rows of the shared epoch
+    df = _load_catalog()
+    keys = _catalog_index(df).keys
     try:
-        if "ano" in df.columns:
-            df = df[df["ano"].isin(list(ALLOWED_YEARS))]
+        if "year" in keys.columns:
+            df = df[keys["year"].isin(list(ALLOWED_YEARS)).to_numpy()]
     except Exception:
         pass
-    # Optional: filter by segment if provided (robust bucketization)
+    # Optional: filter by segment if provided (robust bucketization, precomputed per epoch)
     try:
         if segment and "segmento_ventas" in df.columns:
-            def _seg_norm(v: str) -> str:
-                s0 = str(v or "").strip().lower()
-                if any(x in s0 for x in ("pick","cab","chasis","camioneta")): return "Pickup"
-                if any(x in s0 for x in ("todo terreno","suv","suvs","crossover","sport utility")): return "SUV'S"
-                if "van" in s0: return "Van"
-                if any(x in s0 for x in ("hatch","hb")): return "Hatchback"
-                if any(x in s0 for x in ("sedan","sedán","saloon")): return "Sedán"
-                return str(v or "").strip()
-            seg_filter = _seg_norm(segment)
-            df = df[df["segmento_ventas"].astype(str).map(_seg_norm).str.upper() == str(seg_filter).upper()]
+            seg_filter = _normalize_body_style_label(segment).upper()
+            df = df[(keys.loc[df.index, "segment"] == seg_filter).to_numpy()]
     except Exception:
         pass
+    kf = keys.loc[df.index]
 
     def nuniq(col: str) -> int:
         try:
-            return int(df.get(col, pd.Series(dtype=object)).dropna().astype(str).str.upper().nunique()) if pd is not None else 0
+            return int(kf[col].nunique()) if col in kf.columns else 0
         except Exception:
             return 0
     brands = nuniq("make")
     try:
-        if pd is not None and {"make","model"}.issubset(df.columns):
-            models = int(df[["make","model"]].dropna().astype(str).apply(lambda r: (r["make"].upper(), r["model"].upper()), axis=1).nunique())
+        if {"make","model"}.issubset(kf.columns):
+            models = int(len(kf[["make","model"]].drop_duplicates()))
         else:
             models = 0
     except Exception:
@@ -13861,12 +15095,8 @@ def dashboard(segment: Optional[str] = Query(None)) -> Dict[str, Any]:
     versions_by_year: Dict[int, int] = {}
     versions = 0
     try:
-        if pd is not None and {"make","model","version","ano"}.issubset(df.columns):
-            tmp = df[["make","model","version","ano"]].copy()
-            for c in ("make","model","version"):
-                tmp[c] = tmp[c].astype(str).str.strip().str.upper()
-            tmp["ano"] = pd.to_numeric(tmp["ano"], errors="coerce").astype("Int64")
-            tmp = tmp.dropna(subset=["make","model","version","ano"])  # type: ignore[arg-type]
+        if {"make","model","version","year"}.issubset(kf.columns):
+            tmp = kf.loc[kf["year"] != 0, ["make","model","version","year"]].rename(columns={"year": "ano"})
             tmp = tmp.drop_duplicates(subset=["make","model","version","ano"])  # unique version-year
             versions = int(tmp.drop_duplicates(subset=["make","model","version"]).shape[0])
             try:
@@ -13888,7 +15118,7 @@ def dashboard(segment: Optional[str] = Query(None)) -> Dict[str, Any]:
             df2 = df.copy()
             df2["__has_bono"] = (a.notna() & b.notna() & (a > 0) & (a < b))
             if {"make","model","version","ano"}.issubset(df2.columns):
-                grp = df2.groupby(["make","model","version","ano"], dropna=False)["__has_bono"].any().reset_index()
+                grp = df2.groupby(["make","model","version","ano"], dropna=False, observed=True)["__has_bono"].any().reset_index()
                 with_bonus = int(grp["__has_bono"].sum())
                 try:
                     by = grp.groupby(grp["ano"].astype(int))["__has_bono"].sum()
@@ -14003,7 +15233,9 @@ def analytics_body_style_pillars(
     if not label_requested:
         raise HTTPException(status_code=400, detail="Debes indicar body_style")
 
-    df = _load_catalog().copy()
+    shared = _load_catalog()
+    keys = _catalog_index(shared).keys
+    df = shared
     try:
         if "ano" in df.columns:
             requested_years = {
@@ -14014,11 +15246,13 @@ def analytics_body_style_pillars(
             df = df[df["ano"].isin(requested_years)]
     except Exception:
         df = df[df.get("ano").isin(list(ALLOWED_YEARS))] if "ano" in df.columns else df
+    if df is shared:
+        df = shared.copy(deep=not _PANDAS_COW)
 
     if df.empty:
         raise HTTPException(status_code=404, detail="No hay catálogo disponible")
 
-    df["__body_style"] = df.get("segmento_ventas").fillna(df.get("body_style")).map(_normalize_body_style_label)
+    df["__body_style"] = keys.loc[df.index, "body_style_label"]
     target_label = _normalize_body_style_label(label_requested)
     if not target_label:
         raise HTTPException(status_code=400, detail="Body style inválido")
@@ -14088,127 +15322,55 @@ async def ws_echo(ws: WebSocket):  # simple echo for dev
 def seasonality(segment: Optional[str] = Query(None), year: Optional[int] = Query(2025)) -> Dict[str, Any]:
     """Return seasonality by segment for a given year (default 2025)."""
 
-    import unicodedata as _ud
-
-    def _normalize_token(val: Optional[str]) -> str:
-        s = str(val or "").strip()
-        if not s:
-            return ""
-        s = _ud.normalize('NFKD', s)
-        s = ''.join(ch for ch in s if _ud.category(ch) != 'Mn')
-        s = s.replace('’', "'").replace('´', "'").replace('`', "'")
-        return s
-
     try:
         year_int = int(year or 2025)
     except Exception:
         year_int = 2025
 
-    seg_norm = _normalize_token(segment).upper() if segment else "*"
+    seg_norm = _normalize_seg_token(segment).upper() if segment else "*"
 
     if pd is None:
         return {"segments": []}
 
-    sales_ytd = ROOT / "data" / "enriched" / f"sales_ytd_{year_int}.csv"
     items: Dict[str, list] = {}
-
-    def _segment_lookup() -> Dict[tuple, str]:
-        seg_map: Dict[tuple, str] = {}
-        try:
-            proc = ROOT / "data" / "equipo_veh_limpio_procesado.csv"
-            if proc.exists():
-                f = pd.read_csv(proc, low_memory=False)
-                f.columns = [str(c).strip().lower() for c in f.columns]
-                col = None
-                for c in ("body_style", "segmento_ventas"):
-                    if c in f.columns:
-                        col = c
-                        break
-                if col and {"make","model"}.issubset(f.columns):
-                    def _norm_seg(sv: str) -> str:
-                        base = _normalize_token(sv)
-                        low = base.lower()
-                        if any(x in low for x in ("pick","cab","chasis","camioneta")): return "Pickup"
-                        if any(x in low for x in ("todo terreno","suv","crossover","sport utility")): return "SUV'S"
-                        if "van" in low: return "Van"
-                        if any(x in low for x in ("hatch","hb")): return "Hatchback"
-                        if any(x in low for x in ("sedan","sedán","saloon")): return "Sedán"
-                        return base
-                    ff = f[["make","model", col]].dropna(how="any")
-                    ff["seg"] = ff[col].astype(str).map(_norm_seg)
-                    grp = ff.groupby([ff["make"].astype(str).str.upper(), ff["model"].astype(str).str.upper()])["seg"].agg(lambda x: x.value_counts().idxmax())
-                    seg_map = {k: v for k, v in grp.to_dict().items()}
-            if not seg_map:
-                flat = ROOT / "data" / "enriched" / "vehiculos_todos_flat.csv"
-                if flat.exists():
-                    f = pd.read_csv(flat, low_memory=False)
-                    f.columns = [str(c).strip().lower() for c in f.columns]
-                    col = None
-                    for c in ("segmento_ventas", "body_style"):
-                        if c in f.columns:
-                            col = c
-                            break
-                    if col and {"make","model"}.issubset(f.columns):
-                        def _norm_seg(sv: str) -> str:
-                            base = _normalize_token(sv)
-                            low = base.lower()
-                            if any(x in low for x in ("pick","cab","chasis","camioneta")): return "Pickup"
-                            if any(x in low for x in ("todo terreno","suv","crossover","sport utility")): return "SUV'S"
-                            if "van" in low: return "Van"
-                            if any(x in low for x in ("hatch","hb")): return "Hatchback"
-                            if any(x in low for x in ("sedan","sedán","saloon")): return "Sedán"
-                            return base
-                        ff = f[["make","model", col]].dropna(how="any")
-                        ff["seg"] = ff[col].astype(str).map(_norm_seg)
-                        grp = ff.groupby([ff["make"].astype(str).str.upper(), ff["model"].astype(str).str.upper()])["seg"].agg(lambda x: x.value_counts().idxmax())
-                        seg_map = {k: v for k, v in grp.to_dict().items()}
-        except Exception:
-            seg_map = {}
-        return seg_map
-
-    seg_map = _segment_lookup()
+    seg_map, seg_token = _sales_segment_map("seasonality")
 
     def _segment_value(mk: str, md: str) -> str:
         key = (str(mk or "").strip().upper(), str(md or "").strip().upper())
         seg = seg_map.get(key)
         if seg:
             return seg
-        return "(sin segmento)"
+        return SIN_SEGMENTO
 
-    if sales_ytd.exists():
-        df = pd.read_csv(sales_ytd, low_memory=False)
-        df.columns = [str(c).strip().lower() for c in df.columns]
-        df["__seg"] = df.apply(lambda r: _segment_value(r.get("make", ""), r.get("model", "")), axis=1)
-        if seg_norm != "*":
-            target = seg_norm
-            df = df[df["__seg"].map(lambda x: _normalize_token(x).upper()) == target]
-        months_cols = [c for c in df.columns if c.startswith(f"ventas_{year_int}_")]
-        if months_cols:
-            grouped = df.groupby("__seg")[months_cols].sum(numeric_only=True)
-            for seg, row in grouped.iterrows():
-                months: list[Dict[str, Any]] = []
-                total = float(row.sum()) or 1.0
-                for col in months_cols:
-                    try:
-                        month_num = int(col.rsplit('_', 1)[-1])
-                    except Exception:
-                        continue
-                    val = int(float(row[col])) if col in row else 0
-                    share = round((val / total) * 100.0, 2) if total else 0.0
-                    months.append({"m": month_num, "units": val, "share_pct": share})
-                months.sort(key=lambda x: x["m"])
-                items[seg] = months
+    sales = _sales_year(year_int)
+    if sales is not None and sales.months:
+        for seg, monthly in sorted(sales.segments(seg_map, seg_token).items()):
+            if seg_norm != "*" and _normalize_seg_token(seg).upper() != seg_norm:
+                continue
+            total = float(sum(monthly[m - 1] for m in sales.months)) or 1.0
+            months: list[Dict[str, Any]] = []
+            for month_num in sales.months:
+                val = int(float(monthly[month_num - 1]))
+                share = round((val / total) * 100.0, 2) if total else 0.0
+                months.append({"m": month_num, "units": val, "share_pct": share})
+            items[seg] = months
 
     if not items:
         # Fallback: try catalog monthly columns if available
-        df = _load_catalog().copy()
-        df["__seg"] = df.apply(lambda r: _segment_value(r.get("make", ""), r.get("model", "")), axis=1)
+        # Segments go in a side Series so the shared frame is only read
+        df = _load_catalog()
+        keys = _catalog_index(df).keys
+        if {"make", "model"}.issubset(keys.columns):
+            seg_col = pd.Series([seg_map.get(key) or "(sin segmento)" for key in zip(keys["make"], keys["model"])], index=df.index)
+        else:
+            seg_col = df.apply(lambda r: _segment_value(r.get("make", ""), r.get("model", "")), axis=1)
         if seg_norm != "*":
             target = seg_norm
-            df = df[df["__seg"].map(lambda x: _normalize_token(x).upper()) == target]
+            keep = (seg_col.map(lambda x: _normalize_seg_token(x).upper()) == target).to_numpy()
+            df, seg_col = df[keep], seg_col[keep]
         months_cols = [c for c in map(str, df.columns) if c.startswith(f"ventas_{year_int}_")]
         if months_cols:
-            grouped = df.groupby("__seg")[months_cols].sum(numeric_only=True)
+            grouped = df[months_cols].groupby(seg_col).sum(numeric_only=True)
             for seg, row in grouped.iterrows():
                 months: list[Dict[str, Any]] = []
                 total = float(row.sum()) or 1.0
@@ -14232,7 +15394,7 @@ def debug_options_sources() -> Dict[str, Any]:
     out: Dict[str, Any] = {"catalog": {}, "flat": {}, "processed": {}, "json": {}}
     # 1) Catalog (current.csv)
     try:
-        df = _load_catalog().copy()
+        df = _load_catalog()
         if pd is not None and "make" in df.columns:
             brands = sorted(map(str, df["make"].astype(str).str.upper().dropna().unique().tolist()))
             out["catalog"] = {"count": len(brands), "sample": brands[:20]}
@@ -14347,11 +15509,43 @@ def debug_options_sources() -> Dict[str, Any]:
 
 
 # ------------------------------- Debug: coverage ----------------------------
+@app.get("/debug/catalog_memory")
+def debug_catalog_memory(top: Optional[int] = Query(None, ge=1)) -> Dict[str, Any]:
+    """Per-column dtype and memory of the in-process catalog (per worker)."""
+    if pd is None:
+        return {"error": "pandas not available"}
+    try:
+        report = memory_report(_load_catalog(), top=top)
+    except Exception as e:
+        return {"error": str(e)}
+    report["epoch"] = _CATALOG_EPOCH
+    return report
+
+
+@app.get("/debug/enriched_cache")
+def debug_enriched_cache() -> Dict[str, Any]:
+    """Size and hit/miss counters of the enriched-row cache (per worker)."""
+    out = _ENRICHED_CACHE.stats()
+    out["epoch"] = _CATALOG_EPOCH
+    return out
+
+
+@app.get("/debug/catalog_build")
+def debug_catalog_build() -> Dict[str, Any]:
+    """Stage timings, row counts and memory deltas of the latest catalog build."""
+    running = _CATALOG_BUILD_REPORT.get("running")
+    return {
+        "epoch": _CATALOG_EPOCH,
+        "last": _CATALOG_BUILD_REPORT.get("last"),
+        "running": running.as_dict() if running is not None else None,
+    }
+
+
 @app.get("/debug/coverage")
 def debug_coverage(years: str = "2024,2025,2026") -> Dict[str, Any]:
     """Return coverage stats for key fields in the catalog for selected years."""
     try:
-        df = _load_catalog().copy()
+        df = _load_catalog()
         if pd is None:
             return {"error": "pandas not available"}
         try:
@@ -14782,24 +15976,21 @@ def post_dealer_insights(payload: Dict[str, Any], request: Request) -> Dict[str,
         yr = payload.get("year") or payload.get("ano")
         vr = payload.get("version")
         try:
-            df = _load_catalog().copy()
+            yr_key = int(yr) if yr is not None else None
+        except Exception:
+            yr_key = None
+        try:
+            sub = _catalog_lookup(
+                str(_canon_make(mk) or mk) if mk else None,
+                str(_canon_model(mk, md) or md) if md else None,
+                yr_key,
+                vr or None,
+            )
         except Exception:
             raise HTTPException(status_code=500, detail="catalog not available")
         for c in ("make","model","version"):
-            if c in df.columns:
-                df[c] = df[c].astype(str)
-        sub = df.copy()
-        if mk:
-            sub = sub[sub["make"].astype(str).str.upper()==str(_canon_make(mk) or mk).upper()]
-        if md:
-            sub = sub[sub["model"].astype(str).str.upper()==str(_canon_model(mk, md) or md).upper()]
-        if yr is not None and "ano" in sub.columns:
-            try:
-                sub = sub[pd.to_numeric(sub["ano"], errors="coerce").fillna(0).astype(int)==int(yr)]
-            except Exception:
-                pass
-        if vr:
-            sub = sub[sub["version"].astype(str).str.upper()==str(vr).upper()]
+            if c in sub.columns:
+                sub[c] = sub[c].astype(str)
         if not sub.empty:
             own = sub.iloc[0].to_dict()
     if not own:
@@ -14807,11 +15998,7 @@ def post_dealer_insights(payload: Dict[str, Any], request: Request) -> Dict[str,
 
     # Asegurar score/pilares/energía
     try:
-        cur = dict(own)
-        cur = ensure_fuel_60(cur)
-        cur = ensure_equip_score(cur)
-        cur = ensure_pillars(cur)
-        own = cur
+        own = _ensure_base_metrics(own)
     except Exception:
         pass
 
@@ -0,0 +1,142 @@
+"""Stage-level timing report for multi-step data builds.
+
+A build marks stage boundaries with ``report.stage(name, df)``; each call
+closes the running stage (wall time, rows out, memory delta) and opens the
+next one with ``rows in`` taken from the same frame. Errors that a stage
+swallows are recorded with ``report.fail(exc)`` so they stay visible.
+
+Memory is tracked as the change in process RSS and in peak RSS per stage.
+When ``trace_python=True`` the Python-heap peak from ``tracemalloc`` is
+recorded too (several times slower, meant for one-off investigations).
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+def _current_rss() -> Optional[int]:
+    """Resident set size in bytes (Linux /proc; None elsewhere)."""
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def _peak_rss() -> Optional[int]:
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+def _rows(df: Any) -> Optional[int]:
+    try:
+        return int(len(df))
+    except Exception:
+        return None
+
+
+def _cols(df: Any) -> Optional[int]:
+    try:
+        return int(len(df.columns))
+    except Exception:
+        return None
+
+
+class BuildReport:
+    """Collects per-stage timings, row counts, memory deltas and errors."""
+
+    def __init__(self, name: str, *, trace_python: bool = False, **meta: Any) -> None:
+        self.name = name
+        self.meta: Dict[str, Any] = dict(meta)
+        self.stages: List[Dict[str, Any]] = []
+        self.started_at = datetime.utcnow().isoformat() + "Z"
+        self._t0 = time.perf_counter()
+        self._open: Optional[Dict[str, Any]] = None
+        self._trace = trace_python and not tracemalloc.is_tracing()
+        if self._trace:
+            tracemalloc.start()
+        self.total_ms: Optional[float] = None
+
+    def stage(self, name: str, df: Any = None) -> None:
+        """Close the running stage (``df`` is its output) and start ``name``."""
+        self._close(df)
+        if self._trace:
+            tracemalloc.reset_peak()
+        self._open = {
+            "stage": name,
+            "rows_in": _rows(df),
+            "errors": [],
+            "_t": time.perf_counter(),
+            "_rss": _current_rss(),
+            "_peak": _peak_rss(),
+        }
+
+    def fail(self, exc: BaseException) -> None:
+        """Record an exception swallowed by the running stage."""
+        entry = f"{type(exc).__name__}: {exc}"
+        if self._open is not None:
+            self._open["errors"].append(entry)
+        else:
+            self.meta.setdefault("errors", []).append(entry)
+
+    def _close(self, df: Any) -> None:
+        st = self._open
+        if st is None:
+            return
+        self._open = None
+        rss, peak = _current_rss(), _peak_rss()
+        out = {
+            "stage": st["stage"],
+            "ms": round((time.perf_counter() - st["_t"]) * 1000.0, 1),
+            "rows_in": st["rows_in"],
+            "rows_out": _rows(df),
+            "cols_out": _cols(df),
+            "rss_delta_mb": round((rss - st["_rss"]) / 2**20, 1) if rss is not None and st["_rss"] is not None else None,
+            "peak_rss_delta_mb": round((peak - st["_peak"]) / 2**20, 1) if peak is not None and st["_peak"] is not None else None,
+            "errors": st["errors"],
+        }
+        if self._trace:
+            out["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        self.stages.append(out)
+
+    def finish(self, df: Any = None) -> Dict[str, Any]:
+        """Close the last stage and return the report as a dict."""
+        self._close(df)
+        if self._trace:
+            tracemalloc.stop()
+            self._trace = False
+        self.total_ms = round((time.perf_counter() - self._t0) * 1000.0, 1)
+        return self.as_dict()
+
+    def as_dict(self) -> Dict[str, Any]:
+        finished = self.total_ms is not None
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": self.total_ms if finished else round((time.perf_counter() - self._t0) * 1000.0, 1),
+            "finished": finished,
+            **self.meta,
+            "stages": list(self.stages),
+        }
+
+    def summary(self) -> str:
+        """One line per stage, slowest first, for logs."""
+        parts = [
+            f"{s['stage']}={s['ms']}ms rows {s['rows_in']}->{s['rows_out']}"
+            + (f" errors={len(s['errors'])}" if s["errors"] else "")
+            for s in sorted(self.stages, key=lambda s: s["ms"], reverse=True)
+        ]
+        return "; ".join(parts)
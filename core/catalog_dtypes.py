@@ -0,0 +1,200 @@
+"""Compact dtype plan for the in-memory catalog frame.
+
+The build leaves most columns as ``object``: repeated make/model/segment
+strings, feature flags spelled "Sí"/"Estándar"/True/1 and numbers that arrive
+as Python floats mixed with None. ``compact_frame`` rewrites those columns to
+denser dtypes without changing what handlers read back:
+
+- flags whose every value is a known yes/no token become ``bool``; when
+  cells are missing (None, NaN or blank strings, never False) the column
+  holds True/False/NaN as ``object`` instead, the cells a build with bool
+  flags produces. No ``pd.NA`` reaches handlers, which test cells with
+  ``is None``/``str()``;
+- object columns holding only numbers become numeric; floats drop to
+  ``float32`` and ints to ``int32`` only when every value round-trips exactly;
+- low-cardinality text (``object`` or pandas ``str`` columns) becomes
+  ``category``.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def _pandas():
+    try:
+        import pandas as pd  # type: ignore
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError("pandas is required for catalog dtypes") from e
+    return pd
+
+
+# Same vocabulary as _to01_shared in backend/app.py; anything else keeps the
+# column as-is so no information is lost.
+FLAG_TRUE_TOKENS = frozenset({
+    "true", "1", "si", "sí", "estandar", "estándar", "incluido",
+    "standard", "std", "present", "x", "y", "yes",
+})
+FLAG_FALSE_TOKENS = frozenset({"false", "0", "no"})
+
+# Identifiers and free text must stay plain strings
+DEFAULT_KEEP = frozenset({"vehicle_id", "uid", "id", "images_default"})
+
+CATEGORY_MAX_RATIO = 0.5
+
+
+def _flag_value(v: Any) -> Optional[float]:
+    """1.0/0.0 for a recognised flag value, NaN for missing or blank, None otherwise."""
+    if v is None or v is _pandas().NA:
+        return float("nan")
+    if isinstance(v, bool):
+        return 1.0 if v else 0.0
+    if isinstance(v, (int, float)):
+        if v != v:
+            return float("nan")
+        return float(v) if v in (0, 1) else None
+    if isinstance(v, str):
+        s = v.strip().lower()
+        if not s:
+            return float("nan")
+        if s in FLAG_TRUE_TOKENS:
+            return 1.0
+        if s in FLAG_FALSE_TOKENS:
+            return 0.0
+    return None
+
+
+def _as_flag(series):
+    """Return the compacted flag column, or None when ``series`` is not a flag."""
+    pd = _pandas()
+    import numpy as np  # type: ignore
+
+    try:
+        # None/NaN/pd.NA share code -1; every other cell maps through ``lut``
+        codes, uniques = pd.factorize(series.to_numpy(dtype=object))
+    except TypeError:  # unhashable cells (dict/list)
+        return None
+    lut = np.empty(len(uniques) + 1, dtype=np.float64)
+    lut[-1] = np.nan
+    has_text = False
+    for i, u in enumerate(uniques):
+        f = _flag_value(u)
+        if f is None:
+            return None
+        has_text = has_text or isinstance(u, (str, bool))
+        lut[i] = f
+    # Pure 0/1 numbers (or nothing but blanks) are left to the other passes
+    if not has_text or not bool((lut[:-1] == lut[:-1]).any()):
+        return None
+    mapped = lut[codes]
+    missing = mapped != mapped
+    if missing.any():
+        values = (mapped == 1.0).astype(object)
+        values[missing] = np.nan
+        return pd.Series(values, index=series.index, name=series.name, dtype=object)
+    return pd.Series(mapped == 1.0, index=series.index, name=series.name)
+
+
+def _as_numeric(series):
+    pd = _pandas()
+    kind = pd.api.types.infer_dtype(series, skipna=True)
+    if kind not in {"integer", "floating", "mixed-integer-float"}:
+        return None
+    try:
+        return pd.to_numeric(series, errors="raise")
+    except Exception:
+        return None
+
+
+def _downcast(series):
+    """float32/int32 only when every value survives the cast unchanged."""
+    pd = _pandas()
+    import numpy as np  # type: ignore
+
+    dtype = series.dtype
+    if dtype == np.float64:
+        values = series.to_numpy()
+        small = values.astype(np.float32)
+        same = (small == values) | np.isnan(values)
+        if not bool(same.all()):
+            return series
+        return pd.Series(small, index=series.index, name=series.name)
+    if dtype == np.int64 and len(series):
+        values = series.to_numpy()
+        info = np.iinfo(np.int32)
+        if values.min() >= info.min and values.max() <= info.max:
+            return pd.Series(values.astype(np.int32), index=series.index, name=series.name)
+        return series
+    if str(dtype) == "Int64" and bool(series.notna().any()):
+        info = np.iinfo(np.int32)
+        if series.min() >= info.min and series.max() <= info.max:
+            return series.astype("Int32")
+    return series
+
+
+def _as_category(series, max_ratio: float):
+    pd = _pandas()
+    if pd.api.types.infer_dtype(series, skipna=True) != "string":
+        return None
+    n = int(series.notna().sum())
+    if n == 0:
+        return None
+    if series.nunique(dropna=True) > max(1, int(n * max_ratio)):
+        return None
+    return series.astype("category")
+
+
+def _is_text(series) -> bool:
+    """``object`` columns and pandas ``str`` (``StringDtype``) columns."""
+    pd = _pandas()
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def compact_frame(
+    df,
+    *,
+    keep: Iterable[str] = DEFAULT_KEEP,
+    category_max_ratio: float = CATEGORY_MAX_RATIO,
+):
+    """Rewrite ``df`` columns in place to the compact dtype plan and return it."""
+    keep = set(keep)
+    for col in list(df.columns):
+        if col in keep:
+            continue
+        ser = df[col]
+        try:
+            if _is_text(ser):
+                out = _as_flag(ser)
+                if out is None:
+                    out = _as_numeric(ser)
+                    if out is not None:
+                        out = _downcast(out)
+                if out is None:
+                    out = _as_category(ser, category_max_ratio)
+            else:
+                out = _downcast(ser)
+        except Exception:
+            out = None
+        if out is not None and out is not ser:
+            df[col] = out
+    return df
+
+
+def memory_report(df, *, top: Optional[int] = None) -> Dict[str, Any]:
+    """Per-column dtype and deep memory usage, largest columns first."""
+    usage = df.memory_usage(deep=True, index=False).tolist()
+    cols: List[Dict[str, Any]] = [
+        {"column": str(c), "dtype": str(t), "bytes": int(u)}
+        for c, t, u in zip(df.columns, df.dtypes, usage)
+    ]
+    cols.sort(key=lambda item: item["bytes"], reverse=True)
+    by_dtype: Dict[str, int] = {}
+    for item in cols:
+        by_dtype[item["dtype"]] = by_dtype.get(item["dtype"], 0) + item["bytes"]
+    return {
+        "rows": int(len(df)),
+        "cols": int(len(df.columns)),
+        "total_bytes": int(sum(item["bytes"] for item in cols)),
+        "by_dtype": by_dtype,
+        "columns": cols[:top] if top else cols,
+    }
@@ -0,0 +1,182 @@
+"""Hash index from canonical vehicle keys to catalog row positions.
+
+Request handlers resolve a vehicle by filtering the whole catalog with
+``df["make"].astype(str).str.upper() == mk`` and friends. ``CatalogIndex``
+computes those key columns once per catalog epoch and groups row positions by
+(model), (make, model), (make, model, year) and (make, model, year, version)
+in both plain-upper and compact (alphanumeric only) version spellings, so a
+lookup is a dict access plus, at most, a filter over a handful of rows.
+
+Matching mirrors the masks it replaces: text keys compare as
+``str(value).strip().upper()`` and years as ``pd.to_numeric(ano) == year``. Positions
+are returned in frame order, so ``df.iloc[positions]`` yields the same rows
+the boolean mask would.
+
+The same per-epoch pass materialises ``keys``, a frame aligned with the
+catalog (same index) holding the canonical key columns handlers used to
+recompute per request: upper-case make/model/version, compact model/version,
+integer year (0 when unknown) plus any derived buckets passed as ``extra``.
+They live beside the catalog rather than in it so API rows stay unchanged.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+
+def _pandas():
+    try:
+        import pandas as pd  # type: ignore
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError("pandas is required for the catalog index") from e
+    return pd
+
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+
+
+def compact_version(value: Any) -> str:
+    """Same spelling as ``_compact_key`` in backend/app.py."""
+    return _NON_ALNUM.sub("", str(value or "").upper())
+
+
+class CatalogIndex:
+    """Row positions of a catalog frame keyed by canonical make/model/year/version."""
+
+    def __init__(self, df, extra: Optional[Mapping[str, Callable[[Any], Any]]] = None) -> None:
+        pd = _pandas()
+        import numpy as np  # type: ignore
+
+        self.frame = df
+        self.size = n = int(len(df))
+
+        def upper(col: str):
+            if col not in df.columns:
+                return None
+            return df[col].astype(str).str.strip().str.upper().to_numpy(dtype=object)
+
+        def compact(values):
+            if values is None:
+                return None
+            return np.fromiter(map(compact_version, values), dtype=object, count=n)
+
+        self._make = upper("make")
+        self._model = upper("model")
+        self._version = upper("version")
+        self._version_compact = compact(self._version)
+        self._year = (
+            pd.to_numeric(df["ano"], errors="coerce").to_numpy(dtype="float64")
+            if "ano" in df.columns else None
+        )
+
+        keys: Dict[str, Any] = {}
+        for name, values in (
+            ("make", self._make),
+            ("model", self._model),
+            ("version", self._version),
+            ("model_c", compact(self._model)),
+            ("version_c", self._version_compact),
+        ):
+            if values is not None:
+                keys[name] = values
+        if self._year is not None:
+            keys["year"] = np.nan_to_num(self._year, nan=0.0).astype(np.int64)
+        for name, fn in (extra or {}).items():
+            try:
+                keys[name] = np.asarray(fn(df), dtype=object)
+            except Exception:
+                pass
+        self.keys = pd.DataFrame(keys, index=df.index)
+
+        def group(*cols) -> Dict[Tuple, Any]:
+            if any(c is None for c in cols):
+                return {}
+            # Plain dict pass: same groups as groupby(dropna=True).indices at
+            # a fraction of the cost for a few thousand rows.
+            buckets: Dict[Tuple, list] = {}
+            columns = [c.tolist() for c in cols]
+            for i, key in enumerate(zip(*columns)):
+                if any(k != k for k in key):  # NaN year
+                    continue
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = [i]
+                else:
+                    bucket.append(i)
+            return {k: np.asarray(v, dtype=np.intp) for k, v in buckets.items()}
+
+        self._by_model = group(self._model)
+        self._by_make_model = group(self._make, self._model)
+        self._by_year = group(self._make, self._model, self._year)
+        self._by_version = group(self._make, self._model, self._year, self._version)
+        self._by_version_compact = group(self._make, self._model, self._year, self._version_compact)
+        self._empty = np.empty(0, dtype=np.intp)
+        self._all = np.arange(n)
+
+    @staticmethod
+    def _key(value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        s = str(value).strip().upper()
+        return s or None
+
+    def rows(
+        self,
+        make: Any = None,
+        model: Any = None,
+        year: Any = None,
+        version: Any = None,
+        *,
+        compact: bool = False,
+    ):
+        """Positions of rows matching every given key (None/"" = not filtered).
+
+        ``compact=True`` compares the version in its compact spelling. As with
+        the masks this replaces, year/version filters are skipped when the
+        frame has no ``ano``/``version`` column.
+        """
+        import numpy as np  # type: ignore
+
+        mk, md = self._key(make), self._key(model)
+        vr = self._key(version) if self._version is not None else None
+        if compact and vr is not None:
+            vr = compact_version(vr) or None
+        yr: Optional[float] = None
+        if year is not None and year != "" and self._year is not None:
+            try:
+                yr = float(year)
+            except Exception:
+                return self._empty
+        if mk is None and md is None:
+            pos = self._all
+            if yr is not None:
+                pos = self._filter(pos, self._year, yr)
+            if vr is not None:
+                pos = self._filter(pos, self._version_compact if compact else self._version, vr)
+            return pos
+        if mk is None:
+            pos = self._by_model.get((md,), self._empty)
+            if yr is not None:
+                pos = self._filter(pos, self._year, yr)
+        elif md is None:
+            pos = self._filter(self._all, self._make, mk)
+            if yr is not None:
+                pos = self._filter(pos, self._year, yr)
+        elif yr is None:
+            pos = self._by_make_model.get((mk, md), self._empty)
+        elif vr is not None:
+            table = self._by_version_compact if compact else self._by_version
+            return np.asarray(table.get((mk, md, yr, vr), self._empty))
+        else:
+            return np.asarray(self._by_year.get((mk, md, yr), self._empty))
+        if vr is not None:
+            pos = self._filter(pos, self._version_compact if compact else self._version, vr)
+        return np.asarray(pos)
+
+    def _filter(self, pos, values, target):
+        if values is None:
+            return self._empty
+        if not len(pos):
+            return pos
+        return pos[values[pos] == target]
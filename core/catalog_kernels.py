@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Iterable, Optional, Sequence, Tuple
+
+
+def _pandas():
+    try:
+        import pandas as pd  # type: ignore
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError("pandas is required for catalog kernels") from e
+    return pd
+
+
+_NUMERIC_TYPES = (bool, int, float)
+_HOMOGENEOUS_KINDS = {"string", "boolean", "integer", "floating", "empty", "bytes"}
+
+
+def map_values(series, fn: Callable[[Any], Any]):
+    """Apply a scalar parser to a Series, evaluating each distinct value once.
+
+    Catalog columns repeat a handful of values ("Estándar", "No Disponible",
+    True, 0...) across thousands of rows, so parsing distinct values and
+    broadcasting the result is much cheaper than ``series.map(fn)``.
+    None and NaN still reach ``fn`` as distinct values, and object columns
+    mixing numeric types are grouped by type first so 1, 1.0 and True (equal
+    for hashing) are parsed separately.
+    """
+    pd = _pandas()
+    import numpy as np  # type: ignore
+
+    n = len(series)
+    if n == 0:
+        return pd.Series(np.empty(0, dtype=object), index=series.index, dtype=object)
+    if series.dtype != object:
+        # Typed column: a single kind of scalar, factorize natively.
+        codes, uniques = pd.factorize(series)
+        lut = np.empty(len(uniques) + 1, dtype=object)
+        for i, u in enumerate(uniques.tolist()):
+            lut[i] = fn(u)
+        na_pos = np.flatnonzero(codes == -1)
+        if len(na_pos):
+            lut[-1] = fn(series.iloc[int(na_pos[0])])
+        return pd.Series(lut[codes], index=series.index, dtype=object).infer_objects()
+
+    values = series.to_numpy(dtype=object)
+    out = np.empty(n, dtype=object)
+    groups: list = [None]
+    if pd.api.types.infer_dtype(values, skipna=True) not in _HOMOGENEOUS_KINDS:
+        kinds = set(map(type, values))
+        numeric = [k for k in kinds if issubclass(k, _NUMERIC_TYPES) or k.__module__ == "numpy"]
+        if len(numeric) > 1:
+            type_codes, uniq_types = pd.factorize(np.fromiter(map(type, values), dtype=object, count=n))
+            groups = [np.flatnonzero(type_codes == i) for i in range(len(uniq_types))]
+    for pos in groups:
+        vals = values if pos is None else values[pos]
+        try:
+            codes, uniques = pd.factorize(vals)
+        except TypeError:  # unhashable cells (dict/list)
+            res = np.empty(len(vals), dtype=object)
+            for i, v in enumerate(vals):
+                res[i] = fn(v)
+        else:
+            lut = np.empty(len(uniques) + 1, dtype=object)
+            for i, u in enumerate(uniques):
+                lut[i] = fn(u)
+            res = lut[codes]
+            na_pos = np.flatnonzero(codes == -1)
+            if len(na_pos):
+                # None / NaN / pd.NA share the -1 code; parse each kind once
+                na_vals = vals[na_pos].tolist()
+                na_kinds = set(map(type, na_vals))
+                if len(na_kinds) == 1:
+                    res[na_pos] = fn(na_vals[0])
+                else:
+                    parsed = {v.__class__: v for v in na_vals}
+                    parsed = {k: fn(v) for k, v in parsed.items()}
+                    res[na_pos] = [parsed[v.__class__] for v in na_vals]
+        if pos is None:
+            out[:] = res
+        else:
+            out[pos] = res
+    return pd.Series(out, index=series.index, dtype=object).infer_objects()
+
+
+def column_or_none(df, name: str):
+    """Return ``df[name]`` or None when the column is absent (row.get semantics)."""
+    return df[name] if name in df.columns else None
+
+
+def num_column(df, name: str, parse: Callable[[Any], Optional[float]]):
+    """Parse a column to float (NaN for unparsable/missing); all-NaN when absent."""
+    pd = _pandas()
+    col = column_or_none(df, name)
+    if col is None:
+        return pd.Series(float("nan"), index=df.index, dtype="float64")
+    return pd.to_numeric(map_values(col, parse), errors="coerce").astype("float64")
+
+
+def flag_any(df, names: Iterable[str], to01: Callable[[Any], Any]):
+    """1 where any of ``names`` parses as set (``to01(v) == 1``), else 0."""
+    pd = _pandas()
+    acc = pd.Series(False, index=df.index)
+    for name in names:
+        col = column_or_none(df, name)
+        if col is None:
+            continue
+        acc = acc | (map_values(col, lambda v: to01(v) == 1).astype(bool))
+    return acc.astype("int64")
+
+
+def truthy_mask(series, *, nan_is_truthy: bool = False):
+    """Python truthiness per cell (``bool(v)``).
+
+    On DataFrame rows ``bool(float('nan'))`` is True, so ``row.get(a) or
+    row.get(b)`` never falls through a NaN cell; pass ``nan_is_truthy`` to
+    keep that behaviour. Otherwise NaN counts as missing (absent dict key).
+    """
+
+    def _b(v: Any) -> bool:
+        if v is None:
+            return False
+        try:
+            if v != v:
+                return nan_is_truthy
+            return bool(v)
+        except Exception:
+            return False
+
+    return map_values(series, _b).astype(bool)
+
+
+def python_or(df, names: Sequence[str], *, nan_is_truthy: bool = False):
+    """Column-wise ``row.get(a) or row.get(b) or ...``.
+
+    Returns the first truthy value per row, falling back to the last operand
+    like Python's ``or``. Absent columns behave as None.
+    """
+    pd = _pandas()
+    result = None
+    decided = pd.Series(False, index=df.index)
+    for name in names:
+        col = column_or_none(df, name)
+        if col is None:
+            col = pd.Series([None] * len(df), index=df.index, dtype=object)
+        col = col.astype(object)
+        if result is None:
+            result = col
+        else:
+            result = result.where(decided, col)
+        decided = decided | truthy_mask(col, nan_is_truthy=nan_is_truthy)
+    if result is None:
+        result = pd.Series([None] * len(df), index=df.index, dtype=object)
+    return result
+
+
+def round1(values):
+    """Python ``round(v, 1)`` per element (numpy rounding differs on ties)."""
+    pd = _pandas()
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    series = series.astype("float64")
+    return map_values(series, lambda v: round(v, 1) if v == v else v).astype("float64")
+
+
+def key_present(df, records: Sequence[dict], key: str, rows=None):
+    """Which rows' source records define ``key`` (even as null).
+
+    Only rows whose cell is missing are probed against ``records`` (the dicts
+    the frame was built from), which keeps this cheap on wide, dense frames.
+    ``rows`` optionally restricts the result to those positions.
+    """
+    import numpy as np  # type: ignore
+
+    n = len(df)
+    if rows is None:
+        rows = np.arange(n)
+    if key not in df.columns:
+        return np.zeros(len(rows), dtype=bool)
+    out = df[key].notna().to_numpy()[rows].copy()
+    probe = np.flatnonzero(~out)
+    if len(probe):
+        pos = rows[probe].tolist()
+        out[probe] = np.fromiter((key in records[i] for i in pos), dtype=bool, count=len(pos))
+    return out
+
+
+def apply_alias_table(
+    df,
+    table: Iterable[Tuple[str, str]],
+    *,
+    create_missing: bool = False,
+    records: Optional[Sequence[dict]] = None,
+):
+    """Column-wise ``row.setdefault(dst, row.get(src))`` for an alias table.
+
+    With ``records`` the destination is filled only where the record lacked
+    the key (an explicit null is kept, like ``setdefault``); without it,
+    missing means NaN. ``create_missing`` creates the destination column when
+    the source column is absent altogether.
+    """
+    import numpy as np  # type: ignore
+
+    pd = _pandas()
+    n = len(df)
+    for dst, src in table:
+        if src not in df.columns:
+            if create_missing and dst not in df.columns:
+                df[dst] = pd.Series([None] * n, index=df.index, dtype=object)
+            continue
+        src_ok = df[src].notna().to_numpy()
+        if dst not in df.columns:
+            df[dst] = df[src]
+            continue
+        rows = np.flatnonzero(df[dst].isna().to_numpy() & src_ok)
+        if records is not None and len(rows):
+            rows = rows[~key_present(df, records, dst, rows)]
+        if len(rows):
+            mask = np.zeros(n, dtype=bool)
+            mask[rows] = True
+            df[dst] = df[dst].where(~mask, df[src])
+    return df
@@ -0,0 +1,142 @@
+"""Typo-tolerant n-gram search over catalog make/model/version names.
+
+``CatalogSearch`` is built once per catalog epoch from the canonical key
+columns. Each distinct (make, model, version) is a document; its make, model,
+version and "make model" strings are normalised (accents dropped, only A-Z0-9
+kept, so "T-Cross" and "TCROSS" agree) and broken into character n-grams
+(bigrams by default) padded with boundary markers; so is every word of those
+strings. A query is normalised the same way and scored against every field
+sharing an n-gram with it:
+
+- a field containing the whole query ranks first (``EXACT``, what
+  ``str.contains`` did);
+- otherwise the Dice similarity of the two n-gram sets (shared n-grams over
+  their mean size), so "hylux" still finds HILUX (0.67) and "corola" finds
+  COROLLA (0.93) while "hilux" no longer matches the version "Hibrida Luxury"
+  (0.29) just because the long field holds 4 of its 6 bigrams. A fuzzy hit
+  must also start with the query's first character ("hilux" is not "LUX").
+
+Callers can tell a fuzzy answer from a verbatim one by comparing the best
+score with ``EXACT``.
+
+Bigrams rather than trigrams because model names are short: one typo in a
+five-letter name leaves 2/5 of its trigrams but 4/6 of its bigrams.
+
+The best field decides the document's score; documents expand to catalog
+row positions in frame order.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Sequence, Tuple
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+
+NGRAM = 2
+# Minimum Dice similarity between query and field n-grams to count as a hit
+MIN_SCORE = 0.65
+# Score of a field containing the normalised query verbatim
+EXACT = 2.0
+
+
+def normalize(text: Any) -> str:
+    """Upper-case, accent-free, alphanumeric-only form used for matching."""
+    s = unicodedata.normalize("NFKD", str(text or "").upper())
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub("", s)
+
+
+def ngrams(norm: str, n: int = NGRAM) -> frozenset:
+    """Padded character n-grams of an already normalised string."""
+    if not norm:
+        return frozenset()
+    padded = f"^{norm}$"
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class CatalogSearch:
+    """Ranked fuzzy lookup of catalog rows by make/model/version text."""
+
+    def __init__(self, makes: Sequence[Any], models: Sequence[Any], versions: Sequence[Any]) -> None:
+        import numpy as np  # type: ignore
+
+        docs: Dict[Tuple[str, str, str], List[int]] = {}
+        for pos, key in enumerate(zip(makes, models, versions)):
+            docs.setdefault(tuple(str(v or "") for v in key), []).append(pos)
+        self._doc_rows = [np.asarray(rows, dtype=np.intp) for rows in docs.values()]
+
+        # Makes, models and their words repeat across documents
+        seen: Dict[str, str] = {}
+
+        def norm_of(text: str) -> str:
+            out = seen.get(text)
+            if out is None:
+                out = seen[text] = normalize(text)
+            return out
+
+        field_ids: Dict[str, int] = {}
+        pairs: List[Tuple[int, int]] = []  # (field, doc)
+        for doc, (mk, md, vr) in enumerate(docs):
+            texts = (mk, md, vr, f"{mk} {md}")
+            norms = {norm_of(t) for t in texts}
+            norms.update(norm_of(w) for t in texts for w in t.split())
+            for norm in sorted(norms):
+                if not norm:
+                    continue
+                fid = field_ids.setdefault(norm, len(field_ids))
+                pairs.append((fid, doc))
+        self._fields = list(field_ids)
+        field_grams = [ngrams(f) for f in self._fields]
+        self._field_grams = np.asarray([len(g) for g in field_grams], dtype=np.float64)
+        self._field_head = np.asarray([f[0] for f in self._fields], dtype=object)
+        postings: Dict[str, List[int]] = {}
+        for fid, grams in enumerate(field_grams):
+            for gram in grams:
+                postings.setdefault(gram, []).append(fid)
+        self._postings = {g: np.asarray(ids, dtype=np.intp) for g, ids in postings.items()}
+        pair_arr = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+        self._pair_field = pair_arr[:, 0]
+        self._pair_doc = pair_arr[:, 1]
+        self._n_docs = len(self._doc_rows)
+
+    def search(self, query: Any, *, min_score: float = MIN_SCORE) -> List[Tuple[Any, float]]:
+        """[(row positions, score)] per matching document, best first."""
+        import numpy as np  # type: ignore
+
+        q = normalize(query)
+        if not q or not self._n_docs:
+            return []
+        grams = ngrams(q)
+        hits = [self._postings[g] for g in grams if g in self._postings]
+        if hits:
+            shared = np.bincount(np.concatenate(hits), minlength=len(self._fields))
+        else:
+            shared = np.zeros(len(self._fields), dtype=np.intp)
+        score = 2.0 * shared / (len(grams) + self._field_grams)
+        score[self._field_head != q[0]] = 0.0
+        # A field containing the query verbatim has all of its inner n-grams
+        # (only the two boundary ones may be missing); queries too short to
+        # have an inner n-gram check every field.
+        if len(q) < NGRAM:
+            maybe = range(len(self._fields))
+        else:
+            maybe = np.flatnonzero(shared >= len(grams) - 2).tolist()
+        for fid in maybe:
+            if q in self._fields[fid]:
+                score[fid] = EXACT
+        doc_score = np.zeros(self._n_docs)
+        np.maximum.at(doc_score, self._pair_doc, score[self._pair_field])
+        order = np.flatnonzero(doc_score >= min_score)
+        order = order[np.argsort(-doc_score[order], kind="stable")]
+        return [(self._doc_rows[d], float(doc_score[d])) for d in order.tolist()]
+
+    def rows(self, query: Any, *, min_score: float = MIN_SCORE):
+        """Row positions of matching documents, best match first."""
+        import numpy as np  # type: ignore
+
+        found = self.search(query, min_score=min_score)
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([rows for rows, _score in found])
@@ -0,0 +1,65 @@
+"""Bounded LRU of enriched vehicle rows shared by the comparison endpoints.
+
+Filling a row for /compare (fuel, equipment score, pillars, catalog features,
+overlay, JSON specs, service cost, monthly sales, audio...) costs far more
+than the comparison itself, and the same popular vehicles show up in most
+requests. ``EnrichedCache`` keeps the latest ``maxsize`` results keyed by the
+caller (vehicle identity plus the data epoch they were computed under) and
+counts hits and misses.
+
+Values are deep-copied on the way in and out: handlers patch the rows they
+get back, and a cached row must never see those edits. A miss computes
+outside the lock, so two threads missing the same key at once both compute
+and the last one stores; the results are identical.
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class EnrichedCache:
+    """Thread-safe LRU with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 2048) -> None:
+        self.maxsize = max(0, int(maxsize))
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Cached value for ``key``, computing and storing it with ``fn()`` on a miss."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._data[key])
+            self.misses += 1
+        value = fn()
+        if self.maxsize:
+            stored = copy.deepcopy(value)
+            with self._lock:
+                self._data[key] = stored
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else None,
+            }
@@ -0,0 +1,34 @@
+"""Advisory inter-process lock for artifacts shared through the filesystem.
+
+Several uvicorn workers read and rebuild the same files under ``data/cache``.
+``exclusive`` lets one of them rebuild while the others wait and then reuse
+the result. It relies on ``fcntl.flock`` (POSIX). Where that is missing the
+block runs unlocked, and a concurrent rebuild is only wasted work: writers
+replace artifacts atomically.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+
+@contextmanager
+def exclusive(path: Union[str, Path]) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` (created if missing) for the block."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
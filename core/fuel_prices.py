@@ -0,0 +1,97 @@
+"""Fuel-price snapshots for row-level cost computations.
+
+Pricing ``fuel_cost_60k_mxn`` used to call the whole /config handler for
+every row: it stat'ed every data source, could block on the datos.gob.mx
+fetch and appended the config body to the audit log. ``FuelPrices`` is an
+immutable snapshot of the prices (and where they came from), and
+``FuelPriceProvider`` holds the current one:
+
+- ``current()`` is an attribute read once the first snapshot exists (the
+  first call loads it inline, as the first /config hit used to);
+- ``refresh()`` builds the next snapshot with the ``load`` callable and
+  swaps it in. It is meant to run from a background thread on its own
+  schedule, and reports whether the prices changed so callers can reprice
+  what they derived from the previous ones (``loaded()`` taken before the
+  refresh is that previous snapshot).
+
+``version`` increases whenever a refresh changes the prices or their
+metadata, so caches can key on it.
+"""
+
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional
+
+
+class FuelPrices(NamedTuple):
+    """Prices per litre (gasoline, diesel) and per kWh, with provenance."""
+
+    gasolina_magna_litro: Optional[float]
+    gasolina_premium_litro: Optional[float]
+    diesel_litro: Optional[float]
+    electricidad_kwh: Optional[float]
+    as_of: Optional[str] = None
+    source: Optional[str] = None
+    fetched_at: Optional[datetime] = None
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        """The ``fuel_prices`` object /config returns."""
+        return {
+            "gasolina_magna_litro": self.gasolina_magna_litro,
+            "gasolina_premium_litro": self.gasolina_premium_litro,
+            "diesel_litro": self.diesel_litro,
+            "electricidad_kwh": self.electricidad_kwh,
+        }
+
+    def price_for(self, fuel: str) -> Optional[float]:
+        """Price per unit for a fuel description (0 for electric, None when unknown)."""
+        lc = str(fuel or "").lower()
+        if not lc:
+            return None
+        if "elect" in lc:
+            return 0.0
+        if "diesel" in lc:
+            return self.diesel_litro
+        if "premium" in lc:
+            return self.gasolina_premium_litro or self.gasolina_magna_litro
+        if "magna" in lc or "regular" in lc or any(k in lc for k in ("gas", "nafta", "petrol", "gasolina")):
+            return self.gasolina_magna_litro or self.gasolina_premium_litro
+        return None
+
+
+class FuelPriceProvider:
+    """Current ``FuelPrices`` snapshot, replaced atomically by ``refresh``."""
+
+    def __init__(self, load: Callable[[], FuelPrices]) -> None:
+        self._load = load
+        self._lock = threading.Lock()
+        self._snapshot: Optional[FuelPrices] = None
+        self.version = 0
+
+    def current(self) -> FuelPrices:
+        snap = self._snapshot
+        if snap is not None:
+            return snap
+        with self._lock:
+            if self._snapshot is None:
+                self._swap(self._load())
+            return self._snapshot  # type: ignore[return-value]
+
+    def loaded(self) -> Optional[FuelPrices]:
+        """Current snapshot, or None before the first load (never loads)."""
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Load a new snapshot; True when it differs from the previous one."""
+        with self._lock:
+            return self._swap(self._load())
+
+    def _swap(self, snap: FuelPrices) -> bool:
+        prev = self._snapshot
+        self._snapshot = snap
+        changed = prev is None or prev._replace(fetched_at=None) != snap._replace(fetched_at=None)
+        if changed:
+            self.version += 1
+        return changed
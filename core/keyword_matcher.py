@@ -0,0 +1,48 @@
+"""Single-pass multi-keyword matching for equipment text.
+
+Equipment parsing asks many "does any of these substrings occur?" questions
+of the same text. ``KeywordMatcher`` compiles every keyword of every label
+into one regex and reports all labels hit in a single scan, with the same
+semantics as ``any(k in text for k in keywords)`` per label.
+
+Overlapping keywords are handled Aho-Corasick style: alternatives are tried
+longest first at each position (through a lookahead, so matches overlap), and
+a hit on a keyword also counts for every keyword that is a prefix of it.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, FrozenSet, Iterable, Mapping
+
+
+class KeywordMatcher:
+    """Maps a text to the set of labels whose keywords occur in it."""
+
+    def __init__(self, families: Mapping[str, Iterable[str]]) -> None:
+        owners: Dict[str, set] = {}
+        for label, keywords in families.items():
+            for kw in keywords:
+                if kw:
+                    owners.setdefault(kw, set()).add(label)
+        # keyword -> labels of every keyword that is a prefix of it (itself included)
+        self._labels: Dict[str, FrozenSet[str]] = {
+            kw: frozenset().union(*(owners[p] for p in owners if kw.startswith(p)))
+            for kw in owners
+        }
+        alts = sorted(owners, key=len, reverse=True)
+        self._rx = re.compile("(?=(" + "|".join(map(re.escape, alts)) + "))") if alts else None
+
+    def labels(self, text: str) -> FrozenSet[str]:
+        """Labels with at least one keyword occurring in ``text``."""
+        if self._rx is None or not text:
+            return frozenset()
+        found = {m.group(1) for m in self._rx.finditer(text)}
+        if len(found) == 1:
+            return self._labels[found.pop()]
+        return frozenset().union(*(self._labels[k] for k in found))
+
+
+def any_of(keywords: Iterable[str]) -> "re.Pattern[str]":
+    """Compiled ``any(k in text for k in keywords)`` for a single family."""
+    return re.compile("|".join(map(re.escape, sorted(set(keywords), key=len, reverse=True))))
@@ -0,0 +1,116 @@
+"""Index of 60k-km service costs from the maintenance CSVs.
+
+/compare filled ``service_cost_60k_mxn`` by re-reading
+``data/costos_mantenimiento.csv`` (and the enriched fallback) for every row
+and filtering the record list tier by tier. ``MaintenanceIndex`` parses the
+files once and keeps, for every key of every tier, the record that tier's
+sort would put first:
+
+- (make, model, year, version) and (make, model, year, compact version);
+- (make, model, year);
+- (make, model), any year.
+
+Preference within a tier is unchanged: earlier file first, then an
+"incluido" cost (0) over a paid one, then the cheapest. Rows with cost 1
+(sentinel), negative or unparseable are skipped. Text keys are
+``strip().upper()`` of the file values; years that do not parse are None.
+"""
+
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from core.catalog_index import compact_version
+
+# Cost columns in the order they are tried
+COST_COLUMNS = (
+    "service_cost_60k_mxn",
+    "ServiceCost60k",
+    "service_cost",
+    "60000",
+    "Costo_60k",
+    "Costo 60k",
+)
+
+
+def parse_cost(record: Mapping[str, Any]) -> Optional[float]:
+    """Cost of a CSV record: first non-empty cost column, 'incluido' as 0."""
+    raw_val = None
+    for col in COST_COLUMNS:
+        v = record.get(col)
+        if v not in (None, ""):
+            raw_val = v
+            break
+    raw = str(raw_val or "").strip()
+    if raw == "":
+        return None
+    low = raw.lower()
+    if any(tok in low for tok in ("incluido", "inclu", "gratis", "incl.")):
+        return 0.0
+    try:
+        return float(raw.replace(",", "").replace("$", ""))
+    except Exception:
+        return None
+
+
+class MaintenanceIndex:
+    """Best service cost per make/model/year/version tier."""
+
+    def __init__(self, paths: Iterable[Path]) -> None:
+        self._by_version: Dict[Tuple, Tuple] = {}
+        self._by_compact: Dict[Tuple, Tuple] = {}
+        self._by_year: Dict[Tuple, Tuple] = {}
+        self._by_model: Dict[Tuple, Tuple] = {}
+        self.size = 0
+        for prio, path in enumerate(paths):
+            path = Path(path)
+            if not path.exists():
+                continue
+            with path.open("r", encoding="utf-8", newline="") as fh:
+                for r in csv.DictReader(fh):
+                    val = parse_cost(r)
+                    # Acepta 0 (incluido) y >1; ignora sólo 1 (sentinela) o negativos
+                    if val is None or val == 1 or val < 0:
+                        continue
+                    mk = str(r.get("MAKE") or r.get("Make") or r.get("make") or "").strip().upper()
+                    md = str(r.get("Model") or r.get("MODEL") or r.get("model") or "").strip().upper()
+                    vr = str(r.get("Version") or r.get("VERSION") or r.get("version") or "").strip().upper()
+                    try:
+                        yr = int(str(r.get("Año") or r.get("ano") or r.get("AÑO") or "").strip())
+                    except Exception:
+                        yr = None
+                    rank = (prio, 0 if val == 0 else 1, val)
+                    self._keep(self._by_version, (mk, md, yr, vr), rank)
+                    self._keep(self._by_compact, (mk, md, yr, compact_version(vr)), rank)
+                    self._keep(self._by_year, (mk, md, yr), rank)
+                    self._keep(self._by_model, (mk, md), rank)
+                    self.size += 1
+
+    @staticmethod
+    def _keep(table: Dict[Tuple, Tuple], key: Tuple, rank: Tuple) -> None:
+        cur = table.get(key)
+        if cur is None or rank < cur:
+            table[key] = rank
+
+    def lookup(self, make: str, model: str, year: Optional[int], version: str) -> Optional[float]:
+        """Cost for a canonical vehicle, trying (mk, md, yr, vr) -> (mk, md, yr)
+        -> (mk, md, 2025) -> (mk, md, any); None when nothing matches.
+        """
+        exact = [
+            r for r in (
+                self._by_version.get((make, model, year, version)),
+                self._by_compact.get((make, model, year, compact_version(version))),
+            ) if r is not None
+        ]
+        if exact:
+            return min(exact)[2]
+        for hit in (
+            self._by_year.get((make, model, year)) if year is not None else None,
+            self._by_year.get((make, model, 2025)),
+            self._by_model.get((make, model)),
+        ):
+            if hit is not None:
+                return hit[2]
+        return None
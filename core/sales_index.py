@@ -0,0 +1,175 @@
+"""Per-year sales arrays built once per ``sales_ytd_{year}.csv`` epoch.
+
+/compare, /seasonality and /sales/brand_monthly used to re-read the yearly
+sales file on every request (and /compare once more per enriched row) and
+sum the monthly columns with row-wise ``apply``/``iterrows``. ``SalesYear``
+does that pass once:
+
+- ``monthly`` is an (rows, 12) float matrix of units (missing cells as 0,
+  ``monthly_raw`` keeps them as NaN), ``ytd`` its row sums and
+  ``last_month`` the last month with units (0 when none);
+- ``units`` and friends answer the model-level YTD lookups of /compare from
+  dicts keyed by canonical (make, model, year);
+- ``pick`` finds the row /compare copies monthly columns from;
+- ``segments`` and ``brand_monthly`` sum the matrix by segment / canonical
+  make, memoised on the instance.
+
+Text keys follow the code they replace: raw keys are
+``str(value or "").strip().upper()``, canonical keys come from the
+``canon_make``/``canon_model`` callables (alias resolution lives in the app).
+Only the ``ventas_{year}_01`` .. ``ventas_{year}_12`` columns count as months.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Tuple
+
+SIN_SEGMENTO = "(sin segmento)"
+
+
+def _up(value: Any) -> str:
+    return str(value or "").strip().upper()
+
+
+class SalesYear:
+    """Monthly unit sales of one year keyed by make/model."""
+
+    def __init__(
+        self,
+        df,
+        year: int,
+        canon_make: Callable[[str], Optional[str]],
+        canon_model: Callable[[str, str], Optional[str]],
+    ) -> None:
+        import numpy as np  # type: ignore
+        import pandas as pd  # type: ignore
+
+        df = df.reset_index(drop=True)
+        df.columns = [str(c).strip().lower() for c in df.columns]
+        self.year = year = int(year)
+        self.size = n = int(len(df))
+
+        def text(col: str):
+            values = df[col].tolist() if col in df.columns else [None] * n
+            return np.array([_up(v) for v in values], dtype=object)
+
+        self.make = text("make")
+        self.model = text("model")
+        makes = {mk: canon_make(mk) or mk for mk in set(self.make.tolist())}
+        self.make_canon = np.array([makes[mk] for mk in self.make], dtype=object)
+        models = {pair: canon_model(*pair) or pair[1] for pair in set(zip(self.make_canon.tolist(), self.model.tolist()))}
+        self.model_canon = np.array([models[pair] for pair in zip(self.make_canon, self.model)], dtype=object)
+        if "ano" in df.columns:
+            ano = pd.to_numeric(df["ano"], errors="coerce").to_numpy(dtype="float64")
+            self.ano = np.nan_to_num(ano, nan=float(year)).astype(np.int64)
+        else:
+            self.ano = np.full(n, year, dtype=np.int64)
+
+        prefix = f"ventas_{year}_"
+        self.months: List[int] = [m for m in range(1, 13) if f"{prefix}{m:02d}" in df.columns]
+        raw = np.full((n, 12), np.nan)
+        for m in self.months:
+            raw[:, m - 1] = pd.to_numeric(df[f"{prefix}{m:02d}"], errors="coerce").to_numpy(dtype="float64")
+        self.monthly_raw = raw
+        self.monthly = np.nan_to_num(raw, nan=0.0)
+        self.ytd = self.monthly.sum(axis=1)
+        sold = self.monthly > 0
+        self.last_month = np.where(sold.any(axis=1), 12 - np.argmax(sold[:, ::-1], axis=1), 0)
+        ytd_col = f"ventas_ytd_{year}"
+        self.ytd_reported = (
+            pd.to_numeric(df[ytd_col], errors="coerce").to_numpy(dtype="float64")
+            if ytd_col in df.columns else None
+        )
+
+        # Model-level YTD: later rows win for a repeated key, first-seen order kept
+        units: Dict[Tuple[str, str, int], Tuple[int, Optional[int]]] = {}
+        if self.months:
+            for mk, md, yr, ytd, lm in zip(self.make_canon, self.model_canon, self.ano.tolist(), self.ytd.tolist(), self.last_month.tolist()):
+                units[(mk, md, int(yr))] = (int(ytd), int(lm) or None)
+        self._units = units
+        self._any_year: Dict[Tuple[str, str], Tuple[Tuple[int, Optional[int]], int]] = {}
+        self._best_model: Dict[str, Tuple[int, Optional[int]]] = {}
+        self._best_model_year: Dict[str, Tuple[int, Optional[int]]] = {}
+        for (mk, md, yr), val in units.items():
+            self._any_year.setdefault((mk, md), (val, yr))
+            for best, ok in ((self._best_model, True), (self._best_model_year, yr == year)):
+                cur = best.get(md)
+                if ok and (cur is None or val[0] > cur[0]):
+                    best[md] = val
+
+        # Row picked for (make, model): first exact raw match, else the first
+        # row of that model when the file is sorted by every column
+        self._pick_pair: Dict[Tuple[str, str], int] = {}
+        for pos, pair in enumerate(zip(self.make.tolist(), self.model.tolist())):
+            self._pick_pair.setdefault(pair, pos)
+        self._pick_model: Dict[str, int] = {}
+        try:
+            s = df.assign(__mk=self.make, __md=self.model)
+            for pos in s.sort_values(by=list(s.columns)).index.tolist():
+                self._pick_model.setdefault(self.model[pos], int(pos))
+        except Exception:
+            pass
+
+        self._segments: Dict[Hashable, Dict[str, Any]] = {}
+        self._brands: Optional[Dict[str, List[int]]] = None
+
+    def units(self, make: str, model: str, year: int) -> Optional[Tuple[int, Optional[int]]]:
+        """(ytd_units, last_month) of a canonical (make, model, year)."""
+        return self._units.get((make, model, year))
+
+    def units_any_year(self, make: str, model: str) -> Optional[Tuple[Tuple[int, Optional[int]], int]]:
+        """((ytd_units, last_month), year) of the first year listed for (make, model)."""
+        return self._any_year.get((make, model))
+
+    def units_by_model(self, model: str, *, same_year: bool = False) -> Optional[Tuple[int, Optional[int]]]:
+        """Best-selling entry of a canonical model under any make.
+
+        ``same_year`` only considers rows whose ``ano`` is the file's year.
+        """
+        return (self._best_model_year if same_year else self._best_model).get(model)
+
+    def pick(self, make: str, model: str) -> Optional[int]:
+        """Row position to copy monthly figures from for (make, model)."""
+        pos = self._pick_pair.get((make, model))
+        if pos is None:
+            pos = self._pick_model.get(model)
+        return pos
+
+    def segments(self, seg_map: Mapping[Tuple[str, str], str], token: Hashable) -> Dict[str, Any]:
+        """{segment: 12 monthly units} with rows labelled by ``seg_map[(MAKE, MODEL)]``.
+
+        ``token`` identifies ``seg_map``; results are memoised under it.
+        """
+        hit = self._segments.get(token)
+        if hit is None:
+            import numpy as np  # type: ignore
+            import pandas as pd  # type: ignore
+
+            labels = [seg_map.get(pair) or SIN_SEGMENTO for pair in zip(self.make.tolist(), self.model.tolist())]
+            codes, uniq = pd.factorize(pd.Series(labels, dtype=object))
+            sums = np.zeros((len(uniq), 12))
+            np.add.at(sums, codes, self.monthly)
+            hit = self._segments[token] = {str(seg): sums[i] for i, seg in enumerate(uniq)}
+        return hit
+
+    def segment_totals(self, seg_map: Mapping[Tuple[str, str], str], token: Hashable) -> Dict[str, int]:
+        """{segment: YTD units}; empty when the file has no monthly columns."""
+        if not self.months:
+            return {}
+        return {seg: int(monthly.sum()) for seg, monthly in self.segments(seg_map, token).items()}
+
+    def brand_monthly(self) -> Dict[str, List[int]]:
+        """{canonical make: 12 monthly units}, each cell truncated to int before summing."""
+        if self._brands is None:
+            import numpy as np  # type: ignore
+            import pandas as pd  # type: ignore
+
+            brands: Dict[str, List[int]] = {}
+            if self.months:
+                keep = self.make_canon != ""
+                codes, uniq = pd.factorize(pd.Series(self.make_canon[keep], dtype=object))
+                sums = np.zeros((len(uniq), 12), dtype=np.int64)
+                np.add.at(sums, codes, np.trunc(self.monthly[keep]).astype(np.int64))
+                brands = {str(mk): sums[i].tolist() for i, mk in enumerate(uniq)}
+            self._brands = brands
+        return self._brands
@@ -0,0 +1,263 @@
+"""Incremental reader for vehicle catalog dumps (Autoradar / JATO JSON).
+
+Dumps are either ``{"vehicles": [...], "metadata": {...}}`` (curated files use
+``"items"``) or a bare list of vehicles. Records are yielded one at a time from,
+in order of preference:
+
+- the JSONL sidecar written by ``scripts/refresh_catalog.py`` (``<stem>.jsonl``)
+  when it is at least as new as the JSON;
+- ``ijson`` streaming over the JSON when the package is installed;
+- ``json.load`` of the whole document as a last resort.
+
+``load_vehicles`` is the shared entry point: each dump is parsed once per
+(mtime, size) signature and every consumer of the same catalog epoch reuses
+that parse (``vehicle_hashes`` gets the per-record content hashes from the
+same pass). Parses belong to the generation in which they were last used;
+``begin_generation`` starts a new one when a catalog build begins and
+``release_generations`` drops whatever the new epoch did not use once it is
+published, so at most one epoch's dumps stay in memory.
+``frame_from_records`` turns records into a DataFrame chunk by chunk.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+try:
+    import ijson  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    ijson = None  # type: ignore
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of ``path`` or None when it cannot be stat'ed."""
+    try:
+        st = Path(path).stat()
+    except Exception:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def jsonl_sidecar(path: Path) -> Optional[Path]:
+    """Return a fresh ``<stem>.jsonl`` next to ``path`` (one vehicle per line)."""
+    path = Path(path)
+    side = path.with_suffix(".jsonl")
+    try:
+        if side.exists() and side.stat().st_mtime >= path.stat().st_mtime:
+            return side
+    except Exception:
+        pass
+    return None
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            if isinstance(obj, dict):
+                yield obj
+
+
+def _document_is_list(fh) -> bool:
+    """True when the dump is a bare JSON list; rewinds ``fh``."""
+    head = fh.read(64).lstrip(b"\xef\xbb\xbf \t\r\n")
+    while not head:
+        chunk = fh.read(64)
+        if not chunk:
+            break
+        head = chunk.lstrip(b" \t\r\n")
+    fh.seek(0)
+    return head[:1] == b"["
+
+
+def _iter_ijson(path: Path, key: str, metadata: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    if metadata is None:
+        # Without metadata the items can be built by the backend itself
+        # (C with yajl2_c) instead of pumping every event through Python
+        with path.open("rb") as fh:
+            prefix = "item" if _document_is_list(fh) else f"{key}.item"
+            for item in ijson.items(fh, prefix, use_float=True):
+                if isinstance(item, dict):
+                    yield item
+        return
+    with path.open("rb") as fh:
+        events = ijson.parse(fh, use_float=True)
+        item_prefix: Optional[str] = None
+        for prefix, event, value in events:
+            if item_prefix is None:
+                # First event tells the document shape
+                item_prefix = "item" if event == "start_array" else f"{key}.item"
+                continue
+            wanted = prefix == item_prefix or (metadata is not None and prefix == "metadata")
+            if event != "start_map" or not wanted:
+                continue
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            for sub_prefix, sub_event, sub_value in events:
+                builder.event(sub_event, sub_value)
+                if sub_prefix == prefix and sub_event == "end_map":
+                    break
+            if prefix == "metadata":
+                metadata.update(builder.value)  # type: ignore[union-attr]
+            else:
+                yield builder.value
+
+
+def _iter_loaded(path: Path, key: str, metadata: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as fh:
+        obj = json.load(fh)
+    if isinstance(obj, dict):
+        if metadata is not None and isinstance(obj.get("metadata"), dict):
+            metadata.update(obj["metadata"])
+        items = obj.get(key)
+    else:
+        items = obj
+    if not isinstance(items, list):
+        return
+    for item in items:
+        if isinstance(item, dict):
+            yield item
+
+
+def iter_vehicles(
+    path: Path,
+    *,
+    key: str = "vehicles",
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the vehicle dicts of a dump without materialising the document.
+
+    ``key`` names the list inside object-shaped dumps. When ``metadata`` is
+    given, the top-level ``"metadata"`` object is merged into it as it is
+    read (complete once the iterator is exhausted); the JSONL sidecar carries
+    no metadata, so it is skipped in that case.
+    """
+    path = Path(path)
+    if metadata is None and key == "vehicles":
+        side = jsonl_sidecar(path)
+        if side is not None:
+            yield from _iter_jsonl(side)
+            return
+    done = 0
+    if ijson is not None:
+        try:
+            for item in _iter_ijson(path, key, metadata):
+                done += 1
+                yield item
+            return
+        except ijson.JSONError:
+            # Non-strict JSON (NaN literals...): resume with the stdlib parser
+            if metadata is not None:
+                metadata.clear()
+    for pos, item in enumerate(_iter_loaded(path, key, metadata)):
+        if pos >= done:
+            yield item
+
+
+class _SharedParse:
+    """Records (and, once asked for, content hashes) of one dump signature."""
+
+    def __init__(self, sig: Tuple[int, int], generation: int) -> None:
+        self.sig = sig
+        self.generation = generation
+        self.records: Optional[Tuple[Dict[str, Any], ...]] = None
+        self.hashes: Optional[Tuple[str, ...]] = None
+        self.lock = threading.Lock()
+
+
+_SHARED: Dict[Tuple[str, str], _SharedParse] = {}
+_SHARED_LOCK = threading.Lock()
+_GENERATION = 0
+
+
+def _shared_parse(path: Path, key: str, hashed: bool) -> Tuple[Tuple[Dict[str, Any], ...], Optional[Tuple[str, ...]]]:
+    path = Path(path)
+    sig = file_signature(path)
+    if sig is None:
+        return (), (() if hashed else None)
+    cache_key = (str(path.resolve()), key)
+    with _SHARED_LOCK:
+        entry = _SHARED.get(cache_key)
+        if entry is None or entry.sig != sig:
+            # Only the current signature of each dump is kept
+            entry = _SHARED[cache_key] = _SharedParse(sig, _GENERATION)
+        entry.generation = _GENERATION
+    # Per-dump lock: concurrent consumers wait for one parse, other dumps proceed
+    with entry.lock:
+        if entry.records is None:
+            records = []
+            hashes: Optional[list] = [] if hashed else None
+            for rec in iter_vehicles(path, key=key):
+                records.append(rec)
+                if hashes is not None:
+                    hashes.append(content_hash(rec))
+            entry.records = tuple(records)
+            entry.hashes = tuple(hashes) if hashes is not None else None
+        elif hashed and entry.hashes is None:
+            entry.hashes = tuple(content_hash(rec) for rec in entry.records)
+        return entry.records, entry.hashes
+
+
+def load_vehicles(path: Path, *, key: str = "vehicles") -> Tuple[Dict[str, Any], ...]:
+    """Parsed vehicles of ``path``, read once per (mtime, size) and shared.
+
+    The returned dicts are shared between callers and must be treated as
+    read-only. Parse errors propagate; a missing file yields ``()``.
+    """
+    return _shared_parse(path, key, False)[0]
+
+
+def vehicle_hashes(path: Path, *, key: str = "vehicles") -> Tuple[Tuple[Dict[str, Any], ...], Tuple[str, ...]]:
+    """(records, ``content_hash`` of each) of ``path``, hashed while it is parsed."""
+    records, hashes = _shared_parse(path, key, True)
+    return records, hashes or ()
+
+
+def begin_generation() -> int:
+    """Start a new parse generation and return it; parses used from now on belong to it."""
+    global _GENERATION
+    with _SHARED_LOCK:
+        _GENERATION += 1
+        return _GENERATION
+
+
+def release_generations(older_than: int) -> int:
+    """Drop shared parses last used before generation ``older_than``; returns how many."""
+    with _SHARED_LOCK:
+        stale = [k for k, entry in _SHARED.items() if entry.generation < older_than]
+        for k in stale:
+            del _SHARED[k]
+        return len(stale)
+
+
+def frame_from_records(records: Sequence[Dict[str, Any]], *, chunk_size: int = 2000):
+    """DataFrame of ``records`` built ``chunk_size`` records at a time.
+
+    Same columns (first-seen order) and rows as ``pd.DataFrame(records)``,
+    without converting the whole list into one object matrix at once.
+    """
+    import pandas as pd  # type: ignore
+
+    if len(records) <= chunk_size:
+        return pd.DataFrame(list(records))
+    parts = [pd.DataFrame(list(records[i:i + chunk_size])) for i in range(0, len(records), chunk_size)]
+    df = pd.concat(parts, ignore_index=True, sort=False)
+    # Chunks that disagree on a column's dtype concat to object; infer it
+    # again over all rows, as the single-list constructor does
+    mixed = [c for c in df.columns if df[c].dtype == object]
+    if mixed:
+        df[mixed] = df[mixed].infer_objects()
+    return df
+
+
+def content_hash(record: Dict[str, Any]) -> str:
+    """Stable digest of a vehicle record (key order and whitespace insensitive)."""
+    raw = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
@@ -30,7 +30,7 @@ function buildUrl(path: string, params?: Record<string, any>) {
 
 export async function apiGet<T = any>(path: string, params?: Record<string, any>): Promise<T> {
   const url = buildUrl(path, params);
-  const res = await fetch(url, withAuth({ cache: 'no-store' }));
+  const res = await fetch(url, withAuth({ cache: 'no-cache' }));
   if (!res.ok) throw new Error(`API ${res.status}: ${await res.text()}`);
   return res.json();
 }
@@ -8,11 +8,18 @@ import csv
 import json
 import math
 import re
+import sys
 from typing import Any, Dict, List, Tuple, Optional
 
+import numpy as np
 import pandas as pd
 
 ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from core.catalog_kernels import map_values, num_column, python_or, round1  # noqa: E402
+from core.vehicle_stream import iter_vehicles  # noqa: E402
 DATA = ROOT / "data"
 OEM_DIR = DATA / "oem_specs_processed"
 ENRICHED_DIR = DATA / "enriched"
@@ -158,15 +165,9 @@ def load_strapi_catalog() -> pd.DataFrame:
     path = Path(path_env) if path_env else STRAPI_NORMALIZED_PATH
     if not path.exists():
         raise SystemExit(f"Strapi catalog not found: {path}")
-    payload = json.loads(path.read_text())
-    vehicles = payload.get("vehicles") or []
-
-    meta = payload.get("metadata") or {}
-    fuel_prices = meta.get("fuelPrices") or {}
-    if fuel_prices:
-        os.environ.setdefault("PRECIO_GASOLINA_MAGNA_LITRO", str(fuel_prices.get("regular", "23.57")))
-        os.environ.setdefault("PRECIO_GASOLINA_PREMIUM_LITRO", str(fuel_prices.get("premium", "25.00")))
-        os.environ.setdefault("PRECIO_DIESEL_LITRO", str(fuel_prices.get("diesel", "25.33")))
+    # Vehicles are streamed; metadata is filled in once the stream is exhausted
+    meta: dict[str, Any] = {}
+    vehicles = iter_vehicles(path, metadata=meta)
 
     rows: list[dict[str, Any]] = []
     def _string_from(obj: Any, *keys: str) -> str:
@@ -615,6 +616,12 @@ def load_strapi_catalog() -> pd.DataFrame:
 
         rows.append(row)
 
+    fuel_prices = meta.get("fuelPrices") or {}
+    if fuel_prices:
+        os.environ.setdefault("PRECIO_GASOLINA_MAGNA_LITRO", str(fuel_prices.get("regular", "23.57")))
+        os.environ.setdefault("PRECIO_GASOLINA_PREMIUM_LITRO", str(fuel_prices.get("premium", "25.00")))
+        os.environ.setdefault("PRECIO_DIESEL_LITRO", str(fuel_prices.get("diesel", "25.33")))
+
     if not rows:
         return pd.DataFrame(columns=["make","model","version","ano"])
 
@@ -732,8 +739,54 @@ def _has_text(v: object, *tokens: str) -> bool:
 
 
 def compute_pillars(df: pd.DataFrame) -> pd.DataFrame:
+    """Heuristic 0..100 pillar scores per version.
+
+    Column-wise over the frame (shared kernels in core.catalog_kernels): each
+    distinct cell value is parsed once with _truthy/_num/_has_text and the
+    weights are summed in the same order as the original per-row scorers, so
+    results match row-by-row evaluation exactly.
+    """
     out = df.copy()
-    cols = {c.lower() for c in out.columns}
+    idx = out.index
+
+    def col(c: str) -> pd.Series:
+        if c in out.columns:
+            return out[c]
+        return pd.Series([None] * len(out), index=idx, dtype=object)
+
+    def T(*names: str) -> pd.Series:
+        acc = pd.Series(False, index=idx)
+        for c in names:
+            if c in out.columns:
+                acc = acc | map_values(out[c], _truthy).astype(bool)
+        return acc
+
+    def N(c: str) -> pd.Series:
+        return num_column(out, c, _num)
+
+    def N0(series: pd.Series) -> pd.Series:
+        # ``_num(v) or 0``
+        return series.fillna(0.0)
+
+    def H(values: pd.Series, *tokens: str) -> pd.Series:
+        return map_values(values, lambda v: _has_text(v, *tokens)).astype(bool)
+
+    def first(*names: str) -> pd.Series:
+        # ``row.get(a) or row.get(b) ...`` on DataFrame rows (NaN is truthy there)
+        return python_or(out, names, nan_is_truthy=True)
+
+    def pts(mask: pd.Series, weight: float) -> pd.Series:
+        return mask.astype(bool).astype("float64") * float(weight)
+
+    def cap100(s: pd.Series) -> pd.Series:
+        return round1(s.clip(upper=100.0))
+
+    def direct_or(name: str, fallback: pd.Series) -> pd.Series:
+        direct = N(name)
+        use = direct.notna() & (direct > 0)
+        return cap100(direct).where(use, fallback)
+
+    hd = col('header_description')
 
     # ----- ADAS -----
     adas_weights = {
@@ -746,231 +799,162 @@ def compute_pillars(df: pd.DataFrame) -> pd.DataFrame:
         'crucero_adaptativo': 15,
     }
     adas_total = sum(adas_weights.values())
-
-    def has_cruise_adapt(row) -> bool:
-        # Busca en la columna *_original si menciona adaptativo/ACC
-        for c in ('control_crucero_original','header_description'):
-            if c in out.columns and _has_text(row.get(c), 'adapt'):
-                return True
-        return False
-
-    def score_adas(row) -> float:
-        direct = _num(row.get('adas_score'))
-        if direct is not None and direct > 0:
-            return round(min(100.0, direct), 1)
-        s = 0
-        s += adas_weights['alerta_colision'] if _truthy(row.get('alerta_colision')) or _truthy(row.get('alerta_colision_original')) else 0
-        s += adas_weights['sensor_punto_ciego'] if _truthy(row.get('sensor_punto_ciego')) or _truthy(row.get('sensor_punto_ciego_original')) or _truthy(row.get('tiene_camara_punto_ciego')) else 0
-        s += adas_weights['camara_360'] if _truthy(row.get('camara_360')) else 0
-        s += adas_weights['asistente_estac_frontal'] if _truthy(row.get('asistente_estac_frontal')) or _truthy(row.get('asistente_estac_frontal_original')) else 0
-        s += adas_weights['asistente_estac_trasero'] if _truthy(row.get('asistente_estac_trasero')) else 0
-        s += adas_weights['control_frenado_curvas'] if _truthy(row.get('control_frenado_curvas')) else 0
-        s += adas_weights['crucero_adaptativo'] if has_cruise_adapt(row) else 0
-        # Señales en texto libre para mantener de carril / TSR
-        hd = row.get('header_description')
-        if _has_text(hd, 'lane') or _has_text(hd, 'carril'):
-            s += 10
-        if _has_text(hd, 'señales') or _has_text(hd, 'tsr'):
-            s += 6
-        return round(100.0 * s / adas_total, 1)
+    # Busca en la columna *_original si menciona adaptativo/ACC
+    cruise = pd.Series(False, index=idx)
+    for c in ('control_crucero_original', 'header_description'):
+        if c in out.columns:
+            cruise = cruise | H(out[c], 'adapt')
+    s = pd.Series(0, index=idx, dtype="int64")
+    s = s + T('alerta_colision', 'alerta_colision_original').astype("int64") * adas_weights['alerta_colision']
+    s = s + T('sensor_punto_ciego', 'sensor_punto_ciego_original', 'tiene_camara_punto_ciego').astype("int64") * adas_weights['sensor_punto_ciego']
+    s = s + T('camara_360').astype("int64") * adas_weights['camara_360']
+    s = s + T('asistente_estac_frontal', 'asistente_estac_frontal_original').astype("int64") * adas_weights['asistente_estac_frontal']
+    s = s + T('asistente_estac_trasero').astype("int64") * adas_weights['asistente_estac_trasero']
+    s = s + T('control_frenado_curvas').astype("int64") * adas_weights['control_frenado_curvas']
+    s = s + cruise.astype("int64") * adas_weights['crucero_adaptativo']
+    # Señales en texto libre para mantener de carril / TSR
+    s = s + (H(hd, 'lane') | H(hd, 'carril')).astype("int64") * 10
+    s = s + (H(hd, 'señales') | H(hd, 'tsr')).astype("int64") * 6
+    out['equip_p_adas'] = direct_or('adas_score', round1(100.0 * s / adas_total))
 
     # ----- Seguridad -----
-    def airbags_count(row) -> int:
-        cnt = 0
-        for c in (
-            'bolsas_aire_delanteras_conductor','bolsas_aire_delanteras_pasajero',
-            'bolsas_aire_laterales_adelante','bolsas_aire_laterales_atras',
-            'bolsas_cortina_todas_filas','bolsas_rodillas_conductor','bolsas_rodillas_pasajero',
-            'bolsas_aire_antisumergimiento_atras','bolsas_aire_antisumergimiento_tercera_fila'
-        ):
-            v = row.get(c)
-            if v is None:
-                continue
-            if isinstance(v, (int,float)):
-                try:
-                    if float(v) > 0:
-                        cnt += 1
-                except Exception:
-                    pass
-            else:
-                if _truthy(v):
-                    cnt += 1
-        return cnt
-
-    def score_safety(row) -> float:
-        direct = _num(row.get('safety_score'))
-        if direct is not None and direct > 0:
-            return round(min(100.0, direct), 1)
-        s = 0.0
-        # ABS y ESC
-        if _truthy(row.get('abs')) or _truthy(row.get('abs_original')):
-            s += 20
-        if _truthy(row.get('control_estabilidad')) or _truthy(row.get('control_estabilidad_original')) or _truthy(row.get('control_electrico_de_traccion')):
-            s += 20
-        # Airbags: escala 0..40 (0-6+)
-        ab = airbags_count(row)
-        s += min(40.0, ab * (40.0/6.0))
-        # Blind spot o 360 ya cuentan en ADAS; aquí un pequeño extra si ambos
-        if (_truthy(row.get('sensor_punto_ciego')) or _truthy(row.get('tiene_camara_punto_ciego'))) and _truthy(row.get('camara_360')):
-            s += 10
-        # Faros avanzados aportan seguridad
-        if _has_text(row.get('faros_delanteros') or row.get('tipo_faros') or row.get('header_description'), 'led'):
-            s += 6
-        if _has_text(row.get('header_description'), 'matriz') or _has_text(row.get('header_description'), 'matrix'):
-            s += 6
-        # Antiniebla suma poco
-        if _truthy(row.get('luces_antiniebla')):
-            s += 4
-        return round(min(100.0, s), 1)
+    def _airbag_on(v: object) -> bool:
+        if v is None:
+            return False
+        if isinstance(v, (int, float)):
+            try:
+                return float(v) > 0
+            except Exception:
+                return False
+        return _truthy(v)
+
+    ab = pd.Series(0, index=idx, dtype="int64")
+    for c in (
+        'bolsas_aire_delanteras_conductor','bolsas_aire_delanteras_pasajero',
+        'bolsas_aire_laterales_adelante','bolsas_aire_laterales_atras',
+        'bolsas_cortina_todas_filas','bolsas_rodillas_conductor','bolsas_rodillas_pasajero',
+        'bolsas_aire_antisumergimiento_atras','bolsas_aire_antisumergimiento_tercera_fila'
+    ):
+        if c in out.columns:
+            ab = ab + map_values(out[c], _airbag_on).astype(bool).astype("int64")
+
+    s = pd.Series(0.0, index=idx)
+    # ABS y ESC
+    s = s + pts(T('abs', 'abs_original'), 20)
+    s = s + pts(T('control_estabilidad', 'control_estabilidad_original', 'control_electrico_de_traccion'), 20)
+    # Airbags: escala 0..40 (0-6+)
+    s = s + (ab * (40.0 / 6.0)).clip(upper=40.0)
+    # Blind spot o 360 ya cuentan en ADAS; aquí un pequeño extra si ambos
+    s = s + pts(T('sensor_punto_ciego', 'tiene_camara_punto_ciego') & T('camara_360'), 10)
+    # Faros avanzados aportan seguridad
+    s = s + pts(H(first('faros_delanteros', 'tipo_faros', 'header_description'), 'led'), 6)
+    s = s + pts(H(hd, 'matriz') | H(hd, 'matrix'), 6)
+    # Antiniebla suma poco
+    s = s + pts(T('luces_antiniebla'), 4)
+    out['equip_p_safety'] = direct_or('safety_score', cap100(s))
 
     # ----- Confort -----
-    def score_comfort(row) -> float:
-        conv = _num(row.get('convenience_score'))
-        hv = _num(row.get('hvac_score'))
-        if conv is not None and conv > 0:
-            if hv is not None and hv > 0:
-                val = min(100.0, (conv + hv) / 2.0)
-            else:
-                val = conv
-            return round(min(100.0, val), 1)
-        s = 0.0
-        for c in ('asientos_calefaccion_conductor','asientos_calefaccion_pasajero','asientos_ventilacion_conductor','asientos_ventilacion_pasajero'):
-            if _truthy(row.get(c)):
-                s += 8
-        # Clima multizona: zonas_clima (1,2,3…)
-        z = _num(row.get('zonas_clima')) or 0
-        if z >= 3:
-            s += 20
-        elif z == 2:
-            s += 12
-        elif z == 1:
-            s += 6
-        # Aire acondicionado básico
-        if _truthy(row.get('aire_acondicionado')):
-            s += 6
-        if _truthy(row.get('llave_inteligente')) or _truthy(row.get('llave_inteligente_original')):
-            s += 8
-        if _truthy(row.get('techo_corredizo')) or _truthy(row.get('techo_corredizo_delantero_original')):
-            s += 12
-        # Maletero eléctrico
-        if _truthy(row.get('apertura_remota_maletero')):
-            s += 6
-        if _truthy(row.get('cierre_automatico_maletero')):
-            s += 8
-        # Conveniencia adicional
-        if _truthy(row.get('volante_electrico_ajustable')):
-            s += 6
-        if _truthy(row.get('ventanas_electricas')):
-            s += 4
-        if _truthy(row.get('seguros_electricos')):
-            s += 4
-        if _truthy(row.get('limpiaparabrisas_lluvia')):
-            s += 4
-        # Tapicería premium en texto libre
-        if _has_text(row.get('tapizado_adicional_de_asiento') or row.get('header_description'), 'piel'):
-            s += 6
-        return round(min(100.0, s), 1)
+    s = pd.Series(0.0, index=idx)
+    for c in ('asientos_calefaccion_conductor','asientos_calefaccion_pasajero','asientos_ventilacion_conductor','asientos_ventilacion_pasajero'):
+        s = s + pts(T(c), 8)
+    # Clima multizona: zonas_clima (1,2,3…)
+    z = N0(N('zonas_clima'))
+    s = s + pts(z >= 3, 20) + pts(z == 2, 12) + pts(z == 1, 6)
+    # Aire acondicionado básico
+    s = s + pts(T('aire_acondicionado'), 6)
+    s = s + pts(T('llave_inteligente', 'llave_inteligente_original'), 8)
+    s = s + pts(T('techo_corredizo', 'techo_corredizo_delantero_original'), 12)
+    # Maletero eléctrico
+    s = s + pts(T('apertura_remota_maletero'), 6)
+    s = s + pts(T('cierre_automatico_maletero'), 8)
+    # Conveniencia adicional
+    s = s + pts(T('volante_electrico_ajustable'), 6)
+    s = s + pts(T('ventanas_electricas'), 4)
+    s = s + pts(T('seguros_electricos'), 4)
+    s = s + pts(T('limpiaparabrisas_lluvia'), 4)
+    # Tapicería premium en texto libre
+    s = s + pts(H(first('tapizado_adicional_de_asiento', 'header_description'), 'piel'), 6)
+    conv = N('convenience_score')
+    hv = N('hvac_score')
+    conv_val = ((conv + hv) / 2.0).clip(upper=100.0).where(hv.notna() & (hv > 0), conv)
+    use_conv = conv.notna() & (conv > 0)
+    out['equip_p_comfort'] = cap100(conv_val).where(use_conv, cap100(s))
 
     # ----- Info‑entretenimiento -----
-    def score_infotainment(row) -> float:
-        direct = _num(row.get('infotainment_score'))
-        if direct is not None and direct > 0:
-            return round(min(100.0, direct), 1)
-        s = 0.0
-        if _truthy(row.get('tiene_pantalla_tactil')):
-            s += 18
-        if _truthy(row.get('android_auto')) or _truthy(row.get('android_auto_original')):
-            s += 18
-        if _truthy(row.get('apple_carplay')) or _truthy(row.get('apple_carplay_original')):
-            s += 18
-        # Bocinas, escala 0..30 (hasta 12 tan bien)
-        spk = _num(row.get('bocinas') or row.get('speakers_count')) or 0
-        if spk > 0:
-            s += min(30.0, spk * (30.0/12.0))
-        # Tamaño de pantallas (si está disponible en enriquecido JSON)
-        main_in = _num(row.get('screen_main_in')) or 0
-        cluster_in = _num(row.get('screen_cluster_in')) or 0
-        if main_in > 0:
-            s += min(15.0, max(0.0, (main_in - 6.0) * 2.5))  # 6" base, 12" ~ +15
-        if cluster_in > 0:
-            s += min(10.0, max(0.0, (cluster_in - 4.0) * 2.0))  # 4" base, 9" ~ +10
-        # Conectividad y carga
-        usb_a = int((_num(row.get('usb_a_count')) or 0))
-        usb_c = int((_num(row.get('usb_c_count')) or 0))
-        if usb_a > 0:
-            s += min(8.0, usb_a * 2.0)
-        if usb_c > 0:
-            s += min(8.0, usb_c * 2.5)
-        if _truthy(row.get('wireless_charging')):
-            s += 8
-        # Audio de marca (texto)
-        hd = row.get('header_description')
-        if _has_text(hd, 'bose') or _has_text(hd, 'jbl') or _has_text(hd, 'harman') or _has_text(hd, 'sony'):
-            s += 6
-        # 12V es utilitario; aquí ignoramos
-        return round(min(100.0, s), 1)
+    s = pd.Series(0.0, index=idx)
+    s = s + pts(T('tiene_pantalla_tactil'), 18)
+    s = s + pts(T('android_auto', 'android_auto_original'), 18)
+    s = s + pts(T('apple_carplay', 'apple_carplay_original'), 18)
+    # Bocinas, escala 0..30 (hasta 12 tan bien)
+    spk = N0(pd.to_numeric(map_values(first('bocinas', 'speakers_count'), _num), errors="coerce").astype("float64"))
+    s = s + (spk * (30.0 / 12.0)).clip(upper=30.0).where(spk > 0, 0.0)
+    # Tamaño de pantallas (si está disponible en enriquecido JSON)
+    main_in = N0(N('screen_main_in'))
+    cluster_in = N0(N('screen_cluster_in'))
+    s = s + ((main_in - 6.0) * 2.5).clip(lower=0.0).clip(upper=15.0).where(main_in > 0, 0.0)  # 6" base, 12" ~ +15
+    s = s + ((cluster_in - 4.0) * 2.0).clip(lower=0.0).clip(upper=10.0).where(cluster_in > 0, 0.0)  # 4" base, 9" ~ +10
+    # Conectividad y carga
+    usb_a = np.trunc(N0(N('usb_a_count')))
+    usb_c = np.trunc(N0(N('usb_c_count')))
+    s = s + (usb_a * 2.0).clip(upper=8.0).where(usb_a > 0, 0.0)
+    s = s + (usb_c * 2.5).clip(upper=8.0).where(usb_c > 0, 0.0)
+    s = s + pts(T('wireless_charging'), 8)
+    # Audio de marca (texto)
+    s = s + pts(H(hd, 'bose') | H(hd, 'jbl') | H(hd, 'harman') | H(hd, 'sony'), 6)
+    # 12V es utilitario; aquí ignoramos
+    out['equip_p_infotainment'] = direct_or('infotainment_score', cap100(s))
 
     # ----- Tracción -----
-    def score_traction(row) -> float:
-        s = 0.0
-        tr = str(row.get('traccion_original') or row.get('driven_wheels') or '').lower()
+    def _drive_points(v: object) -> float:
+        tr = str(v or '').lower()
         if '4x4' in tr or '4wd' in tr or 'awd' in tr:
-            s += 70
-        elif 'rwd' in tr or 'trasera' in tr or 'rear' in tr:
-            s += 45
-        elif 'fwd' in tr or 'delantera' in tr or 'front' in tr:
-            s += 30
-        if _truthy(row.get('control_electrico_de_traccion')):
-            s += 15
-        return round(min(100.0, s), 1)
+            return 70.0
+        if 'rwd' in tr or 'trasera' in tr or 'rear' in tr:
+            return 45.0
+        if 'fwd' in tr or 'delantera' in tr or 'front' in tr:
+            return 30.0
+        return 0.0
+
+    s = pd.to_numeric(map_values(first('traccion_original', 'driven_wheels'), _drive_points)).astype("float64")
+    s = s + pts(T('control_electrico_de_traccion'), 15)
+    out['equip_p_traction'] = cap100(s)
 
     # ----- Utilidad -----
-    def score_utility(row) -> float:
-        s = 0.0
-        seats = int((_num(row.get('capacidad_de_asientos')) or 0))
-        if seats >= 7:
-            s += 30
-        if _truthy(row.get('tercera_fila')) or _truthy(row.get('tercera_fila_original')):
-            s += 20
-        if _truthy(row.get('rieles_techo')) or _truthy(row.get('rieles_techo_original')):
-            s += 15
-        if _truthy(row.get('enganche_remolque')) or _truthy(row.get('preparacion_remolque')):
-            s += 20
-        if _truthy(row.get('apertura_remota_maletero')) or _truthy(row.get('cierre_automatico_maletero')):
-            s += 10
-        # Tomas de corriente
-        p12 = int((_num(row.get('power_12v_count')) or 0))
-        p110 = int((_num(row.get('power_110v_count')) or 0))
-        if p12 > 0:
-            s += min(8.0, p12 * 2.0)
-        if p110 > 0:
-            s += min(10.0, p110 * 5.0)
-        return round(min(100.0, s), 1)
+    s = pd.Series(0.0, index=idx)
+    seats = np.trunc(N0(N('capacidad_de_asientos')))
+    s = s + pts(seats >= 7, 30)
+    s = s + pts(T('tercera_fila', 'tercera_fila_original'), 20)
+    s = s + pts(T('rieles_techo', 'rieles_techo_original'), 15)
+    s = s + pts(T('enganche_remolque', 'preparacion_remolque'), 20)
+    s = s + pts(T('apertura_remota_maletero', 'cierre_automatico_maletero'), 10)
+    # Tomas de corriente
+    p12 = np.trunc(N0(N('power_12v_count')))
+    p110 = np.trunc(N0(N('power_110v_count')))
+    s = s + (p12 * 2.0).clip(upper=8.0).where(p12 > 0, 0.0)
+    s = s + (p110 * 5.0).clip(upper=10.0).where(p110 > 0, 0.0)
+    out['equip_p_utility'] = cap100(s)
 
     # ----- Performance -----
-    def score_performance(row) -> float:
-        hp = _num(row.get('caballos_fuerza')) or 0.0
-        seg = segment_from_body_style(str(row.get('body_style','')))
-        ref = {'suv': 300.0, 'pickup': 400.0, 'sedan': 280.0, 'hatch': 220.0, 'van': 260.0}.get(seg, 280.0)
-        base = 0.0
-        if hp > 0:
-            base = min(100.0, (hp / ref) * 100.0)
-        # Bonus por aceleración (si existe): más rápido => mayor score
-        acc = _num(row.get('accel_0_100_s')) or 0.0
-        bonus = 0.0
-        if acc and acc > 0:
-            bonus += max(0.0, min(25.0, (12.0/acc - 1.0) * 100.0 * 0.25))
-        vmax = _num(row.get('vmax_kmh')) or 0.0
-        if vmax and vmax > 0:
-            bonus += min(10.0, max(0.0, (vmax - 180.0) * 0.1))
-        # Modo de manejo (texto original) suma pequeño bonus
-        if _has_text(row.get('modo_manejo_direccion_original'), 'modo') or _has_text(row.get('header_description'), 'drive mode'):
-            bonus += 5.0
-        return round(min(100.0, base + bonus), 1)
+    hp = N0(N('caballos_fuerza'))
+    body = col('body_style') if 'body_style' in out.columns else pd.Series([''] * len(out), index=idx, dtype=object)
+    seg = map_values(body, lambda v: segment_from_body_style(str(v)))
+    ref = pd.to_numeric(
+        map_values(seg, lambda sg: {'suv': 300.0, 'pickup': 400.0, 'sedan': 280.0, 'hatch': 220.0, 'van': 260.0}.get(sg, 280.0))
+    ).astype("float64")
+    base = ((hp / ref) * 100.0).clip(upper=100.0).where(hp > 0, 0.0)
+    # Bonus por aceleración (si existe): más rápido => mayor score
+    acc = N0(N('accel_0_100_s'))
+    safe_acc = acc.where(acc > 0, 1.0)
+    bonus = ((12.0 / safe_acc - 1.0) * 100.0 * 0.25).clip(upper=25.0).clip(lower=0.0).where(acc > 0, 0.0)
+    vmax = N0(N('vmax_kmh'))
+    bonus = bonus + ((vmax - 180.0) * 0.1).clip(lower=0.0).clip(upper=10.0).where(vmax > 0, 0.0)
+    # Modo de manejo (texto original) suma pequeño bonus
+    bonus = bonus + pts(H(col('modo_manejo_direccion_original'), 'modo') | H(hd, 'drive mode'), 5.0)
+    out['equip_p_performance'] = cap100(base + bonus)
 
     # ----- Eficiencia y electrificación -----
-    def fuel_bucket(row) -> str:
-        s = str(row.get('categoria_combustible_final') or row.get('tipo_de_combustible_original') or '').lower()
+    def fuel_bucket(v: object) -> str:
+        s = str(v or '').lower()
         if any(k in s for k in ('bev','eléctrico','electrico')):
             return 'bev'
         if any(k in s for k in ('phev','enchuf')):
@@ -983,68 +967,41 @@ def compute_pillars(df: pd.DataFrame) -> pd.DataFrame:
             return 'gasolina'
         return 'other'
 
-    def score_efficiency(row) -> float:
-        b = fuel_bucket(row)
-        if b == 'bev':
-            return 100.0
-        if b == 'phev':
-            # si trae KML usa, si no ~85
-            kml = _num(row.get('combinado_kml'))
-            if not (kml and kml > 0):
-                return 85.0
-        kml = _num(row.get('combinado_kml')) or 0.0
-        if kml <= 0:
-            return 0.0
-        # Mapear KML 8..20 => 0..100 (clipeado)
-        lo, hi = 8.0, 20.0
-        val = max(0.0, min(100.0, (kml - lo) / (hi - lo) * 100.0))
-        if b == 'hev':
-            val = min(100.0, val + 10.0)
-        return round(val, 1)
-
-    def score_electrification(row) -> float:
-        b = fuel_bucket(row)
-        if b == 'bev':
-            return 100.0
-        if b == 'phev':
-            return 80.0
-        if b == 'hev':
-            return 60.0
-        return 0.0
-
-    # Compute columns
-    out['equip_p_adas'] = out.apply(score_adas, axis=1)
-    out['equip_p_safety'] = out.apply(score_safety, axis=1)
-    out['equip_p_comfort'] = out.apply(score_comfort, axis=1)
-    out['equip_p_infotainment'] = out.apply(score_infotainment, axis=1)
-    out['equip_p_traction'] = out.apply(score_traction, axis=1)
-    out['equip_p_utility'] = out.apply(score_utility, axis=1)
-    out['equip_p_performance'] = out.apply(score_performance, axis=1)
-    out['equip_p_efficiency'] = out.apply(score_efficiency, axis=1)
-    out['equip_p_electrification'] = out.apply(score_electrification, axis=1)
+    bucket = map_values(first('categoria_combustible_final', 'tipo_de_combustible_original'), fuel_bucket)
+    kml = N('combinado_kml')
+    kml0 = N0(kml)
+    # Mapear KML 8..20 => 0..100 (clipeado)
+    lo, hi = 8.0, 20.0
+    val = ((kml0 - lo) / (hi - lo) * 100.0).clip(upper=100.0).clip(lower=0.0)
+    val = (val + 10.0).clip(upper=100.0).where(bucket == 'hev', val)
+    eff = round1(val).where(kml0 > 0, 0.0)
+    eff = eff.where(~((bucket == 'phev') & ~(kml.notna() & (kml > 0))), 85.0)
+    eff = eff.where(bucket != 'bev', 100.0)
+    out['equip_p_efficiency'] = eff.astype("float64")
+    out['equip_p_electrification'] = pd.to_numeric(
+        map_values(bucket, lambda b: {'bev': 100.0, 'phev': 80.0, 'hev': 60.0}.get(b, 0.0))
+    ).astype("float64")
 
     # Warranty score (0..100) si hay columnas
-    def score_warranty(row) -> float:
-        s = 0.0
-        fm = _num(row.get('warranty_full_months')) or 0.0
-        fk = _num(row.get('warranty_full_km')) or 0.0
-        pm = _num(row.get('warranty_powertrain_months')) or 0.0
-        pk = _num(row.get('warranty_powertrain_km')) or 0.0
-        rm = _num(row.get('warranty_roadside_months')) or 0.0
-        cm = _num(row.get('warranty_corrosion_months')) or 0.0
-        em = _num(row.get('warranty_electric_months')) or (_num(row.get('warranty_battery_months')) or 0.0)
-        # Normalizaciones típicas
-        s += min(30.0, (fm/36.0) * 30.0)
-        s += min(10.0, (fk/60000.0) * 10.0) if fk>0 else 0.0
-        s += min(25.0, (pm/72.0) * 25.0)
-        s += min(10.0, (pk/100000.0) * 10.0) if pk>0 else 0.0
-        s += min(10.0, (rm/36.0) * 10.0)
-        s += min(5.0, (cm/60.0) * 5.0)
-        s += min(10.0, (em/96.0) * 10.0)
-        return round(min(100.0, s), 1)
-
     try:
-        out['warranty_score'] = out.apply(score_warranty, axis=1)
+        fm = N0(N('warranty_full_months'))
+        fk = N0(N('warranty_full_km'))
+        pm = N0(N('warranty_powertrain_months'))
+        pk = N0(N('warranty_powertrain_km'))
+        rm = N0(N('warranty_roadside_months'))
+        cm = N0(N('warranty_corrosion_months'))
+        em1 = N('warranty_electric_months')
+        em = em1.where(em1.notna() & (em1 != 0), N0(N('warranty_battery_months')))
+        # Normalizaciones típicas
+        s = pd.Series(0.0, index=idx)
+        s = s + ((fm / 36.0) * 30.0).clip(upper=30.0)
+        s = s + ((fk / 60000.0) * 10.0).clip(upper=10.0).where(fk > 0, 0.0)
+        s = s + ((pm / 72.0) * 25.0).clip(upper=25.0)
+        s = s + ((pk / 100000.0) * 10.0).clip(upper=10.0).where(pk > 0, 0.0)
+        s = s + ((rm / 36.0) * 10.0).clip(upper=10.0)
+        s = s + ((cm / 60.0) * 5.0).clip(upper=5.0)
+        s = s + ((em / 96.0) * 10.0).clip(upper=10.0)
+        out['warranty_score'] = cap100(s)
     except Exception:
         out['warranty_score'] = 0
     return out
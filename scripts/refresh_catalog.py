@@ -16,9 +16,17 @@ from __future__ import annotations
 
 import csv
 import json
+import os
 import re
+import sys
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Dict, Tuple
+
+PKG_ROOT = Path(__file__).resolve().parents[1]
+if str(PKG_ROOT) not in sys.path:
+    sys.path.insert(0, str(PKG_ROOT))
+
+from core.vehicle_stream import iter_vehicles  # noqa: E402
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 DF_BASE = REPO_ROOT / "dataframe_base"
@@ -160,53 +168,64 @@ def _flatten_vehicle(raw: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
+def _write_outputs(json_path: Path, jsonl_path: Path, csv_path: Path) -> int:
+    """Stream the source into the three artifacts; returns the vehicle count."""
+    metadata: Dict[str, Any] = {}
+    count = 0
+    with json_path.open("w", encoding="utf-8") as fh_json, \
+            jsonl_path.open("w", encoding="utf-8") as fh_jsonl, \
+            csv_path.open("w", encoding="utf-8", newline="") as fh_csv:
+        writer: csv.DictWriter | None = None
+        fh_json.write('{"vehicles": [')
+        for raw in iter_vehicles(SRC_JSON, metadata=metadata):
+            raw["modelYear"] = _ensure_model_year(raw)
+            km_l, l_100 = _ensure_consumption(raw)
+            if km_l is not None:
+                raw["combinado_kml"] = km_l
+                raw.setdefault("fuelEconomy", {})["combinedKmPerLitre"] = km_l
+            if l_100 is not None:
+                raw["combinado_l_100km"] = l_100
+                raw.setdefault("fuelEconomy", {})["combinedLitresPer100Km"] = l_100
+            line = json.dumps(raw, ensure_ascii=False)
+            fh_json.write((", " if count else "") + line)
+            fh_jsonl.write(line + "\n")
+            flat = _flatten_vehicle(raw)
+            if writer is None:
+                writer = csv.DictWriter(fh_csv, fieldnames=sorted(flat.keys()))
+                writer.writeheader()
+            writer.writerow(flat)
+            count += 1
+        fh_json.write('], "metadata": ')
+        json.dump(metadata, fh_json, ensure_ascii=False)
+        fh_json.write("}")
+        if writer is None:
+            csv.DictWriter(fh_csv, fieldnames=[]).writeheader()
+    return count
+
+
 def rebuild_catalog() -> None:
     if not SRC_JSON.exists():
         raise FileNotFoundError(f"Fuente no encontrada: {SRC_JSON}")
 
-    with SRC_JSON.open("r", encoding="utf-8") as fh:
-        source_obj = json.load(fh)
-
-    vehicles = source_obj.get("vehicles") if isinstance(source_obj, dict) else source_obj
-    if not isinstance(vehicles, Iterable):
-        raise ValueError("Formato inesperado en JSON de entrada")
-
-    normalized: List[Dict[str, Any]] = []
-    flattened: List[Dict[str, Any]] = []
-
-    for raw in vehicles:
-        if not isinstance(raw, dict):
-            continue
-        raw = dict(raw)  # copy to avoid mutating original
-        raw["modelYear"] = _ensure_model_year(raw)
-        km_l, l_100 = _ensure_consumption(raw)
-        if km_l is not None:
-            raw["combinado_kml"] = km_l
-            raw.setdefault("fuelEconomy", {})["combinedKmPerLitre"] = km_l
-        if l_100 is not None:
-            raw["combinado_l_100km"] = l_100
-            raw.setdefault("fuelEconomy", {})["combinedLitresPer100Km"] = l_100
-        normalized.append(raw)
-        flattened.append(_flatten_vehicle(raw))
-
-    # Write normalized JSON
+    # Vehicles are streamed from the source straight into the three outputs so
+    # the full dump is never held in memory; metadata is complete at the end.
+    # They go to temporary files first, so a parse error halfway leaves the
+    # previous artifacts untouched.
     DST_JSON.parent.mkdir(parents=True, exist_ok=True)
-    with DST_JSON.open("w", encoding="utf-8") as fh:
-        json.dump({"vehicles": normalized, "metadata": source_obj.get("metadata", {})}, fh, ensure_ascii=False)
-
-    # Write JSONL for quick ingestion
-    with DST_JSONL.open("w", encoding="utf-8") as fh:
-        for row in normalized:
-            fh.write(json.dumps(row, ensure_ascii=False) + "\n")
-
-    # Write flattened CSV
-    fieldnames = sorted(flattened[0].keys()) if flattened else []
-    with DST_CSV.open("w", encoding="utf-8", newline="") as fh:
-        writer = csv.DictWriter(fh, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(flattened)
-
-    print(f"Regenerados {len(flattened)} vehículos")
+    tmp_json, tmp_jsonl, tmp_csv = (p.with_name(p.name + ".tmp") for p in (DST_JSON, DST_JSONL, DST_CSV))
+    try:
+        count = _write_outputs(tmp_json, tmp_jsonl, tmp_csv)
+    except BaseException:
+        for tmp in (tmp_json, tmp_jsonl, tmp_csv):
+            tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_csv, DST_CSV)
+    os.replace(tmp_json, DST_JSON)
+    os.replace(tmp_jsonl, DST_JSONL)
+    # Readers only trust the JSONL sidecar when it is at least as new as the JSON
+    DST_JSONL.touch()
+
+    print(f"Regenerados {count} vehículos")
     print(f"JSON -> {DST_JSON}")
     print(f"JSONL -> {DST_JSONL}")
     print(f"CSV -> {DST_CSV}")
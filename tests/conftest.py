@@ -0,0 +1,43 @@
+"""Shared fixtures: the FastAPI app over the catalog shipped in data/.
+
+Snapshots and on-disk artifacts are disabled so every test session builds
+from the sources in the tree.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("CATALOG_SNAPSHOT", "0")
+os.environ.setdefault("OPTIONS_TREE_ARTIFACT", "0")
+os.environ.setdefault("FUEL_PRICES_REFRESH_S", "0")
+# Never read snapshots or row hashes cached by a local server
+os.environ.setdefault("CATALOG_SNAPSHOT_DIR", tempfile.mkdtemp(prefix="catalog-cache-"))
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    pytest.importorskip("pandas")
+    from backend import app as app_module
+
+    try:
+        app_module._load_catalog()
+    except Exception as exc:  # pragma: no cover - no catalog source in the tree
+        pytest.skip(f"catalog not available: {exc}")
+    return app_module
+
+
+@pytest.fixture(scope="session")
+def client(app_module):
+    from fastapi.testclient import TestClient
+
+    return TestClient(app_module.app)
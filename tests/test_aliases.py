@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+
+@pytest.fixture()
+def aliases_root(app_module, tmp_path, monkeypatch):
+    """Point alias loading at a temporary alias_names.csv."""
+    path = tmp_path / "data" / "aliases" / "alias_names.csv"
+    path.parent.mkdir(parents=True)
+    monkeypatch.setattr(app_module, "ROOT", tmp_path)
+    monkeypatch.setattr(app_module, "_ALIASES", None)
+    monkeypatch.setattr(app_module, "_ALIASES_MTIME", None)
+    monkeypatch.setattr(app_module, "_CANON_MEMO", {k: app_module._CanonMemo(3) for k in ("make", "model")})
+
+    def write(rows, mtime):
+        path.write_text("scope,from_name,to_name,make,model,notes\n" + "".join(f"{r}\n" for r in rows), encoding="utf-8")
+        os.utime(path, (mtime, mtime))
+        # Skip the recheck interval
+        monkeypatch.setattr(app_module, "_ALIASES_CHECKED_AT", float("-inf"))
+
+    return write
+
+
+def test_alias_reload_invalidates_resolved_names(app_module, aliases_root):
+    aliases_root(["make,VW,VOLKSWAGEN,,,"], 1_000_000)
+    assert app_module._canon_make("vw") == "VOLKSWAGEN"
+    version = app_module._ALIASES["version"]
+    aliases_root(["make,VW,VOLKS,,,"], 2_000_000)
+    assert app_module._canon_make("vw") == "VOLKS"
+    assert app_module._ALIASES["version"] == version + 1
+
+
+def test_resolved_names_memo_is_bounded(app_module, aliases_root):
+    aliases_root(["model,CX30,CX-30,MAZDA,,"], 1_000_000)
+    for i in range(10):
+        app_module._canon_make(f"marca {i}")
+    assert len(app_module._CANON_MEMO["make"]) == 3
+    pd = pytest.importorskip("pandas")
+    out = app_module._canon_model_series(pd.Series(["MAZDA", "MAZDA"]), pd.Series(["cx30", "CX-5"]))
+    assert out.tolist() == ["CX-30", "CX-5"]
+    assert len(app_module._CANON_MEMO["model"]) == 2
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from core.build_report import BuildReport
+
+
+class _Frame:
+    def __init__(self, rows, cols):
+        self._rows = rows
+        self.columns = list(range(cols))
+
+    def __len__(self):
+        return self._rows
+
+
+def test_stages_record_rows_and_errors():
+    report = BuildReport("catalog", source="test.csv")
+    report.stage("load")
+    report.stage("merge", _Frame(10, 3))
+    report.fail(ValueError("bad row"))
+    out = report.finish(_Frame(8, 4))
+    assert out["name"] == "catalog" and out["source"] == "test.csv" and out["finished"]
+    load, merge = out["stages"]
+    assert (load["stage"], load["rows_in"], load["rows_out"], load["cols_out"]) == ("load", None, 10, 3)
+    assert (merge["rows_in"], merge["rows_out"], merge["cols_out"]) == (10, 8, 4)
+    assert merge["errors"] == ["ValueError: bad row"] and load["errors"] == []
+    assert out["total_ms"] >= 0
+    assert "merge=" in report.summary() and "errors=1" in report.summary()
+
+
+def test_errors_outside_a_stage_go_to_meta():
+    report = BuildReport("catalog")
+    report.fail(RuntimeError("no source"))
+    assert report.as_dict()["errors"] == ["RuntimeError: no source"]
+    assert report.as_dict()["finished"] is False
+
+
+def test_python_heap_tracing():
+    report = BuildReport("catalog", trace_python=True)
+    report.stage("alloc")
+    data = [bytes(1024) for _ in range(100)]
+    out = report.finish(data)
+    assert out["stages"][0]["py_peak_mb"] >= 0
+
+
+def test_debug_catalog_build_endpoint(client):
+    body = client.get("/debug/catalog_build").json()
+    assert body["epoch"] >= 1
+    last = body["last"]
+    assert last["name"] == "catalog" and last["finished"]
+    assert [s["stage"] for s in last["stages"]][-1] == "snapshot_write"
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+
+def _is_nan(value) -> bool:
+    return isinstance(value, float) and math.isnan(value)
+
+
+def test_make_filtered_catalog_keeps_combined_kml(client):
+    rows = client.get("/catalog", params={"make": "MAZDA", "model": "CX-30", "limit": 50}).json()
+    assert rows
+    kml = [r.get("combinado_kml") for r in rows]
+    assert not any(_is_nan(v) for v in kml)
+    assert all(v is not None and v > 0 for v in kml)
+
+
+def test_api_row_ignores_nan_spec_aliases(app_module):
+    row = {"make": "MAZDA", "model": "CX-30", "combinado_kml": 16.0, "fuel_combined_kml": float("nan")}
+    out = app_module._catalog_api_row(row)
+    assert out["combinado_kml"] == 16.0
+    out = app_module._catalog_api_row({"combinado_kml": 16.0, "fuel_combined_kml": 17.5})
+    assert out["combinado_kml"] == 17.5
+
+
+def test_catalog_view_writes_do_not_reach_the_shared_frame(app_module):
+    assert app_module._PANDAS_COW
+    shared = app_module._load_catalog()
+    before = shared["make"].copy()
+    view = app_module._catalog_view()
+    view["make"] = "EDITED"
+    view.loc[view.index[0], "ano"] = 1900
+    assert shared["make"].equals(before)
+    assert shared["ano"].iloc[0] != 1900
+
+
+def test_catalog_cursor_pages_through_the_same_query(client):
+    params = {"make": "MAZDA", "limit": 5, "fields": "make,model,version,ano"}
+    first = client.get("/catalog", params=params)
+    total = int(first.headers["X-Total-Count"])
+    seen = first.json()
+    cursor = first.headers.get("X-Next-Cursor")
+    while cursor:
+        page = client.get("/catalog", params={**params, "cursor": cursor})
+        assert page.status_code == 200
+        seen.extend(page.json())
+        cursor = page.headers.get("X-Next-Cursor")
+    assert len(seen) == total
+    assert {r["make"] for r in seen} == {"MAZDA"}
+
+
+def test_catalog_cursor_rejects_other_queries(client):
+    first = client.get("/catalog", params={"make": "MAZDA", "limit": 2})
+    cursor = first.headers["X-Next-Cursor"]
+    for other in ({"make": "KIA"}, {"make": "MAZDA", "q": "cx"}, {"make": "MAZDA", "fields": "make"}):
+        assert client.get("/catalog", params={**other, "limit": 2, "cursor": cursor}).status_code == 400
+    assert client.get("/catalog", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_catalog_requests_leave_the_shared_frame_untouched(app_module, client):
+    shared = app_module._load_catalog()
+    assert isinstance(shared["make"].dtype, pd.CategoricalDtype)
+    dtypes = shared.dtypes.copy()
+    models = shared["model"].copy()
+    for params in ({"limit": 5}, {"make": "MAZDA", "limit": 5}, {"q": "corola", "limit": 5}):
+        assert client.get("/catalog", params=params).status_code == 200
+    assert app_module._load_catalog() is shared
+    pd.testing.assert_series_equal(shared.dtypes, dtypes)
+    assert shared["model"].equals(models)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import gc
+import json
+import weakref
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from tests.conftest import ROOT
+
+
+@pytest.fixture()
+def vehicles_json(app_module, tmp_path, monkeypatch):
+    """A 40-vehicle Autoradar JSON source and an empty incremental state."""
+    src = pd.read_csv(ROOT / "data" / "equipo_veh_limpio_procesado.csv", low_memory=False).head(40)
+    records = json.loads(src.to_json(orient="records"))
+    path = tmp_path / "vehicles.json"
+    monkeypatch.setenv(app_module._AUTORADAR_JSON_ENV, str(path))
+    monkeypatch.setattr(
+        app_module, "_CATALOG_ROW_STATE", {"rest_sig": None, "hashes": None, "df": None, "gates": None}
+    )
+
+    def write(recs):
+        path.write_text(json.dumps(recs), encoding="utf-8")
+        return path
+
+    return records, write
+
+
+def _build(app_module, path, monkeypatch, *, incremental: bool):
+    monkeypatch.setenv("CATALOG_INCREMENTAL", "1" if incremental else "0")
+    df = app_module._build_catalog(path, True)
+    meta = app_module._CATALOG_BUILD_REPORT["last"]
+    return df, meta
+
+
+def _assert_same(app_module, path, monkeypatch):
+    inc, meta = _build(app_module, path, monkeypatch, incremental=True)
+    full, _ = _build(app_module, path, monkeypatch, incremental=False)
+    pd.testing.assert_frame_equal(inc, full)
+    return meta
+
+
+def test_incremental_build_matches_full_build(app_module, vehicles_json, monkeypatch):
+    records, write = vehicles_json
+    # The published frame is the incremental base
+    published, _ = _build(app_module, write(records), monkeypatch, incremental=True)
+    records[3]["msrp"] = (records[3]["msrp"] or 0) + 1000
+    meta = _assert_same(app_module, write(records), monkeypatch)
+    assert meta.get("incremental", {}).get("changed") == 1
+
+
+def test_incremental_state_does_not_pin_the_previous_frame(app_module, vehicles_json, monkeypatch):
+    records, write = vehicles_json
+    published, _ = _build(app_module, write(records), monkeypatch, incremental=True)
+    ref = weakref.ref(published)
+    del published
+    gc.collect()
+    assert ref() is None
+    records[3]["msrp"] = (records[3]["msrp"] or 0) + 1000
+    _, meta = _build(app_module, write(records), monkeypatch, incremental=True)
+    assert "incremental" not in meta
+
+
+def test_incremental_build_falls_back_when_a_gate_flips(app_module, vehicles_json, monkeypatch):
+    records, write = vehicles_json
+    for rec in records[1:]:
+        rec["fuel_cost_60k_mxn"] = None
+    _build(app_module, write(records), monkeypatch, incremental=True)
+    # The only row with a fuel cost loses it: a full build derives every row
+    records[0]["fuel_cost_60k_mxn"] = None
+    meta = _assert_same(app_module, write(records), monkeypatch)
+    assert "incremental" not in meta
+
+
+def test_default_build_skips_row_hashes(app_module, vehicles_json, monkeypatch):
+    records, write = vehicles_json
+    monkeypatch.delenv("CATALOG_INCREMENTAL", raising=False)
+    monkeypatch.setattr(app_module, "vehicle_hashes", lambda *a, **kw: pytest.fail("hashed"))
+    app_module._build_catalog(write(records), True)
+    meta = app_module._CATALOG_BUILD_REPORT["last"]
+    assert "row_hashes" not in [s.get("stage") for s in meta.get("stages", [])]
+    assert app_module._CATALOG_ROW_STATE["hashes"] is None
+
+
+def test_snapshot_signature_covers_build_code(app_module, monkeypatch):
+    source = ROOT / "data" / "equipo_veh_limpio_procesado.csv"
+    sig = app_module._catalog_input_signature(source)
+    assert app_module._catalog_input_signature(source) == sig
+    monkeypatch.setitem(app_module._CATALOG_CODE_SIG, "sig", "edited-build-code")
+    assert app_module._catalog_input_signature(source) != sig
+
+
+def test_snapshot_is_read_back_only_for_its_signature(app_module, monkeypatch, tmp_path):
+    monkeypatch.setenv("CATALOG_SNAPSHOT", "1")
+    monkeypatch.setenv("CATALOG_SNAPSHOT_DIR", str(tmp_path))
+    df = pd.DataFrame({"make": ["MAZDA", "KIA"], "precio": [399900.0, 389900.0]})
+    app_module._write_catalog_snapshot(df, "sig-1")
+    pd.testing.assert_frame_equal(app_module._read_catalog_snapshot("sig-1"), df)
+    assert app_module._read_catalog_snapshot("sig-2") is None
+    monkeypatch.setenv("CATALOG_SNAPSHOT", "0")
+    assert app_module._read_catalog_snapshot("sig-1") is None
+
+
+
+@pytest.fixture()
+def features_matrix(vehicles_json):
+    """A data/enriched/features_matrix.csv covering the first vehicles (removed afterwards)."""
+    records, _ = vehicles_json
+    enriched = ROOT / "data" / "enriched"
+    created = not enriched.exists()
+    path = enriched / "features_matrix.csv"
+    if path.exists():
+        pytest.skip("features_matrix.csv already present")
+    enriched.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(
+        {
+            "make": [r["make"] for r in records[:3]],
+            "model": [r["model"] for r in records[:3]],
+            "version": [r["version"] for r in records[:3]],
+            "ano": [r["ano"] for r in records[:3]],
+            "feat_probe": [1, 2, 3],
+            "service_cost_60k_mxn": [7100, 7200, 7300],
+        }
+    ).to_csv(path, index=False)
+    try:
+        yield path
+    finally:
+        path.unlink()
+        if created:
+            enriched.rmdir()
+
+
+def test_prefetched_build_matches_sequential_build(app_module, vehicles_json, features_matrix, monkeypatch):
+    records, write = vehicles_json
+    path = write(records)
+    monkeypatch.setenv("CATALOG_BUILD_WORKERS", "1")
+    sequential, _ = _build(app_module, path, monkeypatch, incremental=False)
+    monkeypatch.setenv("CATALOG_BUILD_WORKERS", "8")
+    prefetched, meta = _build(app_module, path, monkeypatch, incremental=False)
+    pd.testing.assert_frame_equal(prefetched, sequential)
+    assert not meta.get("errors")
+    # The features matrix was merged: new columns added, missing values filled
+    assert prefetched["feat_probe"].head(3).tolist() == [1, 2, 3]
+    assert prefetched["feat_probe"].iloc[3:].isna().all()
+    assert prefetched["service_cost_60k_mxn"].iloc[0] == 7100
+
+
+def test_build_parses_the_source_dump_once(app_module, vehicles_json, monkeypatch):
+    from core import vehicle_stream
+
+    records, write = vehicles_json
+    seen = []
+    real = vehicle_stream.iter_vehicles
+
+    def counting(path, **kw):
+        seen.append(str(path))
+        return real(path, **kw)
+
+    monkeypatch.setattr(vehicle_stream, "iter_vehicles", counting)
+    path = write(records)
+    published, _ = _build(app_module, path, monkeypatch, incremental=True)
+    records[5]["msrp"] = (records[5]["msrp"] or 0) + 500
+    path = write(records)
+    _, meta = _build(app_module, path, monkeypatch, incremental=True)
+    assert meta.get("incremental", {}).get("changed") == 1
+    # Row hashes, the source frame and the changed-record subset share one parse per signature
+    assert seen.count(str(path)) == 2
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from core.catalog_dtypes import compact_frame, memory_report
+
+
+def _frame():
+    return pd.DataFrame({
+        "make": pd.array(["MAZDA", "MAZDA", "KIA", "KIA"], dtype="str"),
+        "segmento": ["SUV", "SUV", "SUV", None],
+        "abs": ["Sí", "No", "Estándar", "no"],
+        "camara_360": ["Sí", "", None, "No"],
+        "precio": [399900.0, 425900.0, None, 389900.0],
+        "ano": [2025, 2025, 2024, 2025],
+        "vehicle_id": ["a", "a", "b", "b"],
+    })
+
+
+def test_text_columns_become_category():
+    df = compact_frame(_frame())
+    assert isinstance(df["make"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["segmento"].dtype, pd.CategoricalDtype)
+    assert df["make"].tolist() == ["MAZDA", "MAZDA", "KIA", "KIA"]
+    assert not isinstance(df["vehicle_id"].dtype, pd.CategoricalDtype)
+
+
+def test_flags_keep_blanks_missing():
+    df = compact_frame(_frame())
+    assert df["abs"].dtype == bool
+    assert df["abs"].tolist() == [True, False, True, False]
+    assert df["camara_360"].dtype == object
+    assert df["camara_360"].isna().tolist() == [False, True, True, False]
+    assert df["camara_360"].iloc[0] is True and df["camara_360"].iloc[3] is False
+    assert not any(v is pd.NA for v in df["camara_360"])
+    rows = df.where(df.notna(), None).to_dict(orient="records")
+    assert rows[1]["camara_360"] is None
+
+
+def test_only_yes_no_text_columns_become_flags():
+    df = compact_frame(pd.DataFrame({
+        "bits": [1, 0, None, 1],
+        "blank": ["", None, " ", None],
+        "mixed": ["Sí", "Opcional", "Sí", "No"],
+    }), category_max_ratio=1.0)
+    assert str(df["bits"].dtype) == "float32"
+    assert df["blank"].dtype != bool and df["blank"].tolist()[0] == ""
+    assert isinstance(df["mixed"].dtype, pd.CategoricalDtype)
+
+
+def test_numbers_downcast_only_when_exact():
+    df = compact_frame(_frame())
+    assert str(df["precio"].dtype) == "float32"
+    assert str(df["ano"].dtype) == "int32"
+    precise = compact_frame(pd.DataFrame({"x": [0.1, 0.2]}))
+    assert str(precise["x"].dtype) == "float64"
+
+
+def test_memory_report_sorts_columns_by_size():
+    report = memory_report(compact_frame(_frame()), top=2)
+    assert report["rows"] == 4 and report["cols"] == 7
+    assert len(report["columns"]) == 2
+    assert report["columns"][0]["bytes"] >= report["columns"][1]["bytes"]
+    assert sum(report["by_dtype"].values()) == report["total_bytes"]
+
+
+def test_compare_items_match_the_uncompacted_catalog(app_module, client, monkeypatch):
+    path, from_json = app_module._catalog_source_path()
+    monkeypatch.setenv("CATALOG_COMPACT_DTYPES", "0")
+    plain = app_module._build_catalog(path, from_json)
+    payload = {
+        "own": {"make": "CHANGAN", "model": "UNI-K", "ano": 2025, "version": "2.0T Lv 4"},
+        "competitors": [
+            {"make": "CHANGAN", "model": "CS95 PLUS", "ano": 2026, "version": "Luxury 2wd"},
+            {"make": "CADILLAC", "model": "OPTIQ", "ano": 2025},
+            {"make": "MAZDA", "model": "CX-30", "ano": 2025},
+            {"make": "TOYOTA", "model": "COROLLA CROSS", "ano": 2025},
+        ],
+    }
+
+    def compare():
+        app_module._ENRICHED_CACHE.clear()
+        resp = client.post("/compare", json=payload)
+        assert resp.status_code == 200
+        return resp.json()
+
+    compacted = compare()
+    monkeypatch.setattr(app_module, "_DF", plain)
+    monkeypatch.setattr(app_module, "_CATALOG_EPOCH", app_module._CATALOG_EPOCH + 1)
+    expected = compare()
+    app_module._ENRICHED_CACHE.clear()
+    assert compacted["own"] == expected["own"]
+    for got, want in zip(compacted["competitors"], expected["competitors"]):
+        assert got["item"] == want["item"]
+    assert expected["competitors"][0]["item"].get("sensor_punto_ciego") is True
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from core.catalog_index import CatalogIndex, compact_version
+
+
+def _frame():
+    return pd.DataFrame({
+        "make": ["Mazda", "MAZDA ", "KIA", "MAZDA"],
+        "model": ["CX-30", "CX-30", "K3", "CX-5"],
+        "version": ["i Sport 2WD", "Signature", "GT-Line", "i Sport 2WD"],
+        "ano": [2025, "2024", 2025, None],
+    }, index=[10, 11, 12, 13])
+
+
+def _mask(df, make=None, model=None, year=None, version=None, compact=False):
+    m = pd.Series(True, index=df.index)
+    up = lambda c: df[c].astype(str).str.strip().str.upper()  # noqa: E731
+    if make:
+        m &= up("make") == make.upper()
+    if model:
+        m &= up("model") == model.upper()
+    if year is not None:
+        m &= pd.to_numeric(df["ano"], errors="coerce") == year
+    if version:
+        if compact:
+            m &= up("version").map(compact_version) == compact_version(version)
+        else:
+            m &= up("version") == version.upper()
+    return np.flatnonzero(m.to_numpy())
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {"make": "mazda"},
+    {"model": "cx-30"},
+    {"make": "MAZDA", "model": "CX-30"},
+    {"make": "MAZDA", "model": "CX-30", "year": 2024},
+    {"make": "MAZDA", "model": "CX-5", "year": 2025},
+    {"make": "MAZDA", "model": "CX-30", "year": 2025, "version": "I SPORT 2WD"},
+    {"make": "MAZDA", "model": "CX-30", "year": 2025, "version": "i-sport 2wd", "compact": True},
+    {"year": 2025},
+    {"version": "gt-line"},
+    {"make": "FORD"},
+])
+def test_rows_match_boolean_masks(query):
+    df = _frame()
+    assert CatalogIndex(df).rows(**query).tolist() == _mask(df, **query).tolist()
+
+
+def test_keys_frame_is_aligned_with_the_catalog():
+    df = _frame()
+    idx = CatalogIndex(df, extra={"body": lambda d: ["SUV"] * len(d)})
+    assert list(idx.keys.index) == list(df.index)
+    assert idx.keys["make"].tolist() == ["MAZDA", "MAZDA", "KIA", "MAZDA"]
+    assert idx.keys["model_c"].tolist() == ["CX30", "CX30", "K3", "CX5"]
+    assert idx.keys["year"].tolist() == [2025, 2024, 2025, 0]
+    assert idx.keys["body"].tolist() == ["SUV"] * 4
+    assert CatalogIndex(df).rows(year="not a year").tolist() == []
+
+
+def test_catalog_lookup_matches_masks_on_the_real_catalog(app_module):
+    df = app_module._load_catalog()
+    for query in ({"make": "MAZDA"}, {"make": "MAZDA", "model": "CX-30"}, {"make": "TOYOTA", "model": "COROLLA CROSS", "year": 2025}):
+        got = app_module._catalog_lookup(**query)
+        assert got.index.tolist() == df.index[_mask(df, **query)].tolist()
+
+
+def test_catalog_keys_match_the_per_row_normalisers(app_module):
+    df = app_module._load_catalog()
+    keys = app_module._catalog_index(df).keys
+    assert keys.index.equals(df.index)
+    assert keys["make"].tolist() == df["make"].astype(str).str.strip().str.upper().tolist()
+    year = pd.to_numeric(df["ano"], errors="coerce").fillna(0).astype(int)
+    assert keys["year"].tolist() == year.tolist()
+    # Raw values as the handlers saw them: missing text prints as "nan"
+    seg = df["segmento_ventas"].astype(object).tolist()
+    bs = df["body_style"].astype(object).tolist()
+    label = app_module._normalize_body_style_label
+    expected = {
+        "segment": [label(str(v)).upper() for v in seg],
+        "body_style_label": [label(b if pd.isna(s) else s) for s, b in zip(seg, bs)],
+        "competitor_segment_bs": [app_module._competitor_segment(str(v)) for v in bs],
+        "competitor_segment_sv": [app_module._competitor_segment(str(v)) for v in seg],
+    }
+    for col, values in expected.items():
+        # Missing buckets may be stored as NaN; the handlers filter with == either way
+        assert [None if pd.isna(v) else v for v in keys[col]] == values, col
+
+
+def test_catalog_keys_are_built_once_per_epoch_and_never_served(app_module, client):
+    df = app_module._load_catalog()
+    keys = app_module._catalog_index(df).keys
+    assert app_module._catalog_index(df).keys is keys
+    # A new epoch (another frame) gets its own keys
+    assert app_module._catalog_index(df.copy(deep=False)).keys is not keys
+    app_module._catalog_index(df)
+    row = client.get("/catalog", params={"make": "MAZDA", "limit": 1}).json()[0]
+    assert not {"model_c", "version_c", "body_style_label", "competitor_segment_bs"} & set(row)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from core.catalog_kernels import apply_alias_table, flag_any, map_values, num_column, python_or, round1, truthy_mask
+
+
+def test_map_values_parses_each_type_separately():
+    seen = []
+
+    def parse(v):
+        seen.append(v)
+        return type(v).__name__
+
+    out = map_values(pd.Series([1, 1.0, True, "x", "x", None], dtype=object), parse)
+    assert out.tolist() == ["int", "float", "bool", "str", "str", "NoneType"]
+    assert seen.count("x") == 1
+
+
+def test_num_column_and_flag_any():
+    df = pd.DataFrame({"precio": ["$1,000", "n/a", None], "abs": ["Sí", "No", None], "esp": [0, 1, None]})
+
+    def parse(v):
+        try:
+            return float(str(v).replace("$", "").replace(",", ""))
+        except Exception:
+            return None
+
+    prices = num_column(df, "precio", parse)
+    assert prices.iloc[0] == 1000.0 and math.isnan(prices.iloc[1]) and math.isnan(prices.iloc[2])
+    assert num_column(df, "missing", parse).isna().all()
+    to01 = lambda v: 1 if str(v).strip().lower() in {"sí", "1", "1.0"} else 0  # noqa: E731
+    assert flag_any(df, ["abs", "esp", "missing"], to01).tolist() == [1, 1, 0]
+
+
+def test_python_or_matches_row_semantics():
+    df = pd.DataFrame({"a": [None, "", "x", float("nan")], "b": ["y", "z", "w", "v"]})
+    rows = df.astype(object).to_dict(orient="records")
+    expected = [r.get("a") or r.get("b") for r in rows]
+    got = python_or(df, ["a", "b"], nan_is_truthy=True).tolist()
+    assert got[:3] == expected[:3]
+    assert isinstance(got[3], float) and math.isnan(got[3])
+    assert python_or(df, ["a", "b"]).tolist()[3] == "v"
+    assert truthy_mask(df["a"]).tolist() == [False, False, True, False]
+
+
+def test_round1_uses_python_rounding():
+    assert round1([0.25, 0.35, float("nan")]).tolist()[:2] == [round(0.25, 1), round(0.35, 1)]
+
+
+def test_apply_alias_table_behaves_like_setdefault():
+    records = [{"kml": 15.0}, {"kml": 16.0, "combined": None}, {"kml": 17.0, "combined": 18.0}]
+    df = pd.DataFrame(records)
+    apply_alias_table(df, [("combined", "kml"), ("created", "nope")], create_missing=True, records=records)
+    assert df["combined"].iloc[0] == 15.0
+    assert math.isnan(df["combined"].iloc[1])  # explicit null kept
+    assert df["combined"].iloc[2] == 18.0
+    assert df["created"].isna().all()
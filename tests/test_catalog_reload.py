@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+
+@pytest.fixture()
+def epochs(app_module, monkeypatch):
+    """The published epoch marked stale, a gated fake build and its call log.
+
+    The published frame, its source stamp and the epoch counter are restored
+    afterwards.
+    """
+    old = app_module._load_catalog()
+    for name in ("_DF", "_DF_MTIME", "_CATALOG_SOURCE", "_CATALOG_EPOCH", "_CATALOG_RELOAD_THREAD"):
+        monkeypatch.setattr(app_module, name, getattr(app_module, name))
+    monkeypatch.setattr(app_module, "_CATALOG_RELOAD_STATS", dict(app_module._CATALOG_RELOAD_STATS))
+    monkeypatch.setattr(app_module, "_DF_MTIME", -1.0)
+    new = old.head(50).copy()
+    gate = threading.Event()
+    builds = []
+
+    def build(path, from_json):
+        builds.append(path)
+        assert gate.wait(10)
+        return new
+
+    monkeypatch.setattr(app_module, "_build_catalog", build)
+    return old, new, gate, builds
+
+
+def test_concurrent_reloads_build_once(app_module, epochs):
+    old, new, gate, builds = epochs
+    path, from_json = app_module._catalog_source_path()
+    m = path.stat().st_mtime
+    epoch = app_module._CATALOG_EPOCH
+    threads = [threading.Thread(target=app_module._reload_catalog, args=(path, from_json, m)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    gate.set()
+    for t in threads:
+        t.join(10)
+    assert len(builds) == 1
+    assert app_module._DF is new
+    assert app_module._CATALOG_EPOCH == epoch + 1
+    assert app_module._CATALOG_RELOAD_STATS["building"] is False
+
+
+def test_readers_keep_the_old_epoch_until_the_swap(app_module, epochs):
+    old, new, gate, builds = epochs
+    epoch = app_module._CATALOG_EPOCH
+    # Stale source: the request path serves the published frame and schedules the build
+    assert app_module._load_catalog() is old
+    worker = app_module._CATALOG_RELOAD_THREAD
+    assert worker is not None
+    deadline = time.monotonic() + 5
+    while not builds and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert app_module._catalog_status()["building"] is True
+    assert app_module._load_catalog() is old
+    assert app_module._CATALOG_RELOAD_THREAD is worker
+    assert app_module._CATALOG_EPOCH == epoch
+    gate.set()
+    worker.join(10)
+    assert app_module._load_catalog() is new
+    assert app_module._CATALOG_EPOCH == epoch + 1
+    assert len(builds) == 1
+
+
+def test_failed_reload_keeps_serving_the_old_epoch(app_module, epochs, monkeypatch):
+    old, _, _, _ = epochs
+    path, from_json = app_module._catalog_source_path()
+
+    def broken(path, from_json):
+        raise ValueError("fuente corrupta")
+
+    monkeypatch.setattr(app_module, "_build_catalog", broken)
+    epoch = app_module._CATALOG_EPOCH
+    with pytest.raises(ValueError):
+        app_module._reload_catalog(path, from_json, path.stat().st_mtime)
+    assert app_module._DF is old
+    assert app_module._CATALOG_EPOCH == epoch
+    assert app_module._CATALOG_RELOAD_STATS["last_error"] == "fuente corrupta"
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from core.catalog_search import EXACT, CatalogSearch, normalize
+
+ROWS = [
+    ("TOYOTA", "HILUX", "Sr 4x2"),
+    ("TOYOTA", "COROLLA CROSS", "Le Cvt"),
+    ("GWM", "HAVAL JOLION", "Hibrida Luxury"),
+    ("MG", "ZS", "Hev Lux"),
+    ("GWM", "POER 500", "Híbrida Enchufable Luxury"),
+    ("MAZDA", "CX-30", "I Sport 2wd"),
+    ("MAZDA", "CX-3", "I Sport 2wd"),
+]
+
+
+def _search(rows=ROWS) -> CatalogSearch:
+    makes, models, versions = zip(*rows)
+    return CatalogSearch(makes, models, versions)
+
+
+def _models(found, rows=ROWS):
+    return [rows[int(r[0])][1] for r, _score in found]
+
+
+def test_normalize_drops_accents_and_punctuation():
+    assert normalize("T-Cross") == normalize("TCROSS") == "TCROSS"
+    assert normalize("Híbrida") == "HIBRIDA"
+
+
+def test_verbatim_match_ranks_first():
+    found = _search().search("cx-30")
+    assert _models(found)[0] == "CX-30"
+    assert found[0][1] == EXACT
+
+
+def test_typos_still_match():
+    assert _models(_search().search("hylux")) == ["HILUX"]
+    assert _models(_search().search("corola"))[0] == "COROLLA CROSS"
+
+
+def test_absent_model_does_not_match_versions_sharing_bigrams():
+    rows = [r for r in ROWS if r[1] != "HILUX"]
+    found = _search(rows).search("hilux")
+    assert found == []
+
+
+def test_catalog_q_without_catalog_match_returns_nothing(client):
+    body = client.get("/catalog", params={"q": "hilux", "limit": 50}).json()
+    assert all("HILUX" in f"{r.get('make')} {r.get('model')}".upper() for r in body)
+
+
+def test_catalog_q_present_model(client):
+    body = client.get("/catalog", params={"q": "cx-30", "limit": 50}).json()
+    models = [r["model"] for r in body]
+    assert models and models[0] == "CX-30"
+    assert set(models[: models.count("CX-30")]) == {"CX-30"}
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+FIVE_COMPETITORS = {
+    "own": {"make": "MAZDA", "model": "CX-30", "ano": 2026},
+    "competitors": [
+        {"make": "TOYOTA", "model": "COROLLA CROSS", "ano": 2025},
+        {"make": "KIA", "model": "SELTOS", "ano": 2025},
+        {"make": "CHANGAN", "model": "UNI-K", "ano": 2025},
+        {"make": "HONDA", "model": "BR-V", "ano": 2025},
+        {"make": "CADILLAC", "model": "OPTIQ", "ano": 2025},
+    ],
+}
+
+
+def test_compare_never_copies_the_shared_catalog_in_full(app_module, client, monkeypatch):
+    shared = app_module._load_catalog()
+    full_copies = []
+    real_copy, real_take = pd.DataFrame.copy, pd.DataFrame.take
+
+    def copy(self, *args, **kwargs):
+        if self is shared:
+            full_copies.append("copy")
+        return real_copy(self, *args, **kwargs)
+
+    def take(self, indices, *args, **kwargs):
+        if self is shared and len(indices) >= len(shared):
+            full_copies.append("take")
+        return real_take(self, indices, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, "copy", copy)
+    monkeypatch.setattr(pd.DataFrame, "take", take)
+    app_module._ENRICHED_CACHE.clear()
+    resp = client.post("/compare", json=FIVE_COMPETITORS)
+    assert resp.status_code == 200
+    assert len(resp.json()["competitors"]) == 5
+    assert full_copies == []
+
+
+@pytest.mark.parametrize("version, hp", [
+    ("Maxi Pack 5p 1.2 Puretech 110hp Man 6vel", 110.0),
+    ("Maxi 5p 1.6HDI 90hp Man 5vel", 90.0),
+])
+def test_own_hp_follows_the_version_text(app_module, client, version, hp):
+    payload = {
+        "own": {"make": "PEUGEOT", "model": "NUEVA PARTNER", "ano": 2024, "version": version},
+        "competitors": [{"make": "RAM", "model": "PROMASTER RAPID", "ano": 2025}],
+    }
+    app_module._ENRICHED_CACHE.clear()
+    resp = client.post("/compare", json=payload)
+    assert resp.status_code == 200
+    own = resp.json()["own"]
+    assert own["caballos_fuerza"] == hp
+    assert own["cost_per_hp_mxn"] == pytest.approx(own["msrp"] / hp)
+
+
+def test_batch_results_match_single_compares(app_module, client):
+    peugeot = {"make": "PEUGEOT", "model": "NUEVA PARTNER", "ano": 2024, "version": "Maxi 5p 1.6HDI 90hp Man 5vel"}
+    own_rivals = [{"make": "RAM", "model": "PROMASTER RAPID", "ano": 2025}]
+    payload = {
+        "bases": [
+            FIVE_COMPETITORS["own"],
+            {"own": peugeot, "competitors": own_rivals},
+            # Same year as the first base: enriched in the same pass
+            {"make": "CHANGAN", "model": "CS95 PLUS", "ano": 2026},
+        ],
+        "competitors": FIVE_COMPETITORS["competitors"],
+    }
+    app_module._ENRICHED_CACHE.clear()
+    resp = client.post("/compare/batch", json=payload)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["meta"]["bases"] == 3
+    singles = [
+        FIVE_COMPETITORS,
+        {"own": peugeot, "competitors": own_rivals},
+        {"own": payload["bases"][2], "competitors": FIVE_COMPETITORS["competitors"]},
+    ]
+    for got, single in zip(body["results"], singles):
+        app_module._ENRICHED_CACHE.clear()
+        want = client.post("/compare", json=single)
+        assert want.status_code == 200
+        assert got == want.json()
+
+
+@pytest.mark.parametrize("payload, detail", [
+    ({}, "bases debe ser una lista no vacía"),
+    ({"bases": []}, "bases debe ser una lista no vacía"),
+    ({"bases": {"make": "KIA"}}, "bases debe ser una lista no vacía"),
+    ({"bases": ["KIA SELTOS"]}, "cada base debe ser un objeto"),
+])
+def test_batch_rejects_malformed_bases(client, payload, detail):
+    resp = client.post("/compare/batch", json=payload)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == detail
+
+
+def test_batch_size_is_capped(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "_COMPARE_BATCH_MAX", 2)
+    base = {"make": "KIA", "model": "SELTOS", "ano": 2025}
+    resp = client.post("/compare/batch", json={"bases": [base] * 3, "competitors": []})
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "máximo 2 bases por llamada"
+    resp = client.post("/compare/batch", json={"bases": [base] * 2, "competitors": []})
+    assert resp.status_code == 200
+    assert len(resp.json()["results"]) == 2
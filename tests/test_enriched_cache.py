@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import threading
+
+from core.enriched_cache import EnrichedCache
+
+
+def test_enriched_cache_lru_eviction_and_stats():
+    cache = EnrichedCache(maxsize=2)
+    calls = []
+
+    def make(key):
+        def fn():
+            calls.append(key)
+            return {"key": key}
+        return fn
+
+    assert cache.get_or_compute("a", make("a")) == {"key": "a"}
+    cache.get_or_compute("b", make("b"))
+    cache.get_or_compute("a", make("a"))  # hit, "a" becomes most recent
+    cache.get_or_compute("c", make("c"))  # evicts "b"
+    cache.get_or_compute("b", make("b"))
+    assert calls == ["a", "b", "c", "b"]
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["maxsize"] == 2
+    assert stats["hits"] == 1 and stats["misses"] == 4
+    assert stats["hit_rate"] == 0.2
+
+
+def test_enriched_cache_isolates_callers():
+    cache = EnrichedCache()
+    row = cache.get_or_compute("k", lambda: {"features": ["abs"]})
+    row["features"].append("patched")
+    again = cache.get_or_compute("k", lambda: None)
+    assert again == {"features": ["abs"]}
+    again["features"].clear()
+    assert cache.get_or_compute("k", lambda: None) == {"features": ["abs"]}
+
+
+def test_enriched_cache_disabled_and_clear():
+    off = EnrichedCache(maxsize=0)
+    off.get_or_compute("k", lambda: 1)
+    assert off.get_or_compute("k", lambda: 2) == 2
+    assert off.stats()["size"] == 0 and off.stats()["hits"] == 0
+
+    cache = EnrichedCache(maxsize=4)
+    cache.get_or_compute("k", lambda: 1)
+    cache.clear()
+    assert cache.get_or_compute("k", lambda: 2) == 2
+    assert EnrichedCache().stats()["hit_rate"] is None
+
+
+def test_enriched_cache_concurrent_access():
+    cache = EnrichedCache(maxsize=8)
+    errors = []
+
+    def worker(i):
+        try:
+            for j in range(200):
+                key = (i + j) % 16
+                assert cache.get_or_compute(key, lambda: {"v": key}) == {"v": key}
+        except Exception as exc:  # pragma: no cover - surfaced below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    stats = cache.stats()
+    assert stats["size"] <= 8
+    assert stats["hits"] + stats["misses"] == 800
+
+
+def test_compare_reuses_enriched_rows(client, app_module):
+    app_module._ENRICHED_CACHE.clear()
+    own = {"make": "MAZDA", "model": "CX-30", "ano": 2025, "version": "I Sport 2wd"}
+    payload = {"own": own, "competitors": [{"make": "TOYOTA", "model": "COROLLA CROSS", "ano": 2025}]}
+    first = client.post("/compare", json=payload)
+    assert first.status_code == 200
+    before = client.get("/debug/enriched_cache").json()
+    second = client.post("/compare", json=payload)
+    after = client.get("/debug/enriched_cache").json()
+    assert second.json() == first.json()
+    assert after["hits"] > before["hits"]
+    assert after["misses"] == before["misses"]
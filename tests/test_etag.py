@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import pytest
+
+CATALOG = ("/catalog", {"make": "MAZDA", "model": "CX-30", "limit": 5})
+
+
+def _get(client, path, params=None, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get(path, params=params, headers=headers)
+
+
+@pytest.mark.parametrize("path, params", [CATALOG, ("/config", None)])
+def test_ok_response_carries_etag_and_revalidates_to_304(app_module, client, path, params):
+    # The startup hook loads fuel prices before the first request in production
+    app_module._FUEL_PRICES.current()
+    first = _get(client, path, params)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    again = _get(client, path, params, etag=etag)
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    assert _get(client, path, params, etag=f'"stale", W/{etag}').status_code == 304
+    assert _get(client, path, params, etag='"stale"').status_code == 200
+
+
+def test_etag_depends_on_the_query(client):
+    path, params = CATALOG
+    one = _get(client, path, params).headers["ETag"]
+    other = _get(client, path, {**params, "limit": 6}).headers["ETag"]
+    assert one != other
+
+
+def test_catalog_epoch_swap_changes_the_etag(app_module, client, monkeypatch):
+    path, params = CATALOG
+    before = _get(client, path, params).headers["ETag"]
+    monkeypatch.setattr(app_module, "_CATALOG_EPOCH", app_module._CATALOG_EPOCH + 1)
+    resp = _get(client, path, params, etag=before)
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != before
+
+
+def test_fuel_price_update_changes_the_config_etag(app_module, client, monkeypatch):
+    before = _get(client, "/config").headers["ETag"]
+    monkeypatch.setattr(app_module._FUEL_PRICES, "version", app_module._FUEL_PRICES.version + 1)
+    resp = _get(client, "/config", etag=before)
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != before
+
+
+def test_non_read_paths_and_disabled_toggle_skip_etags(client, monkeypatch):
+    assert "ETag" not in client.get("/health").headers
+    monkeypatch.setenv("HTTP_ETAGS", "0")
+    path, params = CATALOG
+    assert "ETag" not in _get(client, path, params).headers
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from core.file_lock import exclusive
+
+
+def test_exclusive_serialises_holders(tmp_path):
+    lock = tmp_path / "cache" / "x.lock"
+    held = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def first():
+        with exclusive(lock):
+            order.append("a-in")
+            held.set()
+            release.wait(5)
+            order.append("a-out")
+
+    def second():
+        held.wait(5)
+        with exclusive(lock):
+            order.append("b-in")
+
+    ta = threading.Thread(target=first)
+    tb = threading.Thread(target=second)
+    ta.start()
+    tb.start()
+    held.wait(5)
+    time.sleep(0.2)
+    assert order == ["a-in"]
+    release.set()
+    ta.join(5)
+    tb.join(5)
+    assert order == ["a-in", "a-out", "b-in"]
+    assert lock.exists()
+
+
+def test_exclusive_releases_on_error(tmp_path):
+    lock = tmp_path / "x.lock"
+    try:
+        with exclusive(lock):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    with exclusive(lock):
+        pass
+
+
+def test_options_lists_brands_and_models(client):
+    body = client.get("/options").json()
+    assert "MAZDA" in body["brands"]
+    body = client.get("/options", params={"make": "MAZDA"}).json()
+    assert "CX-30" in body["models_for_make"]
+    body = client.get("/options", params={"model": "CX-30"}).json()
+    assert body["autofill"].get("make_from_model") == "MAZDA"
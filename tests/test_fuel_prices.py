@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from core.fuel_prices import FuelPriceProvider, FuelPrices
+
+
+def _prices(magna: float, premium: float = 26.0, diesel: float = 25.0) -> FuelPrices:
+    return FuelPrices(magna, premium, diesel, 2.8, source="test")
+
+
+def test_price_for_follows_fuel_text():
+    p = _prices(24.0)
+    assert p.price_for("Gasolina Magna") == 24.0
+    assert p.price_for("Premium") == 26.0
+    assert p.price_for("diesel") == 25.0
+    assert p.price_for("electric") == 0.0
+    assert p.price_for("") is None
+    assert _prices(None).price_for("premium") == 26.0
+
+
+def test_provider_versions_only_on_change():
+    loads = iter([_prices(24.0), _prices(24.0), _prices(24.5)])
+    provider = FuelPriceProvider(lambda: next(loads))
+    assert provider.loaded() is None
+    assert provider.current().gasolina_magna_litro == 24.0
+    assert provider.version == 1
+    assert provider.refresh() is False
+    assert provider.version == 1
+    assert provider.refresh() is True
+    assert provider.version == 2
+    assert provider.current().gasolina_magna_litro == 24.5
+
+
+def test_reprice_only_touches_formula_costs(app_module):
+    pd = pytest.importorskip("pandas")
+    old, new = _prices(23.57), _prices(24.0)
+    kml = 19.0
+    df = pd.DataFrame({
+        "combinado_kml": [kml, kml, kml, kml, None],
+        "categoria_combustible_final": ["Gasolina", "Gasolina", "Gasolina", "Eléctrico BEV", "Gasolina"],
+        # from the formula at 23.57 (cents), from another source, missing, BEV, no kml
+        "fuel_cost_60k_mxn": [round(60000 / kml * 23.57, 2), 80000.0, None, 12000.0, 70000.0],
+    })
+    out, changed = app_module._reprice_catalog_fuel(df, old, new)
+    assert changed == 1
+    assert out["fuel_cost_60k_mxn"].iloc[0] == round(60000 / kml * 24.0, 2)
+    assert out["fuel_cost_60k_mxn"].iloc[1] == 80000.0
+    assert math.isnan(out["fuel_cost_60k_mxn"].iloc[2])
+    assert out["fuel_cost_60k_mxn"].iloc[3] == 12000.0
+    assert out["fuel_cost_60k_mxn"].iloc[4] == 70000.0
+    assert df["fuel_cost_60k_mxn"].iloc[0] == round(60000 / kml * 23.57, 2)
+
+
+def test_reprice_is_noop_when_prices_unchanged(app_module):
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({"combinado_kml": [19.0], "categoria_combustible_final": ["Gasolina"], "fuel_cost_60k_mxn": [74431.58]})
+    out, changed = app_module._reprice_catalog_fuel(df, _prices(23.57), _prices(23.57))
+    assert changed == 0 and out is df
+
+
+def test_catalog_build_keeps_source_fuel_costs(app_module):
+    pd = pytest.importorskip("pandas")
+    df = app_module._load_catalog()
+    if "fuel_cost_60k_mxn" not in df.columns:
+        pytest.skip("catalog has no fuel cost column")
+    cost = pd.to_numeric(df["fuel_cost_60k_mxn"], errors="coerce").dropna()
+    # the build does not reprice: costs are not forced to whole pesos
+    assert len(cost) == 0 or not (cost == cost.round()).all()
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import random
+
+from core.keyword_matcher import KeywordMatcher, any_of
+
+FAMILIES = {
+    "camara": ["camara", "cámara trasera", "camara 360"],
+    "camara_360": ["camara 360", "vista 360"],
+    "sensor": ["sensor", "sensores de reversa"],
+    "carplay": ["apple carplay", "carplay"],
+    "empty": [],
+}
+
+
+def _naive(text):
+    return frozenset(label for label, kws in FAMILIES.items() if any(k in text for k in kws if k))
+
+
+def test_labels_match_naive_scan():
+    m = KeywordMatcher(FAMILIES)
+    for text in ("", "camara 360 y sensores de reversa", "apple carplay", "vista 360", "nada"):
+        assert m.labels(text) == _naive(text)
+
+
+def test_labels_match_naive_scan_on_random_text():
+    m = KeywordMatcher(FAMILIES)
+    words = ["camara", "360", "vista", "sensor", "es", "de", "reversa", "apple", "carplay", "cámara", "trasera"]
+    rng = random.Random(7)
+    for _ in range(300):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+        assert m.labels(text) == _naive(text)
+
+
+def test_any_of():
+    rx = any_of(["led", "xenon", "led"])
+    assert rx.search("faros led") and rx.search("xenon") and not rx.search("halógeno")
+    assert KeywordMatcher({}).labels("camara") == frozenset()
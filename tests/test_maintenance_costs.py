@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from core.maintenance_costs import MaintenanceIndex, parse_cost
+
+HEADER = "MAKE,Model,Version,Año,60000\n"
+
+
+def _write(path, rows):
+    path.write_text(HEADER + "".join(",".join(map(str, r)) + "\n" for r in rows), encoding="utf-8")
+    return path
+
+
+def test_parse_cost():
+    assert parse_cost({"60000": "$12,500"}) == 12500.0
+    assert parse_cost({"service_cost": "", "Costo_60k": "9000"}) == 9000.0
+    assert parse_cost({"60000": "Incluido"}) == 0.0
+    assert parse_cost({"60000": "n/d"}) is None
+    assert parse_cost({}) is None
+
+
+def test_maintenance_index_tiers(tmp_path):
+    path = _write(tmp_path / "costos.csv", [
+        ("Mazda", "CX-30", "i Sport", 2025, 9000),
+        ("Mazda", "CX-30", "i Sport", 2025, 8000),
+        ("Mazda", "CX-30", "Signature", 2025, 12000),
+        ("Mazda", "CX-30", "Carbon", 2024, 15000),
+        ("Mazda", "CX-5", "Signature", "", 20000),
+        ("Toyota", "Hilux", "SR", 2025, 1),
+        ("Toyota", "Hilux", "SR", 2024, -5),
+    ])
+    idx = MaintenanceIndex([path, tmp_path / "missing.csv"])
+    assert idx.size == 5
+    assert idx.lookup("MAZDA", "CX-30", 2025, "I SPORT") == 8000
+    assert idx.lookup("MAZDA", "CX-30", 2025, "I-SPORT") == 8000
+    assert idx.lookup("MAZDA", "CX-30", 2025, "GRAND TOURING") == 8000
+    assert idx.lookup("MAZDA", "CX-30", 2026, "GRAND TOURING") == 8000
+    assert idx.lookup("MAZDA", "CX-30", 2024, "CARBON") == 15000
+    assert idx.lookup("MAZDA", "CX-5", 2025, "") == 20000
+    assert idx.lookup("TOYOTA", "HILUX", 2025, "SR") is None
+
+
+def test_maintenance_index_preference(tmp_path):
+    first = _write(tmp_path / "a.csv", [("Kia", "K3", "LX", 2025, 7000)])
+    second = _write(tmp_path / "b.csv", [
+        ("Kia", "K3", "LX", 2025, 5000),
+        ("Kia", "Seltos", "EX", 2025, 6000),
+        ("Kia", "Seltos", "EX", 2025, "incluido"),
+    ])
+    idx = MaintenanceIndex([first, second])
+    assert idx.lookup("KIA", "K3", 2025, "LX") == 7000
+    assert idx.lookup("KIA", "SELTOS", 2025, "EX") == 0
+
+
+def test_compare_fills_service_cost_from_index(client, app_module, monkeypatch, tmp_path):
+    path = _write(tmp_path / "costos.csv", [("Toyota", "Corolla Cross", "", 2025, 4321)])
+    idx = MaintenanceIndex([path])
+    monkeypatch.setattr(app_module, "_maintenance_index", lambda: idx)
+    app_module._ENRICHED_CACHE.clear()
+    own = {"make": "MAZDA", "model": "CX-30", "ano": 2025, "version": "I Sport 2wd"}
+    body = client.post("/compare", json={"own": own, "competitors": [{"make": "TOYOTA", "model": "COROLLA CROSS", "ano": 2025}]}).json()
+    assert body["competitors"][0]["item"]["service_cost_60k_mxn"] == 4321.0
+    app_module._ENRICHED_CACHE.clear()
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+
+@pytest.fixture()
+def no_source_reads(app_module, monkeypatch):
+    """A built options tree, an empty response cache and source readers that fail."""
+    app_module._ensure_options_index()
+    monkeypatch.setattr(app_module, "_OPTIONS_CACHE", {})
+
+    def fail(*args, **kwargs):
+        pytest.fail("options source read on the request path")
+
+    monkeypatch.setattr(pd, "read_csv", fail)
+    monkeypatch.setattr(app_module, "load_vehicles", fail)
+    monkeypatch.setattr(app_module, "_build_options_tree", fail)
+
+
+def test_every_query_shape_is_answered_from_the_tree(client, no_source_reads):
+    menus = client.get("/options").json()
+    assert "MAZDA" in menus["makes"] and "CX-30" in menus["models"]
+
+    by_model = client.get("/options", params={"model": "cx30"}).json()
+    assert by_model["makes_for_model"] == ["MAZDA"]
+    assert by_model["selected"]["make"] == "MAZDA"
+    assert 2025 in by_model["years"]
+
+    by_year = client.get("/options", params={"make": "MAZDA", "model": "CX-30", "year": 2025}).json()
+    assert by_year["versions"]
+    assert by_year["years"] == by_model["years"]
+
+
+def test_persisted_tree_round_trips_for_its_signature_only(app_module, monkeypatch, tmp_path):
+    monkeypatch.setenv("OPTIONS_TREE_ARTIFACT", "1")
+    monkeypatch.setenv(app_module._CATALOG_SNAPSHOT_DIR_ENV, str(tmp_path))
+    paths = app_module._options_paths()
+    built = app_module._build_options_tree(paths)
+    sig = {"v": app_module._OPTIONS_TREE_VERSION, "mtimes": app_module._options_source_mtimes(paths), "years": [2025]}
+    app_module._save_options_tree(sig, built)
+    assert app_module._options_tree_path().parent == tmp_path
+
+    loaded = app_module._load_options_tree(sig)
+    assert loaded is not None
+    for key in ("tree", "catalog_years", "makes", "models", "by_model", "by_compact"):
+        assert loaded[key] == built[key], key
+    assert app_module._load_options_tree({**sig, "years": [2026]}) is None
+    monkeypatch.setenv("OPTIONS_TREE_ARTIFACT", "0")
+    assert app_module._load_options_tree(sig) is None
+
+
+def test_changed_source_rebuilds_the_tree(app_module, monkeypatch):
+    app_module._ensure_options_index()
+    monkeypatch.setattr(app_module, "_OPTIONS_IDX", app_module._OPTIONS_IDX)
+    monkeypatch.setattr(app_module, "_OPTIONS_IDX_MTIMES", {**app_module._OPTIONS_IDX_MTIMES, "flat": -2.0})
+    built = []
+    real = app_module._build_options_tree
+
+    def counting(paths):
+        built.append(sorted(paths))
+        return real(paths)
+
+    monkeypatch.setattr(app_module, "_build_options_tree", counting)
+    app_module._ensure_options_index()
+    app_module._ensure_options_index()
+    assert len(built) == 1
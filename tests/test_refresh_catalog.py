@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import csv
+import json
+
+import pytest
+
+from scripts import refresh_catalog
+
+
+@pytest.fixture()
+def paths(tmp_path, monkeypatch):
+    out = {
+        "SRC_JSON": tmp_path / "src.json",
+        "DST_JSON": tmp_path / "data" / "vehiculos.json",
+        "DST_JSONL": tmp_path / "data" / "vehiculos.jsonl",
+        "DST_CSV": tmp_path / "data" / "catalog_master.csv",
+    }
+    for name, path in out.items():
+        monkeypatch.setattr(refresh_catalog, name, path)
+    return out
+
+
+def _source(n):
+    return {
+        "vehicles": [
+            {"vehicle_id": str(i), "make": {"name": "MAZDA"}, "model": {"name": "CX-30"}, "modelYear": 2025}
+            for i in range(n)
+        ],
+        "metadata": {"source": "test"},
+    }
+
+
+def test_rebuild_writes_all_artifacts(paths):
+    paths["SRC_JSON"].write_text(json.dumps(_source(3)), encoding="utf-8")
+    refresh_catalog.rebuild_catalog()
+    doc = json.loads(paths["DST_JSON"].read_text(encoding="utf-8"))
+    assert len(doc["vehicles"]) == 3 and doc["metadata"] == {"source": "test"}
+    assert len(paths["DST_JSONL"].read_text(encoding="utf-8").splitlines()) == 3
+    with paths["DST_CSV"].open(encoding="utf-8", newline="") as fh:
+        assert len(list(csv.DictReader(fh))) == 3
+    assert paths["DST_JSONL"].stat().st_mtime >= paths["DST_JSON"].stat().st_mtime
+    assert not list(paths["DST_JSON"].parent.glob("*.tmp"))
+
+
+def test_parse_error_keeps_previous_artifacts(paths):
+    paths["SRC_JSON"].write_text(json.dumps(_source(2)), encoding="utf-8")
+    refresh_catalog.rebuild_catalog()
+    before = {k: paths[k].read_bytes() for k in ("DST_JSON", "DST_JSONL", "DST_CSV")}
+    paths["SRC_JSON"].write_text(json.dumps(_source(5))[:-40], encoding="utf-8")
+    with pytest.raises(Exception):
+        refresh_catalog.rebuild_catalog()
+    assert {k: paths[k].read_bytes() for k in before} == before
+    assert not list(paths["DST_JSON"].parent.glob("*.tmp"))
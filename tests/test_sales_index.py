@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import math
+
+import pandas as pd
+
+from core.sales_index import SIN_SEGMENTO, SalesYear
+
+ALIASES = {"VW": "VOLKSWAGEN"}
+
+
+def _canon_make(mk):
+    return ALIASES.get(mk)
+
+
+def _canon_model(mk, md):
+    return "JETTA" if md == "JETTA GLI" else None
+
+
+def _frame():
+    return pd.DataFrame(
+        {
+            "Make": ["Mazda", "VW", "Volkswagen", "Mazda", " toyota "],
+            "Model": ["CX-30", "Jetta", "Jetta GLI", "CX-5", "Hilux"],
+            "ano": [2025, 2025, 2024, None, 2025],
+            "ventas_2025_01": [10, 5, 1, None, 0],
+            "ventas_2025_02": [20, "x", 2, 3, 0],
+            "ventas_2025_03": [0, 7.9, 0, 0, 0],
+            "ventas_2025_13": [999, 999, 999, 999, 999],
+        }
+    )
+
+
+def _index():
+    return SalesYear(_frame(), 2025, _canon_make, _canon_model)
+
+
+def test_sales_year_monthly_matrix():
+    idx = _index()
+    assert idx.months == [1, 2, 3]
+    assert idx.monthly.shape == (5, 12)
+    assert idx.monthly[0, :3].tolist() == [10, 20, 0]
+    assert math.isnan(idx.monthly_raw[1, 1]) and idx.monthly[1, 1] == 0
+    assert idx.ytd.tolist() == [30, 12.9, 3, 3, 0]
+    assert idx.last_month.tolist() == [2, 3, 2, 2, 0]
+    assert idx.make.tolist()[4] == "TOYOTA"
+    assert idx.make_canon.tolist()[:3] == ["MAZDA", "VOLKSWAGEN", "VOLKSWAGEN"]
+    assert idx.ano.tolist() == [2025, 2025, 2024, 2025, 2025]
+
+
+def test_sales_year_units_lookups():
+    idx = _index()
+    assert idx.units("MAZDA", "CX-30", 2025) == (30, 2)
+    assert idx.units("MAZDA", "CX-30", 2024) is None
+    assert idx.units("TOYOTA", "HILUX", 2025) == (0, None)
+    assert idx.units_any_year("VOLKSWAGEN", "JETTA") == ((12, 3), 2025)
+    assert idx.units_by_model("JETTA") == (12, 3)
+    assert idx.units_by_model("JETTA", same_year=True) == (12, 3)
+    assert idx.units_by_model("CX-9") is None
+
+
+def test_sales_year_pick():
+    idx = _index()
+    assert idx.pick("VW", "JETTA") == 1
+    assert idx.pick("VOLKSWAGEN", "JETTA GLI") == 2
+    assert idx.pick("ANY", "CX-5") == 3
+    assert idx.pick("ANY", "CX-9") is None
+
+
+def test_sales_year_segments_and_brands():
+    idx = _index()
+    seg_map = {("MAZDA", "CX-30"): "SUV", ("MAZDA", "CX-5"): "SUV", ("VW", "JETTA"): "Sedán"}
+    segs = idx.segments(seg_map, "t1")
+    assert segs["SUV"][:3].tolist() == [10, 23, 0]
+    assert segs[SIN_SEGMENTO][:3].tolist() == [1, 2, 0]
+    assert idx.segments({}, "t1") is segs
+    assert idx.segment_totals(seg_map, "t1") == {"SUV": 33, "Sedán": 12, SIN_SEGMENTO: 3}
+    brands = idx.brand_monthly()
+    assert brands["VOLKSWAGEN"][:3] == [6, 2, 7]
+    assert brands["MAZDA"][:3] == [10, 23, 0]
+    assert len(brands["TOYOTA"]) == 12
+    assert idx.brand_monthly() is brands
+
+
+def test_sales_year_without_month_columns():
+    idx = SalesYear(pd.DataFrame({"make": ["Mazda"], "model": ["CX-30"]}), 2025, _canon_make, _canon_model)
+    assert idx.months == [] and idx.ytd.tolist() == [0]
+    assert idx.units("MAZDA", "CX-30", 2025) is None
+    assert idx.segment_totals({}, "t") == {}
+    assert idx.brand_monthly() == {}
+
+
+def test_brand_monthly_endpoint(client, app_module, monkeypatch):
+    monkeypatch.setattr(
+        app_module,
+        "_brand_sales_monthly",
+        lambda year: SalesYear(_frame(), 2025, _canon_make, _canon_model).brand_monthly() if year == 2025 else {},
+    )
+    body = client.get("/sales/brand_monthly", params={"make": "Mazda", "years": "2025,2024"}).json()
+    series = {s["year"]: s for s in body["series"]}
+    assert series[2025]["monthly"][:3] == [10, 23, 0]
+    assert series[2025]["total"] == 33
+    assert series[2024]["total"] == 0
+    assert client.get("/sales/brand_monthly", params={"make": " "}).status_code == 400
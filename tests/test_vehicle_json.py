@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import json
+import os
+
+
+def _vehicle(vid, version, year):
+    return {
+        "vehicleId": vid,
+        "make": {"name": "Mazda"},
+        "model": {"name": "CX-30"},
+        "version": {"name": version, "year": year},
+    }
+
+
+def _setup(app_module, tmp_path, monkeypatch, vehicles, mtime):
+    path = tmp_path / "vehiculos.json"
+    path.write_text(json.dumps({"vehicles": vehicles}), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+    monkeypatch.setattr(app_module, "_vehicle_json_candidates", lambda: [path])
+    return path
+
+
+def test_vehicle_json_lookup_tiers(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "_VEH_JSON_ENTRIES", None)
+    _setup(app_module, tmp_path, monkeypatch, [_vehicle("1", "i Sport 2WD", 2025), _vehicle("2", "Signature", 2024)], 1_000_000)
+    find = app_module._find_vehicle_json_entry
+    assert find("MAZDA", "CX-30", "I SPORT 2WD", "2025")["year"] == "2025"
+    assert find("MAZDA", "CX-30", "I-SPORT 2WD", "2025") is not None
+    assert find("MAZDA", "CX-30", "SIGNATURE", "2026")["year"] == "2024"
+    assert find("MAZDA", "CX-5", "SIGNATURE", "2024") is None
+
+
+def test_vehicle_json_snapshot_swaps_as_a_whole(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "_VEH_JSON_ENTRIES", None)
+    _setup(app_module, tmp_path, monkeypatch, [_vehicle("1", "i Sport 2WD", 2025)], 1_000_000)
+    first = app_module._vehicle_json_snapshot()
+    assert app_module._vehicle_json_snapshot() is first
+    _setup(app_module, tmp_path, monkeypatch, [_vehicle("2", "Carbon Edition", 2025)], 2_000_000)
+    sig, entries, index = app_module._vehicle_json_snapshot()
+    assert sig != first[0]
+    assert [e["ver"] for e in entries] == ["CARBON EDITION"]
+    assert set(index["ver"]) == {("MAZDA", "CX-30", "CARBON EDITION")}
+    assert app_module._find_vehicle_json_entry("MAZDA", "CX-30", "I SPORT 2WD", "2025") is None
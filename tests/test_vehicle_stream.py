@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+import pytest
+
+from core import vehicle_stream
+from core.vehicle_stream import (
+    begin_generation,
+    content_hash,
+    frame_from_records,
+    iter_vehicles,
+    jsonl_sidecar,
+    load_vehicles,
+    release_generations,
+    vehicle_hashes,
+)
+
+VEHICLES = [{"vehicle_id": "a", "make": "MAZDA"}, {"vehicle_id": "b", "make": "KIA"}]
+
+
+def _write(path, obj):
+    path.write_text(json.dumps(obj), encoding="utf-8")
+    return path
+
+
+def test_object_and_list_dumps(tmp_path):
+    meta = {}
+    obj = _write(tmp_path / "obj.json", {"vehicles": VEHICLES, "metadata": {"source": "jato"}})
+    assert list(iter_vehicles(obj, metadata=meta)) == VEHICLES
+    assert meta == {"source": "jato"}
+    assert list(iter_vehicles(_write(tmp_path / "list.json", VEHICLES))) == VEHICLES
+    pretty = tmp_path / "pretty.json"
+    pretty.write_text("\n  " + json.dumps(VEHICLES + ["note", None], indent=2), encoding="utf-8")
+    assert list(iter_vehicles(pretty)) == VEHICLES
+    items = _write(tmp_path / "items.json", {"items": VEHICLES})
+    assert list(load_vehicles(items, key="items")) == VEHICLES
+
+
+def test_non_strict_json_falls_back_to_stdlib(tmp_path):
+    path = tmp_path / "nan.json"
+    path.write_text('{"vehicles": [{"vehicle_id": "a", "kml": NaN}, {"vehicle_id": "b"}]}', encoding="utf-8")
+    assert [v["vehicle_id"] for v in iter_vehicles(path)] == ["a", "b"]
+
+
+def test_fresh_jsonl_sidecar_is_preferred(tmp_path):
+    path = _write(tmp_path / "dump.json", {"vehicles": VEHICLES})
+    side = tmp_path / "dump.jsonl"
+    side.write_text(json.dumps({"vehicle_id": "side"}) + "\n", encoding="utf-8")
+    st = path.stat()
+    os.utime(side, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert jsonl_sidecar(path) == side
+    assert [v["vehicle_id"] for v in iter_vehicles(path)] == ["side"]
+    # Metadata lives only in the JSON document
+    assert list(iter_vehicles(path, metadata={})) == VEHICLES
+
+
+def test_load_vehicles_reads_current_content(tmp_path):
+    assert list(load_vehicles(tmp_path / "missing.json")) == []
+    path = _write(tmp_path / "dump.json", VEHICLES)
+    assert list(load_vehicles(path)) == VEHICLES
+    _write(path, VEHICLES[:1])
+    assert list(load_vehicles(path)) == VEHICLES[:1]
+
+
+def test_broken_dump_raises_while_iterating(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text('{"vehicles": [{"vehicle_id": "a"}, {"vehicle_', encoding="utf-8")
+    with pytest.raises(Exception):
+        list(load_vehicles(path))
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+@pytest.fixture()
+def parses(monkeypatch):
+    """Paths handed to the parser, in call order."""
+    seen = []
+    real = vehicle_stream.iter_vehicles
+
+    def counting(path, **kw):
+        seen.append(os.path.basename(path))
+        return real(path, **kw)
+
+    monkeypatch.setattr(vehicle_stream, "iter_vehicles", counting)
+    monkeypatch.setattr(vehicle_stream, "_SHARED", {})
+    return seen
+
+
+def test_load_vehicles_parses_each_signature_once(tmp_path, parses):
+    path = _write(tmp_path / "dump.json", VEHICLES)
+    first = load_vehicles(path)
+    assert load_vehicles(path) is first
+    records, hashes = vehicle_hashes(path)
+    assert records is first
+    assert list(hashes) == [content_hash(v) for v in VEHICLES]
+    assert parses == ["dump.json"]
+    _write(path, VEHICLES[:1])
+    assert load_vehicles(path) == tuple(VEHICLES[:1])
+    assert parses == ["dump.json", "dump.json"]
+
+
+def test_concurrent_consumers_share_one_parse(tmp_path, parses):
+    path = _write(tmp_path / "dump.json", VEHICLES * 500)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(load_vehicles(path))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert parses == ["dump.json"]
+    assert all(r is results[0] for r in results)
+
+
+def test_release_drops_parses_the_new_generation_did_not_use(tmp_path, parses):
+    old = _write(tmp_path / "old.json", VEHICLES)
+    kept = _write(tmp_path / "kept.json", VEHICLES)
+    load_vehicles(old)
+    load_vehicles(kept)
+    gen = begin_generation()
+    load_vehicles(kept)
+    assert release_generations(gen) == 1
+    load_vehicles(kept)
+    load_vehicles(old)
+    assert parses == ["old.json", "kept.json", "old.json"]
+
+
+def test_frame_from_records_matches_the_list_constructor():
+    pd = pytest.importorskip("pandas")
+    records = [
+        {"vehicle_id": "a", "make": None, "hp": None},
+        {"vehicle_id": "b", "make": "KIA", "hp": 150},
+        {"vehicle_id": "c", "make": "MAZDA", "hp": 155.5, "extra": True},
+        {"vehicle_id": "d", "make": None},
+    ]
+    for size in (1, 2, 3, 10):
+        pd.testing.assert_frame_equal(frame_from_records(records, chunk_size=size), pd.DataFrame(records))